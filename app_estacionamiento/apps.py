@@ -9,10 +9,11 @@ class AppEstacionamientoConfig(AppConfig):
 
     def ready(self):
         """
-        Conectar señales de allauth al arrancar la app.
+        Conectar señales de allauth y de los modelos al arrancar la app.
         Usamos ready() porque las señales deben registrarse una sola vez,
         después de que todos los modelos estén cargados.
         """
+        from app_estacionamiento import signals  # noqa: F401
         from allauth.account.signals import email_confirmed
         from django.contrib import messages
         from django.dispatch import receiver
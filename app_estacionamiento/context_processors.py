@@ -15,12 +15,15 @@ def municipio_branding(request):
     """Detecta el municipio del usuario logueado y lo pone en el contexto."""
     from django.conf import settings
     from app_estacionamiento.models import Municipio
+    from app_estacionamiento.services.config_municipio import obtener_config
 
     municipio = None
 
-    # Si el usuario está logueado y tiene municipio asignado, usarlo
+    # Si el usuario está logueado y tiene municipio asignado, usar la copia
+    # cacheada de ConfigMunicipio (no carga el Municipio en cada página)
     if request.user.is_authenticated:
-        municipio = getattr(request.user, "municipio", None)
+        config = obtener_config(getattr(request.user, "municipio_id", None))
+        municipio = config.municipio if config else None
 
     # Fallback: primer municipio activo (p.ej. en la página de login)
     if municipio is None:
@@ -29,4 +32,6 @@ def municipio_branding(request):
     return {
         "municipio_branding": municipio,
         "modo_desarrollo":    settings.DEBUG,  # True en local, False en Railway
+        # Sin worker de reportes los links descargan directo (ver base.html)
+        "reportes_en_segundo_plano": settings.REPORTES_EN_SEGUNDO_PLANO,
     }
@@ -158,20 +158,15 @@ def require_modulo(nombre_modulo):
             if getattr(usuario, "es_superadmin", False):
                 return view_func(request, *args, **kwargs)
 
-            # Para el resto: verificar que el municipio tenga el módulo activo
-            municipio = getattr(usuario, "municipio", None)
-            if not municipio:
+            # Para el resto: verificar que el municipio tenga el módulo activo,
+            # según la config cacheada del municipio (sin query por request).
+            # Import local para evitar importación circular con models
+            from .services.config_municipio import obtener_config
+            config = obtener_config(getattr(usuario, "municipio_id", None))
+            if config is None:
                 return TemplateResponse(request, "403.html", status=403)
 
-            # Import local para evitar importación circular con models
-            from .models import ModuloMunicipio
-            tiene_modulo = ModuloMunicipio.objects.filter(
-                municipio=municipio,
-                modulo=nombre_modulo,
-                activo=True,
-            ).exists()
-
-            if not tiene_modulo:
+            if not config.tiene_modulo(nombre_modulo):
                 return TemplateResponse(request, "modulo_no_disponible.html", {
                     "modulo": nombre_modulo,
                 }, status=402)
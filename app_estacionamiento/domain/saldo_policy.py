@@ -3,5 +3,6 @@ from decimal import Decimal
 class SaldoPolicy:
 
     @staticmethod
-    def tiene_saldo(usuario, costo: Decimal):
-        return usuario.saldo >= costo
\ No newline at end of file
+    def tiene_saldo(saldo: Decimal, costo: Decimal):
+        # saldo: el saldo real (services.saldo.saldo_actual), no el snapshot del Usuario
+        return saldo >= costo
\ No newline at end of file
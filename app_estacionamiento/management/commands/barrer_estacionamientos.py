@@ -0,0 +1,56 @@
+"""
+Comando para cerrar los estacionamientos vencidos de todos los municipios.
+
+Finaliza los ACTIVO cuyo tiempo pago terminó y los de municipios cuyo
+horario de cobro ya cerró, con UPDATEs por lotes (ver services/barrido.py).
+Así los reportes y la verificación del inspector ven el estado correcto sin
+esperar a que un conductor abra la app.
+
+Uso desde cron (cada minuto):
+    * * * * * python manage.py barrer_estacionamientos
+
+Como worker, sin cron:
+    python manage.py barrer_estacionamientos --continuo --intervalo 60
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from app_estacionamiento.services.barrido import LOTE_BARRIDO, barrer_estacionamientos
+
+
+class Command(BaseCommand):
+    help = "Finaliza los estacionamientos vencidos por tiempo o por cierre de horario."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="No terminar: repetir el barrido cada --intervalo segundos.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=60,
+            help="Segundos entre pasadas en modo --continuo (default: 60)",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=LOTE_BARRIDO,
+            help=f"Filas por transacción (default: {LOTE_BARRIDO})",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            resultado = barrer_estacionamientos(lote=options["lote"])
+            self.stdout.write(self.style.SUCCESS(
+                f"Finalizados por tiempo: {resultado['por_tiempo']} — "
+                f"por cierre de horario: {resultado['por_horario']}"
+            ))
+            if not options["continuo"]:
+                return
+            connection.close()
+            time.sleep(options["intervalo"])
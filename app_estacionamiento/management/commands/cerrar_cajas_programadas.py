@@ -0,0 +1,83 @@
+"""
+Comando para los cierres de caja programados (Usuario.cierre_automatico o,
+si el cobrador no tiene uno propio, Municipio.cierre_automatico).
+
+Cada pasada crea los TrabajoCierreCaja del último corte de cada cobrador
+y los ejecuta. Ver services/cierres_programados.py.
+
+Uso en Railway Console (o como cron, cada pocos minutos):
+    python manage.py cerrar_cajas_programadas
+
+Como worker, con 4 procesos en paralelo:
+    python manage.py cerrar_cajas_programadas --continuo --procesos 4
+
+Solo crear los trabajos (los ejecuta otro worker):
+    python manage.py cerrar_cajas_programadas --solo-programar
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from app_estacionamiento.services.cierres_programados import (
+    LOTE_TRABAJOS,
+    procesar_en_paralelo,
+    programar_cierres,
+)
+
+
+class Command(BaseCommand):
+    help = "Programa y ejecuta los cierres de caja automáticos de cada cobrador."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--procesos",
+            type=int,
+            default=1,
+            help="Procesos que ejecutan cierres en paralelo (default: 1)",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=LOTE_TRABAJOS,
+            help=f"Cierres por pasada (default: {LOTE_TRABAJOS})",
+        )
+        parser.add_argument(
+            "--solo-programar",
+            action="store_true",
+            help="Crear los trabajos del corte sin ejecutarlos.",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="No terminar: repetir cada --intervalo segundos.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=60,
+            help="Segundos entre pasadas en modo --continuo (default: 60)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            nuevos = programar_cierres()
+            resultado = None
+            if not options["solo_programar"]:
+                resultado = procesar_en_paralelo(options["procesos"], limite=options["lote"])
+            hubo = nuevos or (resultado and any(resultado.values()))
+            if hubo or not options["continuo"]:
+                mensaje = f"Cierres programados: {nuevos} nuevos"
+                if resultado is not None:
+                    mensaje += (
+                        f" — generados: {resultado['listos']}, "
+                        f"sin movimientos: {resultado['sin_movimientos']}, "
+                        f"con error: {resultado['errores']}"
+                    )
+                self.stdout.write(self.style.SUCCESS(mensaje))
+            if not options["continuo"]:
+                return
+            connection.close()
+            if not resultado or sum(resultado.values()) < options["lote"]:
+                time.sleep(options["intervalo"])
@@ -0,0 +1,57 @@
+"""
+Comando para compactar el libro de saldo (SaldoMovimiento) en Usuario.saldo.
+
+Una operación solo compacta su usuario cuando ya acumula COMPACTAR_DESDE
+filas pendientes; este comando compacta el resto, mantiene al día el
+snapshot de Usuario.saldo y chica la cantidad de filas que suma
+saldo_actual().
+Ver services/saldo.py.
+
+Uso en Railway Console (o como cron):
+    python manage.py compactar_saldos
+
+Como worker, cada 5 minutos:
+    python manage.py compactar_saldos --continuo --intervalo 300
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from app_estacionamiento.services.saldo import LOTE_COMPACTACION, compactar_saldos
+
+
+class Command(BaseCommand):
+    help = "Suma los movimientos de saldo pendientes al snapshot de cada usuario."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="No terminar: repetir la compactación cada --intervalo segundos.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=300,
+            help="Segundos entre pasadas en modo --continuo (default: 300)",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=LOTE_COMPACTACION,
+            help=f"Filas por transacción (default: {LOTE_COMPACTACION})",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            compactadas = compactar_saldos(lote=options["lote"])
+            if compactadas or not options["continuo"]:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Movimientos de saldo compactados: {compactadas}"
+                ))
+            if not options["continuo"]:
+                return
+            connection.close()
+            time.sleep(options["intervalo"])
@@ -0,0 +1,78 @@
+"""
+Comando para construir el resumen diario de recaudación (ResumenDiario).
+
+Suma los MovimientoCaja de los días cerrados que faltan (y de los días con
+filas que llegaron tarde). Ver services/resumen_diario.py.
+
+Uso en Railway Console (o como cron nocturno):
+    python manage.py construir_resumen_diario
+
+Reconstruir un rango a mano:
+    python manage.py construir_resumen_diario --desde 2025-01-01 --hasta 2025-03-31
+
+Como worker, una pasada por hora:
+    python manage.py construir_resumen_diario --continuo --intervalo 3600
+"""
+
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from app_estacionamiento.services.resumen_diario import construir_resumen_diario
+
+
+def _fecha(valor):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f"Fecha inválida: {valor} (formato AAAA-MM-DD)")
+
+
+class Command(BaseCommand):
+    help = "Construye ResumenDiario para los días cerrados pendientes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--desde",
+            type=str,
+            default=None,
+            help="Reconstruir desde esta fecha (AAAA-MM-DD) en vez de la pasada incremental.",
+        )
+        parser.add_argument(
+            "--hasta",
+            type=str,
+            default=None,
+            help="Última fecha a construir (default: ayer)",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="No terminar: repetir la pasada incremental cada --intervalo segundos.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=3600,
+            help="Segundos entre pasadas en modo --continuo (default: 3600)",
+        )
+
+    def handle(self, *args, **options):
+        desde = _fecha(options["desde"]) if options["desde"] else None
+        hasta = _fecha(options["hasta"]) if options["hasta"] else None
+        if desde and hasta and desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta.")
+
+        while True:
+            resultado = construir_resumen_diario(desde=desde, hasta=hasta)
+            self.stdout.write(self.style.SUCCESS(
+                f"Resumen diario: {resultado['dias']} días reconstruidos "
+                f"({resultado['filas']} filas)"
+            ))
+            if not options["continuo"]:
+                return
+            # El rango manual se hace una sola vez; después, pasadas incrementales
+            desde = hasta = None
+            connection.close()
+            time.sleep(options["intervalo"])
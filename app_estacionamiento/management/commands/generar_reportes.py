@@ -0,0 +1,64 @@
+"""
+Comando del worker de reportes (TrabajoReporte).
+
+Cada pasada genera los reportes pedidos desde el panel (PDF para juzgado,
+rendición, infracciones del día, estadísticas de inspectores) y borra los
+archivos vencidos y los PDF cacheados sin uso. Ver services/reportes.py y
+services/cache_documentos.py.
+
+Uso en Railway Console (una pasada):
+    python manage.py generar_reportes
+
+Como worker (junto con REPORTES_EN_SEGUNDO_PLANO=True):
+    python manage.py generar_reportes --continuo --intervalo 5
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from app_estacionamiento.services.cache_documentos import purgar_documentos
+from app_estacionamiento.services.reportes import (
+    LOTE_REPORTES,
+    procesar_reportes_pendientes,
+    purgar_reportes,
+)
+
+
+class Command(BaseCommand):
+    help = "Genera los reportes pedidos en segundo plano y borra los vencidos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=LOTE_REPORTES,
+            help=f"Reportes por pasada (default: {LOTE_REPORTES})",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="No terminar: repetir cada --intervalo segundos.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=5,
+            help="Segundos entre pasadas en modo --continuo (default: 5)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            resultado = procesar_reportes_pendientes(limite=options["lote"])
+            purgados = purgar_reportes() + purgar_documentos()
+            if any(resultado.values()) or purgados or not options["continuo"]:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Reportes generados: {resultado['listos']}, "
+                    f"con error: {resultado['errores']}, purgados: {purgados}"
+                ))
+            if not options["continuo"]:
+                return
+            connection.close()
+            if sum(resultado.values()) < options["lote"]:
+                time.sleep(options["intervalo"])
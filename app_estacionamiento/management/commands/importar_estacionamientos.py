@@ -0,0 +1,60 @@
+"""
+Comando del worker de importaciones (TrabajoImportacion).
+
+Cada pasada importa los Excel del sistema anterior subidos por el
+superadmin (TransactionInfo.xlsx), por lotes y retomando desde la última
+fila confirmada. Ver services/importacion_estacionamientos.py.
+
+Uso en Railway Console (una pasada):
+    python manage.py importar_estacionamientos
+
+Como worker (junto con IMPORTACION_EN_SEGUNDO_PLANO=True):
+    python manage.py importar_estacionamientos --continuo --intervalo 10
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from app_estacionamiento.services.importacion_estacionamientos import (
+    LOTE_TRABAJOS,
+    procesar_importaciones_pendientes,
+)
+
+
+class Command(BaseCommand):
+    help = "Importa en segundo plano los Excel de estacionamientos subidos por el superadmin."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=LOTE_TRABAJOS,
+            help=f"Importaciones por pasada (default: {LOTE_TRABAJOS})",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="No terminar: repetir cada --intervalo segundos.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=10,
+            help="Segundos entre pasadas en modo --continuo (default: 10)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            resultado = procesar_importaciones_pendientes(limite=options["lote"])
+            if any(resultado.values()) or not options["continuo"]:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Importaciones terminadas: {resultado['listos']}, "
+                    f"con error: {resultado['errores']}"
+                ))
+            if not options["continuo"]:
+                return
+            connection.close()
+            if sum(resultado.values()) < options["lote"]:
+                time.sleep(options["intervalo"])
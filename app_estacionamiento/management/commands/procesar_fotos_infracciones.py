@@ -0,0 +1,59 @@
+"""
+Comando para procesar las fotos de infracciones pendientes (marca de agua GPS).
+
+Con INFRACCIONES_FOTO_ASINCRONA=True el acta se guarda con la foto cruda;
+este comando le agrega la marca de agua, le quita el EXIF y reemplaza el
+archivo. Ver services/fotos_infracciones.py.
+
+Uso en Railway Console (o como cron):
+    python manage.py procesar_fotos_infracciones
+
+Como worker, revisando la cola cada 5 segundos:
+    python manage.py procesar_fotos_infracciones --continuo --intervalo 5
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from app_estacionamiento.services.fotos_infracciones import LOTE_FOTOS, procesar_fotos_pendientes
+
+
+class Command(BaseCommand):
+    help = "Agrega la marca de agua GPS a las fotos de infracciones pendientes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="No terminar: revisar la cola cada --intervalo segundos.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=5,
+            help="Segundos entre pasadas en modo --continuo (default: 5)",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=LOTE_FOTOS,
+            help=f"Fotos por pasada (default: {LOTE_FOTOS})",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            resultado = procesar_fotos_pendientes(limite=options["lote"])
+            hubo = resultado["listas"] or resultado["errores"]
+            if hubo or not options["continuo"]:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Fotos procesadas: {resultado['listas']} "
+                    f"(con error: {resultado['errores']})"
+                ))
+            if not options["continuo"]:
+                return
+            connection.close()
+            # Si el lote vino lleno puede haber más: seguir sin esperar
+            if resultado["listas"] + resultado["errores"] < options["lote"]:
+                time.sleep(options["intervalo"])
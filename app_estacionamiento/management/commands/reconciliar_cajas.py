@@ -0,0 +1,59 @@
+"""
+Comando para reconciliar los totales de caja (CajaSaldo) con el historial.
+
+CajaSaldo se actualiza en cada MovimientoCaja y cada cierre; este comando
+la recalcula desde MovimientoCaja y corrige las filas que no coinciden
+(por ejemplo, movimientos cargados a mano desde la consola con bulk_create
+o update()). Ver services/caja_saldo.py.
+
+Uso en Railway Console (o como cron nocturno):
+    python manage.py reconciliar_cajas
+
+Solo informar, sin corregir:
+    python manage.py reconciliar_cajas --solo-verificar
+
+Un usuario puntual:
+    python manage.py reconciliar_cajas --usuario 42
+"""
+
+from django.core.management.base import BaseCommand
+
+from app_estacionamiento.services.caja_saldo import LOTE_RECONCILIACION, reconstruir_cajas
+
+
+class Command(BaseCommand):
+    help = "Recalcula CajaSaldo desde MovimientoCaja y corrige las diferencias."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--solo-verificar",
+            action="store_true",
+            help="Informar las cajas que no coinciden sin corregirlas.",
+        )
+        parser.add_argument(
+            "--usuario",
+            type=int,
+            action="append",
+            help="ID de usuario a reconciliar (se puede repetir). Default: todos.",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=LOTE_RECONCILIACION,
+            help=f"Usuarios por transacción (default: {LOTE_RECONCILIACION})",
+        )
+
+    def handle(self, *args, **options):
+        corregir  = not options["solo_verificar"]
+        resultado = reconstruir_cajas(
+            usuario_ids=options["usuario"],
+            lote=options["lote"],
+            corregir=corregir,
+        )
+        diferencias = resultado["diferencias"]
+        for usuario_id in diferencias:
+            self.stdout.write(self.style.WARNING(f"Caja del usuario {usuario_id} no coincidía"))
+        accion = "corregidas" if corregir else "con diferencias"
+        self.stdout.write(self.style.SUCCESS(
+            f"Cajas revisadas: {resultado['revisadas']} — {accion}: {len(diferencias)}"
+        ))
@@ -0,0 +1,62 @@
+"""
+Comando para verificar el libro de comisiones (ComisionPeriodo) contra el historial.
+
+ComisionPeriodo se suma en cada MovimientoCaja con comisión; este comando
+suma MovimientoCaja por vendedor y mes, muestra las diferencias y corrige
+las filas (por ejemplo, movimientos cargados con bulk_create o update()
+desde la consola). Ver services/comisiones.py.
+
+Uso en Railway Console (o como cron nocturno):
+    python manage.py reconciliar_comisiones
+
+Solo informar, sin corregir:
+    python manage.py reconciliar_comisiones --solo-verificar
+
+Un vendedor puntual:
+    python manage.py reconciliar_comisiones --vendedor 42
+"""
+
+from django.core.management.base import BaseCommand
+
+from app_estacionamiento.services.comisiones import LOTE_RECONCILIACION, reconciliar_comisiones
+
+
+class Command(BaseCommand):
+    help = "Compara ComisionPeriodo con MovimientoCaja y corrige las diferencias."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--solo-verificar",
+            action="store_true",
+            help="Informar las diferencias sin corregirlas.",
+        )
+        parser.add_argument(
+            "--vendedor",
+            type=int,
+            action="append",
+            help="ID de vendedor a reconciliar (se puede repetir). Default: todos.",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=LOTE_RECONCILIACION,
+            help=f"Vendedores por transacción (default: {LOTE_RECONCILIACION})",
+        )
+
+    def handle(self, *args, **options):
+        corregir  = not options["solo_verificar"]
+        resultado = reconciliar_comisiones(
+            vendedor_ids=options["vendedor"],
+            lote=options["lote"],
+            corregir=corregir,
+        )
+        diferencias = resultado["diferencias"]
+        for vendedor_id, periodo, (monto, cantidad), (monto_real, cantidad_real) in diferencias:
+            self.stdout.write(self.style.WARNING(
+                f"Vendedor {vendedor_id} {periodo:%m/%Y}: libro ${monto} ({cantidad}) "
+                f"≠ movimientos ${monto_real} ({cantidad_real})"
+            ))
+        accion = "corregidas" if corregir else "sin corregir"
+        self.stdout.write(self.style.SUCCESS(
+            f"Vendedores revisados: {resultado['revisados']} — diferencias {accion}: {len(diferencias)}"
+        ))
@@ -0,0 +1,49 @@
+"""
+Comando para insertar las verificaciones del inspector que quedaron en spool.
+
+Cada proceso web vuelca su propio buffer (cada N registros / T segundos).
+Este comando recupera lo que quedó en disco cuando un proceso murió sin
+volcar o cuando un volcado falló (ver services/registro_verificaciones.py).
+
+Uso en Railway Console (o como cron después de un reinicio):
+    python manage.py volcar_verificaciones
+
+Como worker, revisando cada 30 segundos:
+    python manage.py volcar_verificaciones --continuo --intervalo 30
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from app_estacionamiento.services.registro_verificaciones import recuperar_spools_huerfanos
+
+
+class Command(BaseCommand):
+    help = "Inserta las verificaciones de inspector pendientes en los spools huérfanos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="No terminar: repetir la recuperación cada --intervalo segundos.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=30,
+            help="Segundos entre pasadas en modo --continuo (default: 30)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            insertadas = recuperar_spools_huerfanos()
+            if insertadas or not options["continuo"]:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Verificaciones recuperadas: {insertadas}"
+                ))
+            if not options["continuo"]:
+                return
+            connection.close()
+            time.sleep(options["intervalo"])
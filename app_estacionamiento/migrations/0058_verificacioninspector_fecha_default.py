@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_estacionamiento', '0057_municipio_color_acento_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='verificacioninspector',
+            name='fecha',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_estacionamiento', '0058_verificacioninspector_fecha_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoMovimiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cuenta', models.CharField(choices=[('saldo', 'Saldo del conductor'), ('saldo_operativo', 'Saldo operativo del cobrador')], default='saldo', max_length=20)),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('descripcion', models.CharField(blank=True, default='', max_length=255)),
+                ('creado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('compactado', models.BooleanField(default=False)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movimientos_saldo', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('compactado', False)), fields=['usuario', 'cuenta'], name='idx_saldomov_pendientes')],
+            },
+        ),
+    ]
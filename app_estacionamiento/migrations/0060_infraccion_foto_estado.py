@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_estacionamiento', '0059_saldomovimiento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='infraccion',
+            name='foto_estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente de procesar'), ('procesando', 'Procesando'), ('lista', 'Lista'), ('error', 'Error (queda la foto original)')], default='lista', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='infraccion',
+            name='foto_estado_desde',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='infraccion',
+            name='gps_acc',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='infraccion',
+            name='gps_lat',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='infraccion',
+            name='gps_lon',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='infraccion',
+            index=models.Index(condition=models.Q(('foto_estado__in', ['pendiente', 'procesando'])), fields=['foto_estado', 'id'], name='idx_infraccion_foto_pendiente'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:04
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def cargar_cajas_desde_historial(apps, schema_editor):
+    """Arma una CajaSaldo por usuario con movimientos (lo mismo que reconciliar_cajas)."""
+    MovimientoCaja = apps.get_model("app_estacionamiento", "MovimientoCaja")
+    CajaSaldo = apps.get_model("app_estacionamiento", "CajaSaldo")
+    hoy = django.utils.timezone.localdate()
+    ingreso = Q(tipo="ingreso")
+    filas = (
+        MovimientoCaja.objects.values("usuario_id")
+        .annotate(
+            total_ingresos=Sum("monto", filter=ingreso),
+            total_egresos=Sum("monto", filter=Q(tipo="egreso")),
+            total_comisiones=Sum("comision_monto", filter=ingreso),
+            abierto_monto=Sum("monto", filter=ingreso & Q(cerrado=False)),
+            abierto_cantidad=Count("id", filter=ingreso & Q(cerrado=False)),
+            dia_ingresos=Sum("monto", filter=ingreso & Q(creado_en__date=hoy)),
+            dia_cantidad=Count("id", filter=ingreso & Q(creado_en__date=hoy)),
+        )
+        .order_by()
+    )
+    CajaSaldo.objects.bulk_create(
+        [
+            CajaSaldo(**{campo: valor or 0 for campo, valor in fila.items()}, dia=hoy)
+            for fila in filas
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_estacionamiento', '0060_infraccion_foto_estado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CajaSaldo',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='caja_saldo', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_egresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_comisiones', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('abierto_monto', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('abierto_cantidad', models.IntegerField(default=0)),
+                ('dia', models.DateField(blank=True, null=True)),
+                ('dia_ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('dia_cantidad', models.IntegerField(default=0)),
+                ('actualizado_en', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(cargar_cajas_desde_historial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_estacionamiento', '0061_cajasaldo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimientocaja',
+            index=models.Index(fields=['usuario', '-creado_en', '-id'], name='idx_movcaja_usuario_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientocaja',
+            index=models.Index(fields=['-creado_en', '-id'], name='idx_movcaja_fecha'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_estacionamiento', '0062_movimientocaja_indices_keyset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('medio_pago', models.CharField(max_length=20)),
+                ('tipo', models.CharField(max_length=10)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('comisiones', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('ultimo_movimiento_id', models.BigIntegerField(default=0)),
+                ('actualizado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('municipio', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='app_estacionamiento.municipio')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['municipio', 'fecha'], name='idx_resumen_mun_fecha')],
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'fecha', 'medio_pago', 'tipo'), name='uniq_resumen_diario')],
+            },
+        ),
+    ]
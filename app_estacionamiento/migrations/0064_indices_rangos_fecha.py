@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_estacionamiento', '0063_resumendiario'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='estacionamiento',
+            index=models.Index(fields=['subcuadra', 'estado', 'hora_inicio'], name='idx_estac_sub_estado_inicio'),
+        ),
+        migrations.AddIndex(
+            model_name='infraccion',
+            index=models.Index(fields=['municipio', 'creado_en'], name='idx_infraccion_mun_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='infraccion',
+            index=models.Index(fields=['inspector', 'creado_en'], name='idx_infraccion_insp_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientocaja',
+            index=models.Index(fields=['usuario', 'tipo', 'cerrado', 'creado_en'], name='idx_movcaja_usr_tipo_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='verificacioninspector',
+            index=models.Index(fields=['inspector', 'fecha'], name='idx_verif_inspector_fecha'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:41
+
+import datetime
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_estacionamiento', '0064_indices_rangos_fecha'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='municipio',
+            name='cierre_automatico',
+            field=models.CharField(blank=True, choices=[('', 'Manual'), ('diario', 'Diario'), ('semanal', 'Semanal')], default='', help_text='Manual: cada cobrador cierra su caja. Diario/semanal: se cierra sola al corte.', max_length=10, verbose_name='Cierre de caja automático'),
+        ),
+        migrations.AddField(
+            model_name='municipio',
+            name='cierre_dia_semana',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')], default=6, verbose_name='Día del cierre semanal'),
+        ),
+        migrations.AddField(
+            model_name='municipio',
+            name='cierre_hora',
+            field=models.TimeField(default=datetime.time(23, 59), help_text='Se cierran los cobros registrados hasta esta hora (hora local).', verbose_name='Hora de corte del cierre'),
+        ),
+        migrations.CreateModel(
+            name='TrabajoCierreCaja',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('corte', models.DateTimeField()),
+                ('periodo', models.CharField(blank=True, choices=[('diario', 'Diario'), ('semanal', 'Semanal'), ('mensual', 'Mensual')], default='', max_length=10)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('listo', 'Cierre generado'), ('sin_movimientos', 'Sin movimientos para cerrar'), ('error', 'Error')], default='pendiente', max_length=16)),
+                ('estado_desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('resumen', models.TextField(blank=True, default='')),
+                ('error', models.TextField(blank=True, default='')),
+                ('creado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('cierre', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajo', to='app_estacionamiento.cierrecaja')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_cierre', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('estado__in', ['pendiente', 'procesando', 'error'])), fields=['estado', 'id'], name='idx_trabajo_cierre_pendiente')],
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'corte'), name='uniq_trabajo_cierre_usuario_corte')],
+            },
+        ),
+    ]
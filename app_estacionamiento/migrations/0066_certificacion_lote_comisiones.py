@@ -0,0 +1,75 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def cargar_comisiones_y_certificaciones(apps, schema_editor):
+    """
+    total_comisiones de los cierres existentes: comisiones de los ingresos
+    cerrados del usuario entre fecha_apertura y fecha_cierre. Y una
+    CertificacionCierre por cada cierre ya certificado.
+    """
+    CierreCaja = apps.get_model("app_estacionamiento", "CierreCaja")
+    MovimientoCaja = apps.get_model("app_estacionamiento", "MovimientoCaja")
+    CertificacionCierre = apps.get_model("app_estacionamiento", "CertificacionCierre")
+    decimal = DecimalField(max_digits=12, decimal_places=2)
+    comisiones = (
+        MovimientoCaja.objects
+        .filter(
+            usuario_id=OuterRef("usuario_id"), tipo="ingreso", cerrado=True,
+            creado_en__gte=OuterRef("fecha_apertura"), creado_en__lte=OuterRef("fecha_cierre"),
+        )
+        .order_by()
+        .values("usuario_id")
+        .annotate(t=Sum("comision_monto"))
+        .values("t")
+    )
+    CierreCaja.objects.update(
+        total_comisiones=Coalesce(Subquery(comisiones, output_field=decimal), Value(Decimal("0")), output_field=decimal)
+    )
+    CertificacionCierre.objects.bulk_create(
+        [
+            CertificacionCierre(cierre_id=c["id"], admin_id=c["certificado_por_id"], certificado_en=c["certificado_en"])
+            for c in CierreCaja.objects.filter(certificado=True, certificado_en__isnull=False)
+            .values("id", "certificado_por_id", "certificado_en").iterator()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_estacionamiento', '0065_cierres_programados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cierrecaja',
+            name='total_comisiones',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Suma de MovimientoCaja.comision_monto de los movimientos cerrados.', max_digits=12),
+        ),
+        migrations.CreateModel(
+            name='CertificacionCierre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('certificado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('en_lote', models.BooleanField(default=False)),
+                ('admin', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='certificaciones_cierre', to=settings.AUTH_USER_MODEL)),
+                ('cierre', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='certificaciones', to='app_estacionamiento.cierrecaja')),
+            ],
+            options={
+                'verbose_name': 'Certificación de cierre',
+                'verbose_name_plural': 'Certificaciones de cierre',
+                'ordering': ['-certificado_en'],
+            },
+        ),
+        migrations.RunPython(cargar_comisiones_y_certificaciones, migrations.RunPython.noop),
+    ]
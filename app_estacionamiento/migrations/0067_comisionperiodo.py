@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncMonth
+
+
+def cargar_libro_desde_movimientos(apps, schema_editor):
+    """Una fila por (vendedor, mes) con las comisiones de los ingresos (lo mismo que reconciliar_comisiones)."""
+    MovimientoCaja = apps.get_model("app_estacionamiento", "MovimientoCaja")
+    ComisionPeriodo = apps.get_model("app_estacionamiento", "ComisionPeriodo")
+    filas = (
+        MovimientoCaja.objects
+        .filter(tipo="ingreso", comision_monto__gt=0)
+        .annotate(periodo=TruncMonth("creado_en", output_field=DateField()))
+        .values("usuario_id", "periodo")
+        .annotate(monto=Sum("comision_monto"), cantidad=Count("id"))
+        .order_by()
+    )
+    ComisionPeriodo.objects.bulk_create(
+        [
+            ComisionPeriodo(vendedor_id=f["usuario_id"], periodo=f["periodo"], monto=f["monto"], cantidad=f["cantidad"])
+            for f in filas
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_estacionamiento', '0066_certificacion_lote_comisiones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComisionPeriodo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.DateField(help_text='Primer día del mes (fecha local del cobro).')),
+                ('monto', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('actualizado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('vendedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comisiones_periodo', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Comisión por período',
+                'verbose_name_plural': 'Comisiones por período',
+                'ordering': ['-periodo'],
+                'constraints': [models.UniqueConstraint(fields=('vendedor', 'periodo'), name='uniq_comision_vendedor_periodo')],
+            },
+        ),
+        migrations.RunPython(cargar_libro_desde_movimientos, migrations.RunPython.noop),
+    ]
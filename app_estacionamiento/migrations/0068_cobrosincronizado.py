@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_estacionamiento', '0067_comisionperiodo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CobroSincronizado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=64)),
+                ('tipo', models.CharField(choices=[('estacionamiento', 'Estacionamiento'), ('infraccion', 'Infracción'), ('abono', 'Abono mensual')], max_length=16)),
+                ('estado', models.CharField(choices=[('ok', 'Registrado'), ('rechazado', 'Rechazado')], max_length=10)),
+                ('resultado', models.JSONField(blank=True, default=dict)),
+                ('vendido_en', models.DateTimeField(blank=True, null=True)),
+                ('creado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('movimiento_caja', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app_estacionamiento.movimientocaja')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cobros_sincronizados', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'clave'), name='uniq_cobro_sincronizado_clave')],
+            },
+        ),
+    ]
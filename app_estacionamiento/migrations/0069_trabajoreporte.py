@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:33
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_estacionamiento', '0068_cobrosincronizado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoReporte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('juzgado', 'Infracciones impagas (juzgado)'), ('rendicion', 'Rendición'), ('infracciones_dia', 'Infracciones del día'), ('estadisticas_inspectores', 'Estadísticas de inspectores')], max_length=32)),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('huella', models.CharField(max_length=64)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Generando'), ('listo', 'Listo'), ('error', 'Error')], default='pendiente', max_length=12)),
+                ('estado_desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('progreso', models.PositiveSmallIntegerField(default=0)),
+                ('archivo', models.FileField(blank=True, null=True, upload_to='reportes/%Y/%m/')),
+                ('nombre_archivo', models.CharField(blank=True, default='', max_length=120)),
+                ('content_type', models.CharField(blank=True, default='', max_length=100)),
+                ('error', models.TextField(blank=True, default='')),
+                ('creado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('terminado_en', models.DateTimeField(blank=True, null=True)),
+                ('municipio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_reporte', to='app_estacionamiento.municipio')),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajos_reporte', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['huella', '-terminado_en'], name='idx_trabajo_reporte_huella'), models.Index(condition=models.Q(('estado__in', ['pendiente', 'procesando', 'error'])), fields=['estado', 'id'], name='idx_trabajo_reporte_pendiente')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('estado__in', ['pendiente', 'procesando'])), fields=('huella',), name='uniq_trabajo_reporte_en_curso')],
+            },
+        ),
+    ]
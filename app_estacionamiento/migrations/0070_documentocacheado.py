@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:42
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_estacionamiento', '0069_trabajoreporte'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoCacheado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('juzgado', 'Infracciones impagas (juzgado)'), ('rendicion', 'Rendición')], max_length=16)),
+                ('huella', models.CharField(max_length=64, unique=True)),
+                ('archivo', models.FileField(upload_to='documentos_cache/%Y/%m/')),
+                ('tamano', models.PositiveIntegerField(default=0)),
+                ('creado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('usado_en', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['usado_en'], name='idx_documento_cache_uso')],
+            },
+        ),
+    ]
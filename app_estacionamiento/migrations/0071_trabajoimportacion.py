@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_estacionamiento', '0070_documentocacheado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoImportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivo', models.FileField(blank=True, null=True, upload_to='importaciones/%Y/%m/')),
+                ('nombre_archivo', models.CharField(blank=True, default='', max_length=255)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Importando'), ('listo', 'Terminada'), ('error', 'Error')], default='pendiente', max_length=12)),
+                ('estado_desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('latido_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('filas_total', models.PositiveIntegerField(blank=True, null=True)),
+                ('filas_procesadas', models.PositiveIntegerField(default=0)),
+                ('importados', models.PositiveIntegerField(default=0)),
+                ('omitidos', models.PositiveIntegerField(default=0)),
+                ('errores', models.JSONField(blank=True, default=list)),
+                ('error', models.TextField(blank=True, default='')),
+                ('creado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('terminado_en', models.DateTimeField(blank=True, null=True)),
+                ('municipio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_importacion', to='app_estacionamiento.municipio')),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajos_importacion', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('estado__in', ['pendiente', 'procesando', 'error'])), fields=['estado', 'id'], name='idx_trabajo_import_pendiente')],
+            },
+        ),
+    ]
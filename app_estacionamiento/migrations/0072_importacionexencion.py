@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_estacionamiento', '0071_trabajoimportacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportacionExencion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre_archivo', models.CharField(blank=True, default='', max_length=255)),
+                ('creado_en', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('creado_por', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='importaciones_exencion', to=settings.AUTH_USER_MODEL)),
+                ('municipio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='importaciones_exencion', to='app_estacionamiento.municipio')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FilaImportacionExencion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('num', models.PositiveIntegerField()),
+                ('patente', models.CharField(blank=True, default='', max_length=64)),
+                ('nombre', models.CharField(blank=True, default='', max_length=255)),
+                ('telefono', models.CharField(blank=True, default='', max_length=255)),
+                ('direccion', models.CharField(blank=True, default='', max_length=255)),
+                ('es_global', models.BooleanField(default=False)),
+                ('notas', models.TextField(blank=True, default='')),
+                ('estado', models.CharField(choices=[('nuevo', 'Crea vehículo'), ('actualizar', 'Actualiza vehículo'), ('error', 'Error')], max_length=12)),
+                ('mensaje', models.TextField(blank=True, default='')),
+                ('subcuadra', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app_estacionamiento.subcuadra')),
+                ('importacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='filas', to='app_estacionamiento.importacionexencion')),
+            ],
+            options={
+                'ordering': ['importacion', 'num'],
+            },
+        ),
+    ]
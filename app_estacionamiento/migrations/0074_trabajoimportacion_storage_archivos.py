@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:33
+
+import app_estacionamiento.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_estacionamiento', '0073_trabajoreporte_storage_archivos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trabajoimportacion',
+            name='archivo',
+            field=models.FileField(blank=True, null=True, storage=app_estacionamiento.models.storage_archivos, upload_to='importaciones/%Y/%m/'),
+        ),
+    ]
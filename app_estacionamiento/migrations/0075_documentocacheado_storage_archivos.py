@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:14
+
+import app_estacionamiento.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_estacionamiento', '0074_trabajoimportacion_storage_archivos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='documentocacheado',
+            name='archivo',
+            field=models.FileField(storage=app_estacionamiento.models.storage_archivos, upload_to='documentos_cache/%Y/%m/'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_estacionamiento', '0075_documentocacheado_storage_archivos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='cierre_automatico',
+            field=models.CharField(blank=True, choices=[('', 'Como el municipio'), ('manual', 'Manual'), ('diario', 'Diario'), ('semanal', 'Semanal')], default='', max_length=10, verbose_name='Cierre de caja automático'),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='cierre_dia_semana',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')], help_text='Vacío: el del municipio.', null=True, verbose_name='Día del cierre semanal'),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='cierre_hora',
+            field=models.TimeField(blank=True, help_text='Vacío: la del municipio.', null=True, verbose_name='Hora de corte del cierre'),
+        ),
+        migrations.AlterField(
+            model_name='municipio',
+            name='cierre_automatico',
+            field=models.CharField(blank=True, choices=[('', 'Manual'), ('diario', 'Diario'), ('semanal', 'Semanal')], default='', help_text='Manual: cada cobrador cierra su caja. Diario/semanal: se cierra sola al corte. Cada cobrador puede tener su propio cierre (Usuario.cierre_automatico).', max_length=10, verbose_name='Cierre de caja automático'),
+        ),
+    ]
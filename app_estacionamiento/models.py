@@ -4,12 +4,17 @@ import math
 from decimal import Decimal
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.base_user import BaseUserManager
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
-from datetime import timedelta
+from datetime import time, timedelta
 from django.conf import settings
 from django.db.models import Q, UniqueConstraint
 
+DIAS_SEMANA = [
+    (0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'),
+    (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo'),
+]
+
 # 👤 Usuario del sistema 
 class UsuarioManager(BaseUserManager):
 
@@ -91,6 +96,28 @@ class Usuario(AbstractUser):
         help_text="Con qué frecuencia debe rendir cuentas al municipio."
     )
 
+    # ── Cierre de caja programado propio (cobradores) ──────────────────────
+    # Vacío: sigue el del municipio (Municipio.cierre_automatico). La hora y
+    # el día vacíos también toman los del municipio.
+    CIERRES_COBRADOR = [
+        ('', 'Como el municipio'), ('manual', 'Manual'),
+        ('diario', 'Diario'), ('semanal', 'Semanal'),
+    ]
+    cierre_automatico = models.CharField(
+        max_length=10, choices=CIERRES_COBRADOR, blank=True, default='',
+        verbose_name='Cierre de caja automático',
+    )
+    cierre_hora = models.TimeField(
+        null=True, blank=True,
+        verbose_name='Hora de corte del cierre',
+        help_text='Vacío: la del municipio.',
+    )
+    cierre_dia_semana = models.PositiveSmallIntegerField(
+        choices=DIAS_SEMANA, null=True, blank=True,
+        verbose_name='Día del cierre semanal',
+        help_text='Vacío: el del municipio.',
+    )
+
     # 🎭 Roles
 
     # ── Datos adicionales para inspectores ──────────────────────────────────
@@ -153,6 +180,28 @@ class Usuario(AbstractUser):
     def apellido(self, valor):
         self.last_name = valor
 
+    @property
+    def saldo_al_dia(self):
+        """
+        Saldo real para mostrar: el snapshot más los movimientos del libro aún
+        no compactados (services/saldo.py). Los listados lo anotan con
+        con_saldo_al_dia() para no hacer una consulta por usuario.
+        """
+        if "_saldo_al_dia" in self.__dict__:
+            return self._saldo_al_dia
+        from app_estacionamiento.services.saldo import saldo_actual
+        return saldo_actual(self)
+
+    @saldo_al_dia.setter
+    def saldo_al_dia(self, valor):
+        self._saldo_al_dia = valor
+
+    @property
+    def saldo_operativo_al_dia(self):
+        """Igual que saldo_al_dia, para la cuenta operativa del cobrador."""
+        from app_estacionamiento.services.saldo import saldo_actual
+        return saldo_actual(self, SaldoMovimiento.CUENTA_OPERATIVO)
+
     def nombre_completo(self):
         """Devuelve nombre y apellido, o correo si no tiene datos."""
         partes = [self.first_name, self.last_name]
@@ -193,6 +242,27 @@ class Municipio(models.Model):
         help_text='Monto máximo que puede cargar un conductor via MercadoPago en una sola operación.',
     )
 
+    # ── Cierre de caja automático ────────────────────────────────────────────
+    # `python manage.py cerrar_cajas_programadas` cierra la caja de cada
+    # cobrador al llegar el corte (services/cierres_programados.py).
+    CIERRES_AUTOMATICOS = [('', 'Manual'), ('diario', 'Diario'), ('semanal', 'Semanal')]
+    DIAS_SEMANA = DIAS_SEMANA
+    cierre_automatico = models.CharField(
+        max_length=10, choices=CIERRES_AUTOMATICOS, blank=True, default='',
+        verbose_name='Cierre de caja automático',
+        help_text='Manual: cada cobrador cierra su caja. Diario/semanal: se cierra sola al corte. '
+                  'Cada cobrador puede tener su propio cierre (Usuario.cierre_automatico).',
+    )
+    cierre_hora = models.TimeField(
+        default=time(23, 59),
+        verbose_name='Hora de corte del cierre',
+        help_text='Se cierran los cobros registrados hasta esta hora (hora local).',
+    )
+    cierre_dia_semana = models.PositiveSmallIntegerField(
+        choices=DIAS_SEMANA, default=6,
+        verbose_name='Día del cierre semanal',
+    )
+
     # ── Branding por municipio ────────────────────────────────────────────────
     # El admin carga el logo y elige los colores; cada municipio tiene su propia
     # identidad visual sin tocar el código.
@@ -458,6 +528,14 @@ class Estacionamiento(models.Model):
                 name="unique_estacionamiento_activo_por_vehiculo",
             )
         ]
+        indexes = [
+            # Historial por subcuadra/estado en un rango de hora_inicio
+            # (admin_estacionamientos filtra con services/fechas.filtro_fechas).
+            models.Index(
+                fields=["subcuadra", "estado", "hora_inicio"],
+                name="idx_estac_sub_estado_inicio",
+            ),
+        ]
 
 class MovimientoCaja(models.Model):
     # PROTECT: no permite borrar un usuario que tenga movimientos de caja (historial contable).
@@ -495,6 +573,23 @@ class MovimientoCaja(models.Model):
         verbose_name='ID de pago MercadoPago',
     )
 
+    class Meta:
+        indexes = [
+            # Paginación por cursor (creado_en, id) de los historiales de caja
+            # (services/paginacion.py): la del usuario y la del municipio.
+            models.Index(
+                fields=["usuario", "-creado_en", "-id"],
+                name="idx_movcaja_usuario_fecha",
+            ),
+            models.Index(fields=["-creado_en", "-id"], name="idx_movcaja_fecha"),
+            # Cobros de un usuario por tipo/estado en un rango de fechas
+            # (resumen_caja: ingresos de hoy; cierres: ingresos sin cerrar).
+            models.Index(
+                fields=["usuario", "tipo", "cerrado", "creado_en"],
+                name="idx_movcaja_usr_tipo_fecha",
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         if self.pk:
             # values_list trae solo el booleano "cerrado" en vez del objeto completo.
@@ -503,8 +598,134 @@ class MovimientoCaja(models.Model):
             cerrado = MovimientoCaja.objects.filter(pk=self.pk).values_list("cerrado", flat=True).first()
             if cerrado:
                 raise Exception("No se puede modificar un movimiento cerrado")
-        super().save(*args, **kwargs)
-    
+        if not self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        # Alta: el movimiento, los totales de CajaSaldo y el libro de comisiones se confirman juntos
+        from app_estacionamiento.services.caja_saldo import registrar_movimientos
+        from app_estacionamiento.services.comisiones import registrar_comisiones
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            registrar_movimientos([self])
+            registrar_comisiones([self])
+
+
+class SaldoMovimiento(models.Model):
+    """
+    Libro de saldo: solo se insertan filas, nunca se editan montos.
+
+    Cada acreditación (+) o débito (−) del saldo de un usuario es una fila.
+    Usuario.saldo / Usuario.saldo_operativo quedan como snapshot compactado:
+    el saldo real es snapshot + suma de las filas con compactado=False
+    (ver services/saldo.py: saldo_actual y compactar_saldos).
+    """
+    CUENTA_SALDO     = "saldo"
+    CUENTA_OPERATIVO = "saldo_operativo"
+    CUENTAS = [
+        (CUENTA_SALDO,     "Saldo del conductor"),
+        (CUENTA_OPERATIVO, "Saldo operativo del cobrador"),
+    ]
+
+    # PROTECT: igual que MovimientoCaja, es historial contable.
+    usuario = models.ForeignKey(
+        Usuario, on_delete=models.PROTECT, related_name="movimientos_saldo",
+    )
+    cuenta = models.CharField(max_length=20, choices=CUENTAS, default=CUENTA_SALDO)
+    # Con signo: positivo acredita, negativo debita.
+    monto = models.DecimalField(max_digits=10, decimal_places=2)
+    descripcion = models.CharField(max_length=255, blank=True, default="")
+    creado_en = models.DateTimeField(default=timezone.now)
+    # True cuando el monto ya se sumó al snapshot del Usuario.
+    compactado = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Solo las filas pendientes: es lo que suman saldo_actual y el débito condicional
+            models.Index(
+                fields=["usuario", "cuenta"],
+                condition=Q(compactado=False),
+                name="idx_saldomov_pendientes",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario} {self.cuenta} {self.monto:+}"
+
+
+class CajaSaldo(models.Model):
+    """
+    Totales acumulados de la caja de un usuario (una fila por usuario).
+
+    Se actualiza con F() en la misma transacción que cada MovimientoCaja
+    nuevo y cada cierre (services/caja_saldo.py), así los paneles de caja no
+    suman todo el historial en cada request.
+    `python manage.py reconciliar_cajas` los recalcula desde MovimientoCaja.
+    """
+    usuario = models.OneToOneField(
+        Usuario, on_delete=models.CASCADE, primary_key=True, related_name="caja_saldo",
+    )
+    total_ingresos   = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_egresos    = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # comision_monto de los ingresos
+    total_comisiones = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Ingresos todavía no incluidos en un CierreCaja
+    abierto_monto    = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    abierto_cantidad = models.IntegerField(default=0)
+    # Ingresos del día `dia` (fecha local); al cambiar el día arrancan de cero
+    dia          = models.DateField(null=True, blank=True)
+    dia_ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    dia_cantidad = models.IntegerField(default=0)
+    actualizado_en = models.DateTimeField(default=timezone.now)
+
+    @property
+    def saldo(self):
+        return self.total_ingresos - self.total_egresos
+
+    def ingresos_del_dia(self, fecha):
+        """(monto, cantidad) de ingresos del día `fecha`; cero si no hubo."""
+        if self.dia == fecha:
+            return self.dia_ingresos, self.dia_cantidad
+        return Decimal("0"), 0
+
+    def __str__(self):
+        return f"Caja de {self.usuario}: {self.saldo}"
+
+
+class ResumenDiario(models.Model):
+    """
+    Recaudación diaria ya sumada: una fila por (usuario, fecha, medio_pago, tipo).
+
+    La arma `python manage.py construir_resumen_diario` (services/resumen_diario.py)
+    solo para días cerrados; los reportes leen estas filas en vez de sumar
+    todo MovimientoCaja. `municipio` es el del usuario al construir el día.
+    """
+    municipio  = models.ForeignKey(Municipio, on_delete=models.CASCADE, null=True, blank=True)
+    usuario    = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name="resumenes_diarios")
+    fecha      = models.DateField()   # fecha local de MovimientoCaja.creado_en
+    medio_pago = models.CharField(max_length=20)
+    tipo       = models.CharField(max_length=10)
+    total      = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cantidad   = models.IntegerField(default=0)
+    comisiones = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Mayor MovimientoCaja.id sumado: marca hasta dónde se procesó (catch-up de filas tardías)
+    ultimo_movimiento_id = models.BigIntegerField(default=0)
+    actualizado_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["usuario", "fecha", "medio_pago", "tipo"],
+                name="uniq_resumen_diario",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["municipio", "fecha"], name="idx_resumen_mun_fecha"),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.usuario} {self.tipo}/{self.medio_pago}: {self.total}"
+
+
 class CierreCaja(models.Model):
     # PROTECT: no permite borrar un usuario que tenga cierres de caja (historial contable).
     usuario = models.ForeignKey(Usuario, on_delete=models.PROTECT)
@@ -554,6 +775,10 @@ class CierreCaja(models.Model):
         max_digits=12, decimal_places=2, default=0,
         help_text="Total cobrado por débito/crédito/QR (va directo a tesorería).",
     )
+    total_comisiones = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0,
+        help_text="Suma de MovimientoCaja.comision_monto de los movimientos cerrados.",
+    )
 
     # certificación por el admin
     certificado = models.BooleanField(default=False, help_text="El admin auditó y certificó este cierre.")
@@ -584,11 +809,369 @@ class CierreCaja(models.Model):
         estado = "✅" if self.certificado else "⏳"
         return f"{estado} Cierre {self.usuario} — ${self.total_cobrado} ({self.fecha_cierre:%d/%m/%Y})"
 
+
+class CertificacionCierre(models.Model):
+    """
+    Auditoría de certificaciones: una fila por cierre certificado, con el
+    admin y el momento. `en_lote` distingue la certificación masiva de la
+    individual.
+    """
+    cierre = models.ForeignKey(
+        CierreCaja, on_delete=models.PROTECT, related_name="certificaciones",
+    )
+    admin = models.ForeignKey(
+        Usuario, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="certificaciones_cierre",
+    )
+    certificado_en = models.DateTimeField(default=timezone.now)
+    en_lote = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ["-certificado_en"]
+        verbose_name = "Certificación de cierre"
+        verbose_name_plural = "Certificaciones de cierre"
+
+    def __str__(self):
+        return f"Cierre #{self.cierre_id} certificado por {self.admin} ({self.certificado_en:%d/%m/%Y %H:%M})"
+
+
+class TrabajoCierreCaja(models.Model):
+    """
+    Cierre de caja programado: uno por cobrador y corte.
+
+    Lo crea `cerrar_cajas_programadas` al llegar el corte del cobrador (el
+    suyo o, si no tiene, el del municipio) y lo ejecuta un worker
+    (services/cierres_programados.py). La restricción única (usuario, corte)
+    hace que programar dos veces el mismo corte no duplique trabajos.
+    """
+    PENDIENTE       = "pendiente"
+    PROCESANDO      = "procesando"
+    LISTO           = "listo"
+    SIN_MOVIMIENTOS = "sin_movimientos"
+    ERROR           = "error"
+    ESTADOS = [
+        (PENDIENTE,       "Pendiente"),
+        (PROCESANDO,      "Procesando"),
+        (LISTO,           "Cierre generado"),
+        (SIN_MOVIMIENTOS, "Sin movimientos para cerrar"),
+        (ERROR,           "Error"),
+    ]
+
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name="trabajos_cierre")
+    # Se cierran los ingresos abiertos con creado_en <= corte
+    corte   = models.DateTimeField()
+    periodo = models.CharField(max_length=10, choices=CierreCaja.PERIODOS, blank=True, default="")
+    estado  = models.CharField(max_length=16, choices=ESTADOS, default=PENDIENTE)
+    estado_desde = models.DateTimeField(default=timezone.now)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    cierre  = models.OneToOneField(
+        CierreCaja, on_delete=models.SET_NULL, null=True, blank=True, related_name="trabajo",
+    )
+    # Resumen del cierre ya armado (se manda como Notificacion al cobrador)
+    resumen = models.TextField(blank=True, default="")
+    error   = models.TextField(blank=True, default="")
+    creado_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=["usuario", "corte"], name="uniq_trabajo_cierre_usuario_corte"),
+        ]
+        indexes = [
+            # Cola del worker: solo los que faltan ejecutar (o reintentar)
+            models.Index(
+                fields=["estado", "id"],
+                condition=Q(estado__in=["pendiente", "procesando", "error"]),
+                name="idx_trabajo_cierre_pendiente",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Cierre programado {self.usuario} al {self.corte:%d/%m/%Y %H:%M} [{self.estado}]"
+
+
+class CobroSincronizado(models.Model):
+    """
+    Cobro recibido por el endpoint de lote de las terminales de venta.
+
+    La terminal genera la `clave` al vender (también sin conexión) y la
+    reenvía hasta tener respuesta: (usuario, clave) es único y un reenvío
+    devuelve el `resultado` guardado en vez de cobrar dos veces. Ver
+    services/cobros_lote.py.
+    """
+    ESTACIONAMIENTO = "estacionamiento"
+    INFRACCION      = "infraccion"
+    ABONO           = "abono"
+    TIPOS = [
+        (ESTACIONAMIENTO, "Estacionamiento"),
+        (INFRACCION,      "Infracción"),
+        (ABONO,           "Abono mensual"),
+    ]
+    OK        = "ok"
+    RECHAZADO = "rechazado"
+    ESTADOS = [
+        (OK,        "Registrado"),
+        (RECHAZADO, "Rechazado"),
+    ]
+
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name="cobros_sincronizados")
+    clave   = models.CharField(max_length=64)
+    tipo    = models.CharField(max_length=16, choices=TIPOS)
+    estado  = models.CharField(max_length=10, choices=ESTADOS)
+    # Respuesta devuelta a la terminal (se repite tal cual ante un reenvío)
+    resultado = models.JSONField(default=dict, blank=True)
+    movimiento_caja = models.ForeignKey(
+        "MovimientoCaja", on_delete=models.SET_NULL, null=True, blank=True, related_name="+",
+    )
+    # Momento de la venta según la terminal (puede ser anterior a la sincronización)
+    vendido_en = models.DateTimeField(null=True, blank=True)
+    creado_en  = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=["usuario", "clave"], name="uniq_cobro_sincronizado_clave"),
+        ]
+
+    def __str__(self):
+        return f"Cobro {self.tipo} {self.clave} de {self.usuario} [{self.estado}]"
+
+
+def storage_archivos():
+    """
+    Storage de los archivos que no son imágenes (STORAGES["archivos"]): con
+    Cloudinary, el de media solo acepta imágenes. Callable para que la
+    migración no dependa del backend configurado.
+    """
+    from django.core.files.storage import storages
+    return storages["archivos"]
+
+
+class TrabajoReporte(models.Model):
+    """
+    PDF o planilla pedida desde el panel y generada por un worker.
+
+    Los reportes pesados (juzgado, rendición, infracciones del día,
+    estadísticas de inspectores) se armaban dentro del request. Ahora la
+    vista crea el trabajo, el worker `generar_reportes` lo genera y lo
+    guarda en storage_archivos(), y el navegador consulta el estado hasta
+    que está listo (sin worker, REPORTES_EN_SEGUNDO_PLANO=False, la vista lo
+    genera en el momento). `huella` resume tipo + municipio + parámetros: mientras
+    uno está en curso no se crea otro igual. Ver services/reportes.py.
+    """
+    JUZGADO          = "juzgado"
+    RENDICION        = "rendicion"
+    INFRACCIONES_DIA = "infracciones_dia"
+    ESTADISTICAS     = "estadisticas_inspectores"
+    TIPOS = [
+        (JUZGADO,          "Infracciones impagas (juzgado)"),
+        (RENDICION,        "Rendición"),
+        (INFRACCIONES_DIA, "Infracciones del día"),
+        (ESTADISTICAS,     "Estadísticas de inspectores"),
+    ]
+    PENDIENTE  = "pendiente"
+    PROCESANDO = "procesando"
+    LISTO      = "listo"
+    ERROR      = "error"
+    ESTADOS = [
+        (PENDIENTE,  "Pendiente"),
+        (PROCESANDO, "Generando"),
+        (LISTO,      "Listo"),
+        (ERROR,      "Error"),
+    ]
+
+    tipo       = models.CharField(max_length=32, choices=TIPOS)
+    parametros = models.JSONField(default=dict, blank=True)
+    huella     = models.CharField(max_length=64)
+    municipio  = models.ForeignKey(Municipio, on_delete=models.CASCADE, related_name="trabajos_reporte")
+    solicitado_por = models.ForeignKey(
+        Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name="trabajos_reporte",
+    )
+    estado       = models.CharField(max_length=12, choices=ESTADOS, default=PENDIENTE)
+    estado_desde = models.DateTimeField(default=timezone.now)
+    intentos     = models.PositiveSmallIntegerField(default=0)
+    progreso     = models.PositiveSmallIntegerField(default=0)  # 0–100
+    archivo        = models.FileField(
+        upload_to="reportes/%Y/%m/", storage=storage_archivos, null=True, blank=True,
+    )
+    nombre_archivo = models.CharField(max_length=120, blank=True, default="")
+    content_type   = models.CharField(max_length=100, blank=True, default="")
+    error        = models.TextField(blank=True, default="")
+    creado_en    = models.DateTimeField(default=timezone.now)
+    terminado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Un solo trabajo en curso por huella: dos clics (o dos admins)
+            # pidiendo lo mismo comparten el trabajo
+            UniqueConstraint(
+                fields=["huella"],
+                condition=Q(estado__in=["pendiente", "procesando"]),
+                name="uniq_trabajo_reporte_en_curso",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["huella", "-terminado_en"], name="idx_trabajo_reporte_huella"),
+            # Cola del worker
+            models.Index(
+                fields=["estado", "id"],
+                condition=Q(estado__in=["pendiente", "procesando", "error"]),
+                name="idx_trabajo_reporte_pendiente",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Reporte {self.tipo} #{self.pk} [{self.estado}]"
+
+
+class DocumentoCacheado(models.Model):
+    """
+    PDF ya generado, guardado en storage_archivos() bajo su huella.
+
+    La huella es un sha256 de todo lo que aparece en el documento (ids,
+    estados, montos, nombres) más la versión de la plantilla: si algo
+    cambia, cambia la huella y el PDF se vuelve a generar. Las filas sin
+    uso se borran con purgar_documentos(). Ver services/cache_documentos.py.
+    """
+    JUZGADO   = "juzgado"
+    RENDICION = "rendicion"
+    TIPOS = [
+        (JUZGADO,   "Infracciones impagas (juzgado)"),
+        (RENDICION, "Rendición"),
+    ]
+
+    tipo      = models.CharField(max_length=16, choices=TIPOS)
+    huella    = models.CharField(max_length=64, unique=True)
+    archivo   = models.FileField(upload_to="documentos_cache/%Y/%m/", storage=storage_archivos)
+    tamano    = models.PositiveIntegerField(default=0)
+    creado_en = models.DateTimeField(default=timezone.now)
+    usado_en  = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["usado_en"], name="idx_documento_cache_uso"),
+        ]
+
+    def __str__(self):
+        return f"PDF {self.tipo} {self.huella[:12]}"
+
+
+class TrabajoImportacion(models.Model):
+    """
+    Excel del sistema anterior (TransactionInfo.xlsx) subido por el
+    superadmin e importado por un worker.
+
+    La migración de un municipio son decenas de miles de filas: importarlas
+    dentro del request llegaba al timeout. La vista guarda el archivo y crea
+    el trabajo; el worker `importar_estacionamientos` (o, sin worker, la
+    página de avance de a un rato por request) lo lee en modo streaming y lo
+    importa por lotes. `filas_procesadas` es la última fila del Excel ya
+    confirmada: si el proceso se corta, el siguiente sigue desde ahí. Ver
+    services/importacion_estacionamientos.py.
+    """
+    PENDIENTE  = "pendiente"
+    PROCESANDO = "procesando"
+    LISTO      = "listo"
+    ERROR      = "error"
+    ESTADOS = [
+        (PENDIENTE,  "Pendiente"),
+        (PROCESANDO, "Importando"),
+        (LISTO,      "Terminada"),
+        (ERROR,      "Error"),
+    ]
+
+    municipio = models.ForeignKey(Municipio, on_delete=models.CASCADE, related_name="trabajos_importacion")
+    solicitado_por = models.ForeignKey(
+        Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name="trabajos_importacion",
+    )
+    archivo        = models.FileField(
+        upload_to="importaciones/%Y/%m/", storage=storage_archivos, null=True, blank=True,
+    )
+    nombre_archivo = models.CharField(max_length=255, blank=True, default="")
+    estado       = models.CharField(max_length=12, choices=ESTADOS, default=PENDIENTE)
+    estado_desde = models.DateTimeField(default=timezone.now)
+    latido_en    = models.DateTimeField(default=timezone.now)  # último lote confirmado
+    intentos     = models.PositiveSmallIntegerField(default=0)
+    filas_total      = models.PositiveIntegerField(null=True, blank=True)  # según la dimensión de la hoja
+    filas_procesadas = models.PositiveIntegerField(default=0)              # número de fila del Excel
+    importados = models.PositiveIntegerField(default=0)
+    omitidos   = models.PositiveIntegerField(default=0)
+    # [{"fila": 12, "patente": "AB123CD", "error": "..."}], hasta MAX_ERRORES_GUARDADOS
+    errores      = models.JSONField(default=list, blank=True)
+    error        = models.TextField(blank=True, default="")
+    creado_en    = models.DateTimeField(default=timezone.now)
+    terminado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Cola del worker
+            models.Index(
+                fields=["estado", "id"],
+                condition=Q(estado__in=["pendiente", "procesando", "error"]),
+                name="idx_trabajo_import_pendiente",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Importación #{self.pk} {self.municipio_id} [{self.estado}]"
+
+
+class ImportacionExencion(models.Model):
+    """
+    Vista previa de un Excel de exenciones (vecinos frentistas) a la espera
+    de que el admin la confirme.
+
+    Antes la vista previa se guardaba entera en la sesión (en la base, como
+    un blob serializado por request). Ahora cada fila analizada queda en
+    FilaImportacionExencion y la confirmación solo manda el id. Las vistas
+    previas que nadie confirma se borran a las RETENCION_HORAS. Ver
+    services/importacion_exenciones.py.
+    """
+    municipio  = models.ForeignKey(Municipio, on_delete=models.CASCADE, related_name="importaciones_exencion")
+    creado_por = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name="importaciones_exencion")
+    nombre_archivo = models.CharField(max_length=255, blank=True, default="")
+    creado_en  = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Exenciones #{self.pk} ({self.nombre_archivo})"
+
+
+class FilaImportacionExencion(models.Model):
+    """Una fila analizada del Excel de exenciones, tal como se muestra en la vista previa."""
+    NUEVO      = "nuevo"
+    ACTUALIZAR = "actualizar"
+    ERROR      = "error"
+    ESTADOS = [
+        (NUEVO,      "Crea vehículo"),
+        (ACTUALIZAR, "Actualiza vehículo"),
+        (ERROR,      "Error"),
+    ]
+
+    importacion = models.ForeignKey(ImportacionExencion, on_delete=models.CASCADE, related_name="filas")
+    num        = models.PositiveIntegerField()  # fila del Excel
+    patente    = models.CharField(max_length=64, blank=True, default="")
+    nombre     = models.CharField(max_length=255, blank=True, default="")
+    telefono   = models.CharField(max_length=255, blank=True, default="")
+    direccion  = models.CharField(max_length=255, blank=True, default="")
+    # SET_NULL: si la subcuadra se borra antes de confirmar, la fila se importa sin ella
+    subcuadra  = models.ForeignKey(Subcuadra, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    es_global  = models.BooleanField(default=False)
+    notas      = models.TextField(blank=True, default="")
+    estado     = models.CharField(max_length=12, choices=ESTADOS)
+    mensaje    = models.TextField(blank=True, default="")
+
+    class Meta:
+        ordering = ["importacion", "num"]
+
+    def __str__(self):
+        return f"Fila {self.num} {self.patente} [{self.estado}]"
+
+
 class VerificacionInspector(models.Model):
     inspector = models.ForeignKey(Usuario, on_delete=models.CASCADE)
     vehiculo  = models.ForeignKey(Vehiculo, on_delete=models.CASCADE)
     subcuadra = models.ForeignKey(Subcuadra, on_delete=models.CASCADE)
-    fecha     = models.DateTimeField(auto_now_add=True)
+    # default (no auto_now_add): el buffer write-behind inserta más tarde y
+    # tiene que conservar la hora real de la verificación.
+    fecha     = models.DateTimeField(default=timezone.now)
     infraccion_generada = models.BooleanField(default=False)
     # "verificado" es el único valor que se guarda actualmente.
     # choices documentan los valores válidos sin depender de texto libre.
@@ -603,6 +1186,8 @@ class VerificacionInspector(models.Model):
             # Con ~75.000 registros/año (3 inspectores × 100 checks/día × 250 días),
             # el impacto se nota antes del primer año en producción municipal.
             models.Index(fields=["vehiculo", "-fecha"], name="idx_verif_vehiculo_fecha"),
+            # Estadísticas de inspectores por rango de fechas
+            models.Index(fields=["inspector", "fecha"], name="idx_verif_inspector_fecha"),
         ]
 
 class Infraccion(models.Model):
@@ -621,6 +1206,26 @@ class Infraccion(models.Model):
     estacionamiento = models.ForeignKey(Estacionamiento, on_delete=models.SET_NULL, null=True, blank=True)
     motivo = models.CharField(max_length=255, default="Impago")
     foto   = models.ImageField(upload_to="infracciones/", null=True, blank=True)
+    # ── Procesamiento de la foto (marca de agua GPS en segundo plano) ───────
+    # El acta se guarda con la foto cruda; services/fotos_infracciones.py le
+    # agrega la marca de agua, quita el EXIF y la reemplaza por la final.
+    FOTO_PENDIENTE  = "pendiente"
+    FOTO_PROCESANDO = "procesando"
+    FOTO_LISTA      = "lista"
+    FOTO_ERROR      = "error"
+    FOTO_ESTADOS = [
+        (FOTO_PENDIENTE,  "Pendiente de procesar"),
+        (FOTO_PROCESANDO, "Procesando"),
+        (FOTO_LISTA,      "Lista"),
+        (FOTO_ERROR,      "Error (queda la foto original)"),
+    ]
+    # "lista" por defecto: sin foto no hay nada que procesar
+    foto_estado = models.CharField(max_length=12, choices=FOTO_ESTADOS, default=FOTO_LISTA)
+    foto_estado_desde = models.DateTimeField(null=True, blank=True)
+    # Posición del inspector al labrar el acta (texto tal como la manda el browser)
+    gps_lat = models.CharField(max_length=20, blank=True, default="")
+    gps_lon = models.CharField(max_length=20, blank=True, default="")
+    gps_acc = models.CharField(max_length=20, blank=True, default="")
     # qr_code eliminado: campo muerto desde migración 0008, nunca se usó.
     monto  = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     creado_en = models.DateTimeField(auto_now_add=True)   # única fecha de creación
@@ -644,6 +1249,29 @@ class Infraccion(models.Model):
     # Observación automática generada cuando el SIA no pudo verificarse
     sia_observacion   = models.TextField(blank=True, default="")
 
+    class Meta:
+        indexes = [
+            # Cola del worker de fotos: solo las que faltan procesar
+            models.Index(
+                fields=["foto_estado", "id"],
+                condition=Q(foto_estado__in=["pendiente", "procesando"]),
+                name="idx_infraccion_foto_pendiente",
+            ),
+            # Listados, informes y PDF del juzgado: infracciones del municipio en un rango
+            models.Index(fields=["municipio", "creado_en"], name="idx_infraccion_mun_fecha"),
+            # Panel del inspector y PDF de sus infracciones del día
+            models.Index(fields=["inspector", "creado_en"], name="idx_infraccion_insp_fecha"),
+        ]
+
+    @property
+    def foto_lista(self):
+        """True si hay foto y ya tiene la marca de agua (o quedó la original por error)."""
+        return bool(self.foto) and self.foto_estado in (self.FOTO_LISTA, self.FOTO_ERROR)
+
+    @property
+    def foto_en_proceso(self):
+        return bool(self.foto) and self.foto_estado in (self.FOTO_PENDIENTE, self.FOTO_PROCESANDO)
+
     def save(self, *args, **kwargs):
         if not self.municipio:
             if self.inspector and self.inspector.municipio:
@@ -1064,6 +1692,36 @@ class LiquidacionComision(models.Model):
         return f"{self.vendedor} — ${self.monto_total} [{self.get_estado_display()}]"
 
 
+class ComisionPeriodo(models.Model):
+    """
+    Libro de comisiones: lo devengado por un cobrador en un mes, una fila por
+    (vendedor, periodo).
+
+    Se suma en la misma transacción que cada MovimientoCaja con comisión
+    (services/comisiones.py), así mis_comisiones y el panel del tesorero no
+    suman comision_monto de todo el historial. `python manage.py
+    reconciliar_comisiones` lo compara con MovimientoCaja.
+    """
+    vendedor = models.ForeignKey(
+        Usuario, on_delete=models.CASCADE, related_name='comisiones_periodo',
+    )
+    periodo  = models.DateField(help_text='Primer día del mes (fecha local del cobro).')
+    monto    = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cantidad = models.IntegerField(default=0)
+    actualizado_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-periodo']
+        verbose_name = 'Comisión por período'
+        verbose_name_plural = 'Comisiones por período'
+        constraints = [
+            models.UniqueConstraint(fields=['vendedor', 'periodo'], name='uniq_comision_vendedor_periodo'),
+        ]
+
+    def __str__(self):
+        return f"{self.vendedor} — {self.periodo:%m/%Y}: ${self.monto}"
+
+
 class DestinatarioInforme(models.Model):
     """
     Email externo (o usuario del sistema) que recibe informes periódicos
@@ -0,0 +1,109 @@
+# app_estacionamiento/services/barrido.py
+"""
+Barrido periódico de estacionamientos vencidos.
+
+Antes los ACTIVO vencidos se cerraban recién cuando alguien abría una página
+(inicio_usuarios, verificar_vehiculo) y de a uno por vez con
+finalizar_estacionamiento.ejecutar. Acá se cierran todos juntos, para todos
+los municipios, con UPDATEs por conjunto en transacciones acotadas.
+Lo corre `python manage.py barrer_estacionamientos` cada minuto.
+
+Dos motivos de cierre:
+1. Tiempo pago agotado: hora_inicio + duracion_horas <= ahora.
+2. Horario de cobro del municipio terminado (CalendarioCobro.paso_el_cierre).
+
+Contabilidad: cada lote pasa por finalizar_estacionamiento.finalizar_lote,
+que aplica la misma regla que ejecutar() (incluido el reintegro de los que
+arrancaron hace menos de UMBRAL_REINTEGRO_MINUTOS) con UPDATEs por conjunto.
+"""
+
+from datetime import timedelta
+
+from django.utils import timezone
+
+from app_estacionamiento.models import Estacionamiento, Estado, Municipio
+from app_estacionamiento.use_cases.finalizar_estacionamiento import finalizar_lote
+
+# Filas por transacción: acota el tiempo de lock y el tamaño del IN (...)
+LOTE_BARRIDO = 500
+
+
+def _finalizar_por_lotes(queryset, ahora, lote=LOTE_BARRIDO):
+    """
+    Finaliza los ACTIVO del queryset de a `lote` filas por transacción.
+
+    Cada vuelta toma los próximos ids y los pasa a finalizar_lote, que
+    re-chequea estado=ACTIVO bajo lock (si otro proceso los finalizó en el
+    medio, no se tocan). Retorna la cantidad de filas finalizadas.
+    """
+    finalizados = 0
+    while True:
+        ids = list(
+            queryset.filter(estado=Estado.ACTIVO)
+            .order_by("id")
+            .values_list("id", flat=True)[:lote]
+        )
+        if not ids:
+            return finalizados
+        finalizados += finalizar_lote(
+            Estacionamiento.objects.filter(id__in=ids), ahora,
+        )["finalizados"]
+        if len(ids) < lote:
+            return finalizados
+
+
+def barrer_vencidos_por_tiempo(ahora=None, lote=LOTE_BARRIDO):
+    """
+    Finaliza los ACTIVO cuyo tiempo pago terminó, en todos los municipios.
+
+    En vez de calcular hora_inicio + duracion_horas en SQL (distinto en
+    SQLite y PostgreSQL) se agrupa por duración: hay pocas distintas (medias
+    horas hasta 8 h) y cada grupo es un filtro simple sobre hora_inicio.
+    """
+    ahora = ahora or timezone.now()
+    duraciones = (
+        Estacionamiento.objects.filter(estado=Estado.ACTIVO)
+        .values_list("duracion_horas", flat=True)
+        .distinct()
+    )
+    total = 0
+    for duracion in list(duraciones):
+        vencidos = Estacionamiento.objects.filter(
+            estado=Estado.ACTIVO,
+            duracion_horas=duracion,
+            hora_inicio__lte=ahora - timedelta(hours=float(duracion)),
+        )
+        total += _finalizar_por_lotes(vencidos, ahora, lote)
+    return total
+
+
+def cerrar_municipio_por_horario(municipio, ahora=None, lote=LOTE_BARRIDO):
+    """
+    Finaliza los ACTIVO del municipio si ya pasó el cierre del horario de hoy.
+
+    No hace nada si el horario sigue abierto. Retorna la cantidad finalizada.
+    """
+    from app_estacionamiento.services.horarios import obtener_calendario
+
+    ahora = ahora or timezone.now()
+    if not obtener_calendario(municipio).paso_el_cierre(timezone.localtime(ahora)):
+        return 0
+
+    activos = Estacionamiento.objects.filter(
+        estado=Estado.ACTIVO, subcuadra__municipio=municipio,
+    )
+    return _finalizar_por_lotes(activos, ahora, lote)
+
+
+def barrer_estacionamientos(ahora=None, lote=LOTE_BARRIDO):
+    """
+    Una pasada completa del barrido. Retorna dict con lo finalizado por
+    tiempo agotado y por cierre de horario.
+    """
+    ahora = ahora or timezone.now()
+    por_tiempo  = barrer_vencidos_por_tiempo(ahora, lote)
+    por_horario = sum(
+        cerrar_municipio_por_horario(municipio, ahora, lote)
+        for municipio in Municipio.objects.filter(activo=True)
+    )
+    return {"por_tiempo": por_tiempo, "por_horario": por_horario}
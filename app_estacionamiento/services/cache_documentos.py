@@ -0,0 +1,193 @@
+# app_estacionamiento/services/cache_documentos.py
+"""
+Caché por contenido de los PDF de rendición y de juzgado (DocumentoCacheado).
+
+Cada descarga volvía a armar el PDF con reportlab, aunque una rendición
+validada o un rango de fechas ya cerrado no cambian. Acá:
+
+  - huella_rendicion() / huella_juzgado() calculan un sha256 de todo lo
+    que el PDF muestra (ids, estados, montos, fechas, nombres) más
+    VERSION_PLANTILLA. Es una consulta de columnas, sin armar el PDF.
+  - obtener_pdf() busca la huella en DocumentoCacheado; si no está, genera
+    el PDF, lo guarda en storage_archivos() (el storage de media con
+    Cloudinary solo acepta imágenes) y deja la fila.
+  - respuesta_pdf() responde con ETag = huella: una descarga repetida con
+    If-None-Match recibe 304 sin leer el archivo.
+
+Invalidación: no hace falta borrar nada. Si una infracción del rango
+cambia de estado (o de monto, o su foto queda lista), o la rendición se
+valida, la huella es otra y el próximo pedido genera el PDF nuevo. Cambia
+también si cambia el día: el PDF de juzgado muestra la antigüedad de cada
+acta. Los PDF que nadie pide hace CACHE_DIAS se borran con
+purgar_documentos() (lo llama el worker de reportes).
+
+Si se cambia el diseño de alguno de los PDF en services/documentos.py,
+subir su VERSION_PLANTILLA.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+
+from app_estacionamiento.models import DocumentoCacheado
+from app_estacionamiento.services.documentos import (
+    generar_pdf_juzgado,
+    generar_pdf_rendicion,
+    infracciones_impagas,
+)
+
+logger = logging.getLogger(__name__)
+
+VERSION_PLANTILLA = {
+    DocumentoCacheado.JUZGADO:   1,
+    DocumentoCacheado.RENDICION: 1,
+}
+
+# Días sin pedidos tras los cuales se borra un PDF cacheado
+CACHE_DIAS = 30
+
+# usado_en se actualiza como mucho una vez por este intervalo (evita un UPDATE por descarga)
+MARCAR_USO_CADA = timedelta(hours=1)
+
+# Filas por vuelta al recorrer las infracciones para la huella
+_CHUNK_HUELLA = 2000
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Huellas
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _actualizar(hasher, valor):
+    hasher.update(json.dumps(valor, default=str, separators=(",", ":")).encode())
+    hasher.update(b"\n")
+
+
+def huella_juzgado(municipio, desde, hasta, hoy=None):
+    """sha256 de las infracciones impagas del rango tal como las muestra el PDF."""
+    hoy = hoy or timezone.localtime().date()
+    hasher = hashlib.sha256()
+    _actualizar(hasher, [
+        DocumentoCacheado.JUZGADO, VERSION_PLANTILLA[DocumentoCacheado.JUZGADO],
+        municipio.pk, municipio.nombre, desde, hasta, hoy,
+    ])
+    filas = infracciones_impagas(municipio, desde, hasta).values_list(
+        "id", "estado", "creado_en", "monto", "foto", "foto_estado", "vehiculo__patente",
+        "inspector__first_name", "inspector__last_name", "inspector__correo",
+        "subcuadra__calle", "subcuadra__altura",
+    )
+    for fila in filas.iterator(chunk_size=_CHUNK_HUELLA):
+        _actualizar(hasher, fila)
+    return hasher.hexdigest()
+
+
+def huella_rendicion(rendicion):
+    """sha256 de la rendición, su validación y sus cierres tal como los muestra el PDF."""
+    hasher = hashlib.sha256()
+    _actualizar(hasher, [
+        DocumentoCacheado.RENDICION, VERSION_PLANTILLA[DocumentoCacheado.RENDICION],
+        rendicion.pk, rendicion.municipio.nombre if rendicion.municipio else "",
+        rendicion.estado, rendicion.fecha_desde, rendicion.fecha_hasta,
+        rendicion.total_efectivo, rendicion.total_digital, rendicion.total_neto,
+        rendicion.notas_tesorero, rendicion.validado_en,
+        rendicion.admin.nombre_completo() if rendicion.admin else "",
+        rendicion.tesorero.nombre_completo() if rendicion.tesorero else "",
+    ])
+    filas = rendicion.cierres.order_by("fecha_cierre", "id").values_list(
+        "id", "fecha_cierre", "periodo", "total_efectivo", "total_transferencia",
+        "total_digital", "total_cobrado", "usuario__first_name", "usuario__last_name", "usuario__correo",
+    )
+    for fila in filas:
+        _actualizar(hasher, fila)
+    return hasher.hexdigest()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Almacenamiento
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _leer(documento):
+    with documento.archivo.open("rb") as f:
+        return f.read()
+
+
+def obtener_pdf(tipo, huella, generar):
+    """
+    Bytes del PDF con esa huella: del storage si ya está, o `generar()` y
+    guardarlo. Si el archivo cacheado no se puede leer se vuelve a generar.
+    """
+    documento = DocumentoCacheado.objects.filter(huella=huella).first()
+    if documento is not None:
+        try:
+            contenido = _leer(documento)
+        except OSError as e:
+            logger.warning("PDF cacheado %s ilegible, se regenera: %s", huella, e)
+            documento.archivo.delete(save=False)
+            documento.delete()
+        else:
+            ahora = timezone.now()
+            if ahora - documento.usado_en > MARCAR_USO_CADA:
+                DocumentoCacheado.objects.filter(pk=documento.pk).update(usado_en=ahora)
+            return contenido
+
+    contenido = generar()
+    documento = DocumentoCacheado(tipo=tipo, huella=huella, tamano=len(contenido))
+    documento.archivo.save(f"{tipo}_{huella[:16]}.pdf", ContentFile(contenido), save=False)
+    try:
+        with transaction.atomic():
+            documento.save()
+    except IntegrityError:
+        # Otro request guardó la misma huella mientras este generaba
+        documento.archivo.delete(save=False)
+    return contenido
+
+
+def pdf_juzgado_cacheado(municipio, desde, hasta, huella=None):
+    """Bytes del PDF para juzgado del rango, desde la caché."""
+    huella = huella or huella_juzgado(municipio, desde, hasta)
+    return obtener_pdf(
+        DocumentoCacheado.JUZGADO, huella, lambda: generar_pdf_juzgado(municipio, desde, hasta),
+    )
+
+
+def pdf_rendicion_cacheado(rendicion, huella=None):
+    """Bytes del PDF de la rendición, desde la caché."""
+    huella = huella or huella_rendicion(rendicion)
+    return obtener_pdf(
+        DocumentoCacheado.RENDICION, huella, lambda: generar_pdf_rendicion(rendicion),
+    )
+
+
+def respuesta_pdf(request, huella, obtener, nombre_archivo):
+    """
+    HttpResponse del PDF con ETag = huella, o 304 si el navegador ya lo
+    tiene (If-None-Match). `obtener()` retorna los bytes y solo se llama
+    si hace falta mandar el archivo.
+    """
+    etag = f'"{huella}"'
+    no_modificado = get_conditional_response(request, etag=etag)
+    if no_modificado is not None:
+        no_modificado["ETag"] = etag
+        return no_modificado
+    response = HttpResponse(obtener(), content_type="application/pdf")
+    response["ETag"] = etag
+    # private: el PDF es del municipio; no-cache: revalidar siempre (un 304 no trae el cuerpo)
+    response["Cache-Control"] = "private, no-cache"
+    response["Content-Disposition"] = f'attachment; filename="{nombre_archivo}"'
+    return response
+
+
+def purgar_documentos(ahora=None):
+    """Borra los PDF cacheados sin pedidos hace CACHE_DIAS. Retorna cuántos borró."""
+    limite = (ahora or timezone.now()) - timedelta(days=CACHE_DIAS)
+    viejos = list(DocumentoCacheado.objects.filter(usado_en__lt=limite))
+    for documento in viejos:
+        documento.archivo.delete(save=False)
+    DocumentoCacheado.objects.filter(id__in=[d.id for d in viejos]).delete()
+    return len(viejos)
@@ -9,22 +9,27 @@ Responsabilidades:
 
 from decimal import Decimal, ROUND_HALF_UP
 
-from django.db import transaction
-from django.db.models import Case, DecimalField, Sum, Value, When
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Sum
 from django.utils import timezone
 
 from app_estacionamiento.models import CierreCaja, MovimientoCaja
+from app_estacionamiento.services.caja_saldo import registrar_cierre
 
 # Medios de pago que van directamente a tesorería (débito, crédito, QR, MercadoPago).
 # No pasan por el efectivo del cobrador — se auditan pero no se rinden en efectivo.
 MEDIOS_DIGITALES = ("debito", "credito", "qr", "mercadopago")
 
+# Primer clave de pg_advisory_xact_lock(int, int) para los cierres (saldo.py usa 8001)
+_LOCK_CIERRE = 8002
+
 
 def registrar_cobro_efectivo(cobrador, monto: Decimal, descripcion: str = "", comision_monto: Decimal = Decimal("0")):
     """
     Registra un cobro en efectivo del cobrador (vendedor o admin).
 
-    - Suma el monto al saldo_operativo del cobrador (select_for_update).
+    - Suma el monto al saldo_operativo del cobrador (fila en el libro de
+      saldo, sin bloquear al cobrador).
     - Crea el MovimientoCaja de tipo 'ingreso' con su comisión.
 
     Parámetros:
@@ -36,14 +41,15 @@ def registrar_cobro_efectivo(cobrador, monto: Decimal, descripcion: str = "", co
     Retorna:
         El MovimientoCaja creado.
     """
-    from app_estacionamiento.models import Usuario
+    from app_estacionamiento.models import SaldoMovimiento
+    from app_estacionamiento.services.saldo import acreditar_saldo
 
     with transaction.atomic():
-        cobrador_locked = Usuario.objects.select_for_update().get(id=cobrador.id)
-        cobrador_locked.saldo_operativo += monto
-        cobrador_locked.save(update_fields=["saldo_operativo"])
+        acreditar_saldo(
+            cobrador.pk, monto, descripcion, cuenta=SaldoMovimiento.CUENTA_OPERATIVO,
+        )
         return MovimientoCaja.objects.create(
-            usuario=cobrador_locked,
+            usuario=cobrador,
             monto=monto,
             tipo="ingreso",
             medio_pago="efectivo",
@@ -52,63 +58,113 @@ def registrar_cobro_efectivo(cobrador, monto: Decimal, descripcion: str = "", co
         )
 
 
+def _cerrar_movimientos_postgres(usuario_id, fecha_desde, fecha_hasta):
+    """
+    Un solo statement: el UPDATE marca cerrados los ingresos abiertos y el
+    SELECT de afuera suma lo que devolvió RETURNING, agrupado por medio de
+    pago. Las filas se bloquean al actualizarlas (no antes) y la base las
+    recorre una sola vez.
+    """
+    qn = connection.ops.quote_name
+    tabla = qn(MovimientoCaja._meta.db_table)
+    filtros = ["usuario_id = %s", "tipo = %s", "cerrado = %s"]
+    params  = [True, usuario_id, "ingreso", False]
+    if fecha_desde:
+        filtros.append("creado_en >= %s")
+        params.append(fecha_desde)
+    if fecha_hasta:
+        filtros.append("creado_en <= %s")
+        params.append(fecha_hasta)
+    sql = f"""
+        WITH cerrados AS (
+            UPDATE {tabla} SET cerrado = %s
+            WHERE {" AND ".join(filtros)}
+            RETURNING medio_pago, monto, comision_monto, creado_en
+        )
+        SELECT medio_pago, SUM(monto), COUNT(*), MIN(creado_en), SUM(comision_monto)
+        FROM cerrados
+        GROUP BY medio_pago
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _cerrar_movimientos_generico(usuario_id, fecha_desde, fecha_hasta):
+    """
+    SQLite (y otras bases sin UPDATE dentro de un CTE): una agregación por
+    medio de pago y un UPDATE acotado al mayor id sumado, así lo que entre
+    entre las dos queries no queda cerrado sin estar en el cierre.
+    """
+    movimientos = MovimientoCaja.objects.filter(usuario_id=usuario_id, tipo="ingreso", cerrado=False)
+    if fecha_desde:
+        movimientos = movimientos.filter(creado_en__gte=fecha_desde)
+    if fecha_hasta:
+        movimientos = movimientos.filter(creado_en__lte=fecha_hasta)
+    filas = list(
+        movimientos.values("medio_pago")
+        .annotate(
+            total=Sum("monto"), cantidad=Count("id"), desde=Min("creado_en"),
+            comisiones=Sum("comision_monto"), ultimo=Max("id"),
+        )
+        .order_by()
+        .values_list("medio_pago", "total", "cantidad", "desde", "comisiones", "ultimo")
+    )
+    if filas:
+        movimientos.filter(id__lte=max(f[5] for f in filas)).update(cerrado=True)
+    return [f[:5] for f in filas]
+
+
+def _serializar_cierre(usuario_id):
+    """
+    En PostgreSQL, lock de transacción por usuario: un cierre manual y uno
+    programado del mismo cobrador no corren a la vez (el segundo espera y
+    después no encuentra nada abierto).
+    """
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", [_LOCK_CIERRE, usuario_id])
+
+
 def generar_cierre_caja(usuario, fecha_desde=None, fecha_hasta=None, periodo=""):
     """
     Genera un CierreCaja atómico para el usuario (inspector o vendedor).
 
-    - Cierra todos los MovimientoCaja de tipo 'ingreso' que estén abiertos.
+    - Cierra todos los MovimientoCaja de tipo 'ingreso' que estén abiertos
+      y obtiene los totales por medio de pago en la misma pasada
+      (UPDATE … RETURNING en PostgreSQL; ver _cerrar_movimientos_*),
+      incluida la suma de comision_monto (total_comisiones).
     - Aplica el porcentaje_ganancia del usuario para calcular
       ganancia_usuario y monto_municipio.
+    - Descuenta lo cerrado de los totales abiertos de CajaSaldo.
     - Retorna el CierreCaja creado, o None si no había movimientos.
     """
     with transaction.atomic():
-        movimientos = MovimientoCaja.objects.select_for_update().filter(
-            usuario=usuario,
-            tipo="ingreso",
-            cerrado=False,
-        ).order_by("creado_en")
+        _serializar_cierre(usuario.pk)
+        if connection.vendor == "postgresql":
+            por_medio = _cerrar_movimientos_postgres(usuario.pk, fecha_desde, fecha_hasta)
+        else:
+            por_medio = _cerrar_movimientos_generico(usuario.pk, fecha_desde, fecha_hasta)
 
-        if fecha_desde:
-            movimientos = movimientos.filter(creado_en__gte=fecha_desde)
-        if fecha_hasta:
-            movimientos = movimientos.filter(creado_en__lte=fecha_hasta)
-
-        if not movimientos.exists():
+        if not por_medio:
             return None
 
-        # Calcular totales globales y el desglose por medio de pago en una sola query
-        # usando agregación condicional (evita múltiples queries para cada subtotal).
-        totales = movimientos.aggregate(
-            total=Sum("monto"),
-            efectivo=Sum(
-                Case(
-                    When(medio_pago="efectivo", then="monto"),
-                    default=Value(0),
-                    output_field=DecimalField(max_digits=12, decimal_places=2),
-                )
-            ),
-            transferencia=Sum(
-                Case(
-                    When(medio_pago="transferencia", then="monto"),
-                    default=Value(0),
-                    output_field=DecimalField(max_digits=12, decimal_places=2),
-                )
-            ),
-            digital=Sum(
-                Case(
-                    When(medio_pago__in=MEDIOS_DIGITALES, then="monto"),
-                    default=Value(0),
-                    output_field=DecimalField(max_digits=12, decimal_places=2),
-                )
-            ),
-        )
-
-        total              = totales["total"]        or Decimal("0")
-        total_efectivo     = totales["efectivo"]     or Decimal("0")
-        total_transferencia = totales["transferencia"] or Decimal("0")
-        total_digital      = totales["digital"]      or Decimal("0")
-
-        fecha_apertura = movimientos.first().creado_en
+        # Desglose por medio de pago: a lo sumo una fila por medio (seis)
+        total = total_efectivo = total_transferencia = total_digital = comisiones = Decimal("0")
+        cantidad = 0
+        for medio, subtotal, n, _, comision in por_medio:
+            subtotal = Decimal(subtotal or 0)
+            total    += subtotal
+            cantidad += n
+            comisiones += Decimal(comision or 0)
+            if medio == "efectivo":
+                total_efectivo += subtotal
+            elif medio == "transferencia":
+                total_transferencia += subtotal
+            elif medio in MEDIOS_DIGITALES:
+                total_digital += subtotal
+        fecha_apertura = min(fila[3] for fila in por_medio)
 
         # Comisión: snapshot del porcentaje actual al momento del cierre
         porcentaje = usuario.porcentaje_ganancia or Decimal("0")
@@ -123,16 +179,57 @@ def generar_cierre_caja(usuario, fecha_desde=None, fecha_hasta=None, periodo="")
             total_efectivo=total_efectivo,
             total_transferencia=total_transferencia,
             total_digital=total_digital,
+            total_comisiones=comisiones,
             fecha_apertura=fecha_apertura,
-            cantidad_movimientos=movimientos.count(),
+            cantidad_movimientos=cantidad,
             creado_por=usuario,
             periodo=periodo,
             porcentaje_ganancia_aplicado=porcentaje,
             ganancia_usuario=ganancia,
             monto_municipio=monto_municipio,
         )
-
-        # Bloqueo definitivo: una vez cerrado no se puede reabrir
-        movimientos.update(cerrado=True)
+        registrar_cierre(usuario.pk, total, cantidad)
 
         return cierre
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Exportación del historial
+# ─────────────────────────────────────────────────────────────────────────────
+
+ENCABEZADOS_MOVIMIENTOS = [
+    "Fecha", "Usuario", "Tipo", "Medio de pago", "Descripción", "Monto", "Comisión", "Cerrado",
+]
+
+
+def filas_movimientos_caja(queryset, chunk_size=None):
+    """
+    Genera las filas de ENCABEZADOS_MOVIMIENTOS para el queryset, de la más
+    vieja a la más nueva.
+
+    Lee con values_list + iterator(chunk_size): sin instanciar modelos ni
+    cargar el historial entero (lo usan las exportaciones en streaming).
+    """
+    from app_estacionamiento.services.exportaciones import CHUNK_EXPORTACION
+
+    tipos  = dict(MovimientoCaja.TIPOS)
+    medios = dict(MovimientoCaja.MEDIOS_PAGO)
+    filas = (
+        queryset.order_by("creado_en", "id")
+        .values_list(
+            "creado_en", "usuario__first_name", "usuario__last_name", "usuario__correo",
+            "tipo", "medio_pago", "descripcion", "monto", "comision_monto", "cerrado",
+        )
+        .iterator(chunk_size=chunk_size or CHUNK_EXPORTACION)
+    )
+    for creado_en, nombre, apellido, correo, tipo, medio, descripcion, monto, comision, cerrado in filas:
+        yield [
+            timezone.localtime(creado_en).strftime("%d/%m/%Y %H:%M"),
+            f"{nombre} {apellido}".strip() or correo,
+            tipos.get(tipo, tipo),
+            medios.get(medio, medio),
+            descripcion or "",
+            monto,
+            comision,
+            "Sí" if cerrado else "No",
+        ]
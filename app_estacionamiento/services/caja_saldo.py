@@ -0,0 +1,223 @@
+# app_estacionamiento/services/caja_saldo.py
+"""
+Totales de caja mantenidos de forma incremental (CajaSaldo).
+
+Antes panel_vendedor, caja_inspector y cerrar_caja sumaban con Sum() todo
+el historial de MovimientoCaja del usuario en cada request (5 a 8
+agregados, algunos repetidos). Ahora cada usuario tiene una fila CajaSaldo
+con los totales y los paneles la leen con una query por pk.
+
+Mantenimiento (siempre en la transacción del cambio):
+  - MovimientoCaja.save() en el alta llama a registrar_movimientos([mov]).
+  - Los bulk_create de MovimientoCaja (finalizar_lote) llaman a
+    registrar_movimientos(lista) a mano: bulk_create no pasa por save().
+  - generar_cierre_caja llama a registrar_cierre() con lo que cerró.
+  Los UPDATE usan F(): dos movimientos concurrentes del mismo usuario no se
+  pisan, y la fila de CajaSaldo solo queda bloqueada hasta el commit.
+
+Reconciliación: reconstruir_cajas() recalcula las filas desde el historial
+(`python manage.py reconciliar_cajas`). Bloquea cada fila antes de sumar,
+así un movimiento que entra en el medio se aplica después sobre el valor
+reconstruido y no se pierde.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from app_estacionamiento.models import CajaSaldo, MovimientoCaja
+from app_estacionamiento.services.fechas import filtro_fechas
+
+# Usuarios por transacción en la reconciliación
+LOTE_RECONCILIACION = 500
+
+_DECIMAL = DecimalField(max_digits=14, decimal_places=2)
+
+_CAMPOS_MONTO    = ("total_ingresos", "total_egresos", "total_comisiones", "abierto_monto")
+_CAMPOS_CANTIDAD = ("abierto_cantidad", "dia_cantidad")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Lectura
+# ─────────────────────────────────────────────────────────────────────────────
+
+def obtener_caja_saldo(usuario):
+    """CajaSaldo del usuario; uno en cero (sin guardar) si nunca tuvo movimientos."""
+    return CajaSaldo.objects.filter(usuario_id=usuario.pk).first() or CajaSaldo(usuario_id=usuario.pk)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Escritura incremental
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _por_usuario(deltas, campo):
+    """Case por usuario con lo que hay que sumarle a `campo` (como _delta en saldo.py)."""
+    if campo in _CAMPOS_CANTIDAD:
+        return Case(
+            *[When(pk=u, then=Value(int(d[campo]))) for u, d in deltas.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    return Case(
+        *[When(pk=u, then=Value(d[campo])) for u, d in deltas.items()],
+        default=Value(Decimal("0")),
+        output_field=_DECIMAL,
+    )
+
+
+def registrar_movimientos(movimientos):
+    """
+    Suma MovimientoCaja recién creados a la CajaSaldo de cada usuario.
+
+    Un UPDATE por día calendario presente en la lista (en la práctica uno),
+    sin importar cuántos usuarios haya. Debe llamarse dentro de la misma
+    transacción que creó los movimientos.
+    """
+    if not movimientos:
+        return
+    # dia → usuario_id → deltas
+    por_dia = defaultdict(lambda: defaultdict(lambda: defaultdict(Decimal)))
+    for mov in movimientos:
+        dia = timezone.localdate(mov.creado_en or timezone.now())
+        d = por_dia[dia][mov.usuario_id]
+        monto = Decimal(mov.monto)
+        if mov.tipo == "ingreso":
+            d["total_ingresos"]   += monto
+            d["total_comisiones"] += Decimal(mov.comision_monto or 0)
+            d["dia_ingresos"]     += monto
+            d["dia_cantidad"]     += 1
+            if not mov.cerrado:
+                d["abierto_monto"]    += monto
+                d["abierto_cantidad"] += 1
+        else:
+            d["total_egresos"] += monto
+
+    usuarios = {m.usuario_id for m in movimientos}
+    CajaSaldo.objects.bulk_create(
+        [CajaSaldo(usuario_id=u) for u in usuarios], ignore_conflicts=True,
+    )
+    ahora = timezone.now()
+    for dia in sorted(por_dia):
+        deltas = por_dia[dia]
+        # El día guardado es anterior (o nunca hubo): los acumulados del día arrancan de cero.
+        # Si es posterior (un movimiento de antes de medianoche que confirma tarde), no se tocan.
+        dia_viejo = Q(dia__lt=dia) | Q(dia__isnull=True)
+        cambios = {
+            campo: F(campo) + _por_usuario(deltas, campo)
+            for campo in (*_CAMPOS_MONTO, "abierto_cantidad")
+        }
+        for campo in ("dia_ingresos", "dia_cantidad"):
+            cambios[campo] = Case(
+                When(dia=dia, then=F(campo) + _por_usuario(deltas, campo)),
+                When(dia_viejo, then=_por_usuario(deltas, campo)),
+                default=F(campo),
+            )
+        cambios["dia"] = Case(When(dia_viejo, then=Value(dia)), default=F("dia"))
+        CajaSaldo.objects.filter(pk__in=list(deltas)).update(actualizado_en=ahora, **cambios)
+
+
+def registrar_cierre(usuario_id, monto, cantidad):
+    """Descuenta de lo abierto los ingresos que acaba de cerrar generar_cierre_caja."""
+    CajaSaldo.objects.filter(pk=usuario_id).update(
+        abierto_monto=F("abierto_monto") - monto,
+        abierto_cantidad=F("abierto_cantidad") - cantidad,
+        actualizado_en=timezone.now(),
+    )
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Reconciliación
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _suma(campo, **filtro):
+    return Coalesce(Sum(campo, filter=Q(**filtro)), Value(Decimal("0")), output_field=_DECIMAL)
+
+
+def totales_desde_historial(usuario_ids, hoy=None):
+    """
+    usuario_id → dict con los totales de CajaSaldo calculados desde
+    MovimientoCaja (una sola query de agregación condicional).
+    """
+    hoy = hoy or timezone.localdate()
+    del_dia = filtro_fechas("creado_en", hoy, hoy)
+    filas = (
+        MovimientoCaja.objects
+        .filter(usuario_id__in=usuario_ids)
+        .values("usuario_id")
+        .annotate(
+            total_ingresos=_suma("monto", tipo="ingreso"),
+            total_egresos=_suma("monto", tipo="egreso"),
+            total_comisiones=_suma("comision_monto", tipo="ingreso"),
+            abierto_monto=_suma("monto", tipo="ingreso", cerrado=False),
+            abierto_cantidad=Count("id", filter=Q(tipo="ingreso", cerrado=False)),
+            dia_ingresos=_suma("monto", tipo="ingreso", **del_dia),
+            dia_cantidad=Count("id", filter=Q(tipo="ingreso", **del_dia)),
+        )
+        .order_by()
+    )
+    totales = {
+        u: {campo: Decimal("0") for campo in _CAMPOS_MONTO}
+        | {"abierto_cantidad": 0, "dia_ingresos": Decimal("0"), "dia_cantidad": 0}
+        for u in usuario_ids
+    }
+    for fila in filas:
+        totales[fila.pop("usuario_id")] = fila
+    for t in totales.values():
+        t["dia"] = hoy
+    return totales
+
+
+def _difiere(caja, esperado):
+    campos = (*_CAMPOS_MONTO, "abierto_cantidad")
+    if any(getattr(caja, c) != esperado[c] for c in campos):
+        return True
+    return caja.ingresos_del_dia(esperado["dia"]) != (esperado["dia_ingresos"], esperado["dia_cantidad"])
+
+
+def reconstruir_cajas(usuario_ids=None, lote=LOTE_RECONCILIACION, corregir=True):
+    """
+    Recalcula CajaSaldo desde MovimientoCaja.
+
+    Sin usuario_ids revisa a todos los usuarios con movimientos o con fila
+    en CajaSaldo. Con corregir=False solo informa. Retorna dict con la
+    cantidad de cajas revisadas y la lista de usuario_id que no coincidían.
+    """
+    if usuario_ids is None:
+        usuario_ids = set(
+            MovimientoCaja.objects.order_by().values_list("usuario_id", flat=True).distinct()
+        ) | set(CajaSaldo.objects.values_list("usuario_id", flat=True))
+    usuario_ids = sorted(usuario_ids)
+
+    diferencias = []
+    for i in range(0, len(usuario_ids), lote):
+        ids = usuario_ids[i:i + lote]
+        with transaction.atomic():
+            if corregir:
+                CajaSaldo.objects.bulk_create(
+                    [CajaSaldo(usuario_id=u) for u in ids], ignore_conflicts=True,
+                )
+                cajas = CajaSaldo.objects.select_for_update().filter(usuario_id__in=ids)
+            else:
+                cajas = CajaSaldo.objects.filter(usuario_id__in=ids)
+            cajas = {c.usuario_id: c for c in cajas.order_by("usuario_id")}
+            esperados = totales_desde_historial(ids)
+            a_corregir = []
+            for u in ids:
+                caja = cajas.get(u) or CajaSaldo(usuario_id=u)
+                if _difiere(caja, esperados[u]):
+                    diferencias.append(u)
+                    for campo, valor in esperados[u].items():
+                        setattr(caja, campo, valor)
+                    caja.actualizado_en = timezone.now()
+                    a_corregir.append(caja)
+            if corregir and a_corregir:
+                CajaSaldo.objects.bulk_update(
+                    a_corregir,
+                    [*_CAMPOS_MONTO, "abierto_cantidad", "dia", "dia_ingresos",
+                     "dia_cantidad", "actualizado_en"],
+                )
+    return {"revisadas": len(usuario_ids), "diferencias": diferencias}
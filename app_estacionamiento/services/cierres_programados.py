@@ -0,0 +1,259 @@
+# app_estacionamiento/services/cierres_programados.py
+"""
+Cierres de caja programados por cobrador.
+
+Al terminar el turno todos los cobradores apretaban "Cerrar caja" a la vez
+y cada request hacía el cierre completo (bloqueo de los movimientos,
+sumas, CierreCaja) dentro de la transacción del request. Con el cierre
+automático en "diario" o "semanal" el cierre lo hace un worker al llegar
+el corte (hora y, si es semanal, día de la semana).
+
+El programa sale del cobrador (Usuario.cierre_automatico, cierre_hora,
+cierre_dia_semana) y lo que deja vacío lo toma del municipio: el municipio
+define el de todos y el admin puede cambiárselo a un vendedor (otro turno,
+cierre semanal, o "manual" para que cierre él mismo).
+
+  1. programar_cierres() crea un TrabajoCierreCaja por cobrador con
+     ingresos abiertos anteriores al corte. (usuario, corte) es único:
+     correrlo varias veces no duplica trabajos.
+  2. ejecutar_trabajo() lo toma con un UPDATE condicional, corre
+     generar_cierre_caja(fecha_hasta=corte), guarda el resumen ya armado
+     y se lo manda al cobrador como Notificacion:
+
+         pendiente ──► procesando ──► listo / sin_movimientos
+                           │
+                           └────────► error  (se reintenta hasta MAX_INTENTOS)
+
+Lo corre `python manage.py cerrar_cajas_programadas`. Con --procesos N los
+trabajos se reparten entre N procesos; generar_cierre_caja toma un
+advisory lock por usuario, así un cierre manual simultáneo del mismo
+cobrador espera en vez de pisarse.
+"""
+
+import logging
+import multiprocessing
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from django.db import connection, connections, transaction
+from django.db.models import F, Min, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from app_estacionamiento.models import (
+    CierreCaja, MovimientoCaja, Notificacion, TrabajoCierreCaja, Usuario,
+)
+from app_estacionamiento.services.caja import generar_cierre_caja
+
+logger = logging.getLogger(__name__)
+
+# Trabajos por pasada del worker
+LOTE_TRABAJOS = 200
+
+# Tiempo tras el cual un trabajo "procesando" se considera abandonado
+PROCESANDO_VENCE_MINUTOS = 15
+
+# Reintentos de un trabajo que terminó en error
+MAX_INTENTOS = 3
+
+_AUTOMATICOS = ("diario", "semanal")
+
+ProgramaCierre = namedtuple("ProgramaCierre", "cierre_automatico cierre_hora cierre_dia_semana")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Programación
+# ─────────────────────────────────────────────────────────────────────────────
+
+def programa_cierre(usuario, municipio):
+    """ProgramaCierre del cobrador: lo que no tiene propio sale del municipio."""
+    if not usuario.cierre_automatico:
+        return ProgramaCierre(municipio.cierre_automatico, municipio.cierre_hora, municipio.cierre_dia_semana)
+    return ProgramaCierre(
+        usuario.cierre_automatico,
+        usuario.cierre_hora or municipio.cierre_hora,
+        municipio.cierre_dia_semana if usuario.cierre_dia_semana is None else usuario.cierre_dia_semana,
+    )
+
+
+def corte_vigente(programa, ahora=None):
+    """
+    Último corte del programa (Municipio o ProgramaCierre) que ya pasó
+    (datetime con zona horaria), o None si el cierre es manual.
+    """
+    if programa.cierre_automatico not in _AUTOMATICOS:
+        return None
+    ahora = ahora or timezone.now()
+    fecha = timezone.localtime(ahora).date()
+    if programa.cierre_automatico == "semanal":
+        fecha -= timedelta(days=(fecha.weekday() - programa.cierre_dia_semana) % 7)
+    corte = timezone.make_aware(datetime.combine(fecha, programa.cierre_hora))
+    if corte > ahora:
+        dias = 7 if programa.cierre_automatico == "semanal" else 1
+        corte = timezone.make_aware(
+            datetime.combine(fecha - timedelta(days=dias), programa.cierre_hora)
+        )
+    return corte
+
+
+def programar_cierres(ahora=None):
+    """
+    Crea los TrabajoCierreCaja del último corte de cada cobrador con cierre
+    automático (propio o del municipio). Retorna la cantidad de trabajos nuevos.
+
+    Una consulta trae, por cobrador, el ingreso abierto más viejo; el corte
+    de cada uno se calcula en Python y solo se programa si ese ingreso es
+    anterior al corte.
+    """
+    ahora = ahora or timezone.now()
+    primer_abierto = dict(
+        MovimientoCaja.objects
+        .filter(tipo="ingreso", cerrado=False, creado_en__lte=ahora, usuario__municipio__activo=True)
+        .filter(
+            Q(usuario__cierre_automatico__in=_AUTOMATICOS)
+            | Q(usuario__cierre_automatico="", usuario__municipio__cierre_automatico__in=_AUTOMATICOS)
+        )
+        .order_by()
+        .values("usuario_id")
+        .annotate(primero=Min("creado_en"))
+        .values_list("usuario_id", "primero")
+    )
+    if not primer_abierto:
+        return 0
+
+    trabajos = []
+    for usuario in Usuario.objects.filter(id__in=primer_abierto).select_related("municipio"):
+        programa = programa_cierre(usuario, usuario.municipio)
+        corte = corte_vigente(programa, ahora)
+        if corte is not None and primer_abierto[usuario.id] <= corte:
+            trabajos.append(TrabajoCierreCaja(
+                usuario_id=usuario.id, corte=corte, periodo=programa.cierre_automatico, creado_en=ahora,
+            ))
+
+    existentes = set(
+        TrabajoCierreCaja.objects
+        .filter(usuario_id__in=[t.usuario_id for t in trabajos], corte__in={t.corte for t in trabajos})
+        .values_list("usuario_id", "corte")
+    )
+    nuevos = [t for t in trabajos if (t.usuario_id, t.corte) not in existentes]
+    TrabajoCierreCaja.objects.bulk_create(nuevos, ignore_conflicts=True)
+    return len(nuevos)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Ejecución
+# ─────────────────────────────────────────────────────────────────────────────
+
+class _TrabajoRetomado(Exception):
+    pass
+
+
+def _por_procesar(ahora):
+    """Filtro: pendientes, procesando abandonados, o con error y reintentos disponibles."""
+    vencido = ahora - timedelta(minutes=PROCESANDO_VENCE_MINUTOS)
+    return (
+        Q(estado=TrabajoCierreCaja.PENDIENTE)
+        | Q(estado=TrabajoCierreCaja.PROCESANDO, estado_desde__lt=vencido)
+        | Q(estado=TrabajoCierreCaja.ERROR, intentos__lt=MAX_INTENTOS)
+    )
+
+
+def _tomar(trabajo_id, ahora):
+    """UPDATE condicional a "procesando". True si este proceso se quedó con el trabajo."""
+    return TrabajoCierreCaja.objects.filter(_por_procesar(ahora), id=trabajo_id).update(
+        estado=TrabajoCierreCaja.PROCESANDO,
+        estado_desde=ahora,
+        intentos=F("intentos") + 1,
+    ) == 1
+
+
+def resumen_cierre(cierre, corte):
+    """Texto del resumen de un cierre programado (el de la Notificacion)."""
+    return render_to_string("vendedores/resumen_cierre.txt", {
+        "cierre":  cierre,
+        "corte":   corte,
+        "periodo": dict(CierreCaja.PERIODOS).get(cierre.periodo, ""),
+    }).strip()
+
+
+def ejecutar_trabajo(trabajo_id):
+    """
+    Genera el cierre de un TrabajoCierreCaja.
+
+    Retorna el estado final, o None si el trabajo no estaba para procesar
+    (u otro worker lo tomó). El cierre, el resumen y la notificación se
+    guardan en la misma transacción: si algo falla no queda un cierre sin
+    su trabajo marcado.
+    """
+    tomado = timezone.now()
+    if not _tomar(trabajo_id, tomado):
+        return None
+    trabajo = TrabajoCierreCaja.objects.select_related("usuario").get(id=trabajo_id)
+    propio = TrabajoCierreCaja.objects.filter(
+        id=trabajo_id, estado=TrabajoCierreCaja.PROCESANDO, estado_desde=tomado,
+    )
+    try:
+        with transaction.atomic():
+            cierre = generar_cierre_caja(trabajo.usuario, fecha_hasta=trabajo.corte, periodo=trabajo.periodo)
+            if cierre is None:
+                estado, resumen = TrabajoCierreCaja.SIN_MOVIMIENTOS, ""
+            else:
+                estado, resumen = TrabajoCierreCaja.LISTO, resumen_cierre(cierre, trabajo.corte)
+                Notificacion.objects.create(destinatario=trabajo.usuario, mensaje=resumen)
+            if not propio.update(
+                estado=estado, estado_desde=timezone.now(), cierre=cierre, resumen=resumen, error="",
+            ):
+                # Otro worker lo retomó (este tardó más que PROCESANDO_VENCE_MINUTOS): deshacer
+                raise _TrabajoRetomado
+    except _TrabajoRetomado:
+        return None
+    except Exception as e:
+        logger.warning("Cierre programado #%s (usuario %s) falló: %s", trabajo_id, trabajo.usuario_id, e)
+        propio.update(estado=TrabajoCierreCaja.ERROR, estado_desde=timezone.now(), error=str(e)[:1000])
+        return TrabajoCierreCaja.ERROR
+    return estado
+
+
+def _pendientes(limite):
+    return list(
+        TrabajoCierreCaja.objects.filter(_por_procesar(timezone.now()))
+        .order_by("id")
+        .values_list("id", flat=True)[:limite]
+    )
+
+
+def _contar(estados):
+    return {
+        "listos":          estados.count(TrabajoCierreCaja.LISTO),
+        "sin_movimientos": estados.count(TrabajoCierreCaja.SIN_MOVIMIENTOS),
+        "errores":         estados.count(TrabajoCierreCaja.ERROR),
+    }
+
+
+def procesar_trabajos_pendientes(limite=LOTE_TRABAJOS):
+    """Ejecuta hasta `limite` trabajos en este proceso. Retorna dict con los resultados."""
+    return _contar([ejecutar_trabajo(trabajo_id) for trabajo_id in _pendientes(limite)])
+
+
+def _ejecutar_en_hijo(trabajo_id):
+    # Cada proceso del pool abre su propia conexión la primera vez que la usa
+    return ejecutar_trabajo(trabajo_id)
+
+
+def procesar_en_paralelo(procesos, limite=LOTE_TRABAJOS):
+    """
+    Reparte hasta `limite` trabajos pendientes entre `procesos` procesos.
+
+    Las conexiones del proceso padre se cierran antes del fork: una
+    conexión compartida entre procesos mezcla las respuestas de la base.
+    SQLite admite un solo escritor a la vez: ahí se procesa en este proceso.
+    """
+    if procesos <= 1 or connection.vendor != "postgresql":
+        return procesar_trabajos_pendientes(limite)
+    ids = _pendientes(limite)
+    if not ids:
+        return _contar([])
+    connections.close_all()
+    with multiprocessing.get_context("fork").Pool(processes=min(procesos, len(ids))) as pool:
+        estados = pool.map(_ejecutar_en_hijo, ids, chunksize=1)
+    return _contar(estados)
@@ -0,0 +1,427 @@
+# app_estacionamiento/services/cobros_lote.py
+"""
+Cobros por lote desde las terminales de los vendedores (con cola offline).
+
+Con mala señal el vendedor cobra igual: la terminal guarda cada venta en
+una cola local con una clave propia (UUID) y la hora de la venta, y la
+manda junto con las demás cuando vuelve la conexión. Acá:
+
+  - procesar_lote() recibe la lista de ventas y las registra en una sola
+    transacción, cada una en su savepoint: un cobro rechazado no tira
+    abajo al resto.
+  - Cada venta queda en CobroSincronizado con (usuario, clave) único. Si la
+    terminal reenvía el lote (se cortó la señal antes de la respuesta) se
+    devuelve el resultado guardado con "duplicado": true, sin volver a cobrar.
+  - Vehículos, tarifa, estacionamientos activos, abonos e infracciones se
+    leen una vez por lote, no una vez por venta.
+
+Tipos de venta (mismas reglas que las vistas del vendedor):
+  estacionamiento  {patente, duracion}           → registrar_estacionamiento_vendedor
+  infraccion       {infraccion_id, medio_pago}   → cobrar_infraccion_vendedor
+  abono            {patente, mes, medio_pago}    → cobrar_abono
+
+Todas llevan {clave, tipo} y opcionalmente vendido_en (ISO 8601). El horario
+de cobro y la tolerancia de las infracciones se evalúan a la hora de la
+venta, no a la de la sincronización.
+"""
+
+import logging
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from app_estacionamiento.factories import EstacionamientoFactory
+from app_estacionamiento.models import (
+    AbonoMensual, CobroSincronizado, Estacionamiento, Infraccion, MovimientoCaja, Vehiculo,
+)
+from app_estacionamiento.services.config_municipio import tarifa_vigente
+from app_estacionamiento.services.horarios import obtener_calendario
+from app_estacionamiento.services.infracciones import MEDIOS_VALIDOS_COBRO, calcular_estado_tolerancia
+from app_estacionamiento.use_cases.cobrar_estacionamiento import ejecutar as cobrar_estacionamiento
+from app_estacionamiento.use_cases.finalizar_estacionamiento import finalizar_lote
+from app_estacionamiento.utils import get_subcuadra_default, sanitizar_patente
+
+logger = logging.getLogger(__name__)
+
+# Ventas por request
+MAX_COBROS_POR_LOTE = 50
+
+# Antigüedad máxima de una venta offline; las más viejas se registran a mano
+VENTA_OFFLINE_MAX_HORAS = 24
+
+# Diferencia de reloj tolerada entre la terminal y el servidor
+_RELOJ_ADELANTADO = timedelta(minutes=5)
+
+# Primer clave de pg_advisory_xact_lock(int, int): dos lotes del mismo
+# vendedor (p. ej. dos pestañas que sincronizan a la vez) se procesan de a uno
+_LOCK_COBROS = 8003
+
+TIPOS = {t for t, _ in CobroSincronizado.TIPOS}
+
+_LARGO_PATENTE = Vehiculo._meta.get_field("patente").max_length
+
+
+class CobroRechazado(Exception):
+    """La venta no se puede registrar (regla de negocio); el mensaje va a la terminal."""
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Normalización
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _momento_venta(valor, ahora):
+    """datetime de la venta según la terminal; sin dato (o adelantado) → ahora."""
+    momento = parse_datetime(str(valor)) if valor else None
+    if momento is None:
+        return ahora
+    if timezone.is_naive(momento):
+        momento = timezone.make_aware(momento)
+    if momento > ahora + _RELOJ_ADELANTADO:
+        return ahora
+    return min(momento, ahora)
+
+
+def _normalizar(item, ahora):
+    """
+    dict con los campos de la venta ya validados en forma, o un str con el
+    error si la venta no se puede ni identificar.
+    """
+    if not isinstance(item, dict):
+        return "Venta inválida"
+    clave = str(item.get("clave") or "").strip()
+    if not clave or len(clave) > 64:
+        return "Clave de venta inválida"
+    tipo = item.get("tipo")
+    if tipo not in TIPOS:
+        return "Tipo de venta inválido"
+    patente = sanitizar_patente(str(item.get("patente") or ""))
+    # Una patente que no entra en la columna haría fallar el bulk_create de
+    # _vehiculos y con él todo el lote (la cola de la terminal no avanzaría)
+    if tipo != CobroSincronizado.INFRACCION and len(patente) > _LARGO_PATENTE:
+        return f"Patente de más de {_LARGO_PATENTE} caracteres"
+    medio_pago = item.get("medio_pago") or "efectivo"
+    return {
+        "clave":         clave,
+        "tipo":          tipo,
+        "patente":       patente,
+        "duracion":      item.get("duracion"),
+        "infraccion_id": str(item.get("infraccion_id") or ""),
+        "mes":           str(item.get("mes") or ""),
+        "medio_pago":    medio_pago if medio_pago in MEDIOS_VALIDOS_COBRO else "efectivo",
+        "vendido_en":    _momento_venta(item.get("vendido_en"), ahora),
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Datos del lote (una query por tipo de dato, no por venta)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _vehiculos(patentes, municipio):
+    """
+    patente → Vehiculo, creando los que no existen con un solo INSERT.
+    Los vehículos sin municipio quedan asignados al del vendedor (igual que
+    el cobro de a uno).
+    """
+    if not patentes:
+        return {}
+    Vehiculo.objects.bulk_create(
+        [Vehiculo(patente=p, municipio=municipio) for p in sorted(patentes)],
+        ignore_conflicts=True,
+    )
+    Vehiculo.objects.filter(patente__in=patentes, municipio__isnull=True).update(municipio=municipio)
+    return {v.patente: v for v in Vehiculo.objects.filter(patente__in=patentes)}
+
+
+class _Lote:
+    """Lo que las ventas de un lote consultan, leído una vez."""
+
+    def __init__(self, cobrador, ventas):
+        self.cobrador  = cobrador
+        self.municipio = cobrador.municipio
+        self.tarifa    = tarifa_vigente(self.municipio)
+        self._subcuadra = None
+
+        patentes = {
+            v["patente"] for v in ventas
+            if v["tipo"] in (CobroSincronizado.ESTACIONAMIENTO, CobroSincronizado.ABONO) and v["patente"]
+        }
+        self.vehiculos = _vehiculos(patentes, self.municipio)
+        vehiculo_ids = [v.id for v in self.vehiculos.values()]
+
+        # vehiculo_id → fin del estacionamiento activo
+        self.activos = {
+            e.vehiculo_id: e.hora_inicio + timedelta(hours=float(e.duracion_horas))
+            for e in Estacionamiento.objects.filter(vehiculo_id__in=vehiculo_ids, estado="ACTIVO")
+        }
+        self.abonos = set(
+            AbonoMensual.objects.filter(vehiculo_id__in=vehiculo_ids, municipio=self.municipio)
+            .values_list("vehiculo_id", "mes")
+        )
+        # Infracción pendiente más nueva de cada vehículo a estacionar
+        self.pendientes = {}
+        for inf in (
+            Infraccion.objects.filter(vehiculo_id__in=vehiculo_ids, municipio=self.municipio, estado="pendiente")
+            .order_by("creado_en")
+        ):
+            self.pendientes[inf.vehiculo_id] = inf
+        # Infracciones a cobrar, bloqueadas hasta el fin del lote
+        infraccion_ids = [
+            int(v["infraccion_id"]) for v in ventas
+            if v["tipo"] == CobroSincronizado.INFRACCION and v["infraccion_id"].isdigit()
+        ]
+        self.infracciones = Infraccion.objects.select_for_update(of=("self",)).select_related("vehiculo").in_bulk(
+            infraccion_ids
+        ) if infraccion_ids else {}
+
+    @property
+    def subcuadra(self):
+        if self._subcuadra is None:
+            self._subcuadra = get_subcuadra_default(self.municipio)
+        return self._subcuadra
+
+    @property
+    def comision_pct(self):
+        return getattr(self.municipio, "comision_vendedor", None) or Decimal("0")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Un cobro por tipo
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _cobrar_estacionamiento(lote, venta):
+    patente = venta["patente"]
+    if not patente:
+        raise CobroRechazado("Ingresá la patente del vehículo.")
+    momento = venta["vendido_en"]
+    permitido, msg_horario = obtener_calendario(lote.municipio).cobro_activo(timezone.localtime(momento))
+    if not permitido:
+        raise CobroRechazado(msg_horario)
+    try:
+        duracion = Decimal(str(venta["duracion"]))
+        if duracion <= 0 or (duracion * 2) % 1 != 0:
+            raise ValueError()
+    except (InvalidOperation, ValueError):
+        raise CobroRechazado("Duración inválida.")
+
+    vehiculo = lote.vehiculos[patente]
+    if getattr(vehiculo, "exento_global", False):
+        raise CobroRechazado(f"El vehículo {patente} tiene exención total — no se puede cobrar.")
+    # Antes de tocar nada: sin subcuadra no se puede crear el estacionamiento
+    if lote.subcuadra is None:
+        raise CobroRechazado("No hay subcuadra configurada para este municipio.")
+    # Activo a la hora de la venta: uno que ya había vencido no bloquea, se
+    # finaliza a esa hora (el barrido todavía no lo cerró)
+    if vehiculo.id in lote.activos:
+        if lote.activos[vehiculo.id] > momento:
+            raise CobroRechazado("El vehículo ya tiene un estacionamiento activo.")
+        finalizar_lote(Estacionamiento.objects.filter(vehiculo=vehiculo), ahora=momento)
+
+    tarifa_auto = lote.tarifa.precio_por_hora if lote.tarifa else Decimal("100")
+    tarifa_moto = (
+        lote.tarifa.precio_por_hora_moto if lote.tarifa and lote.tarifa.precio_por_hora_moto else tarifa_auto
+    )
+    monto    = duracion * (tarifa_moto if getattr(vehiculo, "tipo", "auto") == "moto" else tarifa_auto)
+    comision = (monto * lote.comision_pct / 100).quantize(Decimal("0.01"))
+
+    resultado = {}
+    infraccion = lote.pendientes.pop(vehiculo.id, None)
+    if infraccion is not None:
+        if calcular_estado_tolerancia(infraccion, lote.municipio, ahora=momento)["dentro_tolerancia"]:
+            infraccion.estado     = "anulada"
+            infraccion.fecha_pago = momento
+            infraccion.save()
+            resultado["infraccion_anulada"] = infraccion.id
+        else:
+            resultado["infraccion_pendiente"] = infraccion.id
+
+    est = EstacionamientoFactory.crear(
+        usuario=lote.cobrador,
+        vehiculo=vehiculo,
+        subcuadra=lote.subcuadra,
+        duracion=duracion,
+        costo_base=monto,
+    )
+    # hora_inicio es auto_now_add: el tiempo pagado corre desde la venta
+    Estacionamiento.objects.filter(id=est.id).update(hora_inicio=momento)
+    movimiento = cobrar_estacionamiento(
+        inspector=lote.cobrador,
+        monto=monto,
+        descripcion=f"Estacionamiento {patente}",
+        comision_monto=comision,
+    )["movimiento"]
+    lote.activos[vehiculo.id] = momento + timedelta(hours=float(duracion))
+    resultado.update({"estacionamiento_id": est.id, "monto": str(monto.quantize(Decimal("0.01")))})
+    return resultado, movimiento
+
+
+def _cobrar_infraccion(lote, venta):
+    infraccion_id = venta["infraccion_id"]
+    inf = lote.infracciones.get(int(infraccion_id)) if infraccion_id.isdigit() else None
+    if inf is None or inf.municipio_id != lote.municipio.id or inf.estado != "pendiente":
+        raise CobroRechazado("Infracción no encontrada o ya procesada.")
+
+    momento = venta["vendido_en"]
+    movimiento = None
+    if calcular_estado_tolerancia(inf, lote.municipio, ahora=momento)["dentro_tolerancia"]:
+        # Dentro de la gracia: anular sin cobrar
+        inf.estado = "anulada"
+    else:
+        inf.estado = "pagada"
+        movimiento = MovimientoCaja.objects.create(
+            usuario=lote.cobrador,
+            monto=inf.monto,
+            tipo="ingreso",
+            medio_pago=venta["medio_pago"],
+            comision_monto=round(inf.monto * lote.comision_pct / 100, 2),
+            descripcion=f"Cobro infraccion #{inf.id} — {inf.vehiculo.patente} ({venta['medio_pago']})",
+        )
+    inf.fecha_pago = momento
+    inf.save()
+    return {"infraccion_id": inf.id, "infraccion_estado": inf.estado, "monto": str(inf.monto)}, movimiento
+
+
+def _cobrar_abono(lote, venta):
+    patente = venta["patente"]
+    if not patente:
+        raise CobroRechazado("Ingresá la patente del vehículo.")
+    try:
+        mes = date.fromisoformat(venta["mes"]).replace(day=1)
+    except ValueError:
+        raise CobroRechazado("Mes inválido.")
+
+    vehiculo = lote.vehiculos[patente]
+    precio_moto = lote.tarifa.precio_abono_moto if lote.tarifa else None
+    precio_auto = lote.tarifa.precio_abono_auto if lote.tarifa else None
+    if getattr(vehiculo, "tipo", "auto") == "moto" and precio_moto and precio_moto > 0:
+        precio = precio_moto
+    elif precio_auto and precio_auto > 0:
+        precio = precio_auto
+    else:
+        raise CobroRechazado("No hay tarifa de abono configurada. Configurala en Tarifas.")
+    if (vehiculo.id, mes) in lote.abonos:
+        raise CobroRechazado(f"El vehículo {patente} ya tiene abono para {mes:%m/%Y}.")
+
+    # El admin rinde el 100% a tesorería: sin comisión propia
+    if lote.cobrador.es_admin:
+        comision = Decimal("0")
+    else:
+        comision = (precio * lote.comision_pct / 100).quantize(Decimal("0.01"))
+    movimiento = MovimientoCaja.objects.create(
+        usuario=lote.cobrador,
+        monto=precio,
+        tipo="ingreso",
+        descripcion=f"Abono mensual {mes:%m/%Y} - {patente} ({venta['medio_pago']})",
+        medio_pago=venta["medio_pago"],
+        comision_monto=comision,
+    )
+    abono = AbonoMensual.objects.create(
+        vehiculo=vehiculo,
+        municipio=lote.municipio,
+        vendedor=lote.cobrador,
+        mes=mes,
+        monto=precio,
+        medio_pago="efectivo",
+        movimiento_caja=movimiento,
+    )
+    lote.abonos.add((vehiculo.id, mes))
+    return {"abono_id": abono.id, "monto": str(precio)}, movimiento
+
+
+_COBRAR = {
+    CobroSincronizado.ESTACIONAMIENTO: _cobrar_estacionamiento,
+    CobroSincronizado.INFRACCION:      _cobrar_infraccion,
+    CobroSincronizado.ABONO:           _cobrar_abono,
+}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Lote
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _bloquear_cobrador(usuario_id):
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", [_LOCK_COBROS, usuario_id])
+
+
+def _registrar(lote, venta):
+    """
+    Cobra una venta y guarda su CobroSincronizado. Un rechazo deshace solo
+    el cobro (savepoint) y queda guardado. Retorna el dict de resultado.
+    """
+    if venta["vendido_en"] < timezone.now() - timedelta(hours=VENTA_OFFLINE_MAX_HORAS):
+        estado, resultado, movimiento = (
+            CobroSincronizado.RECHAZADO,
+            {"error": f"Venta de hace más de {VENTA_OFFLINE_MAX_HORAS} h: registrala desde el panel."},
+            None,
+        )
+    else:
+        try:
+            with transaction.atomic():
+                resultado, movimiento = _COBRAR[venta["tipo"]](lote, venta)
+                estado = CobroSincronizado.OK
+        except CobroRechazado as e:
+            estado, resultado, movimiento = CobroSincronizado.RECHAZADO, {"error": str(e)}, None
+    CobroSincronizado.objects.create(
+        usuario=lote.cobrador,
+        clave=venta["clave"],
+        tipo=venta["tipo"],
+        estado=estado,
+        resultado=resultado,
+        movimiento_caja=movimiento,
+        vendido_en=venta["vendido_en"],
+    )
+    return {"estado": estado, **resultado}
+
+
+def procesar_lote(cobrador, items):
+    """
+    Registra las ventas `items` (lista de dicts) del cobrador.
+
+    Retorna una lista de resultados en el mismo orden, cada uno con
+    {clave, tipo, estado, duplicado} y los datos del cobro:
+      - "ok":        registrada (o ya registrada antes, con duplicado=True)
+      - "rechazado": no se puede registrar; reenviarla da el mismo resultado
+      - "error":     falla inesperada; no queda guardada y se puede reintentar
+    """
+    ahora  = timezone.now()
+    ventas = [_normalizar(item, ahora) for item in items]
+    validas = [v for v in ventas if isinstance(v, dict)]
+
+    resultados = {}
+    with transaction.atomic():
+        _bloquear_cobrador(cobrador.pk)
+        for cobro in CobroSincronizado.objects.filter(
+            usuario=cobrador, clave__in=[v["clave"] for v in validas],
+        ):
+            resultados[cobro.clave] = {"estado": cobro.estado, **cobro.resultado, "duplicado": True}
+
+        nuevas = list({v["clave"]: v for v in validas if v["clave"] not in resultados}.values())
+        lote = _Lote(cobrador, nuevas)
+        for venta in nuevas:
+            try:
+                with transaction.atomic():
+                    resultados[venta["clave"]] = {**_registrar(lote, venta), "duplicado": False}
+            except Exception:
+                logger.exception("Cobro %s de %s falló", venta["clave"], cobrador.pk)
+                resultados[venta["clave"]] = {
+                    "estado": "error", "error": "No se pudo registrar, se reintenta.", "duplicado": False,
+                }
+
+    salida = []
+    vistas = set()
+    for venta in ventas:
+        if isinstance(venta, str):
+            salida.append({"clave": None, "tipo": None, "estado": CobroSincronizado.RECHAZADO,
+                           "error": venta, "duplicado": False})
+            continue
+        resultado = dict(resultados[venta["clave"]])
+        # La misma clave dos veces en el lote: la segunda es un reenvío
+        if venta["clave"] in vistas:
+            resultado["duplicado"] = True
+        vistas.add(venta["clave"])
+        salida.append({"clave": venta["clave"], "tipo": venta["tipo"], **resultado})
+    return salida
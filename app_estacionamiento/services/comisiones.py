@@ -0,0 +1,179 @@
+# app_estacionamiento/services/comisiones.py
+"""
+Libro de comisiones devengadas (ComisionPeriodo).
+
+mis_comisiones y el panel del vendedor sumaban comision_monto de todo el
+historial del cobrador en cada request. Acá cada MovimientoCaja de ingreso
+con comisión suma su comision_monto a la fila (vendedor, mes) en la misma
+transacción que lo crea, y las pantallas leen esas filas ya sumadas.
+
+  devengado  = Σ ComisionPeriodo.monto
+  liquidado  = Σ LiquidacionComision.monto_total (las genera armar_rendicion)
+  pendiente  = devengado − liquidado
+
+Mantenimiento:
+  - MovimientoCaja.save() en el alta llama a registrar_comisiones([mov]).
+  - Un bulk_create de movimientos con comisión tiene que llamarlo a mano.
+  El UPDATE usa F(): dos cobros simultáneos del mismo vendedor no se pisan.
+
+Reconciliación: reconciliar_comisiones() suma MovimientoCaja por (usuario,
+mes) y corrige las filas que no coinciden
+(`python manage.py reconciliar_comisiones`).
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from app_estacionamiento.models import ComisionPeriodo, LiquidacionComision, MovimientoCaja, Usuario
+
+# Vendedores por transacción en la reconciliación
+LOTE_RECONCILIACION = 200
+
+
+def periodo_de(momento):
+    """Primer día del mes (fecha local) de un datetime."""
+    return timezone.localdate(momento).replace(day=1)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Escritura
+# ─────────────────────────────────────────────────────────────────────────────
+
+def registrar_comisiones(movimientos):
+    """
+    Suma la comisión de MovimientoCaja recién creados al libro.
+
+    Solo cuentan los ingresos con comision_monto > 0; el resto no genera
+    queries. Debe llamarse dentro de la transacción que creó los movimientos.
+    """
+    deltas = defaultdict(lambda: [Decimal("0"), 0])
+    for mov in movimientos:
+        comision = Decimal(mov.comision_monto or 0)
+        if mov.tipo != "ingreso" or comision <= 0:
+            continue
+        d = deltas[(mov.usuario_id, periodo_de(mov.creado_en or timezone.now()))]
+        d[0] += comision
+        d[1] += 1
+    if not deltas:
+        return
+    ComisionPeriodo.objects.bulk_create(
+        [ComisionPeriodo(vendedor_id=v, periodo=p) for v, p in deltas], ignore_conflicts=True,
+    )
+    ahora = timezone.now()
+    for (vendedor_id, periodo), (monto, cantidad) in deltas.items():
+        ComisionPeriodo.objects.filter(vendedor_id=vendedor_id, periodo=periodo).update(
+            monto=F("monto") + monto,
+            cantidad=F("cantidad") + cantidad,
+            actualizado_en=ahora,
+        )
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Lectura
+# ─────────────────────────────────────────────────────────────────────────────
+
+def saldo_comisiones(vendedor):
+    """dict {devengado, liquidado, pendiente} del vendedor."""
+    devengado = ComisionPeriodo.objects.filter(vendedor=vendedor).aggregate(t=Sum("monto"))["t"] or Decimal("0")
+    liquidado = (
+        LiquidacionComision.objects.filter(vendedor=vendedor).aggregate(t=Sum("monto_total"))["t"]
+        or Decimal("0")
+    )
+    return {"devengado": devengado, "liquidado": liquidado, "pendiente": devengado - liquidado}
+
+
+def saldos_por_vendedor(municipio):
+    """
+    Devengado, liquidado y pendiente de cada cobrador del municipio con
+    comisiones. Lista de dicts {vendedor, devengado, liquidado, pendiente},
+    con el mayor pendiente primero.
+    """
+    devengado = dict(
+        ComisionPeriodo.objects.filter(vendedor__municipio=municipio)
+        .values("vendedor_id").annotate(t=Sum("monto")).order_by()
+        .values_list("vendedor_id", "t")
+    )
+    liquidado = dict(
+        LiquidacionComision.objects.filter(municipio=municipio)
+        .values("vendedor_id").annotate(t=Sum("monto_total")).order_by()
+        .values_list("vendedor_id", "t")
+    )
+    vendedores = Usuario.objects.in_bulk(list(devengado.keys() | liquidado.keys()))
+    saldos = []
+    for vendedor_id, vendedor in vendedores.items():
+        d = devengado.get(vendedor_id) or Decimal("0")
+        l = liquidado.get(vendedor_id) or Decimal("0")
+        saldos.append({"vendedor": vendedor, "devengado": d, "liquidado": l, "pendiente": d - l})
+    saldos.sort(key=lambda s: s["pendiente"], reverse=True)
+    return saldos
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Reconciliación
+# ─────────────────────────────────────────────────────────────────────────────
+
+def devengado_desde_movimientos(vendedor_ids):
+    """(vendedor_id, periodo) → (monto, cantidad) sumado desde MovimientoCaja."""
+    filas = (
+        MovimientoCaja.objects
+        .filter(usuario_id__in=vendedor_ids, tipo="ingreso", comision_monto__gt=0)
+        .annotate(periodo=TruncMonth("creado_en", output_field=DateField()))
+        .values("usuario_id", "periodo")
+        .annotate(monto=Sum("comision_monto"), cantidad=Count("id"))
+        .order_by()
+    )
+    return {(f["usuario_id"], f["periodo"]): (f["monto"], f["cantidad"]) for f in filas}
+
+
+def reconciliar_comisiones(vendedor_ids=None, lote=LOTE_RECONCILIACION, corregir=True):
+    """
+    Compara ComisionPeriodo con lo que suman los MovimientoCaja.
+
+    Sin vendedor_ids revisa a todos los usuarios con comisiones o con filas
+    en el libro. Con corregir=True crea las filas que faltan y corrige las
+    que difieren (una fila sin movimientos queda en cero). Retorna dict con
+    la cantidad de vendedores revisados y la lista de diferencias
+    (vendedor_id, periodo, en el libro, según movimientos).
+    """
+    if vendedor_ids is None:
+        vendedor_ids = set(
+            MovimientoCaja.objects.filter(tipo="ingreso", comision_monto__gt=0)
+            .order_by().values_list("usuario_id", flat=True).distinct()
+        ) | set(ComisionPeriodo.objects.order_by().values_list("vendedor_id", flat=True).distinct())
+    vendedor_ids = sorted(vendedor_ids)
+
+    diferencias = []
+    cero = (Decimal("0"), 0)
+    for i in range(0, len(vendedor_ids), lote):
+        ids = vendedor_ids[i:i + lote]
+        with transaction.atomic():
+            libro = ComisionPeriodo.objects.filter(vendedor_id__in=ids)
+            if corregir:
+                ComisionPeriodo.objects.bulk_create(
+                    [ComisionPeriodo(vendedor_id=v, periodo=p) for v, p in devengado_desde_movimientos(ids)],
+                    ignore_conflicts=True,
+                )
+                # Bloquear antes de sumar: un cobro que entra en el medio se
+                # aplica después sobre el valor corregido
+                libro = libro.select_for_update()
+            filas = {(c.vendedor_id, c.periodo): c for c in libro.order_by("vendedor_id", "periodo")}
+            esperado = devengado_desde_movimientos(ids)
+            a_corregir = []
+            for clave in sorted(filas.keys() | esperado.keys()):
+                fila = filas.get(clave)
+                actual = (fila.monto, fila.cantidad) if fila else cero
+                real = esperado.get(clave, cero)
+                if actual != real:
+                    diferencias.append((*clave, actual, real))
+                    if fila:
+                        fila.monto, fila.cantidad = real
+                        fila.actualizado_en = timezone.now()
+                        a_corregir.append(fila)
+            if corregir and a_corregir:
+                ComisionPeriodo.objects.bulk_update(a_corregir, ["monto", "cantidad", "actualizado_en"])
+    return {"revisados": len(vendedor_ids), "diferencias": diferencias}
@@ -0,0 +1,132 @@
+# app_estacionamiento/services/config_municipio.py
+"""
+Configuración del municipio en caché (ConfigMunicipio).
+
+Casi todos los caminos de cobro leían la tarifa con
+`Tarifa.objects.filter(municipio=...).first()` (estacionar, cobro del
+vendedor, infracciones, pago público) y el decorator require_modulo hacía
+un EXISTS por request. Acá todo eso se arma una vez por municipio:
+
+  - los datos del Municipio (comisión, tolerancias, montos de carga y el
+    branding que usa base.html),
+  - la Tarifa vigente (la primera, mismo criterio que antes),
+  - los módulos activos,
+  - el horario de cobro, que sigue en su propio caché (CalendarioCobro,
+    ver services/horarios.py) y se expone como config.calendario.
+
+Caché: la config armada vive en la memoria de cada proceso durante
+CONFIG_TTL segundos. No se consulta el caché de Django en cada lectura:
+en producción es DatabaseCache y un sello de versión costaría un SELECT
+a la tabla de caché en cada página (branding) y en cada cobro.
+
+Las señales de Municipio, Tarifa y ModuloMunicipio descartan la copia del
+proceso que hizo el cambio; los demás workers la ven al vencer el TTL, así
+que una tarifa editada tarda CONFIG_TTL, como mucho, en llegar a todos los
+cobros. Un queryset.update() sobre esos modelos tiene que llamar a
+invalidar_config() a mano.
+"""
+
+import time
+
+from django.db import transaction
+
+from app_estacionamiento.models import ModuloMunicipio, Municipio, Tarifa
+from app_estacionamiento.services.horarios import obtener_calendario, obtener_tarifa_hora
+
+CONFIG_TTL = 30
+
+# municipio_id → (vence, ConfigMunicipio) de este proceso
+_configs = {}
+
+
+class ConfigMunicipio:
+    """
+    Foto de la configuración de un municipio, lista para leer sin tocar la base.
+
+    `municipio` y `tarifa` son copias de las instancias: sirven para leer,
+    no para editar (para eso, traerlas de la base).
+    """
+
+    def __init__(self, municipio, tarifa, modulos):
+        self.municipio = municipio
+        self.tarifa    = tarifa
+        self.modulos   = modulos        # frozenset de claves de ModuloMunicipio activas
+
+    @classmethod
+    def construir(cls, municipio_id):
+        municipio = Municipio.objects.filter(pk=municipio_id).first()
+        if municipio is None:
+            return None
+        tarifa  = Tarifa.objects.filter(municipio_id=municipio_id).first()
+        modulos = frozenset(
+            ModuloMunicipio.objects.filter(municipio_id=municipio_id, activo=True)
+            .values_list("modulo", flat=True)
+        )
+        return cls(municipio, tarifa, modulos)
+
+    @property
+    def comision_vendedor(self):
+        return self.municipio.comision_vendedor
+
+    @property
+    def tolerancia_multa_minutos(self):
+        return self.municipio.tolerancia_multa_minutos
+
+    @property
+    def minutos_entre_infracciones(self):
+        return self.municipio.minutos_entre_infracciones
+
+    @property
+    def calendario(self):
+        return obtener_calendario(self.municipio)
+
+    def tiene_modulo(self, modulo):
+        return modulo in self.modulos
+
+    def tarifa_hora(self, vehiculo, fallback=None):
+        """Precio por hora según el tipo de vehículo (ver obtener_tarifa_hora)."""
+        return obtener_tarifa_hora(self.tarifa, vehiculo, fallback)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Caché en memoria del proceso
+# ─────────────────────────────────────────────────────────────────────────────
+
+def obtener_config(municipio):
+    """
+    ConfigMunicipio del municipio (instancia o id), desde caché.
+
+    Con un id no hace falta cargar el Municipio: `request.user.municipio_id`
+    alcanza. Retorna None si el municipio es None o no existe.
+    """
+    municipio_id = getattr(municipio, "pk", municipio)
+    if municipio_id is None:
+        return None
+    ahora = time.monotonic()
+    guardada = _configs.get(municipio_id)
+    if guardada is not None and guardada[0] > ahora:
+        return guardada[1]
+    config = ConfigMunicipio.construir(municipio_id)
+    if config is not None:
+        _configs[municipio_id] = (ahora + CONFIG_TTL, config)
+    return config
+
+
+def invalidar_config(municipio_id):
+    """
+    Descarta la config del municipio en este proceso (lo llaman las señales).
+
+    Se descarta en el momento y de nuevo al confirmar: un request que armó la
+    config con los datos viejos mientras la transacción seguía abierta no
+    queda guardado.
+    """
+    if municipio_id is None:
+        return
+    _configs.pop(municipio_id, None)
+    transaction.on_commit(lambda: _configs.pop(municipio_id, None))
+
+
+def tarifa_vigente(municipio):
+    """Tarifa del municipio (instancia o id) desde la config cacheada, o None."""
+    config = obtener_config(municipio)
+    return config.tarifa if config else None
@@ -0,0 +1,559 @@
+# app_estacionamiento/services/documentos.py
+"""
+Generación de los documentos descargables (PDF con reportlab, XLSX con openpyxl).
+
+Antes vivían dentro de las vistas; acá quedan como funciones que reciben
+los datos ya resueltos y retornan los bytes del archivo, así las usan
+tanto las vistas (descarga directa) como el worker de reportes en segundo
+plano (services/reportes.py) y el informe por email.
+"""
+
+from datetime import date, timedelta
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from app_estacionamiento.models import Infraccion, Usuario
+from app_estacionamiento.services.fechas import filtro_fechas
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PDF infracciones impagas — para presentar en juzgado de faltas
+# ─────────────────────────────────────────────────────────────────────────────
+
+def rango_juzgado(frecuencia, desde, hasta, hoy=None):
+    """
+    (desde, hasta) del PDF para juzgado a partir de los parámetros GET.
+
+    Sin `desde` válido, la frecuencia lo pre-selecciona: "diario" → hoy,
+    "semanal" → lunes de esta semana, "mensual" (o cualquier otro valor) →
+    primer día del mes. Sin `hasta` válido, hasta hoy.
+    """
+    hoy = hoy or timezone.localtime().date()
+    try:
+        desde = date.fromisoformat(desde)
+    except (TypeError, ValueError):
+        if frecuencia == "diario":
+            desde = hoy
+        elif frecuencia == "semanal":
+            desde = hoy - timedelta(days=hoy.weekday())
+        else:
+            desde = hoy.replace(day=1)
+    try:
+        hasta = date.fromisoformat(hasta)
+    except (TypeError, ValueError):
+        hasta = hoy
+    return desde, hasta
+
+
+def infracciones_impagas(municipio, desde, hasta):
+    """Infracciones pendientes del municipio creadas en el rango, en el orden del PDF."""
+    return (
+        Infraccion.objects
+        .filter(municipio=municipio, estado="pendiente", **filtro_fechas("creado_en", desde, hasta))
+        .order_by("creado_en", "id")
+    )
+
+
+def generar_pdf_juzgado(municipio, desde, hasta, infracciones_qs=None):
+    """
+    Genera un PDF con las infracciones impagas del municipio en el rango de fechas.
+    Retorna bytes del PDF listo para HttpResponse o adjunto de email.
+
+    Args:
+        municipio: objeto Municipio
+        desde / hasta: date objects
+        infracciones_qs: queryset ya filtrado (opcional). Si None, filtra impagas del rango.
+    """
+    import io
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate, Spacer, Table, TableStyle, Paragraph
+
+    if infracciones_qs is None:
+        infracciones_qs = infracciones_impagas(municipio, desde, hasta).select_related(
+            "vehiculo", "inspector", "subcuadra",
+        )
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=A4,
+        rightMargin=2*cm, leftMargin=2*cm,
+        topMargin=2*cm, bottomMargin=2*cm,
+    )
+    estilos = getSampleStyleSheet()
+    estilo_titulo = ParagraphStyle("titulo", parent=estilos["Title"], fontSize=14, alignment=TA_CENTER)
+    estilo_sub    = ParagraphStyle("sub",    parent=estilos["Normal"], fontSize=9,
+                                   textColor=colors.HexColor("#555555"), alignment=TA_CENTER)
+    estilo_pie    = ParagraphStyle("pie",    parent=estilos["Normal"], fontSize=8,
+                                   textColor=colors.HexColor("#888888"))
+
+    partes = []
+
+    municipio_nombre = municipio.nombre if municipio else "Municipio"
+    generado_en = timezone.localtime().strftime("%d/%m/%Y %H:%M")
+
+    partes.append(Paragraph(f"Infracciones impagas — {municipio_nombre}", estilo_titulo))
+    partes.append(Paragraph(
+        f"Período: {desde.strftime('%d/%m/%Y')} al {hasta.strftime('%d/%m/%Y')} "
+        f"&nbsp;|&nbsp; Generado: {generado_en}",
+        estilo_sub,
+    ))
+    partes.append(Spacer(1, 0.6*cm))
+
+    encabezado = ["#Acta", "Fecha", "Patente", "Inspector", "Subcuadra", "Monto", "Días", "Foto"]
+    filas = [encabezado]
+
+    hoy = timezone.localtime().date()
+    monto_total = 0
+    for inf in infracciones_qs:
+        dias = (hoy - timezone.localtime(inf.creado_en).date()).days
+        filas.append([
+            str(inf.id),
+            timezone.localtime(inf.creado_en).strftime("%d/%m/%Y"),
+            inf.vehiculo.patente if inf.vehiculo else "—",
+            inf.inspector.nombre_completo() if inf.inspector else "—",
+            str(inf.subcuadra) if inf.subcuadra else "—",
+            f"${inf.monto:,.0f}",
+            str(dias),
+            # La foto pasa al juzgado recién con la marca de agua puesta
+            "Sí" if inf.foto_lista else ("En proceso" if inf.foto_en_proceso else "—"),
+        ])
+        monto_total += inf.monto
+
+    if len(filas) == 1:
+        partes.append(Paragraph("Sin infracciones impagas en el período.", estilos["Normal"]))
+    else:
+        anchos = [1.4*cm, 2.2*cm, 2.0*cm, 3.4*cm, 3.1*cm, 1.8*cm, 1.2*cm, 1.6*cm]
+        tabla = Table(filas, colWidths=anchos, repeatRows=1)
+        tabla.setStyle(TableStyle([
+            ("BACKGROUND",    (0, 0), (-1, 0), colors.HexColor("#2c3e50")),
+            ("TEXTCOLOR",     (0, 0), (-1, 0), colors.white),
+            ("FONTNAME",      (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("FONTSIZE",      (0, 0), (-1, 0), 8),
+            ("FONTSIZE",      (0, 1), (-1, -1), 7.5),
+            ("ROWBACKGROUNDS",(0, 1), (-1, -1), [colors.white, colors.HexColor("#f5f5f5")]),
+            ("GRID",          (0, 0), (-1, -1), 0.4, colors.HexColor("#cccccc")),
+            ("ALIGN",         (5, 0), (6, -1), "RIGHT"),
+            ("ALIGN",         (0, 0), (0, -1), "RIGHT"),
+            ("VALIGN",        (0, 0), (-1, -1), "MIDDLE"),
+            ("TOPPADDING",    (0, 0), (-1, -1), 3),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 3),
+        ]))
+        partes.append(tabla)
+        partes.append(Spacer(1, 0.5*cm))
+        total_actas = len(filas) - 1
+        partes.append(Paragraph(
+            f"Total: <b>{total_actas}</b> acta{'s' if total_actas != 1 else ''} "
+            f"&nbsp;|&nbsp; Monto total adeudado: <b>${monto_total:,.0f}</b>",
+            estilos["Normal"],
+        ))
+
+    partes.append(Spacer(1, 1.5*cm))
+    partes.append(Paragraph(
+        "Documento generado automáticamente por el Sistema de Estacionamiento Medido Municipal.",
+        estilo_pie,
+    ))
+
+    doc.build(partes)
+    buffer.seek(0)
+    return buffer.read()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PDF de infracciones del día (inspector)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def generar_pdf_infracciones_dia(inspector, fecha):
+    """
+    Genera el PDF con las infracciones del inspector en la fecha indicada
+    (columnas: N° acta, Hora, Patente, Subcuadra, Motivo, Monto, Estado).
+    Retorna bytes del PDF.
+    """
+    import io
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate, Spacer, Table, TableStyle, Paragraph
+
+    infracciones = (
+        Infraccion.objects
+        .filter(inspector=inspector, municipio=inspector.municipio,
+                **filtro_fechas("creado_en", fecha, fecha))
+        .select_related("vehiculo", "subcuadra")
+        .order_by("id")
+    )
+
+    # ── Armar PDF en memoria ────────────────────────────────────────────
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=A4,
+        rightMargin=2*cm, leftMargin=2*cm,
+        topMargin=2*cm, bottomMargin=2*cm,
+    )
+
+    estilos = getSampleStyleSheet()
+    estilo_titulo = ParagraphStyle(
+        "titulo", parent=estilos["Title"], fontSize=14, alignment=TA_CENTER
+    )
+    estilo_sub = ParagraphStyle(
+        "sub", parent=estilos["Normal"], fontSize=9, textColor=colors.HexColor("#555555")
+    )
+
+    partes = []
+
+    municipio_nombre = inspector.municipio.nombre if inspector.municipio else ""
+    partes.append(Paragraph(
+        f"Infracciones del día — {fecha.strftime('%d/%m/%Y')}",
+        estilo_titulo,
+    ))
+    partes.append(Spacer(1, 0.3*cm))
+    partes.append(Paragraph(
+        f"Inspector: {inspector.nombre_completo()} &nbsp;|&nbsp; Municipio: {municipio_nombre}",
+        estilo_sub,
+    ))
+    partes.append(Spacer(1, 0.6*cm))
+
+    ESTADOS = {"pendiente": "Pendiente", "pagada": "Pagada", "anulada": "Anulada"}
+    encabezado = ["Acta", "Hora", "Patente", "Subcuadra", "Motivo", "Monto", "Estado"]
+    filas = [encabezado]
+
+    for inf in infracciones:
+        hora_local = timezone.localtime(inf.creado_en).strftime("%H:%M")
+        filas.append([
+            str(inf.id),
+            hora_local,
+            inf.vehiculo.patente,
+            str(inf.subcuadra.calle) if inf.subcuadra else "—",
+            inf.motivo or "—",
+            f"${inf.monto}",
+            ESTADOS.get(inf.estado, inf.estado.capitalize()),
+        ])
+
+    if len(filas) == 1:
+        partes.append(Paragraph("Sin infracciones registradas para esta fecha.", estilos["Normal"]))
+    else:
+        anchos = [1.5*cm, 1.5*cm, 2.2*cm, 3.5*cm, 4.5*cm, 1.8*cm, 2.2*cm]
+        tabla = Table(filas, colWidths=anchos, repeatRows=1)
+        tabla.setStyle(TableStyle([
+            ("BACKGROUND",    (0, 0), (-1, 0), colors.HexColor("#2c3e50")),
+            ("TEXTCOLOR",     (0, 0), (-1, 0), colors.white),
+            ("FONTNAME",      (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("FONTSIZE",      (0, 0), (-1, 0), 9),
+            ("FONTSIZE",      (0, 1), (-1, -1), 8),
+            ("ROWBACKGROUNDS",(0, 1), (-1, -1), [colors.white, colors.HexColor("#f5f5f5")]),
+            ("GRID",          (0, 0), (-1, -1), 0.4, colors.HexColor("#cccccc")),
+            ("ALIGN",         (5, 0), (5, -1), "RIGHT"),
+            ("VALIGN",        (0, 0), (-1, -1), "MIDDLE"),
+            ("TOPPADDING",    (0, 0), (-1, -1), 3),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 3),
+        ]))
+        partes.append(tabla)
+
+    total = len(filas) - 1
+    partes.append(Spacer(1, 0.5*cm))
+    partes.append(Paragraph(
+        f"Total: <b>{total}</b> infracción{'es' if total != 1 else ''}",
+        estilos["Normal"],
+    ))
+
+    doc.build(partes)
+    return buffer.getvalue()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# XLSX de estadísticas de inspectores
+# ─────────────────────────────────────────────────────────────────────────────
+
+def generar_xlsx_estadisticas_inspectores(municipio, desde, hasta, inspector_sel=None):
+    """
+    Genera el .xlsx con la comparativa de inspectores del período (o solo
+    del inspector elegido). Retorna los bytes del archivo.
+    """
+    import io
+    import openpyxl
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from openpyxl.utils import get_column_letter
+
+    # ── Datos de comparativa ──────────────────────────────────────────────────
+    rango_q = Q(**filtro_fechas("verificacioninspector__fecha", desde, hasta))
+    rango_inf_q = Q(
+        **filtro_fechas("infraccion__creado_en", desde, hasta),
+        infraccion__municipio=municipio,
+    )
+    qs_inspectores = Usuario.objects.filter(
+        municipio=municipio, es_inspector=True
+    )
+    if inspector_sel:
+        qs_inspectores = qs_inspectores.filter(pk=inspector_sel.pk)
+
+    comparativa = qs_inspectores.order_by("first_name", "last_name").annotate(
+        total_verificaciones=Count("verificacioninspector", filter=rango_q),
+        total_infracciones=Count(
+            "infraccion",
+            filter=rango_inf_q & ~Q(infraccion__estado="anulada"),
+        ),
+        infracciones_anuladas=Count(
+            "infraccion",
+            filter=rango_inf_q & Q(infraccion__estado="anulada"),
+        ),
+    )
+
+    # ── Armar el Excel ────────────────────────────────────────────────────────
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Estadísticas inspectores"
+
+    # Estilo de encabezado
+    COLOR_HEADER = "1a4d6e"  # azul oscuro
+    estilo_header = Font(bold=True, color="FFFFFF")
+    relleno_header = PatternFill("solid", fgColor=COLOR_HEADER)
+    centrado = Alignment(horizontal="center")
+
+    # ── Título del reporte ────────────────────────────────────────────────────
+    ws.merge_cells("A1:F1")
+    celda_titulo = ws["A1"]
+    celda_titulo.value = f"Estadísticas de inspectores — {municipio.nombre}"
+    celda_titulo.font = Font(bold=True, size=13)
+    celda_titulo.alignment = centrado
+
+    ws.merge_cells("A2:F2")
+    celda_periodo = ws["A2"]
+    celda_periodo.value = f"Período: {desde.strftime('%d/%m/%Y')} al {hasta.strftime('%d/%m/%Y')}"
+    celda_periodo.alignment = centrado
+
+    ws.append([])  # fila vacía
+
+    # ── Encabezados de la tabla ───────────────────────────────────────────────
+    encabezados = [
+        "Inspector",
+        "Verificaciones",
+        "Infracciones",
+        "Anuladas",
+        "Tasa infracción (%)",
+        "Efectividad (%)",
+    ]
+    ws.append(encabezados)
+    fila_header = ws.max_row
+    for col_idx, _ in enumerate(encabezados, start=1):
+        celda = ws.cell(row=fila_header, column=col_idx)
+        celda.font = estilo_header
+        celda.fill = relleno_header
+        celda.alignment = centrado
+
+    # ── Filas de datos ────────────────────────────────────────────────────────
+    for insp in comparativa:
+        nombre_completo = f"{insp.first_name} {insp.last_name}".strip() or insp.correo
+        verif = insp.total_verificaciones
+        inf   = insp.total_infracciones
+        anul  = insp.infracciones_anuladas
+        # tasa = infracciones / verificaciones (cuántas verificaciones terminaron en infracción)
+        tasa = round(inf / verif * 100, 1) if verif else 0
+        # efectividad = (inf - anuladas) / inf (de las que labró, cuántas sobrevivieron)
+        efectividad = round((inf - anul) / inf * 100, 1) if inf else 0
+        ws.append([nombre_completo, verif, inf, anul, tasa, efectividad])
+
+    # ── Fila de totales ───────────────────────────────────────────────────────
+    total_verif = sum(i.total_verificaciones for i in comparativa)
+    total_inf   = sum(i.total_infracciones   for i in comparativa)
+    total_anul  = sum(i.infracciones_anuladas for i in comparativa)
+    tasa_total  = round(total_inf / total_verif * 100, 1) if total_verif else 0
+
+    ws.append([])  # separador
+    fila_totales = ["TOTAL", total_verif, total_inf, total_anul, tasa_total, ""]
+    ws.append(fila_totales)
+    fila_tot_idx = ws.max_row
+    for col_idx in range(1, 7):
+        celda = ws.cell(row=fila_tot_idx, column=col_idx)
+        celda.font = Font(bold=True)
+
+    # ── Ancho de columnas ─────────────────────────────────────────────────────
+    anchos = [30, 16, 14, 12, 20, 18]
+    for i, ancho in enumerate(anchos, start=1):
+        ws.column_dimensions[get_column_letter(i)].width = ancho
+
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PDF de rendición
+# ─────────────────────────────────────────────────────────────────────────────
+
+def generar_pdf_rendicion(rendicion):
+    """
+    Genera el PDF de una rendición para tesorería.
+
+    Incluye:
+    - Encabezado: municipio, período, admin, estado
+    - Resumen: efectivo / digital / neto
+    - Tabla de detalle: un fila por CierreCaja incluido en la rendición
+    - Pie: fecha de generación + notas del tesorero si las hay
+
+    Retorna bytes del PDF listos para HttpResponse.
+    """
+    import io
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate, Spacer, Table, TableStyle, Paragraph, HRFlowable
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=A4,
+        rightMargin=2*cm, leftMargin=2*cm,
+        topMargin=2*cm, bottomMargin=2*cm,
+    )
+
+    estilos = getSampleStyleSheet()
+    estilo_titulo = ParagraphStyle(
+        "titulo", parent=estilos["Title"], fontSize=14, alignment=TA_CENTER, spaceAfter=4,
+    )
+    estilo_sub = ParagraphStyle(
+        "sub", parent=estilos["Normal"], fontSize=9,
+        textColor=colors.HexColor("#555555"), alignment=TA_CENTER, spaceAfter=2,
+    )
+    estilo_seccion = ParagraphStyle(
+        "seccion", parent=estilos["Normal"], fontSize=10,
+        textColor=colors.HexColor("#2c3e50"), fontName="Helvetica-Bold", spaceBefore=10, spaceAfter=4,
+    )
+    estilo_pie = ParagraphStyle(
+        "pie", parent=estilos["Normal"], fontSize=8,
+        textColor=colors.HexColor("#888888"), alignment=TA_CENTER,
+    )
+    estilo_notas = ParagraphStyle(
+        "notas", parent=estilos["Normal"], fontSize=9,
+        textColor=colors.HexColor("#664d03"),
+        backColor=colors.HexColor("#fff3cd"),
+        borderPadding=(4, 8, 4, 8),
+    )
+
+    municipio_nombre = rendicion.municipio.nombre if rendicion.municipio else "Municipio"
+    admin_nombre = rendicion.admin.nombre_completo() if rendicion.admin else "—"
+    generado_en = timezone.localtime().strftime("%d/%m/%Y %H:%M")
+
+    # Estado con color de texto (no hay color en PDF inline, usamos texto)
+    estado_texto = {
+        "pendiente": "Pendiente de validación",
+        "validada":  "Validada por tesorería",
+        "observada": "Con observaciones",
+    }.get(rendicion.estado, rendicion.estado)
+
+    partes = []
+
+    # ── Encabezado ──────────────────────────────────────────────────────────
+    partes.append(Paragraph(f"Rendición — {municipio_nombre}", estilo_titulo))
+    partes.append(Paragraph(
+        f"Período: {rendicion.fecha_desde.strftime('%d/%m/%Y')} al {rendicion.fecha_hasta.strftime('%d/%m/%Y')}"
+        f"&nbsp;|&nbsp; Admin: {admin_nombre}"
+        f"&nbsp;|&nbsp; Estado: {estado_texto}",
+        estilo_sub,
+    ))
+    partes.append(Paragraph(f"Generado: {generado_en}", estilo_sub))
+    partes.append(Spacer(1, 0.4*cm))
+    partes.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor("#2c3e50")))
+    partes.append(Spacer(1, 0.4*cm))
+
+    # ── Resumen de totales ───────────────────────────────────────────────────
+    partes.append(Paragraph("Resumen de totales", estilo_seccion))
+    resumen_data = [
+        ["Concepto", "Monto"],
+        ["Efectivo", f"${rendicion.total_efectivo:,.2f}"],
+        ["Digital (transferencia + débito/crédito/QR)", f"${rendicion.total_digital:,.2f}"],
+        ["Total neto a rendir", f"${rendicion.total_neto:,.2f}"],
+    ]
+    tabla_resumen = Table(resumen_data, colWidths=[12*cm, 4*cm])
+    tabla_resumen.setStyle(TableStyle([
+        ("BACKGROUND",    (0, 0), (-1, 0), colors.HexColor("#2c3e50")),
+        ("TEXTCOLOR",     (0, 0), (-1, 0), colors.white),
+        ("FONTNAME",      (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE",      (0, 0), (-1, -1), 9),
+        ("ROWBACKGROUNDS",(0, 1), (-1, -2), [colors.white, colors.HexColor("#f5f5f5")]),
+        # Fila de total neto en negrita con fondo destacado
+        ("BACKGROUND",    (0, 3), (-1, 3), colors.HexColor("#e8f5e9")),
+        ("FONTNAME",      (0, 3), (-1, 3), "Helvetica-Bold"),
+        ("GRID",          (0, 0), (-1, -1), 0.4, colors.HexColor("#cccccc")),
+        ("ALIGN",         (1, 0), (1, -1), "RIGHT"),
+        ("TOPPADDING",    (0, 0), (-1, -1), 4),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
+        ("LEFTPADDING",   (0, 0), (-1, -1), 8),
+    ]))
+    partes.append(tabla_resumen)
+    partes.append(Spacer(1, 0.5*cm))
+
+    # ── Detalle de cierres incluidos ─────────────────────────────────────────
+    cierres = list(
+        rendicion.cierres.select_related("usuario", "certificado_por").order_by("fecha_cierre")
+    )
+
+    if cierres:
+        partes.append(Paragraph(f"Cierres de caja incluidos ({len(cierres)})", estilo_seccion))
+
+        encabezado = ["Usuario", "Fecha cierre", "Período", "Efectivo", "Transferencia", "Digital", "Total"]
+        filas = [encabezado]
+
+        for cierre in cierres:
+            filas.append([
+                cierre.usuario.nombre_completo() if cierre.usuario else "—",
+                timezone.localtime(cierre.fecha_cierre).strftime("%d/%m/%Y"),
+                cierre.get_periodo_display() if cierre.periodo else "—",
+                f"${cierre.total_efectivo:,.0f}",
+                f"${cierre.total_transferencia:,.0f}",
+                f"${cierre.total_digital:,.0f}",
+                f"${cierre.total_cobrado:,.0f}",
+            ])
+
+        anchos = [4.2*cm, 2.2*cm, 1.8*cm, 2.0*cm, 2.5*cm, 1.8*cm, 2.0*cm]
+        tabla_cierres = Table(filas, colWidths=anchos, repeatRows=1)
+        tabla_cierres.setStyle(TableStyle([
+            ("BACKGROUND",    (0, 0), (-1, 0), colors.HexColor("#2c3e50")),
+            ("TEXTCOLOR",     (0, 0), (-1, 0), colors.white),
+            ("FONTNAME",      (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("FONTSIZE",      (0, 0), (-1, 0), 8),
+            ("FONTSIZE",      (0, 1), (-1, -1), 7.5),
+            ("ROWBACKGROUNDS",(0, 1), (-1, -1), [colors.white, colors.HexColor("#f5f5f5")]),
+            ("GRID",          (0, 0), (-1, -1), 0.4, colors.HexColor("#cccccc")),
+            ("ALIGN",         (3, 0), (-1, -1), "RIGHT"),
+            ("VALIGN",        (0, 0), (-1, -1), "MIDDLE"),
+            ("TOPPADDING",    (0, 0), (-1, -1), 3),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 3),
+            ("LEFTPADDING",   (0, 0), (-1, -1), 5),
+        ]))
+        partes.append(tabla_cierres)
+    else:
+        partes.append(Paragraph("Sin cierres de caja vinculados.", estilos["Normal"]))
+
+    # ── Validación de tesorería ──────────────────────────────────────────────
+    if rendicion.tesorero and rendicion.validado_en:
+        partes.append(Spacer(1, 0.5*cm))
+        partes.append(Paragraph("Validación de tesorería", estilo_seccion))
+        validado_en = timezone.localtime(rendicion.validado_en).strftime("%d/%m/%Y %H:%M")
+        partes.append(Paragraph(
+            f"Validada por: <b>{rendicion.tesorero.nombre_completo()}</b> el {validado_en}",
+            estilos["Normal"],
+        ))
+
+    if rendicion.notas_tesorero:
+        partes.append(Spacer(1, 0.3*cm))
+        partes.append(Paragraph(f"Observaciones: {rendicion.notas_tesorero}", estilo_notas))
+
+    # ── Pie ──────────────────────────────────────────────────────────────────
+    partes.append(Spacer(1, 1*cm))
+    partes.append(HRFlowable(width="100%", thickness=0.5, color=colors.HexColor("#cccccc")))
+    partes.append(Spacer(1, 0.2*cm))
+    partes.append(Paragraph(
+        "Documento generado automáticamente por el Sistema de Estacionamiento Medido Municipal.",
+        estilo_pie,
+    ))
+
+    doc.build(partes)
+    buffer.seek(0)
+    return buffer.read()
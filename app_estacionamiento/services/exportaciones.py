@@ -0,0 +1,181 @@
+# app_estacionamiento/services/exportaciones.py
+"""
+Exportaciones grandes (CSV / XLSX) con memoria acotada.
+
+Las exportaciones "de siempre" (estadisticas_inspectores_excel, etc.) arman
+el Workbook entero en memoria y lo devuelven con HttpResponse: alcanza para
+un resumen, no para el historial completo de caja de un municipio.
+
+Acá:
+- CSV: StreamingHttpResponse que va escribiendo fila por fila a medida que
+  el queryset se lee con .iterator(chunk_size=...). Nunca está el archivo
+  entero en memoria.
+- XLSX: openpyxl en modo write_only (las filas van a un archivo temporal,
+  no a objetos Cell en memoria) y el .xlsx terminado se manda con
+  FileResponse, que lo lee del disco en bloques.
+
+Las filas se piden con values_list: sin instanciar modelos. Los
+generadores de filas de cada listado (filas_infracciones,
+filas_estacionamientos acá; filas_movimientos_caja en services/caja.py)
+reciben el queryset ya filtrado por la vista de la lista, así la
+exportación trae exactamente lo que el admin está viendo.
+"""
+
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from app_estacionamiento.models import Estado, Infraccion
+
+# Filas que trae la base por vuelta del cursor
+CHUNK_EXPORTACION = 2000
+
+CONTENT_TYPE_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve lo escrito en vez de guardarlo."""
+
+    def write(self, valor):
+        return valor
+
+
+def _filas_csv(encabezados, filas):
+    escritor = csv.writer(_Eco())
+    # BOM: Excel abre el CSV en UTF-8 (acentos y ñ) sin pasar por el asistente
+    yield "\ufeff" + escritor.writerow(encabezados)
+    for fila in filas:
+        yield escritor.writerow(fila)
+
+
+def respuesta_csv(nombre_archivo, encabezados, filas):
+    """StreamingHttpResponse con un CSV; `filas` es un iterable (idealmente perezoso)."""
+    respuesta = StreamingHttpResponse(
+        _filas_csv(encabezados, filas), content_type="text/csv; charset=utf-8",
+    )
+    respuesta["Content-Disposition"] = f'attachment; filename="{nombre_archivo}"'
+    return respuesta
+
+
+def respuesta_xlsx(nombre_archivo, encabezados, filas, titulo_hoja="Datos"):
+    """
+    FileResponse con un .xlsx armado en modo write_only.
+
+    El archivo temporal se borra solo cuando la respuesta lo cierra.
+    """
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title=titulo_hoja[:31])
+    negrita = Font(bold=True)
+    fila_encabezado = []
+    for texto in encabezados:
+        celda = WriteOnlyCell(ws, value=texto)
+        celda.font = negrita
+        fila_encabezado.append(celda)
+    ws.append(fila_encabezado)
+    for fila in filas:
+        ws.append(list(fila))
+
+    archivo = tempfile.TemporaryFile(suffix=".xlsx")
+    wb.save(archivo)
+    archivo.seek(0)
+    return FileResponse(
+        archivo, as_attachment=True, filename=nombre_archivo, content_type=CONTENT_TYPE_XLSX,
+    )
+
+
+def respuesta_exportacion(formato, nombre_base, encabezados, filas, titulo_hoja="Datos"):
+    """respuesta_xlsx si formato == "xlsx"; si no, respuesta_csv (el default)."""
+    if formato == "xlsx":
+        return respuesta_xlsx(f"{nombre_base}.xlsx", encabezados, filas, titulo_hoja)
+    return respuesta_csv(f"{nombre_base}.csv", encabezados, filas)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Filas de cada exportación
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _fecha_hora(valor):
+    return timezone.localtime(valor).strftime("%d/%m/%Y %H:%M") if valor else ""
+
+
+def _persona(nombre, apellido, correo):
+    return f"{nombre or ''} {apellido or ''}".strip() or correo or ""
+
+
+def _ubicacion(calle, altura):
+    if not calle:
+        return ""
+    return calle if not altura else f"{calle} {altura}"
+
+
+ENCABEZADOS_INFRACCIONES = [
+    "N° acta", "Fecha", "Patente", "Inspector", "Subcuadra", "Motivo", "Monto", "Estado",
+    "Fecha de pago", "Motivo de anulación",
+]
+
+
+def filas_infracciones(queryset, chunk_size=None):
+    """Filas de ENCABEZADOS_INFRACCIONES, de la más vieja a la más nueva."""
+    estados = dict(Infraccion._meta.get_field("estado").choices)
+    filas = (
+        queryset.order_by("creado_en", "id")
+        .values_list(
+            "id", "creado_en", "vehiculo__patente",
+            "inspector__first_name", "inspector__last_name", "inspector__correo",
+            "subcuadra__calle", "subcuadra__altura",
+            "motivo", "monto", "estado", "fecha_pago", "motivo_anulacion",
+        )
+        .iterator(chunk_size=chunk_size or CHUNK_EXPORTACION)
+    )
+    for (id_, creado_en, patente, nombre, apellido, correo, calle, altura,
+         motivo, monto, estado, fecha_pago, motivo_anulacion) in filas:
+        yield [
+            id_,
+            _fecha_hora(creado_en),
+            patente or "",
+            _persona(nombre, apellido, correo),
+            _ubicacion(calle, altura),
+            motivo or "",
+            monto,
+            estados.get(estado, estado),
+            _fecha_hora(fecha_pago),
+            motivo_anulacion or "",
+        ]
+
+
+ENCABEZADOS_ESTACIONAMIENTOS = [
+    "Inicio", "Fin", "Patente", "Subcuadra", "Registrado por", "Horas", "Costo", "Costo final", "Estado",
+]
+
+
+def filas_estacionamientos(queryset, chunk_size=None):
+    """Filas de ENCABEZADOS_ESTACIONAMIENTOS, del más viejo al más nuevo."""
+    estados = dict(Estado.choices)
+    filas = (
+        queryset.order_by("hora_inicio", "id")
+        .values_list(
+            "hora_inicio", "hora_fin", "vehiculo__patente", "subcuadra__calle", "subcuadra__altura",
+            "usuario__first_name", "usuario__last_name", "usuario__correo",
+            "duracion_horas", "costo_base", "costo_final", "estado",
+        )
+        .iterator(chunk_size=chunk_size or CHUNK_EXPORTACION)
+    )
+    for (inicio, fin, patente, calle, altura, nombre, apellido, correo,
+         horas, costo, costo_final, estado) in filas:
+        yield [
+            _fecha_hora(inicio),
+            _fecha_hora(fin),
+            patente or "",
+            _ubicacion(calle, altura),
+            _persona(nombre, apellido, correo),
+            horas,
+            costo,
+            costo_final if costo_final is not None else "",
+            estados.get(estado, estado),
+        ]
@@ -0,0 +1,67 @@
+# app_estacionamiento/services/fechas.py
+"""
+Filtros por fecha local sobre columnas DateTimeField, sin __date.
+
+`creado_en__date=hoy` se traduce a un cast de la columna a fecha en la zona
+del proyecto (en PostgreSQL: (creado_en AT TIME ZONE ...)::date = ...). Con
+la columna envuelta en una función los índices B-tree sobre creado_en no
+sirven y la base recorre todas las filas del filtro anterior.
+
+Acá el rango de fechas locales se pasa a un rango semiabierto de datetimes
+con zona horaria:
+
+    desde..hasta (inclusive)  →  campo >= 00:00 de desde  AND  campo < 00:00 de hasta+1
+
+que el planner resuelve con el índice (…, campo). Mismo resultado que
+__date__gte/__date__lte, también en los días de cambio de horario.
+"""
+
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def a_fecha(valor):
+    """date desde un date o un string AAAA-MM-DD; None si viene vacío o inválido."""
+    if not valor:
+        return None
+    if isinstance(valor, datetime):
+        return timezone.localdate(valor) if timezone.is_aware(valor) else valor.date()
+    if isinstance(valor, date):
+        return valor
+    try:
+        return date.fromisoformat(str(valor).strip())
+    except ValueError:
+        return None
+
+
+def inicio_dia(fecha):
+    """00:00 (hora local) de `fecha`, con zona horaria."""
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def rango_fechas(desde=None, hasta=None):
+    """
+    (inicio, fin) semiabierto para las fechas locales desde..hasta inclusive.
+    Cualquiera de los dos extremos puede ser None (sin límite).
+    """
+    desde, hasta = a_fecha(desde), a_fecha(hasta)
+    inicio = inicio_dia(desde) if desde else None
+    fin    = inicio_dia(hasta + timedelta(days=1)) if hasta else None
+    return inicio, fin
+
+
+def filtro_fechas(campo, desde=None, hasta=None):
+    """
+    kwargs para .filter()/Q() equivalentes a campo__date__gte=desde y
+    campo__date__lte=hasta, pero usables por un índice sobre `campo`.
+
+        Infraccion.objects.filter(municipio=m, **filtro_fechas("creado_en", hoy, hoy))
+    """
+    inicio, fin = rango_fechas(desde, hasta)
+    filtro = {}
+    if inicio:
+        filtro[f"{campo}__gte"] = inicio
+    if fin:
+        filtro[f"{campo}__lt"] = fin
+    return filtro
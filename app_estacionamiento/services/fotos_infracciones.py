@@ -0,0 +1,139 @@
+# app_estacionamiento/services/fotos_infracciones.py
+"""
+Procesamiento en segundo plano de las fotos de infracciones.
+
+Antes crear_infraccion abría la foto con Pillow, dibujaba la marca de agua
+GPS y re-codificaba el JPEG dentro del request del inspector (varios
+segundos con fotos de 12 MP en el servidor de Railway).
+
+Con INFRACCIONES_FOTO_ASINCRONA el acta se guarda en el momento con la foto
+cruda y foto_estado="pendiente". Este módulo (lo corre el comando
+`python manage.py procesar_fotos_infracciones`) toma cada pendiente, le
+pone la marca de agua con los datos guardados en el acta (GPS, patente,
+inspector, subcuadra, hora de creación), re-codifica sin EXIF y reemplaza
+el archivo:
+
+    pendiente ──► procesando ──► lista
+                      │
+                      └────────► error   (queda la foto original)
+
+- Tomar la fila es un UPDATE condicional: dos workers no procesan la misma.
+- Una fila "procesando" hace más de PROCESANDO_VENCE_MINUTOS (worker caído
+  en el medio) se vuelve a tomar.
+- El reemplazo también es condicional (misma foto, misma toma): si alguien
+  cambió la foto mientras tanto, se descarta el archivo nuevo.
+- El ticket y el PDF del juzgado miran Infraccion.foto_lista /
+  foto_en_proceso para no mostrar la foto sin marca como definitiva.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from app_estacionamiento.models import Infraccion
+from app_estacionamiento.services.infracciones import _agregar_marca_de_agua_gps
+
+logger = logging.getLogger(__name__)
+
+# Fotos por pasada del worker
+LOTE_FOTOS = 20
+
+# Tiempo tras el cual una foto "procesando" se considera abandonada
+PROCESANDO_VENCE_MINUTOS = 10
+
+
+def _por_procesar(ahora):
+    """Filtro: pendientes, o procesando desde hace demasiado (worker caído)."""
+    vencido = ahora - timedelta(minutes=PROCESANDO_VENCE_MINUTOS)
+    return Q(foto_estado=Infraccion.FOTO_PENDIENTE) | Q(
+        foto_estado=Infraccion.FOTO_PROCESANDO, foto_estado_desde__lt=vencido,
+    )
+
+
+def _tomar(infraccion_id, ahora):
+    """UPDATE condicional a "procesando". True si este proceso se quedó con la fila."""
+    return Infraccion.objects.filter(_por_procesar(ahora), id=infraccion_id).update(
+        foto_estado=Infraccion.FOTO_PROCESANDO,
+        foto_estado_desde=ahora,
+    ) == 1
+
+
+def procesar_foto(infraccion_id):
+    """
+    Marca de agua + EXIF + reemplazo de la foto de una infracción.
+
+    Retorna True si la foto quedó "lista". Si la fila no estaba pendiente
+    (u otro worker la tomó) retorna False sin tocar nada. Si Pillow o el
+    storage fallan, la deja en "error" con la foto original.
+    """
+    tomada = timezone.now()
+    if not _tomar(infraccion_id, tomada):
+        return False
+
+    infraccion = (
+        Infraccion.objects
+        .select_related("vehiculo", "inspector", "subcuadra")
+        .get(id=infraccion_id)
+    )
+    original = infraccion.foto.name
+    storage  = infraccion.foto.storage
+    nuevo = None
+    try:
+        if not original:
+            raise ValueError("la infracción no tiene foto")
+        with storage.open(original, "rb") as cruda:
+            final = _agregar_marca_de_agua_gps(
+                foto=cruda,
+                lat=infraccion.gps_lat, lon=infraccion.gps_lon, acc=infraccion.gps_acc,
+                patente=infraccion.vehiculo.patente,
+                inspector=infraccion.inspector,
+                subcuadra=infraccion.subcuadra,
+                fecha=infraccion.creado_en,
+            )
+            if final is cruda:
+                # El helper devuelve la foto original cuando Pillow falla
+                raise ValueError("no se pudo agregar la marca de agua")
+        nuevo = storage.save(
+            infraccion.foto.field.generate_filename(infraccion, final.name), final,
+        )
+    except Exception as e:
+        logger.warning("Foto de infracción #%s sin procesar: %s", infraccion_id, e)
+        Infraccion.objects.filter(
+            id=infraccion_id, foto_estado=Infraccion.FOTO_PROCESANDO, foto_estado_desde=tomada,
+        ).update(foto_estado=Infraccion.FOTO_ERROR, foto_estado_desde=timezone.now())
+        return False
+
+    reemplazada = Infraccion.objects.filter(
+        id=infraccion_id,
+        foto=original,
+        foto_estado=Infraccion.FOTO_PROCESANDO,
+        foto_estado_desde=tomada,
+    ).update(foto=nuevo, foto_estado=Infraccion.FOTO_LISTA, foto_estado_desde=timezone.now())
+
+    # Si no se reemplazó (la foto cambió o otro worker la retomó) el que sobra es el nuevo
+    sobrante = original if reemplazada else nuevo
+    try:
+        storage.delete(sobrante)
+    except Exception as e:
+        logger.warning("No se pudo borrar la foto %s: %s", sobrante, e)
+    return bool(reemplazada)
+
+
+def procesar_fotos_pendientes(limite=LOTE_FOTOS):
+    """
+    Procesa hasta `limite` fotos pendientes, de la más vieja a la más nueva.
+
+    Retorna dict con la cantidad de fotos listas y con error en esta pasada.
+    """
+    ids = list(
+        Infraccion.objects.filter(_por_procesar(timezone.now()))
+        .order_by("id")
+        .values_list("id", flat=True)[:limite]
+    )
+    listas = sum(1 for infraccion_id in ids if procesar_foto(infraccion_id))
+    errores = Infraccion.objects.filter(
+        id__in=ids, foto_estado=Infraccion.FOTO_ERROR,
+    ).count() if ids else 0
+    return {"listas": listas, "errores": errores}
@@ -6,25 +6,158 @@ Responsabilidades:
 - Verificar si el municipio permite estacionar en el momento actual
 - Calcular las opciones de duración disponibles según el horario y saldo
 - Cerrar estacionamientos activos cuando venció el horario del día
+- Precompilar el calendario de cobro de cada municipio (CalendarioCobro)
 
 Estas funciones manejan reglas de negocio del municipio (no son helpers puros de DB).
 Antes vivían en utils.py.
 """
 
-from datetime import timedelta
+from datetime import datetime, timedelta
 from decimal import Decimal
 
+from django.core.cache import cache
 from django.utils import timezone
 
 from app_estacionamiento.models import (
     DiaEspecial,
-    Estacionamiento,
     HorarioEstacionamiento,
 )
 
 
 TARIFA_HORA_FALLBACK = Decimal("100")
 
+# Cuántos días hacia adelante se precargan los días especiales del calendario.
+DIAS_ESPECIALES_ADELANTE = 30
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Calendario de cobro precompilado
+# ─────────────────────────────────────────────────────────────────────────────
+
+class CalendarioCobro:
+    """
+    Horario de cobro de un municipio listo para consultar sin tocar la base.
+
+    Contiene las 7 ventanas semanales (None si ese día no hay horario activo)
+    y los días especiales desde `desde` hasta `hasta` inclusive. Cada consulta
+    es un acceso por índice o por clave de dict.
+
+    Se arma con 2 queries en construir() y se guarda en caché por municipio
+    (ver obtener_calendario); las señales de HorarioEstacionamiento y
+    DiaEspecial lo invalidan cuando el admin edita los horarios.
+    """
+
+    def __init__(self, ventanas, especiales, desde, hasta):
+        self.ventanas   = ventanas      # tupla de 7: (hora_inicio, hora_fin) | None
+        self.especiales = especiales    # {fecha: (cobro_activo, descripcion)}
+        self.desde      = desde
+        self.hasta      = hasta
+
+    @classmethod
+    def construir(cls, municipio, desde=None, dias=DIAS_ESPECIALES_ADELANTE):
+        desde = desde or timezone.localdate()
+        hasta = desde + timedelta(days=dias)
+
+        ventanas = [None] * 7
+        for horario in HorarioEstacionamiento.objects.filter(municipio=municipio, activo=True):
+            ventanas[horario.dia_semana] = (horario.hora_inicio, horario.hora_fin)
+
+        especiales = {
+            fecha: (cobro_activo, descripcion)
+            for fecha, cobro_activo, descripcion in DiaEspecial.objects.filter(
+                municipio=municipio, fecha__gte=desde, fecha__lte=hasta,
+            ).values_list("fecha", "cobro_activo", "descripcion")
+        }
+        return cls(tuple(ventanas), especiales, desde, hasta)
+
+    def cubre(self, fecha):
+        """True si los días especiales de `fecha` están precargados."""
+        return self.desde <= fecha <= self.hasta
+
+    def ventana(self, fecha):
+        """(hora_inicio, hora_fin) del horario semanal de ese día, o None."""
+        return self.ventanas[fecha.weekday()]
+
+    def cobro_activo(self, momento):
+        """
+        ¿Se cobra estacionamiento en `momento` (datetime local)?
+
+        Retorna (permitido: bool, mensaje_error: str | None), igual que
+        puede_estacionar_ahora. Un día especial sin cobro anula el horario
+        semanal; sin horario configurado ese día se permite todo el día.
+        """
+        especial = self.especiales.get(momento.date())
+        if especial and not especial[0]:
+            return (
+                False,
+                f"Hoy es {especial[1]}. No hay cobro de estacionamiento.",
+            )
+
+        ventana = self.ventana(momento.date())
+        if ventana is None:
+            return (True, None)
+
+        hora_inicio, hora_fin = ventana
+        hora_actual = momento.time()
+        if hora_actual < hora_inicio or hora_actual > hora_fin:
+            return (
+                False,
+                (
+                    f"El estacionamiento está habilitado de "
+                    f"{hora_inicio.strftime('%H:%M')} a "
+                    f"{hora_fin.strftime('%H:%M')}. "
+                    f"Actualmente son las {hora_actual.strftime('%H:%M')}."
+                ),
+            )
+        return (True, None)
+
+    def cierre(self, fecha):
+        """Datetime aware del cierre del horario semanal de `fecha`, o None."""
+        ventana = self.ventana(fecha)
+        if ventana is None:
+            return None
+        return timezone.make_aware(
+            datetime.combine(fecha, ventana[1]), timezone.get_current_timezone(),
+        )
+
+    def minutos_hasta_cierre(self, momento):
+        """
+        Minutos enteros desde `momento` hasta el cierre de ese día
+        (negativo si ya cerró). None si ese día no tiene horario.
+        """
+        cierre = self.cierre(momento.date())
+        if cierre is None:
+            return None
+        return int((cierre - momento).total_seconds() / 60)
+
+    def paso_el_cierre(self, momento):
+        """True si ese día tiene horario y `momento` es posterior al cierre."""
+        ventana = self.ventana(momento.date())
+        return ventana is not None and momento.time() > ventana[1]
+
+
+def _clave_calendario(municipio_id):
+    return f"calendario_cobro_{municipio_id}"
+
+
+def obtener_calendario(municipio):
+    """
+    CalendarioCobro del municipio desde caché; lo arma si no está o si ya no
+    cubre el día de hoy (pasaron más de DIAS_ESPECIALES_ADELANTE días).
+    """
+    clave      = _clave_calendario(municipio.id)
+    hoy        = timezone.localdate()
+    calendario = cache.get(clave)
+    if calendario is None or not calendario.cubre(hoy):
+        calendario = CalendarioCobro.construir(municipio, desde=hoy)
+        cache.set(clave, calendario, timeout=24 * 3600)
+    return calendario
+
+
+def invalidar_calendario(municipio_id):
+    """Descarta el calendario cacheado (lo llaman las señales de horarios)."""
+    cache.delete(_clave_calendario(municipio_id))
+
 
 def obtener_tarifa_hora(tarifa_obj, vehiculo, fallback=None):
     """
@@ -52,64 +185,15 @@ def puede_estacionar_ahora(municipio):
     Verifica si el horario del municipio permite estacionar en este momento.
     Tiene en cuenta días especiales (feriados) y el horario semanal configurado.
 
-    Usa caché de 1 hora para evitar queries repetidas en cada verificación.
+    Consulta el CalendarioCobro cacheado: sin queries mientras no cambie el
+    horario, y sin quedar desactualizado hasta una hora después de editarlo.
 
     Retorna:
         (permitido: bool, mensaje_error: str | None)
         Si permitido es True, mensaje_error es None.
         Si permitido es False, mensaje_error explica por qué.
     """
-    from django.core.cache import cache
-
-    ahora       = timezone.localtime()
-    hoy_fecha   = ahora.date()
-    hoy_dia     = ahora.weekday()   # 0=Lunes … 6=Domingo
-    hora_actual = ahora.time()
-
-    cache_key        = f"puede_estacionar_{municipio.id}_{hoy_fecha}_{ahora.hour}"
-    resultado_cached = cache.get(cache_key)
-    if resultado_cached is not None:
-        return resultado_cached
-
-    # Día especial sin cobro → no se cobra estacionamiento
-    dia_especial = DiaEspecial.objects.filter(
-        municipio=municipio, fecha=hoy_fecha
-    ).first()
-    if dia_especial and not dia_especial.cobro_activo:
-        resultado = (
-            False,
-            f"Hoy es {dia_especial.descripcion}. No hay cobro de estacionamiento.",
-        )
-        cache.set(cache_key, resultado, timeout=3600)
-        return resultado
-
-    # Horario semanal para el día actual
-    horario = HorarioEstacionamiento.objects.filter(
-        municipio=municipio, dia_semana=hoy_dia, activo=True
-    ).first()
-
-    if horario is None:
-        # Sin horario configurado → libre de cobro todo el día
-        resultado = (True, None)
-        cache.set(cache_key, resultado, timeout=3600)
-        return resultado
-
-    if hora_actual < horario.hora_inicio or hora_actual > horario.hora_fin:
-        resultado = (
-            False,
-            (
-                f"El estacionamiento está habilitado de "
-                f"{horario.hora_inicio.strftime('%H:%M')} a "
-                f"{horario.hora_fin.strftime('%H:%M')}. "
-                f"Actualmente son las {hora_actual.strftime('%H:%M')}."
-            ),
-        )
-        cache.set(cache_key, resultado, timeout=3600)
-        return resultado
-
-    resultado = (True, None)
-    cache.set(cache_key, resultado, timeout=3600)
-    return resultado
+    return obtener_calendario(municipio).cobro_activo(timezone.localtime())
 
 
 def calcular_opciones_duracion(municipio, tarifa_hora, hora_inicio_est=None, duracion_actual_h=0):
@@ -127,27 +211,18 @@ def calcular_opciones_duracion(municipio, tarifa_hora, hora_inicio_est=None, dur
         Lista de dicts [{horas, label, costo}].
         Lista vacía si no queda tiempo disponible.
     """
-    from datetime import datetime as _dt
-
-    ahora   = timezone.localtime()
-    hoy_dia = ahora.weekday()
-
-    horario = HorarioEstacionamiento.objects.filter(
-        municipio=municipio, dia_semana=hoy_dia, activo=True
-    ).first()
+    ahora      = timezone.localtime()
+    calendario = obtener_calendario(municipio)
+    cierre     = calendario.cierre(ahora.date())
 
-    if horario:
-        cierre = timezone.make_aware(
-            _dt.combine(ahora.date(), horario.hora_fin),
-            timezone.get_current_timezone(),
-        )
+    if cierre:
         if hora_inicio_est:
             vencimiento_actual = hora_inicio_est + timedelta(hours=float(duracion_actual_h))
             if vencimiento_actual >= cierre:
                 return []
             minutos_disponibles = int((cierre - vencimiento_actual).total_seconds() / 60)
         else:
-            minutos_disponibles = int((cierre - ahora).total_seconds() / 60)
+            minutos_disponibles = calendario.minutos_hasta_cierre(ahora)
     else:
         # Sin horario configurado → permitimos hasta 8 horas como máximo
         minutos_disponibles = 8 * 60
@@ -175,8 +250,9 @@ def cerrar_estacionamientos_vencidos_por_horario(municipio):
     Cierra todos los estacionamientos activos del municipio
     si el horario de cobro ya terminó para el día de hoy.
 
-    Se llama en inicio_usuarios de forma reactiva (sin tarea periódica programada).
-    No hace nada si el horario sigue activo.
+    Se llama en inicio_usuarios de forma reactiva, como respaldo del barrido
+    periódico (manage.py barrer_estacionamientos). No hace nada si el horario
+    sigue activo. El cierre es por lotes: ver services/barrido.py.
 
     Usa caché para evitar dos problemas:
     1. Query a HorarioEstacionamiento en CADA visita al home de cualquier conductor.
@@ -184,36 +260,22 @@ def cerrar_estacionamientos_vencidos_por_horario(municipio):
        estacionamientos en paralelo (trabajo duplicado + race condition).
     El caché dura hasta las 05:00 del día siguiente para cubrir toda la noche.
     """
-    from django.core.cache import cache
-    from app_estacionamiento.use_cases.finalizar_estacionamiento import (
-        ejecutar as finalizar_estacionamiento_uc,
-    )
+    from app_estacionamiento.services.barrido import cerrar_municipio_por_horario
 
     ahora      = timezone.localtime()
     hoy_fecha  = ahora.date()
-    hoy_dia    = ahora.weekday()
-    hora_actual = ahora.time()
 
     # Si ya se procesó el cierre de hoy para este municipio, no repetir
     cache_key_cierre = f"cierre_horario_{municipio.id}_{hoy_fecha}"
     if cache.get(cache_key_cierre):
         return
 
-    horario = HorarioEstacionamiento.objects.filter(
-        municipio=municipio, dia_semana=hoy_dia, activo=True
-    ).first()
-
-    if horario and hora_actual > horario.hora_fin:
-        activos = Estacionamiento.objects.filter(
-            estado="ACTIVO",
-            subcuadra__municipio=municipio,
-        )
-        for est in activos:
-            finalizar_estacionamiento_uc(est)
+    if obtener_calendario(municipio).paso_el_cierre(ahora):
+        cerrar_municipio_por_horario(municipio, ahora)
 
         # Marcar el cierre como hecho: expira a las 05:00 del día siguiente
         # para que al día siguiente vuelva a correr normalmente.
-        from datetime import datetime, time as _time
+        from datetime import time as _time
         dia_siguiente = ahora.date() + timedelta(days=1)
         proximas_5am  = timezone.make_aware(
             datetime.combine(dia_siguiente, _time(5, 0)),
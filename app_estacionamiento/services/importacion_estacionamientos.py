@@ -0,0 +1,495 @@
+# app_estacionamiento/services/importacion_estacionamientos.py
+"""
+Importación de estacionamientos activos desde el Excel del sistema anterior
+(TransactionInfo.xlsx) en segundo plano (TrabajoImportacion).
+
+Antes la vista abría el libro completo en memoria y por cada fila hacía un
+get_or_create de Vehiculo y de Subcuadra y un create de Estacionamiento:
+con las decenas de miles de filas de un municipio el request llegaba al
+timeout. Ahora:
+
+  1. solicitar_importacion() guarda el archivo en storage_archivos() (el
+     storage de media con Cloudinary solo acepta imágenes) y crea el
+     trabajo.
+  2. El worker (`python manage.py importar_estacionamientos --continuo`) lo
+     toma con un UPDATE condicional y lee la hoja con openpyxl en modo
+     read_only (streaming), de a LOTE_FILAS filas:
+
+       - valida cada fila en Python (patente, duración, cuadra, monto,
+         incluido que entren en sus columnas);
+       - junta las patentes y las cuadras distintas del lote, crea las que
+         faltan con bulk_create(ignore_conflicts=True) y arma el mapa
+         patente → id y (calle, altura) → id con una consulta cada una;
+       - resuelve teléfonos y estacionamientos activos con un __in cada uno;
+       - inserta los estacionamientos con un bulk_create.
+
+     Cada lote se confirma en su transacción junto con el avance del
+     trabajo (filas_procesadas, importados, omitidos, errores):
+
+         pendiente ──► procesando ──► listo
+                           │
+                           └────────► error  (se reintenta hasta MAX_INTENTOS,
+                                              desde la última fila confirmada)
+
+  3. La página del trabajo muestra el avance y las filas con error.
+
+Sin worker desplegado (IMPORTACION_EN_SEGUNDO_PLANO=False) el paso 2 lo
+hacen los requests: importar_en_el_request() importa lotes durante
+SEGUNDOS_POR_REQUEST como mucho y devuelve el trabajo a "pendiente"; la
+página de avance, que se recarga sola, sigue desde la última fila
+confirmada.
+
+Reglas por fila (las mismas de la importación anterior):
+  - hora_inicio = momento de la importación; duracion_horas = Hasta − Desde.
+  - usuario = el conductor con ese teléfono, si existe (no se toca saldo).
+  - subcuadra y vehículo se crean si no existen.
+  - una patente con un estacionamiento ACTIVO (en el sistema o más arriba en
+    el mismo archivo) se saltea y se informa.
+"""
+
+import logging
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from app_estacionamiento.models import (
+    Estacionamiento,
+    Subcuadra,
+    TrabajoImportacion,
+    Usuario,
+    Vehiculo,
+)
+from app_estacionamiento.services.indice_subcuadras import invalidar_indice_subcuadras
+from app_estacionamiento.utils import sanitizar_patente
+
+logger = logging.getLogger(__name__)
+
+# Filas del Excel por lote (una transacción y un puñado de consultas por lote)
+LOTE_FILAS = 1000
+
+# Trabajos por pasada del worker
+LOTE_TRABAJOS = 5
+
+# Un trabajo "procesando" sin confirmar un lote tras este tiempo se considera abandonado
+PROCESANDO_VENCE_MINUTOS = 10
+
+# Reintentos de un trabajo que terminó en error
+MAX_INTENTOS = 3
+
+# Sin worker: tiempo de importación por request (gunicorn corta a los 30 s)
+SEGUNDOS_POR_REQUEST = 15
+
+# Errores por fila que se guardan para mostrar (omitidos cuenta todos)
+MAX_ERRORES_GUARDADOS = 2000
+
+# Fila 1: título, fila 2: encabezados
+PRIMERA_FILA = 3
+
+# Domino, Hora de Transacción, Desde, Desde Ingresado, Hasta, Cuadra, Zona,
+# Interfaz, Inspector, Teléfono, Monto, Tarjeta, -, Local
+COLUMNAS = 14
+
+# Límites de las columnas: en PostgreSQL un valor que no entra aborta el lote
+# entero (DataError) y el reintento vuelve a chocar con la misma fila.
+_LARGO_PATENTE = Vehiculo._meta.get_field("patente").max_length
+_LARGO_CALLE   = Subcuadra._meta.get_field("calle").max_length
+_MAX_ALTURA    = 2**31 - 1
+
+
+def _tope_decimal(modelo, campo):
+    f = modelo._meta.get_field(campo)
+    return Decimal(10) ** (f.max_digits - f.decimal_places)
+
+
+_TOPE_DURACION = _tope_decimal(Estacionamiento, "duracion_horas")
+_TOPE_COSTO    = _tope_decimal(Estacionamiento, "costo_base")
+
+FilaImportada = namedtuple(
+    "FilaImportada", "fila patente duracion_horas telefono calle altura costo",
+)
+
+
+class _TrabajoPerdido(Exception):
+    """Otro worker retomó el trabajo mientras este importaba un lote."""
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Lectura de filas
+# ─────────────────────────────────────────────────────────────────────────────
+
+def parsear_cuadra(texto_cuadra):
+    """
+    Convierte el formato del Excel "16 750" en (calle, altura).
+
+    El Excel usa "CALLE ALTURA" donde CALLE puede tener espacios
+    (ej: "Av San Martín 350"). Tomamos todo excepto el último token
+    como calle, y el último token como altura entera.
+
+    Devuelve (calle: str, altura: int) o lanza ValueError si no se puede parsear.
+    """
+    partes = str(texto_cuadra).strip().split()
+    if len(partes) < 2:
+        raise ValueError(f"Formato de cuadra inválido: '{texto_cuadra}'")
+    try:
+        altura = int(partes[-1])
+    except ValueError:
+        raise ValueError(f"Altura no es un número en cuadra: '{texto_cuadra}'")
+    calle = " ".join(partes[:-1])
+    return calle, altura
+
+
+def leer_fila(num_fila, fila):
+    """
+    Valida una fila del Excel sin tocar la base. Retorna FilaImportada o
+    lanza ValueError con el motivo.
+    """
+    # En read_only openpyxl corta las celdas vacías del final si la hoja no
+    # declara su dimensión: se completan como lo haría la lectura normal.
+    if len(fila) > COLUMNAS:
+        raise ValueError(
+            f"Fila con {len(fila)} columnas (se esperan {COLUMNAS}) — verificar formato"
+        )
+    fila = tuple(fila) + (None,) * (COLUMNAS - len(fila))
+    (domino, _hora_tx, desde, _desde_ing, hasta,
+     cuadra, _zona, _interfaz, _inspector, telefono,
+     monto, _tarjeta, _col13, _local) = fila
+
+    patente = sanitizar_patente(str(domino or ""))
+    if not patente:
+        raise ValueError("Patente vacía o inválida")
+    if len(patente) > _LARGO_PATENTE:
+        raise ValueError(f"Patente de más de {_LARGO_PATENTE} caracteres: '{patente}'")
+
+    if not desde or not hasta:
+        raise ValueError("Faltan columnas Desde o Hasta")
+    if not hasattr(desde, "hour") or not hasattr(hasta, "hour"):
+        raise ValueError("Desde/Hasta no son fechas válidas")
+    duracion_segundos = (hasta - desde).total_seconds()
+    if duracion_segundos <= 0:
+        raise ValueError(f"Duración inválida: Desde={desde} Hasta={hasta}")
+    # Redondear a 1 decimal (ej: 3600s → 1.0h, 5400s → 1.5h)
+    duracion_horas = Decimal(str(round(duracion_segundos / 3600, 1)))
+    if duracion_horas >= _TOPE_DURACION:
+        raise ValueError(f"Duración demasiado larga: {duracion_horas} h")
+
+    tel_str = ""
+    if telefono:
+        tel_str = str(int(telefono)) if isinstance(telefono, float) else str(telefono).strip()
+
+    nombre_cuadra = str(cuadra).strip() if cuadra else ""
+    if not nombre_cuadra:
+        raise ValueError("Cuadra vacía")
+    calle, altura = parsear_cuadra(nombre_cuadra)
+    if len(calle) > _LARGO_CALLE:
+        raise ValueError(f"Calle de más de {_LARGO_CALLE} caracteres: '{nombre_cuadra}'")
+    if abs(altura) > _MAX_ALTURA:
+        raise ValueError(f"Altura fuera de rango en cuadra: '{nombre_cuadra}'")
+
+    try:
+        costo = Decimal(str(monto or 0))
+    except InvalidOperation:
+        costo = Decimal("0")
+    if not costo.is_finite() or abs(costo) >= _TOPE_COSTO:
+        raise ValueError(f"Monto fuera de rango: {monto}")
+
+    return FilaImportada(num_fila, patente, duracion_horas, tel_str, calle, altura, costo)
+
+
+def _error(num_fila, patente, motivo):
+    return {"fila": num_fila, "patente": str(patente or "—"), "error": str(motivo)}
+
+
+def _error_activo(fila):
+    return _error(
+        fila.fila, fila.patente,
+        f"Patente {fila.patente} ya tiene un estacionamiento ACTIVO en el sistema",
+    )
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Importación por lotes
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _ids_vehiculos(municipio, patentes):
+    """patente → id, creando los vehículos que faltan."""
+    ids = dict(Vehiculo.objects.filter(patente__in=patentes).values_list("patente", "id"))
+    faltan = [p for p in patentes if p not in ids]
+    if faltan:
+        # ignore_conflicts: otro proceso pudo crear la misma patente recién
+        Vehiculo.objects.bulk_create(
+            [Vehiculo(patente=p, municipio=municipio) for p in faltan], ignore_conflicts=True,
+        )
+        ids.update(Vehiculo.objects.filter(patente__in=faltan).values_list("patente", "id"))
+    return ids
+
+
+def _ids_subcuadras(municipio, claves):
+    """(calle, altura) → id, creando las subcuadras que faltan. Retorna (ids, creó_alguna)."""
+    calles = {calle for calle, _ in claves}
+
+    def consultar():
+        return {
+            (calle, altura): id_
+            for id_, calle, altura in Subcuadra.objects
+            .filter(municipio=municipio, calle__in=calles)
+            .values_list("id", "calle", "altura")
+        }
+
+    ids = consultar()
+    faltan = [clave for clave in claves if clave not in ids]
+    if faltan:
+        # Se crean con el nombre del Excel; el admin puede renombrarlas después
+        Subcuadra.objects.bulk_create(
+            [Subcuadra(municipio=municipio, calle=calle, altura=altura) for calle, altura in faltan],
+            ignore_conflicts=True,
+        )
+        ids = consultar()
+    return ids, bool(faltan)
+
+
+def _ids_usuarios(telefonos):
+    """teléfono → id del usuario (el de menor id si hay más de uno)."""
+    if not telefonos:
+        return {}
+    return dict(
+        Usuario.objects.filter(telefono__in=telefonos)
+        .order_by("-id")
+        .values_list("telefono", "id")
+    )
+
+
+def _crear_estacionamientos(pares, errores):
+    """
+    Inserta los estacionamientos de [(fila, Estacionamiento)]. Si el bulk
+    choca con la restricción de un solo ACTIVO por vehículo (un conductor
+    estacionó una de estas patentes entre la consulta y el INSERT) se
+    insertan de a uno y el que choca va a errores. Retorna los creados.
+    """
+    try:
+        with transaction.atomic():
+            Estacionamiento.objects.bulk_create([est for _, est in pares])
+        return len(pares)
+    except IntegrityError:
+        pass
+    creados = 0
+    for fila, est in pares:
+        est.pk = None
+        try:
+            with transaction.atomic():
+                est.save()
+            creados += 1
+        except IntegrityError:
+            errores.append(_error_activo(fila))
+    return creados
+
+
+def importar_lote(trabajo, propio, lote):
+    """
+    Importa un lote de [(número de fila, valores)] y confirma el avance del
+    trabajo en la misma transacción. `propio` es el queryset del trabajo
+    tomado por este worker: si ya no lo es, el lote se descarta.
+    """
+    municipio = trabajo.municipio
+    errores = []
+    validas = []
+    patentes_vistas = set()
+    for num_fila, valores in lote:
+        if not any(valores):
+            continue
+        try:
+            fila = leer_fila(num_fila, valores)
+        except ValueError as e:
+            errores.append(_error(num_fila, valores[0] if valores else None, e))
+            continue
+        if fila.patente in patentes_vistas:
+            # La misma patente más arriba en el lote ya queda ACTIVA
+            errores.append(_error_activo(fila))
+            continue
+        patentes_vistas.add(fila.patente)
+        validas.append(fila)
+
+    importados = 0
+    nuevas_subcuadras = False
+    with transaction.atomic():
+        if validas:
+            vehiculos = _ids_vehiculos(municipio, sorted(patentes_vistas))
+            subcuadras, nuevas_subcuadras = _ids_subcuadras(
+                municipio, sorted({(f.calle, f.altura) for f in validas}),
+            )
+            usuarios = _ids_usuarios({f.telefono for f in validas if f.telefono})
+            activos = set(
+                Estacionamiento.objects
+                .filter(vehiculo_id__in=vehiculos.values(), estado="ACTIVO")
+                .values_list("vehiculo_id", flat=True)
+            )
+            pares = []
+            for f in validas:
+                if vehiculos[f.patente] in activos:
+                    errores.append(_error_activo(f))
+                    continue
+                pares.append((f, Estacionamiento(
+                    vehiculo_id=vehiculos[f.patente],
+                    subcuadra_id=subcuadras[(f.calle, f.altura)],
+                    usuario_id=usuarios.get(f.telefono),
+                    estado="ACTIVO",
+                    duracion_horas=f.duracion_horas,
+                    costo_base=f.costo,
+                    costo_final=f.costo,
+                )))
+            importados = _crear_estacionamientos(pares, errores)
+
+        errores.sort(key=lambda e: e["fila"])
+        lugar = MAX_ERRORES_GUARDADOS - len(trabajo.errores)
+        guardados = trabajo.errores + errores[:max(lugar, 0)]
+        if not propio.update(
+            filas_procesadas=lote[-1][0],
+            importados=F("importados") + importados,
+            omitidos=F("omitidos") + len(errores),
+            errores=guardados,
+            latido_en=timezone.now(),
+        ):
+            raise _TrabajoPerdido
+
+    trabajo.errores = guardados
+    trabajo.filas_procesadas = lote[-1][0]
+    # bulk_create no dispara la señal que mantiene el índice de subcuadras
+    if nuevas_subcuadras:
+        invalidar_indice_subcuadras(municipio.id)
+    return importados, len(errores)
+
+
+def importar_archivo(trabajo, propio, hasta=None):
+    """
+    Recorre el Excel del trabajo desde la primera fila sin confirmar.
+
+    Con `hasta` deja de leer al pasar esa hora (después de confirmar el
+    lote en curso). Retorna True si llegó al final del archivo.
+    """
+    import openpyxl
+
+    with trabajo.archivo.open("rb") as f:
+        wb = openpyxl.load_workbook(f, read_only=True, data_only=True)
+        try:
+            ws = wb.active
+            if trabajo.filas_total is None and ws.max_row:
+                trabajo.filas_total = max(ws.max_row - PRIMERA_FILA + 1, 0)
+                propio.update(filas_total=trabajo.filas_total)
+            inicio = max(PRIMERA_FILA, trabajo.filas_procesadas + 1)
+            lote = []
+            filas = ws.iter_rows(min_row=inicio, values_only=True)
+            for num_fila, valores in enumerate(filas, start=inicio):
+                lote.append((num_fila, valores))
+                if len(lote) >= LOTE_FILAS:
+                    importar_lote(trabajo, propio, lote)
+                    lote = []
+                    if hasta is not None and timezone.now() >= hasta:
+                        return False
+            if lote:
+                importar_lote(trabajo, propio, lote)
+            return True
+        finally:
+            wb.close()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Trabajos
+# ─────────────────────────────────────────────────────────────────────────────
+
+def solicitar_importacion(municipio, usuario, archivo):
+    """Guarda el Excel subido y crea el TrabajoImportacion pendiente."""
+    trabajo = TrabajoImportacion(
+        municipio=municipio,
+        solicitado_por=usuario,
+        nombre_archivo=archivo.name[:255],
+    )
+    trabajo.archivo.save(archivo.name, archivo, save=False)
+    trabajo.save()
+    return trabajo
+
+
+def _por_procesar(ahora):
+    """Filtro: pendientes, procesando abandonados, o con error y reintentos disponibles."""
+    vencido = ahora - timedelta(minutes=PROCESANDO_VENCE_MINUTOS)
+    return (
+        Q(estado=TrabajoImportacion.PENDIENTE)
+        | Q(estado=TrabajoImportacion.PROCESANDO, latido_en__lt=vencido)
+        | Q(estado=TrabajoImportacion.ERROR, intentos__lt=MAX_INTENTOS)
+    )
+
+
+def _tomar(trabajo_id, ahora):
+    """UPDATE condicional a "procesando". True si este proceso se quedó con el trabajo."""
+    return TrabajoImportacion.objects.filter(_por_procesar(ahora), id=trabajo_id).update(
+        estado=TrabajoImportacion.PROCESANDO,
+        estado_desde=ahora,
+        latido_en=ahora,
+        intentos=F("intentos") + 1,
+        error="",
+    ) == 1
+
+
+def ejecutar_importacion(trabajo_id, hasta=None):
+    """
+    Importa el Excel de un TrabajoImportacion, continuando desde la última
+    fila confirmada.
+
+    Retorna el estado final, o None si el trabajo no estaba para procesar
+    (u otro worker lo tomó). Al terminar se borra el archivo subido. Con
+    `hasta` (ver importar_archivo) el trabajo puede quedar a medias: vuelve
+    a "pendiente" sin gastar un intento.
+    """
+    tomado = timezone.now()
+    if not _tomar(trabajo_id, tomado):
+        return None
+    trabajo = TrabajoImportacion.objects.select_related("municipio").get(id=trabajo_id)
+    propio = TrabajoImportacion.objects.filter(
+        id=trabajo_id, estado=TrabajoImportacion.PROCESANDO, estado_desde=tomado,
+    )
+    try:
+        completo = importar_archivo(trabajo, propio, hasta)
+    except _TrabajoPerdido:
+        return None
+    except Exception as e:
+        logger.warning("Importación #%s falló en la fila %s: %s", trabajo_id, trabajo.filas_procesadas, e)
+        propio.update(
+            estado=TrabajoImportacion.ERROR, estado_desde=timezone.now(),
+            error=str(e)[:1000],
+        )
+        return TrabajoImportacion.ERROR
+
+    ahora = timezone.now()
+    if not completo:
+        propio.update(
+            estado=TrabajoImportacion.PENDIENTE, estado_desde=ahora, intentos=F("intentos") - 1,
+        )
+        return TrabajoImportacion.PENDIENTE
+    if not propio.update(estado=TrabajoImportacion.LISTO, estado_desde=ahora, terminado_en=ahora):
+        return None
+    trabajo.archivo.delete(save=False)
+    TrabajoImportacion.objects.filter(id=trabajo_id).update(archivo="")
+    return TrabajoImportacion.LISTO
+
+
+def importar_en_el_request(trabajo_id):
+    """Sin worker: avanza el trabajo durante SEGUNDOS_POR_REQUEST como mucho."""
+    return ejecutar_importacion(
+        trabajo_id, hasta=timezone.now() + timedelta(seconds=SEGUNDOS_POR_REQUEST),
+    )
+
+
+def procesar_importaciones_pendientes(limite=LOTE_TRABAJOS):
+    """Importa hasta `limite` trabajos en este proceso. Retorna dict {listos, errores}."""
+    ids = list(
+        TrabajoImportacion.objects.filter(_por_procesar(timezone.now()))
+        .order_by("id")
+        .values_list("id", flat=True)[:limite]
+    )
+    estados = [ejecutar_importacion(trabajo_id) for trabajo_id in ids]
+    return {
+        "listos":  estados.count(TrabajoImportacion.LISTO),
+        "errores": estados.count(TrabajoImportacion.ERROR),
+    }
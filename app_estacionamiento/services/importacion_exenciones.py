@@ -0,0 +1,286 @@
+# app_estacionamiento/services/importacion_exenciones.py
+"""
+Importación de exenciones de vecinos frentistas desde Excel, en dos pasos:
+vista previa y confirmación.
+
+Columnas: Patente | Nombre y Apellido | Direccion | Telefono | Fecha |
+Condicion | Vencimiento (la primera fila es el encabezado).
+
+Antes cada fila se analizaba por separado (dos o tres consultas de
+Subcuadra y una de Vehiculo por fila), la vista previa completa viajaba en
+la sesión y la confirmación hacía un get_or_create + save + add() por fila.
+Ahora:
+
+  - analizar_exenciones() lee la hoja con pandas y normaliza por columna
+    (patentes, teléfonos, fechas, calle y bloque de 50 de la dirección).
+    Las subcuadras del municipio se leen con una consulta y cada dirección
+    distinta se resuelve una sola vez; los vehículos existentes salen de un
+    patente__in. Las filas quedan en FilaImportacionExencion.
+  - confirmar_importacion() aplica las filas con un upsert por lote: crea
+    los vehículos que faltan (bulk_create), actualiza marcas y notas
+    (bulk_update) y agrega las subcuadras exentas con un bulk_create sobre
+    la tabla intermedia. La vista previa se borra en la misma transacción:
+    confirmar dos veces no duplica notas.
+
+Reglas por fila (las mismas de antes):
+  - Condición con "global" → exento_global; cualquier otra → exento_parcial.
+  - La subcuadra se busca por calle (contiene, sin distinguir mayúsculas) y
+    bloque de 50 de la altura; si el bloque no existe, la de la misma calle
+    con la altura más cercana.
+  - Todo queda con exencion_verificada=False y tipo "vecino_frentista"; las
+    notas se agregan con " | " sin pisar las anteriores.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from app_estacionamiento.models import (
+    FilaImportacionExencion,
+    ImportacionExencion,
+    Subcuadra,
+    Vehiculo,
+)
+
+# Las vistas previas sin confirmar se borran pasado este tiempo
+RETENCION_HORAS = 24
+
+# Las subcuadras se organizan en bloques de 50 numerales: 685 → 650
+BLOQUE_ALTURA = 50
+
+COLUMNAS = ["patente", "nombre", "direccion", "telefono", "fecha", "condicion", "vencimiento"]
+
+# (columna, etiqueta) en el orden en que se arman las notas de la exención
+_NOTAS = [
+    ("nombre",      "Nombre: "),
+    ("telefono",    "Tel: "),
+    ("fecha",       "Fecha: "),
+    ("direccion",   "Dirección: "),
+    ("condicion",   "Condición: "),
+    ("vencimiento", "Vencimiento: "),
+]
+
+_LARGO_PATENTE = Vehiculo._meta.get_field("patente").max_length
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Vista previa
+# ─────────────────────────────────────────────────────────────────────────────
+
+def leer_excel(archivo):
+    """
+    DataFrame de textos con COLUMNAS y la columna "num" (fila del Excel),
+    sin las filas vacías. Las fechas (celdas de tipo fecha) quedan dd/mm/aaaa.
+    """
+    import pandas as pd
+
+    crudo = pd.read_excel(archivo, header=None, skiprows=1, dtype=object, engine="openpyxl")
+    crudo = crudo.reindex(columns=range(len(COLUMNAS)))
+    crudo.columns = COLUMNAS
+    df = crudo.fillna("").astype(str).apply(lambda col: col.str.strip())
+    df["num"] = df.index + 2  # fila 1: encabezado
+
+    for columna in ("fecha", "vencimiento"):
+        fechas = pd.to_datetime(df[columna], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+        df[columna] = fechas.dt.strftime("%d/%m/%Y").where(fechas.notna(), df[columna])
+    # Un teléfono numérico leído como float ("2994123456.0")
+    df["telefono"] = df["telefono"].str.replace(r"^(\d+)\.0$", r"\1", regex=True)
+
+    return df[(df[COLUMNAS] != "").any(axis=1)].reset_index(drop=True)
+
+
+def _calle_y_bloque(direccion):
+    """
+    Separa "CALLE NUMERO" por columna. Retorna (calle, bloque); el bloque es
+    NaN si el último token no es un número (y entonces la calle es toda la
+    dirección).
+    """
+    import pandas as pd
+
+    tokens = direccion.str.rsplit(n=1, expand=True).reindex(columns=[0, 1])
+    numero = tokens[1].fillna("")
+    es_numero = numero.str.fullmatch(r"[+-]?\d+")
+    altura = pd.to_numeric(numero.where(es_numero), errors="coerce")
+    calle = tokens[0].fillna("").str.strip().where(es_numero, direccion)
+    return calle, (altura // BLOQUE_ALTURA) * BLOQUE_ALTURA
+
+
+def _resolver_subcuadra(calle, bloque, subcuadras):
+    """
+    (Subcuadra o None, aviso) para una dirección, sobre las subcuadras del
+    municipio ordenadas por id.
+    """
+    buscada = calle.casefold()
+    por_calle = [s for s in subcuadras if buscada in s.calle.casefold()]
+    if bloque is None:
+        return (por_calle[0], "") if por_calle else (None, None)
+    for s in por_calle:
+        if s.altura == bloque:
+            return s, ""
+    if not por_calle:
+        return None, None
+    cercana = min(por_calle, key=lambda s: abs(s.altura - bloque))
+    return cercana, f" (bloque {bloque} no existe, subcuadra más cercana: {cercana})"
+
+
+def _notas(df):
+    """Notas de cada fila: "Nombre: … | Tel: … | …" con las columnas no vacías."""
+    import pandas as pd
+
+    vacio = pd.Series("", index=df.index, dtype=object)
+    notas = vacio
+    for columna, etiqueta in _NOTAS:
+        valor = df[columna]
+        separador = vacio.mask((notas != "") & (valor != ""), " | ")
+        notas = notas + separador + (etiqueta + valor).where(valor != "", "")
+    return notas
+
+
+def analizar_exenciones(archivo, municipio, usuario):
+    """
+    Lee el Excel, analiza todas las filas y guarda la vista previa.
+
+    Retorna (ImportacionExencion, [FilaImportacionExencion]) con las filas
+    en el orden del archivo y la subcuadra ya cargada. Levanta la excepción
+    de pandas/openpyxl si el archivo no se puede leer.
+    """
+    df = leer_excel(archivo)
+
+    df["patente"] = df["patente"].str.upper().str.replace(r"[^A-Z0-9]", "", regex=True)
+    df["es_global"] = df["condicion"].str.lower().str.contains("global", regex=False)
+    df["notas"] = _notas(df)
+    df["calle"], df["bloque"] = _calle_y_bloque(df["direccion"])
+
+    # ── Subcuadras: una consulta, una resolución por dirección distinta ──────
+    subcuadras = list(Subcuadra.objects.filter(municipio=municipio).order_by("id"))
+    resueltas = {}
+    con_direccion = df[df["direccion"] != ""]
+    for calle, bloque in con_direccion[["calle", "bloque"]].drop_duplicates().itertuples(index=False):
+        bloque = None if bloque != bloque else int(bloque)  # NaN
+        resueltas[(calle, bloque)] = _resolver_subcuadra(calle, bloque, subcuadras)
+
+    # ── Vehículos existentes: una consulta ──────────────────────────────────
+    patentes = set(df["patente"]) - {""}
+    existentes = set(
+        Vehiculo.objects.filter(patente__in=patentes).values_list("patente", flat=True)
+    )
+
+    importacion = ImportacionExencion.objects.create(
+        municipio=municipio,
+        creado_por=usuario,
+        nombre_archivo=getattr(archivo, "name", "")[:255],
+    )
+    filas = []
+    for r in df.itertuples(index=False):
+        fila = FilaImportacionExencion(
+            importacion=importacion,
+            num=r.num,
+            patente=r.patente[:64],
+            nombre=r.nombre[:255],
+            telefono=r.telefono[:255],
+            direccion=r.direccion[:255],
+        )
+        if not r.patente:
+            fila.estado, fila.mensaje = FilaImportacionExencion.ERROR, "Patente vacía — fila ignorada."
+        elif len(r.patente) > _LARGO_PATENTE:
+            fila.estado = FilaImportacionExencion.ERROR
+            fila.mensaje = f"Patente de más de {_LARGO_PATENTE} caracteres — fila ignorada."
+        else:
+            aviso = ""
+            if r.direccion:
+                bloque = None if r.bloque != r.bloque else int(r.bloque)
+                subcuadra, aviso = resueltas[(r.calle, bloque)]
+                fila.subcuadra = subcuadra
+                if aviso is None:
+                    aviso = f" (sin subcuadra para '{r.direccion}')"
+            existe = r.patente in existentes
+            fila.es_global = bool(r.es_global)
+            fila.notas = r.notas
+            fila.estado = FilaImportacionExencion.ACTUALIZAR if existe else FilaImportacionExencion.NUEVO
+            fila.mensaje = (
+                f"{'Actualiza' if existe else 'Crea'} vehículo. "
+                f"{'🌐 Global' if fila.es_global else '📍 Parcial'}.{aviso}"
+            )
+        filas.append(fila)
+    FilaImportacionExencion.objects.bulk_create(filas)
+    return importacion, filas
+
+
+def purgar_vistas_previas(ahora=None):
+    """Borra las vistas previas sin confirmar de hace más de RETENCION_HORAS."""
+    limite = (ahora or timezone.now()) - timedelta(hours=RETENCION_HORAS)
+    borradas, _ = ImportacionExencion.objects.filter(creado_en__lt=limite).delete()
+    return borradas
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Confirmación
+# ─────────────────────────────────────────────────────────────────────────────
+
+def confirmar_importacion(importacion_id, municipio, usuario):
+    """
+    Aplica la vista previa y la borra. Retorna (creados, actualizados)
+    contando por fila (una patente repetida en el archivo cuenta como
+    actualización desde la segunda), o None si la vista previa no existe
+    (ya confirmada, vencida o de otro usuario).
+    """
+    with transaction.atomic():
+        importacion = (
+            ImportacionExencion.objects.select_for_update()
+            .filter(id=importacion_id, municipio=municipio, creado_por=usuario)
+            .first()
+        )
+        if importacion is None:
+            return None
+        filas = list(
+            importacion.filas.exclude(estado=FilaImportacionExencion.ERROR)
+            .order_by("num")
+            .values_list("patente", "subcuadra_id", "notas", "es_global")
+        )
+        patentes = list(dict.fromkeys(f[0] for f in filas))
+
+        # ── Upsert de vehículos ──────────────────────────────────────────────
+        existian = set(
+            Vehiculo.objects.filter(patente__in=patentes).values_list("patente", flat=True)
+        )
+        Vehiculo.objects.bulk_create(
+            [Vehiculo(patente=p, tipo="auto", municipio=municipio) for p in patentes if p not in existian],
+            ignore_conflicts=True,
+        )
+        vehiculos = {
+            v.patente: v
+            for v in Vehiculo.objects.select_for_update().filter(patente__in=patentes)
+        }
+        exentas = set()
+        for patente, subcuadra_id, notas, es_global in filas:
+            vehiculo = vehiculos[patente]
+            if es_global:
+                # No tocamos exento_parcial ni subcuadras_exentas si ya tenía parcial
+                vehiculo.exento_global = True
+            else:
+                vehiculo.exento_parcial = True
+            vehiculo.exencion_verificada = False
+            vehiculo.tipo_exencion       = "vecino_frentista"
+            # Concatenar notas sin pisar lo que el admin haya escrito antes
+            if notas:
+                vehiculo.notas_exencion = (
+                    f"{vehiculo.notas_exencion} | {notas}" if vehiculo.notas_exencion else notas
+                )
+            if subcuadra_id:
+                exentas.add((vehiculo.id, subcuadra_id))
+
+        Vehiculo.objects.bulk_update(
+            list(vehiculos.values()),
+            ["exento_global", "exento_parcial", "exencion_verificada", "tipo_exencion", "notas_exencion"],
+            batch_size=500,
+        )
+        Intermedia = Vehiculo.subcuadras_exentas.through
+        Intermedia.objects.bulk_create(
+            [Intermedia(vehiculo_id=v, subcuadra_id=s) for v, s in sorted(exentas)],
+            ignore_conflicts=True,
+        )
+        importacion.delete()
+
+    creados = len(set(patentes) - existian)
+    return creados, len(filas) - creados
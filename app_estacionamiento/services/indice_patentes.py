@@ -0,0 +1,191 @@
+# app_estacionamiento/services/indice_patentes.py
+"""
+Estado compacto de cada patente, resuelto en una sola query.
+
+El inspector verifica la misma patente muchas veces por día y el conductor
+consulta su detalle desde el pago público. Todo lo que hace falta para
+decidir el estado (estacionamiento activo, abono, última infracción,
+exenciones, última verificación) sale de UN SELECT anotado sobre Vehiculo.
+
+No se cachea: en producción el único caché compartido entre procesos es
+DatabaseCache, y leer el registro de ahí (más la invalidación en cada save)
+cuesta más queries que armarlo desde la base.
+
+El registro NO depende de la hora de consulta: guarda timestamps crudos
+(inicio del estacionamiento activo, última infracción, última verificación,
+vigencia de la exención) y las ventanas de tiempo se aplican al leer.
+"""
+
+from datetime import date, timedelta
+
+from django.db.models import OuterRef, Subquery
+
+from app_estacionamiento.models import (
+    AbonoMensual,
+    Estado,
+    Estacionamiento,
+    Infraccion,
+    Subcuadra,
+    VerificacionInspector,
+    Vehiculo,
+)
+
+def _mes_actual():
+    return date.today().replace(day=1)
+
+
+def _consultar_registros(patentes, municipio):
+    """
+    Arma los registros de varias patentes en UNA sola query.
+
+    Cada fila de Vehiculo se anota con subqueries correlacionadas para el
+    estacionamiento activo, la última verificación y, si hay municipio, el
+    próximo abono (mes actual o posterior) y la última infracción en ese
+    municipio. Las subcuadras exentas se traen con un LEFT JOIN sobre la M2M:
+    una fila por subcuadra exenta (o una sola fila con NULL si no tiene).
+
+    La última verificación combina la base con las que todavía están en el
+    buffer write-behind de registro_verificaciones (sin esto la tolerancia
+    del inspector fallaría hasta el próximo volcado).
+
+    Retorna dict {patente: registro}. Las patentes no registradas no aparecen.
+    """
+    from app_estacionamiento.services.registro_verificaciones import ultimas_pendientes
+
+    activo = Estacionamiento.objects.filter(
+        vehiculo=OuterRef("pk"), estado=Estado.ACTIVO,
+    ).order_by("-hora_inicio")
+    anotaciones = {
+        "estacionamiento_inicio":   Subquery(activo.values("hora_inicio")[:1]),
+        "estacionamiento_duracion": Subquery(activo.values("duracion_horas")[:1]),
+        "ultima_verificacion": Subquery(
+            VerificacionInspector.objects
+            .filter(vehiculo=OuterRef("pk"))
+            .order_by("-fecha")
+            .values("fecha")[:1]
+        ),
+    }
+    if municipio:
+        anotaciones["abono_mes"] = Subquery(
+            AbonoMensual.objects
+            .filter(vehiculo=OuterRef("pk"), municipio=municipio, mes__gte=_mes_actual())
+            .order_by("mes")
+            .values("mes")[:1]
+        )
+        anotaciones["ultima_infraccion"] = Subquery(
+            Infraccion.objects
+            .filter(vehiculo=OuterRef("pk"), municipio=municipio)
+            .order_by("-creado_en")
+            .values("creado_en")[:1]
+        )
+
+    filas = (
+        Vehiculo.objects
+        .filter(patente__in=list(patentes))
+        .annotate(**anotaciones)
+        .values(
+            "id", "patente", "exento_global", "vigencia_exencion", "tipo_exencion",
+            *anotaciones,
+            "subcuadras_exentas__id",
+            "subcuadras_exentas__calle",
+            "subcuadras_exentas__altura",
+            "subcuadras_exentas__municipio_id",
+        )
+        .order_by("id", "subcuadras_exentas__id")
+    )
+
+    registros = {}
+    for fila in filas:
+        registro = registros.get(fila["patente"])
+        if registro is None:
+            registro = registros[fila["patente"]] = {
+                "id":                       fila["id"],
+                "exento_global":            fila["exento_global"],
+                "vigencia_exencion":        fila["vigencia_exencion"],
+                "tipo_exencion":            fila["tipo_exencion"],
+                "estacionamiento_inicio":   fila["estacionamiento_inicio"],
+                "estacionamiento_duracion": fila["estacionamiento_duracion"],
+                "ultima_verificacion":      fila["ultima_verificacion"],
+                "subcuadras_exentas":       [],
+                "municipios":               {},
+            }
+            if municipio:
+                registro["municipios"][municipio.id] = {
+                    "abono_mes":         fila["abono_mes"],
+                    "ultima_infraccion": fila["ultima_infraccion"],
+                }
+        if fila["subcuadras_exentas__id"] is not None:
+            registro["subcuadras_exentas"].append((
+                fila["subcuadras_exentas__id"],
+                fila["subcuadras_exentas__calle"],
+                fila["subcuadras_exentas__altura"],
+                fila["subcuadras_exentas__municipio_id"],
+            ))
+
+    pendientes = ultimas_pendientes([r["id"] for r in registros.values()])
+    for registro in registros.values():
+        pendiente = pendientes.get(registro["id"])
+        if pendiente and (
+            registro["ultima_verificacion"] is None or pendiente > registro["ultima_verificacion"]
+        ):
+            registro["ultima_verificacion"] = pendiente
+    return registros
+
+
+class PatenteStatusIndex:
+    """
+    Acceso al estado por patente.
+
+    obtener() / obtener_varios() van siempre a la base (una query por
+    llamada, sin importar cuántas patentes). Las patentes no registradas no
+    aparecen en el resultado.
+    """
+
+    @staticmethod
+    def obtener_varios(patentes, municipio):
+        """Retorna dict {patente: registro}; las no registradas no aparecen."""
+        return _consultar_registros(dict.fromkeys(patentes), municipio)
+
+    @staticmethod
+    def obtener(patente, municipio):
+        """Registro de una patente, o None si no está registrada."""
+        return PatenteStatusIndex.obtener_varios([patente], municipio).get(patente)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Lectura de un registro (las ventanas de tiempo se aplican acá)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def estacionamiento_vence(registro):
+    """Hora de vencimiento del estacionamiento activo, o None si no hay."""
+    if registro is None or registro["estacionamiento_inicio"] is None:
+        return None
+    return registro["estacionamiento_inicio"] + timedelta(
+        hours=float(registro["estacionamiento_duracion"])
+    )
+
+
+def abono_vigente(registro, municipio):
+    """True si la patente tiene abono del mes actual en el municipio."""
+    if registro is None or municipio is None:
+        return False
+    datos = registro["municipios"].get(municipio.id)
+    return bool(datos) and datos["abono_mes"] == _mes_actual()
+
+
+def ultima_infraccion(registro, municipio):
+    """Fecha de la última infracción de la patente en el municipio, o None."""
+    if registro is None or municipio is None:
+        return None
+    datos = registro["municipios"].get(municipio.id)
+    return datos["ultima_infraccion"] if datos else None
+
+
+def subcuadras_exentas(registro):
+    """Subcuadras exentas como instancias de Subcuadra (sin tocar la base)."""
+    if registro is None:
+        return []
+    return [
+        Subcuadra(id=id_, calle=calle, altura=altura, municipio_id=municipio_id)
+        for id_, calle, altura, municipio_id in registro["subcuadras_exentas"]
+    ]
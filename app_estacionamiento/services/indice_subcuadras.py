@@ -0,0 +1,200 @@
+# app_estacionamiento/services/indice_subcuadras.py
+"""
+Índice espacial de subcuadras por municipio (grilla uniforme lat/lon).
+
+El GPS del inspector y el del pago público preguntan "¿en qué cuadra estoy?"
+a cada rato. Antes se traían todas las subcuadras con coordenadas y se hacía
+min() sobre la distancia euclidiana en grados: O(n) por consulta, con la
+conversión Decimal → float de cada fila.
+
+Acá las subcuadras con coordenadas de un municipio se reparten en celdas de
+CELDA_GRADOS × CELDA_GRADOS y la búsqueda recorre anillos de celdas alrededor
+del punto: solo mira las cuadras cercanas. Las distancias son haversine en
+metros.
+
+Caché: el índice armado vive en la memoria de cada proceso; en el caché de
+Django solo se guarda un sello de versión por municipio. Las señales de
+Subcuadra (alta, edición de coordenadas en gestionar_subcuadras, baja)
+cambian el sello y cada proceso rearma su índice en la próxima consulta.
+"""
+
+import heapq
+import math
+import uuid
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+from app_estacionamiento.models import Subcuadra
+
+RADIO_TIERRA_M = 6_371_000
+
+# ~220 m de latitud: una celda cubre unas pocas cuadras
+CELDA_GRADOS = 0.002
+
+_METROS_POR_GRADO = math.pi * RADIO_TIERRA_M / 180
+
+# municipio_id → (versión, IndiceSubcuadras) de este proceso
+_indices = {}
+
+
+class SubcuadraGPS(namedtuple("SubcuadraGPS", "id calle altura lat lon")):
+    """Lo mínimo de una Subcuadra para responder al GPS (sin tocar la base)."""
+
+    __slots__ = ()
+
+    @property
+    def nombre(self):
+        # Mismo criterio que Subcuadra.__str__: Zona Única (altura=0) sin número
+        return self.calle if self.altura == 0 else f"{self.calle} {self.altura}"
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Distancia en metros sobre la esfera terrestre entre dos puntos en grados."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dlat = p2 - p1
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dlon / 2) ** 2
+    return 2 * RADIO_TIERRA_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class IndiceSubcuadras:
+    """
+    Grilla uniforme de SubcuadraGPS.
+
+    cercanas(lat, lon, k) recorre anillos de celdas alrededor del punto y
+    corta cuando la k-ésima distancia encontrada es menor que la distancia
+    mínima posible a cualquier celda todavía no visitada.
+    """
+
+    def __init__(self, puntos, celda=CELDA_GRADOS):
+        self.celda  = celda
+        self.puntos = list(puntos)
+        self._celdas = {}
+        for punto in self.puntos:
+            self._celdas.setdefault(self._clave(punto.lat, punto.lon), []).append(punto)
+        if self.puntos:
+            filas    = [i for i, _ in self._celdas]
+            columnas = [j for _, j in self._celdas]
+            self._extension = (min(filas), max(filas), min(columnas), max(columnas))
+            # Cota inferior de metros por grado de longitud en la zona
+            lat_max = max(abs(p.lat) for p in self.puntos) + celda
+            self._cos_lat = math.cos(math.radians(min(lat_max, 89.0)))
+
+    @classmethod
+    def construir(cls, municipio_id):
+        """Una query: subcuadras del municipio con lat y lon cargadas."""
+        filas = (
+            Subcuadra.objects
+            .filter(municipio_id=municipio_id, lat__isnull=False, lon__isnull=False)
+            .values_list("id", "calle", "altura", "lat", "lon")
+        )
+        return cls(
+            SubcuadraGPS(id_, calle, altura, float(lat), float(lon))
+            for id_, calle, altura, lat, lon in filas
+        )
+
+    def __len__(self):
+        return len(self.puntos)
+
+    def _clave(self, lat, lon):
+        return (math.floor(lat / self.celda), math.floor(lon / self.celda))
+
+    def _anillo(self, ci, cj, r):
+        """Claves de las celdas a distancia de Chebyshev exactamente r."""
+        if r == 0:
+            yield (ci, cj)
+            return
+        for j in range(cj - r, cj + r + 1):
+            yield (ci - r, j)
+            yield (ci + r, j)
+        for i in range(ci - r + 1, ci + r):
+            yield (i, cj - r)
+            yield (i, cj + r)
+
+    def _cota_fuera(self, lat, lon, ci, cj, r):
+        """Metros mínimos desde el punto a cualquier celda fuera del cuadrado de radio r."""
+        dlat = min(lat - (ci - r) * self.celda, (ci + r + 1) * self.celda - lat)
+        dlon = min(lon - (cj - r) * self.celda, (cj + r + 1) * self.celda - lon)
+        cos_lat = min(self._cos_lat, math.cos(math.radians(min(abs(lat) + self.celda, 89.0))))
+        return min(dlat, dlon * cos_lat) * _METROS_POR_GRADO
+
+    def _fuerza_bruta(self, lat, lon, k):
+        return heapq.nsmallest(
+            k, ((haversine_m(lat, lon, p.lat, p.lon), p) for p in self.puntos),
+            key=lambda par: par[0],
+        )
+
+    def cercanas(self, lat, lon, k=1):
+        """Lista de hasta k pares (distancia_m, SubcuadraGPS), de la más cercana a la más lejana."""
+        if not self.puntos or k <= 0:
+            return []
+        ci, cj = self._clave(lat, lon)
+        imin, imax, jmin, jmax = self._extension
+        r_max = max(ci - imin, imax - ci, cj - jmin, jmax - cj)
+
+        mejores = []   # heap de (-distancia, id, punto) con las k mejores
+        for r in range(r_max + 1):
+            if 8 * r > len(self._celdas):
+                # Punto lejos de todo (o grilla muy rala): recorrer anillos
+                # vacíos costaría más que mirar todas las cuadras.
+                return self._fuerza_bruta(lat, lon, k)
+            for clave in self._anillo(ci, cj, r):
+                for punto in self._celdas.get(clave, ()):
+                    d = haversine_m(lat, lon, punto.lat, punto.lon)
+                    if len(mejores) < k:
+                        heapq.heappush(mejores, (-d, punto.id, punto))
+                    elif d < -mejores[0][0]:
+                        heapq.heapreplace(mejores, (-d, punto.id, punto))
+            if len(mejores) == k and -mejores[0][0] <= self._cota_fuera(lat, lon, ci, cj, r):
+                break
+        return sorted(((-d, p) for d, _, p in mejores), key=lambda par: par[0])
+
+    def mas_cercana(self, lat, lon):
+        """La SubcuadraGPS más cercana, o None si el municipio no tiene coordenadas."""
+        resultado = self.cercanas(lat, lon, k=1)
+        return resultado[0][1] if resultado else None
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Caché por proceso + sello de versión compartido
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _clave_version(municipio_id):
+    return f"indice_subcuadras_version_{municipio_id}"
+
+
+def _version(municipio_id):
+    clave = _clave_version(municipio_id)
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, uuid.uuid4().hex, timeout=None)
+        version = cache.get(clave)
+    return version
+
+
+def obtener_indice_subcuadras(municipio_id):
+    """IndiceSubcuadras del municipio; se rearma solo si cambió la versión."""
+    version = _version(municipio_id)
+    guardado = _indices.get(municipio_id)
+    if guardado is not None and guardado[0] == version:
+        return guardado[1]
+    indice = IndiceSubcuadras.construir(municipio_id)
+    _indices[municipio_id] = (version, indice)
+    return indice
+
+
+def invalidar_indice_subcuadras(municipio_id):
+    """
+    Cambia el sello de versión del municipio (lo llaman las señales de Subcuadra).
+
+    Se cambia en el momento y de nuevo al confirmar: un proceso que rearmó el
+    índice con los datos viejos mientras la transacción seguía abierta no
+    queda con la versión nueva.
+    """
+    if municipio_id is None:
+        return
+    clave = _clave_version(municipio_id)
+    cache.set(clave, uuid.uuid4().hex, timeout=None)
+    transaction.on_commit(lambda: cache.set(clave, uuid.uuid4().hex, timeout=None))
@@ -4,6 +4,7 @@ Lógica de negocio relacionada con infracciones de tránsito.
 
 Responsabilidades:
 - Crear infracciones (con validaciones de exención, tolerancia, monto, foto GPS)
+  La marca de agua en segundo plano vive en services/fotos_infracciones.py
 - Cobrar infracciones en efectivo (desde el panel admin)
 """
 
@@ -12,6 +13,7 @@ import logging
 from datetime import timedelta
 from decimal import Decimal
 
+from django.conf import settings
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.db import transaction
 from django.utils import timezone
@@ -22,10 +24,11 @@ from app_estacionamiento.models import (
     Infraccion,
     MovimientoCaja,
     Subcuadra,
-    Tarifa,
     VerificacionInspector,
     Vehiculo,
 )
+from app_estacionamiento.services.config_municipio import tarifa_vigente
+from app_estacionamiento.services.registro_verificaciones import volcar as volcar_verificaciones
 
 logger = logging.getLogger(__name__)
 
@@ -42,20 +45,26 @@ class ErrorInfraccion(Exception):
 # Helper privado
 # ─────────────────────────────────────────────────────────────────────────────
 
-def _agregar_marca_de_agua_gps(foto, lat, lon, acc, patente, inspector, subcuadra=None):
+def _agregar_marca_de_agua_gps(foto, lat, lon, acc, patente, inspector, subcuadra=None,
+                               fecha=None):
     """
     Superpone coordenadas GPS, patente y fecha/hora sobre la foto del acta.
+
+    La imagen se re-codifica como JPEG sin EXIF (ubicación y datos del
+    celular del inspector); antes se aplica la rotación EXIF para que la
+    foto no quede girada. `fecha` es la hora del acta (default: ahora).
+
     Retorna un InMemoryUploadedFile listo para el modelo,
     o la foto original si Pillow falla (para no bloquear el acta).
     """
     try:
-        from PIL import Image, ImageDraw, ImageFont
+        from PIL import Image, ImageDraw, ImageFont, ImageOps
 
-        imagen = Image.open(foto)
+        imagen = ImageOps.exif_transpose(Image.open(foto))
         if imagen.mode not in ("RGB", "L"):
             imagen = imagen.convert("RGB")
 
-        fecha_str = timezone.localtime().strftime("%d/%m/%Y %H:%M:%S")
+        fecha_str = timezone.localtime(fecha).strftime("%d/%m/%Y %H:%M:%S")
         subcuadra_str    = str(subcuadra) if subcuadra else ""
         # getattr con default para que el helper sea robusto fuera de tests con DB real
         nombre_inspector = (
@@ -137,6 +146,11 @@ def _agregar_marca_de_agua_gps(foto, lat, lon, acc, patente, inspector, subcuadr
 # Servicios públicos
 # ─────────────────────────────────────────────────────────────────────────────
 
+def foto_asincrona():
+    """True si la marca de agua de la foto se hace en segundo plano (settings)."""
+    return getattr(settings, "INFRACCIONES_FOTO_ASINCRONA", False)
+
+
 def crear_infraccion(
     *, patente, subcuadra_id, inspector,
     foto=None, gps_lat=None, gps_lon=None, gps_acc=None
@@ -193,16 +207,27 @@ def crear_infraccion(
     if ultima and ultima.creado_en >= hace_n_min:
         raise ErrorInfraccion("Ya existe una infraccion reciente")
 
-    tarifa = Tarifa.objects.filter(municipio=municipio).first()
+    tarifa = tarifa_vigente(municipio)
     monto  = tarifa.monto_infraccion if tarifa else Decimal("0")
 
-    # Siempre agregar marca de agua si hay foto (GPS opcional — muestra "sin señal" si falta)
-    foto_final = foto
+    # Siempre agregar marca de agua si hay foto (GPS opcional — muestra "sin señal" si falta).
+    # Con INFRACCIONES_FOTO_ASINCRONA se guarda la foto cruda y la marca la pone
+    # el worker (services/fotos_infracciones.py): el inspector no espera a Pillow.
+    foto_final  = foto
+    foto_estado = Infraccion.FOTO_LISTA
     if foto:
-        foto_final = _agregar_marca_de_agua_gps(
-            foto=foto, lat=gps_lat, lon=gps_lon, acc=gps_acc,
-            patente=patente, inspector=inspector, subcuadra=subcuadra,
-        )
+        if foto_asincrona():
+            foto_estado = Infraccion.FOTO_PENDIENTE
+        else:
+            foto_final = _agregar_marca_de_agua_gps(
+                foto=foto, lat=gps_lat, lon=gps_lon, acc=gps_acc,
+                patente=patente, inspector=inspector, subcuadra=subcuadra,
+            )
+    gps = {
+        "gps_lat": str(gps_lat or "")[:20],
+        "gps_lon": str(gps_lon or "")[:20],
+        "gps_acc": str(gps_acc or "")[:20],
+    }
 
     # Intentar crear con foto. Si el storage (Cloudinary) falla, guardar sin foto
     # para no perder el acta. El inspector puede agregar la foto manualmente si hace falta.
@@ -214,7 +239,10 @@ def crear_infraccion(
             subcuadra=subcuadra,
             estacionamiento=estacionamiento,
             foto=foto_final,
+            foto_estado=foto_estado,
+            foto_estado_desde=timezone.now() if foto_final else None,
             monto=monto,
+            **gps,
         )
     except Exception as e:
         logger.error("Error al guardar foto de infraccion (¿Cloudinary?): %s", e)
@@ -226,9 +254,12 @@ def crear_infraccion(
             estacionamiento=estacionamiento,
             foto=None,
             monto=monto,
+            **gps,
         )
 
-    # Trazabilidad: marcar que la última verificación generó infracción
+    # Trazabilidad: marcar que la última verificación generó infracción.
+    # Puede seguir en el buffer write-behind: volcarlo antes de buscarla.
+    volcar_verificaciones()
     ultima_verificacion = VerificacionInspector.objects.filter(
         vehiculo=vehiculo, inspector=inspector
     ).order_by("-fecha").first()
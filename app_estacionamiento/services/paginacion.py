@@ -0,0 +1,84 @@
+# app_estacionamiento/services/paginacion.py
+"""
+Paginación por cursor (keyset) sobre (creado_en, id), del más nuevo al más viejo.
+
+Paginator hace COUNT(*) + OFFSET: con el historial de caja de un año, cada
+página lejana recorre todas las filas anteriores. Acá la página siguiente
+se pide "desde" la última fila mostrada:
+
+    WHERE creado_en < c OR (creado_en = c AND id < i)
+    ORDER BY creado_en DESC, id DESC
+    LIMIT n + 1
+
+y con el índice (…, creado_en DESC, id DESC) cada página cuesta lo mismo
+sin importar qué tan atrás esté. No hay número de página ni total: la
+vista muestra "Más antiguos →" mientras haya cursor siguiente.
+
+El cursor viaja en la URL (?desde=...) como texto opaco; uno inválido o
+adulterado se trata como "primera página".
+"""
+
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.db.models import Q
+
+TAMANIO_PAGINA = 50
+
+
+@dataclass
+class PaginaKeyset:
+    items: list
+    siguiente: str | None   # cursor para ?desde= de la página siguiente (más antigua)
+    es_primera: bool
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def codificar_cursor(creado_en, id_):
+    crudo = f"{creado_en.isoformat()}|{id_}".encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor):
+    """(creado_en, id) del cursor, o None si no es válido."""
+    if not cursor:
+        return None
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        fecha, id_ = crudo.rsplit("|", 1)
+        creado_en = datetime.fromisoformat(fecha)
+        if creado_en.tzinfo is None:
+            return None
+        return creado_en, int(id_)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def paginar_keyset(queryset, cursor=None, tamanio=None):
+    """
+    Una página del queryset ordenado por (-creado_en, -id).
+
+    `cursor` es el valor de ?desde= (o None para la primera página);
+    `tamanio` por defecto es TAMANIO_PAGINA.
+    Retorna PaginaKeyset con los items y el cursor de la página siguiente.
+    """
+    tamanio  = tamanio or TAMANIO_PAGINA
+    posicion = decodificar_cursor(cursor)
+    qs = queryset.order_by("-creado_en", "-id")
+    if posicion:
+        creado_en, id_ = posicion
+        qs = qs.filter(Q(creado_en__lt=creado_en) | Q(creado_en=creado_en, id__lt=id_))
+    filas = list(qs[:tamanio + 1])
+    hay_mas = len(filas) > tamanio
+    filas = filas[:tamanio]
+    siguiente = codificar_cursor(filas[-1].creado_en, filas[-1].id) if hay_mas else None
+    return PaginaKeyset(items=filas, siguiente=siguiente, es_primera=posicion is None)
@@ -0,0 +1,279 @@
+# app_estacionamiento/services/registro_verificaciones.py
+"""
+Registro write-behind de VerificacionInspector.
+
+Cada verificación del inspector dejaba un INSERT sincrónico en el request
+(~75k filas por año y por municipio). Acá se encolan en memoria y se insertan
+con un solo bulk_create cada VERIFICACIONES_FLUSH_CADA registros o cada
+VERIFICACIONES_FLUSH_SEGUNDOS (hilo de fondo por proceso).
+
+Durabilidad: antes de encolar, cada registro se agrega como línea JSON al
+spool del proceso (<spool_dir>/<token>.spool). Si el proceso muere sin volcar,
+`python manage.py volcar_verificaciones` inserta los spools huérfanos.
+Un spool es huérfano cuando nadie tiene tomado el flock de su <token>.lock:
+el lock lo sostiene el proceso dueño mientras vive y lo libera el sistema
+operativo al morir (aunque el PID se reutilice).
+
+La tolerancia del inspector necesita la última verificación de cada vehículo:
+ultimas_pendientes() expone lo que todavía no llegó a la base para que
+PatenteStatusIndex la combine con la consulta.
+
+Si el proceso muere justo entre el bulk_create y el borrado del spool, la
+recuperación vuelve a insertar ese lote (filas duplicadas de trazabilidad,
+no afectan ningún estado).
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from app_estacionamiento.models import VerificacionInspector
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin flock no hay forma segura de detectar huérfanos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_EXT_SPOOL    = ".spool"
+_EXT_LOCK     = ".lock"
+_EXT_VOLCANDO = ".volcando"
+
+
+def write_behind_activo():
+    """True si las verificaciones se encolan en lugar de insertarse en el momento."""
+    return bool(getattr(settings, "VERIFICACIONES_WRITE_BEHIND", False)) and fcntl is not None
+
+
+def _spool_dir():
+    return Path(getattr(settings, "VERIFICACIONES_SPOOL_DIR", Path(settings.BASE_DIR) / "spool"))
+
+
+def _a_linea(fila):
+    return json.dumps({**fila, "fecha": fila["fecha"].isoformat()}) + "\n"
+
+
+def _leer_spool(ruta):
+    """Filas de un spool; una última línea cortada (crash a mitad de write) se descarta."""
+    filas = []
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            try:
+                datos = json.loads(linea)
+            except json.JSONDecodeError:
+                logger.warning("Línea de spool ilegible en %s, se descarta", ruta)
+                continue
+            datos["fecha"] = datetime.fromisoformat(datos["fecha"])
+            filas.append(datos)
+    return filas
+
+
+def _insertar(filas):
+    """Un solo bulk_create para todas las filas (dicts con los campos del modelo)."""
+    return VerificacionInspector.objects.bulk_create(
+        [VerificacionInspector(**fila) for fila in filas]
+    )
+
+
+class _BufferVerificaciones:
+    """Cola en memoria + spool en disco de las verificaciones de ESTE proceso."""
+
+    def __init__(self):
+        self._lock       = threading.Lock()
+        self._filas      = []
+        self._pendientes = {}     # vehiculo_id → fecha más reciente aún no insertada
+        self._token      = None
+        self._lock_fd    = None
+        self._hilo       = None
+        self._lotes      = 0
+
+    # ── spool ────────────────────────────────────────────────────────────────
+
+    def _ruta(self, ext):
+        return _spool_dir() / f"{self._token}{ext}"
+
+    def _asegurar_spool(self):
+        """Crea el lock del proceso la primera vez que se encola algo."""
+        if self._token is not None and self._lock_fd is not None:
+            return
+        _spool_dir().mkdir(parents=True, exist_ok=True)
+        self._token   = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        self._lock_fd = os.open(self._ruta(_EXT_LOCK), os.O_CREAT | os.O_RDWR, 0o600)
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _iniciar_hilo(self):
+        segundos = float(getattr(settings, "VERIFICACIONES_FLUSH_SEGUNDOS", 0) or 0)
+        if segundos <= 0 or (self._hilo and self._hilo.is_alive()):
+            return
+        self._hilo = threading.Thread(
+            target=self._bucle, args=(segundos,), name="volcar-verificaciones", daemon=True,
+        )
+        self._hilo.start()
+
+    def _bucle(self, segundos):
+        evento = threading.Event()
+        while True:
+            evento.wait(segundos)
+            try:
+                self.volcar()
+            except Exception:
+                logger.exception("Error volcando verificaciones")
+            finally:
+                # El hilo tiene su propia conexión: no dejarla abierta entre vueltas
+                connection.close()
+
+    # ── API ──────────────────────────────────────────────────────────────────
+
+    def encolar(self, filas):
+        """Agrega filas al spool y a la cola; vuelca si se llegó al tope."""
+        limite = int(getattr(settings, "VERIFICACIONES_FLUSH_CADA", 50))
+        with self._lock:
+            self._asegurar_spool()
+            with open(self._ruta(_EXT_SPOOL), "a", encoding="utf-8") as spool:
+                spool.writelines(_a_linea(f) for f in filas)
+                spool.flush()
+            self._filas.extend(filas)
+            for fila in filas:
+                anterior = self._pendientes.get(fila["vehiculo_id"])
+                if anterior is None or fila["fecha"] > anterior:
+                    self._pendientes[fila["vehiculo_id"]] = fila["fecha"]
+            lleno = len(self._filas) >= limite
+        self._iniciar_hilo()
+        if lleno:
+            self.volcar()
+
+    def volcar(self):
+        """
+        Inserta lo encolado con un bulk_create. Retorna la cantidad insertada.
+
+        El spool se renombra a .volcando bajo el lock y recién se borra cuando
+        el INSERT terminó bien. Si falla, el .volcando queda para
+        volcar_verificaciones y las filas no se reintentan desde acá
+        (reintentar y además recuperar el archivo las duplicaría).
+        """
+        with self._lock:
+            if not self._filas:
+                return 0
+            filas, self._filas = self._filas, []
+            self._lotes += 1
+            volcando = self._ruta(f".{self._lotes}{_EXT_VOLCANDO}")
+            os.replace(self._ruta(_EXT_SPOOL), volcando)
+
+        try:
+            _insertar(filas)
+        except Exception:
+            # No se propaga: la verificación del inspector ya quedó en disco
+            logger.exception("No se pudo volcar %s verificaciones; quedan en %s", len(filas), volcando)
+            return 0
+        finally:
+            with self._lock:
+                for fila in filas:
+                    if self._pendientes.get(fila["vehiculo_id"]) == fila["fecha"]:
+                        del self._pendientes[fila["vehiculo_id"]]
+
+        volcando.unlink(missing_ok=True)
+        return len(filas)
+
+    def ultimas_pendientes(self, vehiculo_ids):
+        """dict {vehiculo_id: fecha} de verificaciones encoladas y aún no insertadas."""
+        with self._lock:
+            return {v: self._pendientes[v] for v in vehiculo_ids if v in self._pendientes}
+
+
+_buffer = _BufferVerificaciones()
+
+
+@atexit.register
+def _volcar_al_salir():
+    # Apagado prolijo (gunicorn reinicia workers): no esperar a la recuperación
+    try:
+        _buffer.volcar()
+    except Exception:
+        pass
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# API pública
+# ─────────────────────────────────────────────────────────────────────────────
+
+def registrar_verificaciones(filas):
+    """
+    Registra verificaciones del inspector.
+
+    `filas` es una lista de dicts con vehiculo_id, inspector_id, subcuadra_id
+    (y opcionalmente resultado). Se les agrega la fecha, que se retorna en el
+    mismo orden. Con write-behind activo no toca la base; si no, hace un solo
+    bulk_create.
+    """
+    ahora = timezone.now()
+    filas = [{"resultado": "verificado", **fila, "fecha": ahora} for fila in filas]
+    if not filas:
+        return []
+    if write_behind_activo():
+        _buffer.encolar(filas)
+    else:
+        _insertar(filas)
+    return [fila["fecha"] for fila in filas]
+
+
+def volcar():
+    """Fuerza la inserción de lo encolado en este proceso."""
+    return _buffer.volcar()
+
+
+def ultimas_pendientes(vehiculo_ids):
+    """Última verificación aún no insertada por vehículo (solo este proceso)."""
+    return _buffer.ultimas_pendientes(vehiculo_ids)
+
+
+def recuperar_spools_huerfanos():
+    """
+    Inserta los spools de procesos que ya no existen y los .volcando que
+    quedaron de volcados fallidos. Retorna la cantidad de filas insertadas.
+
+    Lo usa el comando volcar_verificaciones; un proceso vivo nunca toca los
+    archivos de otro.
+    """
+    directorio = _spool_dir()
+    if fcntl is None or not directorio.is_dir():
+        return 0
+
+    insertadas = 0
+    for ruta_lock in directorio.glob(f"*{_EXT_LOCK}"):
+        token = ruta_lock.name[: -len(_EXT_LOCK)]
+        fd = os.open(ruta_lock, os.O_RDWR)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                huerfano = True
+            except BlockingIOError:
+                huerfano = False
+
+            archivos = sorted(directorio.glob(f"{token}.*{_EXT_VOLCANDO}"))
+            if huerfano:
+                archivos.append(directorio / f"{token}{_EXT_SPOOL}")
+
+            for archivo in archivos:
+                if not archivo.exists():
+                    continue
+                filas = _leer_spool(archivo)
+                if filas:
+                    _insertar(filas)
+                    insertadas += len(filas)
+                archivo.unlink()
+
+            if huerfano:
+                ruta_lock.unlink(missing_ok=True)
+        finally:
+            os.close(fd)
+    return insertadas
@@ -0,0 +1,223 @@
+# app_estacionamiento/services/rendiciones.py
+"""
+Certificación de cierres y armado de rendiciones a tesorería, por lote.
+
+Con 20 vendedores cerrando todos los días un municipio junta cientos de
+cierres por mes. Antes el admin certificaba de a uno (un POST por cierre) y
+crear_rendicion listaba cada cierre con su checkbox. Acá:
+
+  - certificar_cierres(): certifica un conjunto de cierres con un solo
+    UPDATE y deja una CertificacionCierre por cierre (auditoría).
+  - cierres_por_periodo(): los cierres listos para rendir agrupados por
+    día/semana/mes, ya sumados en la base (una fila por grupo).
+  - armar_rendicion(): crea la Rendicion, le vincula los cierres y genera
+    una LiquidacionComision por vendedor, todo en la misma transacción y
+    con agregaciones por conjunto (sin recorrer vendedor por vendedor).
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, DateField, Max, Min, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from app_estacionamiento.models import CertificacionCierre, CierreCaja, LiquidacionComision, Rendicion
+from app_estacionamiento.services.fechas import inicio_dia
+
+# Agrupación de cierres en el armado de la rendición → kind de Trunc
+AGRUPACIONES = {"diario": "day", "semanal": "week", "mensual": "month"}
+
+
+class RendicionInvalida(Exception):
+    """Los cierres pedidos no se pueden rendir (ya rendidos, sin certificar, de otro municipio)."""
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Certificación
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _certificar_postgres(cierres, admin_id, ahora):
+    """UPDATE … WHERE id IN (<queryset>) RETURNING id: un solo statement."""
+    qn = connection.ops.quote_name
+    subconsulta, params = cierres.values("id").order_by().query.sql_with_params()
+    sql = f"""
+        UPDATE {qn(CierreCaja._meta.db_table)}
+        SET certificado = %s, certificado_en = %s, certificado_por_id = %s
+        WHERE certificado = %s AND id IN ({subconsulta})
+        RETURNING id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [True, ahora, admin_id, False, *params])
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def _certificar_generico(cierres, admin_id, ahora):
+    """Bloquea los ids a certificar y los actualiza por id (SQLite no tiene RETURNING en UPDATE de Django)."""
+    ids = list(cierres.select_for_update().filter(certificado=False).values_list("id", flat=True))
+    if ids:
+        CierreCaja.objects.filter(id__in=ids, certificado=False).update(
+            certificado=True, certificado_en=ahora, certificado_por_id=admin_id,
+        )
+    return ids
+
+
+def certificar_cierres(admin, cierres, en_lote=True):
+    """
+    Certifica los cierres del queryset que todavía no estén certificados.
+
+    Un UPDATE marca los cierres y un bulk_create deja la CertificacionCierre
+    de cada uno. Los ya certificados se ignoran (no pisan quién ni cuándo).
+    Retorna la cantidad de cierres certificados.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            ids = _certificar_postgres(cierres, admin.pk, ahora)
+        else:
+            ids = _certificar_generico(cierres, admin.pk, ahora)
+        CertificacionCierre.objects.bulk_create(
+            [
+                CertificacionCierre(cierre_id=cierre_id, admin=admin, certificado_en=ahora, en_lote=en_lote)
+                for cierre_id in ids
+            ],
+            batch_size=1000,
+        )
+    return len(ids)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Armado de la rendición
+# ─────────────────────────────────────────────────────────────────────────────
+
+def cierres_a_rendir(municipio):
+    """Cierres del municipio certificados y todavía sin rendición."""
+    return CierreCaja.objects.filter(
+        usuario__municipio=municipio, certificado=True, rendicion__isnull=True,
+    )
+
+
+def cierres_por_periodo(municipio, agrupacion="diario"):
+    """
+    Cierres a rendir agrupados por día, semana o mes (fecha local del
+    cierre). Una fila por grupo: {grupo, cantidad, efectivo, transferencia,
+    digital, cobrado, comisiones}, del grupo más viejo al más nuevo.
+    """
+    kind = AGRUPACIONES.get(agrupacion, "day")
+    return (
+        cierres_a_rendir(municipio)
+        .annotate(grupo=Trunc("fecha_cierre", kind, output_field=DateField()))
+        .values("grupo")
+        .annotate(
+            cantidad=Count("id"),
+            efectivo=Sum("total_efectivo"),
+            transferencia=Sum("total_transferencia"),
+            digital=Sum("total_digital"),
+            cobrado=Sum("total_cobrado"),
+            comisiones=Sum("total_comisiones"),
+        )
+        .order_by("grupo")
+    )
+
+
+def _fin_grupo(inicio, agrupacion):
+    if agrupacion == "mensual":
+        return (inicio.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return inicio + timedelta(days=7 if agrupacion == "semanal" else 1)
+
+
+def filtro_grupos(grupos, agrupacion="diario"):
+    """
+    Q con los cierres de los grupos elegidos (fechas de inicio de
+    cierres_por_periodo), como rangos semiabiertos sobre fecha_cierre.
+    """
+    filtro = Q(pk__in=[])
+    for inicio in grupos:
+        filtro |= Q(
+            fecha_cierre__gte=inicio_dia(inicio),
+            fecha_cierre__lt=inicio_dia(_fin_grupo(inicio, agrupacion)),
+        )
+    return filtro
+
+
+def _liquidaciones(ids, municipio, rendicion):
+    """Una LiquidacionComision por vendedor con comisiones en los cierres `ids`."""
+    por_vendedor = (
+        CierreCaja.objects
+        .filter(id__in=ids, usuario__es_vendedor=True, total_comisiones__gt=0)
+        .values("usuario_id")
+        .annotate(monto=Sum("total_comisiones"), desde=Min("fecha_apertura"), hasta=Max("fecha_cierre"))
+        .order_by("usuario_id")
+    )
+    return LiquidacionComision.objects.bulk_create(
+        [
+            LiquidacionComision(
+                vendedor_id=fila["usuario_id"],
+                municipio=municipio,
+                rendicion=rendicion,
+                fecha_desde=timezone.localdate(fila["desde"]),
+                fecha_hasta=timezone.localdate(fila["hasta"]),
+                monto_total=fila["monto"],
+            )
+            for fila in por_vendedor
+        ],
+        batch_size=500,
+    )
+
+
+def armar_rendicion(admin, periodo, cierre_ids=None, grupos=None, agrupacion="diario",
+                    notas="", comprobante=None):
+    """
+    Crea la Rendicion de los cierres elegidos: por id (`cierre_ids`) o por
+    grupo de cierres_por_periodo (`grupos`, con su `agrupacion`).
+
+    En una transacción: bloquea los cierres, suma los totales en una query,
+    crea la rendición, vincula los cierres con un UPDATE y genera las
+    liquidaciones de comisión por vendedor. Con `cierre_ids`, si alguno no
+    se puede rendir no se crea nada y se levanta RendicionInvalida.
+
+    Retorna (rendicion, cantidad de cierres, liquidaciones creadas).
+    """
+    municipio = admin.municipio
+    with transaction.atomic():
+        cierres = cierres_a_rendir(municipio)
+        if cierre_ids is not None:
+            cierres = cierres.filter(id__in=cierre_ids)
+        else:
+            cierres = cierres.filter(filtro_grupos(grupos or [], agrupacion))
+        # select_for_update: dos admins rindiendo a la vez no se llevan el mismo cierre
+        ids = list(cierres.select_for_update().values_list("id", flat=True))
+        if not ids or (cierre_ids is not None and len(ids) != len(set(cierre_ids))):
+            raise RendicionInvalida(
+                "Algunos cierres seleccionados no son válidos (ya rendidos, no certificados o de otro municipio)."
+                if ids else "No hay cierres para rendir en la selección."
+            )
+
+        elegidos = CierreCaja.objects.filter(id__in=ids)
+        totales = elegidos.aggregate(
+            efectivo=Sum("total_efectivo"),
+            transferencia=Sum("total_transferencia"),
+            digital=Sum("total_digital"),
+            desde=Min("fecha_cierre"),
+            hasta=Max("fecha_cierre"),
+        )
+        # Para tesorería, transferencia + digital (débito/crédito/QR) se agrupan como "digital"
+        total_efectivo = totales["efectivo"] or Decimal("0")
+        total_digital  = (totales["transferencia"] or Decimal("0")) + (totales["digital"] or Decimal("0"))
+
+        rendicion = Rendicion.objects.create(
+            municipio           = municipio,
+            admin               = admin,
+            periodo             = periodo,
+            fecha_desde         = timezone.localdate(totales["desde"]),
+            fecha_hasta         = timezone.localdate(totales["hasta"]),
+            total_efectivo      = total_efectivo,
+            total_digital       = total_digital,
+            total_neto          = total_efectivo + total_digital,
+            notas_tesorero      = notas,
+            comprobante_archivo = comprobante,
+        )
+        elegidos.update(rendicion=rendicion)
+        liquidaciones = _liquidaciones(ids, municipio, rendicion)
+    return rendicion, len(ids), liquidaciones
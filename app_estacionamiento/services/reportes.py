@@ -0,0 +1,335 @@
+# app_estacionamiento/services/reportes.py
+"""
+Reportes generados en segundo plano (TrabajoReporte).
+
+El PDF para juzgado, el de la rendición, el de infracciones del día y la
+planilla de estadísticas de inspectores se armaban dentro del request: con
+meses de infracciones el worker de gunicorn quedaba ocupado (o llegaba al
+timeout) mientras reportlab/openpyxl recorrían todo. Ahora:
+
+  1. solicitar_reporte() normaliza los parámetros, calcula la huella
+     (sha256 de tipo + municipio + parámetros) y crea el TrabajoReporte.
+     Si ya hay uno igual en curso, o uno listo hace menos de
+     REUTILIZAR_LISTO_MINUTOS, devuelve ese.
+  2. El worker (`python manage.py generar_reportes --continuo`) lo toma
+     con un UPDATE condicional, genera el archivo con services/documentos.py
+     y lo guarda en storage_archivos() (ver models.py). Sin worker
+     desplegado (REPORTES_EN_SEGUNDO_PLANO=False) lo hace la vista que lo
+     pidió, con el mismo ejecutar_trabajo():
+
+         pendiente ──► procesando ──► listo
+                           │
+                           └────────► error  (se reintenta hasta MAX_INTENTOS)
+
+  3. El navegador consulta el estado (progreso 0–100) y descarga el archivo.
+
+Los archivos se borran a las RETENCION_HORAS (purgar_reportes(), lo llama
+el worker en cada pasada). Las descargas directas siguen disponibles.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import date, timedelta
+
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from app_estacionamiento.models import Rendicion, TrabajoReporte, Usuario
+from app_estacionamiento.services.cache_documentos import pdf_juzgado_cacheado, pdf_rendicion_cacheado
+from app_estacionamiento.services.documentos import (
+    generar_pdf_infracciones_dia,
+    generar_xlsx_estadisticas_inspectores,
+    rango_juzgado,
+)
+
+logger = logging.getLogger(__name__)
+
+# Trabajos por pasada del worker
+LOTE_REPORTES = 20
+
+# Un trabajo "procesando" sin terminar tras este tiempo se considera abandonado
+PROCESANDO_VENCE_MINUTOS = 15
+
+# Reintentos de un trabajo que terminó en error
+MAX_INTENTOS = 3
+
+# Un reporte listo con la misma huella se reutiliza durante este tiempo
+REUTILIZAR_LISTO_MINUTOS = 10
+
+# Los archivos generados se borran pasado este tiempo
+RETENCION_HORAS = 24
+
+PDF  = "application/pdf"
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Roles que pueden pedir cada tipo (los mismos que la descarga directa)
+ROLES_POR_TIPO = {
+    TrabajoReporte.JUZGADO:          ("admin",),
+    TrabajoReporte.RENDICION:        ("admin", "tesorero"),
+    TrabajoReporte.INFRACCIONES_DIA: ("inspector", "admin"),
+    TrabajoReporte.ESTADISTICAS:     ("admin",),
+}
+
+
+class ReporteInvalido(Exception):
+    """Tipo desconocido, parámetros inválidos o usuario sin permiso para el reporte."""
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Solicitud
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _tiene_rol(usuario, roles):
+    es_admin = usuario.is_superuser or usuario.is_staff or getattr(usuario, "es_admin", False)
+    return (
+        ("admin" in roles and es_admin)
+        or ("inspector" in roles and getattr(usuario, "es_inspector", False))
+        or ("tesorero" in roles and getattr(usuario, "es_tesorero", False))
+    )
+
+
+def _fecha_iso(valor, defecto):
+    try:
+        return date.fromisoformat(valor).isoformat()
+    except (TypeError, ValueError):
+        return defecto.isoformat()
+
+
+def normalizar_parametros(usuario, tipo, datos):
+    """
+    Parámetros de un reporte listos para guardar y para la huella: fechas
+    ISO ya resueltas (el mismo rango pedido de dos formas da la misma
+    huella) e ids validados contra el municipio del usuario.
+    """
+    municipio = usuario.municipio
+    hoy = timezone.localtime().date()
+
+    if tipo == TrabajoReporte.JUZGADO:
+        desde, hasta = rango_juzgado(datos.get("frecuencia", "mensual"), datos.get("desde"), datos.get("hasta"))
+        return {"desde": desde.isoformat(), "hasta": hasta.isoformat()}
+
+    if tipo == TrabajoReporte.RENDICION:
+        try:
+            rendicion_id = int(datos.get("rendicion_id"))
+        except (TypeError, ValueError):
+            raise ReporteInvalido("Rendición inválida.")
+        if not Rendicion.objects.filter(id=rendicion_id, municipio=municipio).exists():
+            raise ReporteInvalido("Rendición no encontrada.")
+        return {"rendicion_id": rendicion_id}
+
+    if tipo == TrabajoReporte.INFRACCIONES_DIA:
+        # Como en la descarga directa: las infracciones de quien lo pide
+        return {"inspector_id": usuario.pk, "fecha": _fecha_iso(datos.get("fecha"), hoy)}
+
+    # ESTADISTICAS
+    parametros = {
+        "desde": _fecha_iso(datos.get("desde"), hoy.replace(day=1)),
+        "hasta": _fecha_iso(datos.get("hasta"), hoy),
+    }
+    try:
+        inspector_id = int(datos.get("inspector_id") or 0)
+    except (TypeError, ValueError):
+        inspector_id = 0
+    if inspector_id and Usuario.objects.filter(
+        id=inspector_id, municipio=municipio, es_inspector=True,
+    ).exists():
+        parametros["inspector_id"] = inspector_id
+    return parametros
+
+
+def puede_ver_reporte(usuario, trabajo):
+    """
+    El trabajo es del municipio del usuario y el usuario tiene el rol del
+    tipo. Las infracciones del día solo las ve el inspector que las pidió.
+    """
+    if trabajo.municipio_id != usuario.municipio_id or not _tiene_rol(usuario, ROLES_POR_TIPO[trabajo.tipo]):
+        return False
+    if trabajo.tipo == TrabajoReporte.INFRACCIONES_DIA:
+        return trabajo.parametros.get("inspector_id") == usuario.pk
+    return True
+
+
+def huella_reporte(tipo, municipio_id, parametros):
+    """sha256 hex de tipo + municipio + parámetros (con las claves ordenadas)."""
+    texto = json.dumps([tipo, municipio_id, parametros], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def solicitar_reporte(usuario, tipo, datos):
+    """
+    Pide un reporte. Retorna (trabajo, nuevo).
+
+    Reutiliza el trabajo en curso con la misma huella, o uno listo hace
+    menos de REUTILIZAR_LISTO_MINUTOS. Levanta ReporteInvalido si el tipo
+    no existe, el usuario no tiene el rol o los parámetros no valen.
+    """
+    if tipo not in ROLES_POR_TIPO:
+        raise ReporteInvalido("Tipo de reporte desconocido.")
+    if usuario.municipio_id is None or not _tiene_rol(usuario, ROLES_POR_TIPO[tipo]):
+        raise ReporteInvalido("No tenés permiso para este reporte.")
+
+    parametros = normalizar_parametros(usuario, tipo, datos)
+    huella = huella_reporte(tipo, usuario.municipio_id, parametros)
+    reciente = timezone.now() - timedelta(minutes=REUTILIZAR_LISTO_MINUTOS)
+    previo = (
+        TrabajoReporte.objects
+        .filter(
+            Q(estado__in=[TrabajoReporte.PENDIENTE, TrabajoReporte.PROCESANDO])
+            | Q(estado=TrabajoReporte.LISTO, terminado_en__gte=reciente),
+            huella=huella,
+        )
+        .order_by("-id")
+        .first()
+    )
+    if previo is not None:
+        return previo, False
+    try:
+        with transaction.atomic():
+            trabajo = TrabajoReporte.objects.create(
+                tipo=tipo,
+                parametros=parametros,
+                huella=huella,
+                municipio_id=usuario.municipio_id,
+                solicitado_por=usuario,
+            )
+        return trabajo, True
+    except IntegrityError:
+        # Otro request creó el mismo trabajo entre la consulta y el INSERT
+        return TrabajoReporte.objects.get(
+            huella=huella, estado__in=[TrabajoReporte.PENDIENTE, TrabajoReporte.PROCESANDO],
+        ), False
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Generación
+# ─────────────────────────────────────────────────────────────────────────────
+
+def generar_archivo(trabajo):
+    """(contenido en bytes, nombre del archivo, content type) del reporte."""
+    p = trabajo.parametros
+    municipio = trabajo.municipio
+
+    if trabajo.tipo == TrabajoReporte.JUZGADO:
+        desde, hasta = date.fromisoformat(p["desde"]), date.fromisoformat(p["hasta"])
+        nombre = f"infracciones_impagas_{desde:%Y%m%d}_{hasta:%Y%m%d}.pdf"
+        return pdf_juzgado_cacheado(municipio, desde, hasta), nombre, PDF
+
+    if trabajo.tipo == TrabajoReporte.RENDICION:
+        rendicion = Rendicion.objects.select_related("municipio", "admin", "tesorero").get(
+            id=p["rendicion_id"], municipio=municipio,
+        )
+        nombre = f"rendicion_{rendicion.fecha_desde:%Y%m%d}_{rendicion.fecha_hasta:%Y%m%d}.pdf"
+        return pdf_rendicion_cacheado(rendicion), nombre, PDF
+
+    if trabajo.tipo == TrabajoReporte.INFRACCIONES_DIA:
+        inspector = Usuario.objects.get(id=p["inspector_id"])
+        fecha = date.fromisoformat(p["fecha"])
+        nombre = f"infracciones_{fecha:%Y%m%d}_{inspector.id}.pdf"
+        return generar_pdf_infracciones_dia(inspector, fecha), nombre, PDF
+
+    desde, hasta = date.fromisoformat(p["desde"]), date.fromisoformat(p["hasta"])
+    inspector_sel = Usuario.objects.filter(id=p.get("inspector_id")).first() if p.get("inspector_id") else None
+    nombre = f"inspectores_{desde:%Y%m%d}_{hasta:%Y%m%d}.xlsx"
+    return generar_xlsx_estadisticas_inspectores(municipio, desde, hasta, inspector_sel), nombre, XLSX
+
+
+def _por_procesar(ahora):
+    """Filtro: pendientes, procesando abandonados, o con error y reintentos disponibles."""
+    vencido = ahora - timedelta(minutes=PROCESANDO_VENCE_MINUTOS)
+    return (
+        Q(estado=TrabajoReporte.PENDIENTE)
+        | Q(estado=TrabajoReporte.PROCESANDO, estado_desde__lt=vencido)
+        | Q(estado=TrabajoReporte.ERROR, intentos__lt=MAX_INTENTOS)
+    )
+
+
+def _tomar(trabajo_id, ahora):
+    """
+    UPDATE condicional a "procesando". True si este proceso se quedó con el
+    trabajo. Un reintento de un trabajo con error puede chocar con otro en
+    curso de la misma huella (restricción única): ese queda como está.
+    """
+    try:
+        with transaction.atomic():
+            return TrabajoReporte.objects.filter(_por_procesar(ahora), id=trabajo_id).update(
+                estado=TrabajoReporte.PROCESANDO,
+                estado_desde=ahora,
+                intentos=F("intentos") + 1,
+                progreso=10,
+                error="",
+            ) == 1
+    except IntegrityError:
+        return False
+
+
+def ejecutar_trabajo(trabajo_id):
+    """
+    Genera el archivo de un TrabajoReporte y lo guarda en el storage.
+
+    Retorna el estado final, o None si el trabajo no estaba para procesar
+    (u otro worker lo tomó). Si otro worker lo retomó mientras este
+    generaba, el archivo recién guardado se borra.
+    """
+    tomado = timezone.now()
+    if not _tomar(trabajo_id, tomado):
+        return None
+    trabajo = TrabajoReporte.objects.select_related("municipio").get(id=trabajo_id)
+    propio = TrabajoReporte.objects.filter(
+        id=trabajo_id, estado=TrabajoReporte.PROCESANDO, estado_desde=tomado,
+    )
+    try:
+        contenido, nombre, content_type = generar_archivo(trabajo)
+        propio.update(progreso=90)
+        archivo = trabajo.archivo.field.generate_filename(trabajo, f"{trabajo.pk}_{nombre}")
+        archivo = trabajo.archivo.storage.save(archivo, ContentFile(contenido))
+    except Exception as e:
+        logger.warning("Reporte #%s (%s) falló: %s", trabajo_id, trabajo.tipo, e)
+        propio.update(estado=TrabajoReporte.ERROR, estado_desde=timezone.now(), error=str(e)[:1000])
+        return TrabajoReporte.ERROR
+
+    ahora = timezone.now()
+    if not propio.update(
+        estado=TrabajoReporte.LISTO, estado_desde=ahora, terminado_en=ahora, progreso=100,
+        archivo=archivo, nombre_archivo=nombre, content_type=content_type,
+    ):
+        trabajo.archivo.storage.delete(archivo)
+        return None
+    return TrabajoReporte.LISTO
+
+
+def _pendientes(limite):
+    return list(
+        TrabajoReporte.objects.filter(_por_procesar(timezone.now()))
+        .order_by("id")
+        .values_list("id", flat=True)[:limite]
+    )
+
+
+def procesar_reportes_pendientes(limite=LOTE_REPORTES):
+    """Genera hasta `limite` reportes en este proceso. Retorna dict {listos, errores}."""
+    estados = [ejecutar_trabajo(trabajo_id) for trabajo_id in _pendientes(limite)]
+    return {
+        "listos":  estados.count(TrabajoReporte.LISTO),
+        "errores": estados.count(TrabajoReporte.ERROR),
+    }
+
+
+def purgar_reportes(ahora=None):
+    """
+    Borra los trabajos terminados hace más de RETENCION_HORAS y sus
+    archivos. Retorna la cantidad de trabajos borrados.
+    """
+    limite = (ahora or timezone.now()) - timedelta(hours=RETENCION_HORAS)
+    viejos = list(
+        TrabajoReporte.objects
+        .filter(estado__in=[TrabajoReporte.LISTO, TrabajoReporte.ERROR], estado_desde__lt=limite)
+        .exclude(estado=TrabajoReporte.ERROR, intentos__lt=MAX_INTENTOS)
+    )
+    for trabajo in viejos:
+        if trabajo.archivo:
+            trabajo.archivo.delete(save=False)
+    TrabajoReporte.objects.filter(id__in=[t.id for t in viejos]).delete()
+    return len(viejos)
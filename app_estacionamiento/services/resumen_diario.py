@@ -0,0 +1,193 @@
+# app_estacionamiento/services/resumen_diario.py
+"""
+Resumen diario de recaudación (ResumenDiario).
+
+Los reportes de recaudación (dashboard_admin, el informe por email de
+admin_rendiciones) sumaban MovimientoCaja completo en cada request. Acá se
+suma una vez por día cerrado, agrupado por (usuario, fecha, medio_pago,
+tipo), y los reportes leen esas filas: unos miles en vez de millones.
+
+Construcción (`python manage.py construir_resumen_diario`, de noche):
+  - Solo días cerrados (anteriores a hoy, fecha local). Cada día se borra y
+    se vuelve a insertar entero dentro de una transacción: correrlo dos
+    veces da lo mismo.
+  - Días nuevos: desde el último día construido (inclusive, por los
+    movimientos que confirmaron pasada la medianoche) hasta ayer.
+  - Filas tardías: MovimientoCaja con id mayor al último procesado pero de
+    un día ya construido (p. ej. cobros offline sincronizados después). Se
+    reconstruyen esos días.
+  - --desde/--hasta reconstruyen un rango a mano.
+
+Lectura: recaudacion_por_usuario() suma ResumenDiario hasta el último día
+construido y MovimientoCaja en vivo después de ese día (hoy, y ayer si la
+construcción de la noche todavía no corrió).
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from app_estacionamiento.models import MovimientoCaja, ResumenDiario, Usuario
+from app_estacionamiento.services.fechas import filtro_fechas
+
+# Días por transacción al construir un rango largo (la primera vez, o con --desde)
+LOTE_DIAS = 31
+
+
+def ultimo_dia_construido():
+    """Fecha más nueva presente en ResumenDiario, o None si nunca se construyó."""
+    return ResumenDiario.objects.aggregate(m=Max("fecha"))["m"]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Construcción
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _reconstruir_rango(desde, hasta):
+    """Borra y vuelve a sumar los días desde..hasta (inclusive). Retorna filas creadas."""
+    filas = (
+        MovimientoCaja.objects
+        .filter(**filtro_fechas("creado_en", desde, hasta))
+        .annotate(fecha=TruncDate("creado_en"))
+        .values("fecha", "usuario_id", "usuario__municipio_id", "medio_pago", "tipo")
+        .annotate(
+            total=Sum("monto"),
+            cantidad=Count("id"),
+            comisiones=Sum("comision_monto"),
+            ultimo=Max("id"),
+        )
+        .order_by()
+    )
+    ahora = timezone.now()
+    resumenes = [
+        ResumenDiario(
+            municipio_id=f["usuario__municipio_id"],
+            usuario_id=f["usuario_id"],
+            fecha=f["fecha"],
+            medio_pago=f["medio_pago"],
+            tipo=f["tipo"],
+            total=f["total"] or 0,
+            cantidad=f["cantidad"],
+            comisiones=f["comisiones"] or 0,
+            ultimo_movimiento_id=f["ultimo"],
+            actualizado_en=ahora,
+        )
+        for f in filas
+    ]
+    with transaction.atomic():
+        ResumenDiario.objects.filter(fecha__gte=desde, fecha__lte=hasta).delete()
+        ResumenDiario.objects.bulk_create(resumenes, batch_size=1000)
+    return len(resumenes)
+
+
+def _dias_con_filas_tardias(hasta):
+    """Días ≤ hasta con movimientos posteriores al último id procesado."""
+    marca = ResumenDiario.objects.aggregate(m=Max("ultimo_movimiento_id"))["m"]
+    if marca is None:
+        return []
+    return sorted(
+        MovimientoCaja.objects
+        .filter(id__gt=marca, **filtro_fechas("creado_en", hasta=hasta))
+        .annotate(fecha=TruncDate("creado_en"))
+        .values_list("fecha", flat=True)
+        .distinct()
+        .order_by()
+    )
+
+
+def construir_resumen_diario(desde=None, hasta=None, lote_dias=LOTE_DIAS):
+    """
+    Construye ResumenDiario para los días cerrados pendientes.
+
+    Sin argumentos hace la pasada incremental (días nuevos + filas
+    tardías). Con `desde` reconstruye desde..hasta entero; `hasta` nunca
+    pasa de ayer. Retorna dict con los días reconstruidos y las filas creadas.
+    """
+    ayer  = timezone.localdate() - timedelta(days=1)
+    hasta = min(hasta or ayer, ayer)
+
+    dias_sueltos = []
+    if desde is None:
+        desde = ultimo_dia_construido()
+        if desde is None:
+            primero = MovimientoCaja.objects.aggregate(m=Min("creado_en"))["m"]
+            desde = timezone.localdate(primero) if primero else hasta + timedelta(days=1)
+        dias_sueltos = [d for d in _dias_con_filas_tardias(hasta) if d < desde]
+
+    dias = filas = 0
+    for dia in dias_sueltos:
+        filas += _reconstruir_rango(dia, dia)
+        dias += 1
+    inicio = desde
+    while inicio <= hasta:
+        fin = min(inicio + timedelta(days=lote_dias - 1), hasta)
+        filas += _reconstruir_rango(inicio, fin)
+        dias += (fin - inicio).days + 1
+        inicio = fin + timedelta(days=1)
+    return {"dias": dias, "filas": filas}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Lectura
+# ─────────────────────────────────────────────────────────────────────────────
+
+def recaudacion_por_usuario(municipio, desde=None, hasta=None, tipo="ingreso"):
+    """
+    Recaudación por usuario del municipio entre desde..hasta (fechas
+    locales, inclusive; None = sin límite). `tipo=None` suma ingresos y egresos.
+
+    Retorna lista de dicts {usuario, total, cantidad, comisiones} ordenada
+    por total descendente.
+    """
+    corte = ultimo_dia_construido()
+    acumulado = defaultdict(lambda: {"total": Decimal("0"), "cantidad": 0, "comisiones": Decimal("0")})
+
+    def _sumar(filas):
+        for f in filas:
+            a = acumulado[f["usuario_id"]]
+            a["total"]      += f["total"] or 0
+            a["cantidad"]   += f["cantidad"] or 0
+            a["comisiones"] += f["comisiones"] or 0
+
+    if corte is not None and (desde is None or desde <= corte):
+        resumen = ResumenDiario.objects.filter(municipio=municipio, fecha__lte=corte)
+        if desde:
+            resumen = resumen.filter(fecha__gte=desde)
+        if hasta:
+            resumen = resumen.filter(fecha__lte=hasta)
+        if tipo:
+            resumen = resumen.filter(tipo=tipo)
+        _sumar(
+            resumen.values("usuario_id")
+            .annotate(total=Sum("total"), cantidad=Sum("cantidad"), comisiones=Sum("comisiones"))
+            .order_by()
+        )
+
+    # Lo que todavía no está en el resumen, desde MovimientoCaja
+    inicio_vivo = desde
+    if corte is not None and (inicio_vivo is None or inicio_vivo <= corte):
+        inicio_vivo = corte + timedelta(days=1)
+    if inicio_vivo is None or hasta is None or inicio_vivo <= hasta:
+        vivo = MovimientoCaja.objects.filter(
+            usuario__municipio=municipio, **filtro_fechas("creado_en", inicio_vivo, hasta),
+        )
+        if tipo:
+            vivo = vivo.filter(tipo=tipo)
+        _sumar(
+            vivo.values("usuario_id")
+            .annotate(total=Sum("monto"), cantidad=Count("id"), comisiones=Sum("comision_monto"))
+            .order_by()
+        )
+
+    usuarios = Usuario.objects.in_bulk(list(acumulado))
+    resultado = [
+        {"usuario": usuarios[u], **totales}
+        for u, totales in acumulado.items() if u in usuarios
+    ]
+    resultado.sort(key=lambda r: r["total"], reverse=True)
+    return resultado
@@ -4,16 +4,215 @@ Lógica de negocio relacionada con el saldo de los conductores.
 
 Responsabilidades:
 - Carga manual de saldo por parte de un admin (con registro contable)
+- Libro de saldo (SaldoMovimiento): acreditaciones, débitos y compactación
 
 La acreditación automática vía MercadoPago vive en:
     use_cases/acreditar_saldo_mp.py
+
+Libro de saldo:
+  Antes cada débito, reintegro o carga tomaba select_for_update() sobre la
+  fila del Usuario y la tenía bloqueada hasta el final de la transacción
+  (en estacionar_vehiculo, mientras se chequeaban infracciones y se creaba el
+  estacionamiento). Ahora cada operación INSERTA una fila en SaldoMovimiento
+  y el Usuario no se bloquea:
+
+  - Acreditar: INSERT con monto positivo. No necesita ningún lock.
+  - Debitar: INSERT ... SELECT ... WHERE saldo_actual >= monto (un solo
+    statement). En PostgreSQL los débitos del mismo usuario se serializan con
+    pg_advisory_xact_lock para que dos débitos concurrentes no pasen los dos
+    el chequeo; no bloquea acreditaciones, compactación ni otras escrituras
+    sobre el Usuario. En SQLite las escrituras ya están serializadas.
+  - Leer: saldo_actual() = snapshot (Usuario.saldo) + filas no compactadas,
+    en una sola query.
+  - Compactar: compactar_saldos() suma las filas pendientes al snapshot con
+    F() y las marca compactado=True en la misma transacción. Corre
+    periódicamente con `python manage.py compactar_saldos` y, al confirmarse
+    una operación, solo si el usuario ya acumula COMPACTAR_DESDE filas
+    pendientes: compactar en cada operación volvía a escribir la fila del
+    Usuario cada vez, que es justo la contención que el libro evita.
+
+  El snapshot puede ir atrasado, así que lo que se muestra usa
+  Usuario.saldo_al_dia (o con_saldo_al_dia() en los listados) y las
+  decisiones (alcanza / no alcanza) siempre usan saldo_actual().
 """
 
+import logging
+from collections import defaultdict
 from decimal import Decimal
 
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import Case, Count, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from app_estacionamiento.models import MovimientoCaja, SaldoMovimiento, Usuario
+
+logger = logging.getLogger(__name__)
+
+# Filas del libro por transacción de compactación
+LOTE_COMPACTACION = 1000
+
+# Filas pendientes de un usuario a partir de las cuales una operación lo compacta
+COMPACTAR_DESDE = 50
+
+# Primer clave de pg_advisory_xact_lock(int, int): separa estos locks de otros usos
+_LOCK_DEBITOS = 8001
+
+_DECIMAL = DecimalField(max_digits=12, decimal_places=2)
+
+
+class SaldoInsuficiente(ValueError):
+    """El saldo del conductor no alcanza para el débito; el mensaje va al usuario."""
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Lectura
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _pendiente(cuenta):
+    """Subquery: suma de las filas no compactadas del usuario en la cuenta."""
+    return Coalesce(
+        Subquery(
+            SaldoMovimiento.objects
+            .filter(usuario=OuterRef("pk"), cuenta=cuenta, compactado=False)
+            .values("usuario")
+            .annotate(total=Sum("monto"))
+            .values("total")[:1],
+            output_field=_DECIMAL,
+        ),
+        Value(Decimal("0")),
+        output_field=_DECIMAL,
+    )
+
+
+def saldo_actual(usuario, cuenta=SaldoMovimiento.CUENTA_SALDO):
+    """
+    Saldo real del usuario: snapshot + movimientos aún no compactados.
+
+    Una sola query, así el snapshot y los pendientes se leen consistentes
+    aunque una compactación confirme en el medio.
+    """
+    snapshot, pendiente = (
+        Usuario.objects
+        .filter(pk=usuario.pk)
+        .annotate(pendiente=_pendiente(cuenta))
+        .values_list(cuenta, "pendiente")
+        .get()
+    )
+    return snapshot + pendiente
+
+
+def con_saldo_al_dia(queryset):
+    """
+    Anota saldo_al_dia (snapshot + pendientes de la cuenta saldo) en cada
+    usuario del queryset: los listados no hacen una consulta por fila.
+    """
+    return queryset.annotate(
+        saldo_al_dia=F("saldo") + _pendiente(SaldoMovimiento.CUENTA_SALDO),
+    )
 
-from app_estacionamiento.models import MovimientoCaja
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Escritura
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _compactar_si_acumula(*usuario_ids):
+    """
+    Al confirmar, compacta los usuarios con COMPACTAR_DESDE filas pendientes
+    o más. El resto lo recoge el comando compactar_saldos.
+    """
+    def _compactar():
+        try:
+            acumulados = list(
+                SaldoMovimiento.objects
+                .filter(usuario_id__in=usuario_ids, compactado=False)
+                .values("usuario_id")
+                .annotate(pendientes=Count("id"))
+                .filter(pendientes__gte=COMPACTAR_DESDE)
+                .values_list("usuario_id", flat=True)
+            )
+            if acumulados:
+                compactar_saldos(usuario_ids=acumulados)
+        except Exception:
+            logger.exception("No se pudo compactar el saldo de los usuarios %s", usuario_ids)
+    transaction.on_commit(_compactar)
+
+
+def acreditar_saldo(usuario_id, monto: Decimal, descripcion: str = "",
+                    cuenta=SaldoMovimiento.CUENTA_SALDO):
+    """
+    Suma `monto` al saldo del usuario agregando una fila al libro.
+
+    No bloquea al Usuario. Retorna el SaldoMovimiento creado.
+    """
+    movimiento = SaldoMovimiento.objects.create(
+        usuario_id=usuario_id,
+        cuenta=cuenta,
+        monto=monto,
+        descripcion=descripcion[:255],
+    )
+    _compactar_si_acumula(usuario_id)
+    return movimiento
+
+
+def acreditar_saldos(creditos):
+    """
+    Versión por lote de acreditar_saldo: lista de (usuario_id, monto, descripcion).
+
+    Un solo bulk_create (lo usa finalizar_lote para los reintegros).
+    """
+    if not creditos:
+        return []
+    movimientos = SaldoMovimiento.objects.bulk_create([
+        SaldoMovimiento(usuario_id=usuario_id, monto=monto, descripcion=descripcion[:255])
+        for usuario_id, monto, descripcion in creditos
+    ])
+    for usuario_id in {c[0] for c in creditos}:
+        _compactar_si_acumula(usuario_id)
+    return movimientos
+
+
+def _serializar_debitos(usuario_id):
+    """En PostgreSQL, lock de transacción solo para los débitos de este usuario."""
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", [_LOCK_DEBITOS, usuario_id])
+
+
+def _insertar_debito(usuario_id, monto, descripcion, cuenta):
+    """
+    INSERT condicional: agrega la fila −monto solo si el saldo alcanza.
+
+    Retorna True si se insertó. El ROUND evita que la suma en punto flotante
+    de SQLite deje un saldo exacto apenas por debajo del monto.
+    """
+    qn = connection.ops.quote_name
+    libro   = qn(SaldoMovimiento._meta.db_table)
+    usuario = qn(Usuario._meta.db_table)
+    columna = qn(cuenta)
+    sql = f"""
+        INSERT INTO {libro} (usuario_id, cuenta, monto, descripcion, creado_en, compactado)
+        SELECT %s, %s, %s, %s, %s, %s
+        WHERE ROUND(
+            (SELECT u.{columna} FROM {usuario} u WHERE u.id = %s)
+            + COALESCE((
+                SELECT SUM(m.monto) FROM {libro} m
+                WHERE m.usuario_id = %s AND m.cuenta = %s AND m.compactado = %s
+            ), 0),
+            2
+        ) >= CAST(%s AS NUMERIC)
+    """
+    params = [
+        usuario_id, cuenta, -monto, descripcion[:255],
+        connection.ops.adapt_datetimefield_value(timezone.now()), False,
+        usuario_id,
+        usuario_id, cuenta, False,
+        monto,
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount == 1
 
 
 def cargar_saldo_conductor(admin, conductor, monto: Decimal):
@@ -21,7 +220,7 @@ def cargar_saldo_conductor(admin, conductor, monto: Decimal):
     El admin carga saldo a un conductor manualmente (cobro en efectivo, corrección, etc.).
 
     Pasos:
-    1. Suma el monto al saldo del conductor.
+    1. Agrega la acreditación al libro de saldo del conductor.
     2. Registra el ingreso en la caja del admin (para trazabilidad y rendición).
 
     Parámetros:
@@ -30,7 +229,7 @@ def cargar_saldo_conductor(admin, conductor, monto: Decimal):
         monto: Decimal positivo a acreditar
 
     Retorna:
-        El conductor con el saldo actualizado.
+        El conductor (su saldo real se lee con saldo_actual).
 
     Lanza:
         ValueError si el monto es menor o igual a 0.
@@ -39,8 +238,9 @@ def cargar_saldo_conductor(admin, conductor, monto: Decimal):
         raise ValueError("El monto debe ser mayor a 0.")
 
     with transaction.atomic():
-        conductor.saldo += monto
-        conductor.save(update_fields=["saldo"])
+        acreditar_saldo(
+            conductor.pk, monto, descripcion=f"Carga de saldo por {admin.correo}",
+        )
 
         MovimientoCaja.objects.create(
             usuario=admin,
@@ -57,27 +257,85 @@ def debitar_saldo_conductor(conductor, monto: Decimal, descripcion: str = ""):
     """
     Descuenta saldo al conductor y registra el egreso en caja.
 
-    IMPORTANTE: debe llamarse desde dentro de un bloque transaction.atomic()
-    con el conductor ya bloqueado con select_for_update(). No abre su propia
-    transacción para no romper el lock del llamador.
+    El débito es un INSERT condicional en el libro: no hace falta bloquear
+    al conductor con select_for_update(). Si se llama dentro de un
+    transaction.atomic() del llamador, el débito se deshace junto con el
+    resto si algo falla después.
 
     Parámetros:
-        conductor: instancia de Usuario ya bloqueada (select_for_update)
+        conductor: instancia de Usuario
         monto:     Decimal a descontar
         descripcion: texto para el MovimientoCaja
 
     Lanza:
-        ValueError si el saldo es insuficiente.
+        SaldoInsuficiente si el saldo no alcanza.
     """
-    if conductor.saldo < monto:
-        raise ValueError(
-            f"Saldo insuficiente. Disponible: {conductor.saldo}, requerido: {monto}."
+    with transaction.atomic():
+        _serializar_debitos(conductor.pk)
+        if not _insertar_debito(conductor.pk, monto, descripcion, SaldoMovimiento.CUENTA_SALDO):
+            raise SaldoInsuficiente(
+                f"Saldo insuficiente. Disponible: {saldo_actual(conductor)}, requerido: {monto}."
+            )
+        MovimientoCaja.objects.create(
+            usuario=conductor,
+            monto=monto,
+            tipo="egreso",
+            descripcion=descripcion,
         )
-    conductor.saldo -= monto
-    conductor.save(update_fields=["saldo"])
-    MovimientoCaja.objects.create(
-        usuario=conductor,
-        monto=monto,
-        tipo="egreso",
-        descripcion=descripcion,
+    _compactar_si_acumula(conductor.pk)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Compactación
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _delta(campo, deltas):
+    """F(campo) + Case por usuario con el total a sumarle."""
+    return F(campo) + Case(
+        *[When(id=u, then=Value(total)) for u, total in deltas.items()],
+        default=Value(Decimal("0")),
+        output_field=_DECIMAL,
     )
+
+
+def compactar_saldos(usuario_ids=None, lote=LOTE_COMPACTACION):
+    """
+    Pasa las filas no compactadas del libro al snapshot de Usuario.
+
+    Por lote y en una transacción: toma las filas pendientes (SKIP LOCKED:
+    si otro proceso está compactando las mismas, las deja), suma por usuario
+    y cuenta, hace un UPDATE con F() sobre Usuario y marca las filas.
+    El saldo real (snapshot + pendientes) no cambia en ningún momento.
+
+    Con usuario_ids se limita a esos usuarios. Retorna la cantidad de filas
+    compactadas.
+    """
+    compactadas = 0
+    while True:
+        with transaction.atomic():
+            pendientes = SaldoMovimiento.objects.filter(compactado=False)
+            if usuario_ids is not None:
+                pendientes = pendientes.filter(usuario_id__in=usuario_ids)
+            filas = list(
+                pendientes.select_for_update(skip_locked=True)
+                .order_by("id")
+                .values_list("id", "usuario_id", "cuenta", "monto")[:lote]
+            )
+            if not filas:
+                return compactadas
+
+            deltas = {
+                SaldoMovimiento.CUENTA_SALDO:     defaultdict(Decimal),
+                SaldoMovimiento.CUENTA_OPERATIVO: defaultdict(Decimal),
+            }
+            for _, usuario_id, cuenta, monto in filas:
+                deltas[cuenta][usuario_id] += monto
+
+            cambios = {campo: _delta(campo, d) for campo, d in deltas.items() if d}
+            usuarios = set().union(*(d.keys() for d in deltas.values()))
+            Usuario.objects.filter(id__in=usuarios).update(**cambios)
+            SaldoMovimiento.objects.filter(id__in=[f[0] for f in filas]).update(compactado=True)
+
+        compactadas += len(filas)
+        if len(filas) < lote:
+            return compactadas
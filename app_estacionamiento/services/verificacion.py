@@ -6,6 +6,7 @@ Responsabilidades:
 - Determinar si un vehículo está pagado, en deuda, exento o con abono activo
 - Registrar la verificación del inspector (trazabilidad)
 - Calcular tolerancia entre verificaciones consecutivas
+- Verificar un lote de patentes de la misma subcuadra con queries constantes
 """
 
 from datetime import date, timedelta
@@ -16,14 +17,13 @@ from django.utils import timezone
 from app_estacionamiento.domain.enums import EstadoVehiculo
 from app_estacionamiento.domain.verificacion import ResultadoVerificacion
 from app_estacionamiento.domain.enums import MINUTOS_ENTRE_INFRACCIONES
-from app_estacionamiento.models import (
-    AbonoMensual,
-    Estado,
-    Estacionamiento,
-    Infraccion,
-    VerificacionInspector,
-    Vehiculo,
+from app_estacionamiento.services.indice_patentes import (
+    PatenteStatusIndex,
+    abono_vigente,
+    subcuadras_exentas,
+    ultima_infraccion,
 )
+from app_estacionamiento.services.registro_verificaciones import registrar_verificaciones
 
 # Minutos de tolerancia entre verificaciones sucesivas del inspector.
 # Distinto de municipio.tolerancia_multa_minutos (que es la ventana de pago de multas).
@@ -35,27 +35,14 @@ def _url_infraccion(patente):
     return reverse("inspectores_registrar_infraccion") + f"?patente={patente}"
 
 
-def verificar_estado_vehiculo(patente, usuario, subcuadra):
+def _resolver_estado(patente, estado, subcuadra, municipio):
     """
-    Verifica el estado de un vehículo para el inspector.
-
-    Orden de evaluación:
-    1. Vehículo no registrado       → NO_REGISTRADO
-    2. Exento total                 → EXENTO_TOTAL
-    3. Estacionamiento activo       → PAGADO
-    4. Abono mensual vigente        → ABONO_ACTIVO
-    5. Exento parcial en subcuadra  → EXENTO_PARCIAL
-    6. Dentro de tolerancia         → PENDIENTE_PAGO
-    7. Infracción reciente (<15min) → INFRACCION_RECIENTE
-    8. Sin pago                     → IMPAGO
+    Traduce el registro de PatenteStatusIndex a un ResultadoVerificacion.
 
-    Registra siempre la verificación para trazabilidad.
+    No toca la base: toda la información ya viene en `estado`.
+    `estado` es None cuando la patente no está registrada.
     """
-    municipio = getattr(usuario, "municipio", None)
-
-    vehiculo = Vehiculo.objects.filter(patente=patente).first()
-
-    if not vehiculo:
+    if estado is None:
         return ResultadoVerificacion(
             patente=patente,
             estado=EstadoVehiculo.NO_REGISTRADO,
@@ -64,37 +51,22 @@ def verificar_estado_vehiculo(patente, usuario, subcuadra):
             registrar_infraccion_url=_url_infraccion(patente),
         )
 
-    # Guardar la verificación anterior ANTES de crear la nueva (para tolerancia)
-    verificacion_anterior = VerificacionInspector.objects.filter(
-        vehiculo=vehiculo
-    ).order_by("-fecha").first()
-
-    VerificacionInspector.objects.create(
-        vehiculo=vehiculo,
-        inspector=usuario,
-        subcuadra=subcuadra,
-        resultado="verificado",
-    )
-
-    # 1. EXENTO TOTAL — solo si la vigencia no expiró
     # vigencia_exencion=None significa sin vencimiento (indefinida).
     # Si la fecha venció, el vehículo cae al flujo normal y puede recibir infracción.
-    if getattr(vehiculo, "exento_global", False):
-        vigencia = getattr(vehiculo, "vigencia_exencion", None)
-        if vigencia is None or vigencia >= date.today():
-            return ResultadoVerificacion(
-                patente=patente,
-                estado=EstadoVehiculo.EXENTO_TOTAL,
-                estacionamiento_activo=True,
-                tipo_exencion=getattr(vehiculo, "tipo_exencion", None),
-            )
+    vigencia = estado["vigencia_exencion"]
+    exencion_vigente = vigencia is None or vigencia >= date.today()
 
-    # 2. ESTACIONAMIENTO ACTIVO
-    estacionamiento = Estacionamiento.objects.filter(
-        vehiculo=vehiculo, estado=Estado.ACTIVO
-    ).order_by("-hora_inicio").first()
+    # 1. EXENTO TOTAL — solo si la vigencia no expiró
+    if estado["exento_global"] and exencion_vigente:
+        return ResultadoVerificacion(
+            patente=patente,
+            estado=EstadoVehiculo.EXENTO_TOTAL,
+            estacionamiento_activo=True,
+            tipo_exencion=estado["tipo_exencion"],
+        )
 
-    if estacionamiento:
+    # 2. ESTACIONAMIENTO ACTIVO
+    if estado["estacionamiento_inicio"] is not None:
         return ResultadoVerificacion(
             patente=patente,
             estado=EstadoVehiculo.PAGADO,
@@ -102,24 +74,17 @@ def verificar_estado_vehiculo(patente, usuario, subcuadra):
         )
 
     # 3. ABONO MENSUAL VIGENTE
-    if municipio:
-        hoy       = date.today()
-        mes_actual = hoy.replace(day=1)
-        if AbonoMensual.objects.filter(
-            vehiculo=vehiculo, municipio=municipio, mes=mes_actual
-        ).exists():
-            return ResultadoVerificacion(
-                patente=patente,
-                estado=EstadoVehiculo.ABONO_ACTIVO,
-                estacionamiento_activo=True,
-            )
+    if abono_vigente(estado, municipio):
+        return ResultadoVerificacion(
+            patente=patente,
+            estado=EstadoVehiculo.ABONO_ACTIVO,
+            estacionamiento_activo=True,
+        )
 
     # 4. EXENTO PARCIAL — solo si la vigencia no expiró
-    vigencia_parcial = getattr(vehiculo, "vigencia_exencion", None)
-    exencion_parcial_activa = (vigencia_parcial is None or vigencia_parcial >= date.today())
-    if exencion_parcial_activa and hasattr(vehiculo, "subcuadras_exentas") and vehiculo.subcuadras_exentas.exists():
-        subcuadras_del_vehiculo = list(vehiculo.subcuadras_exentas.all())
-        if subcuadra and vehiculo.subcuadras_exentas.filter(id=subcuadra.id).exists():
+    subcuadras_del_vehiculo = subcuadras_exentas(estado)
+    if exencion_vigente and subcuadras_del_vehiculo:
+        if subcuadra and any(s.id == subcuadra.id for s in subcuadras_del_vehiculo):
             # El vehiculo esta en su zona exenta -> libre, no infraccionar
             return ResultadoVerificacion(
                 patente=patente,
@@ -128,22 +93,21 @@ def verificar_estado_vehiculo(patente, usuario, subcuadra):
                 estacionamiento_activo=False,
                 exento_en_subcuadra_actual=True,
             )
-        else:
-            # El vehiculo tiene exencion parcial pero esta FUERA de su zona.
-            # necesita_infraccion() devuelve True cuando exento_en_subcuadra_actual is False,
-            # por lo que el template mostrara el boton de infraccionar.
-            return ResultadoVerificacion(
-                patente=patente,
-                estado=EstadoVehiculo.EXENTO_PARCIAL,
-                subcuadras_exentas=subcuadras_del_vehiculo,
-                estacionamiento_activo=False,
-                exento_en_subcuadra_actual=False,
-                registrar_infraccion_url=_url_infraccion(patente),
-            )
+        # El vehiculo tiene exencion parcial pero esta FUERA de su zona.
+        # necesita_infraccion() devuelve True cuando exento_en_subcuadra_actual is False,
+        # por lo que el template mostrara el boton de infraccionar.
+        return ResultadoVerificacion(
+            patente=patente,
+            estado=EstadoVehiculo.EXENTO_PARCIAL,
+            subcuadras_exentas=subcuadras_del_vehiculo,
+            estacionamiento_activo=False,
+            exento_en_subcuadra_actual=False,
+            registrar_infraccion_url=_url_infraccion(patente),
+        )
 
     # 5. TOLERANCIA del inspector (entre verificaciones sucesivas)
-    if verificacion_anterior:
-        tiempo_desde_ultima = timezone.now() - verificacion_anterior.fecha
+    if estado["ultima_verificacion"]:
+        tiempo_desde_ultima = timezone.now() - estado["ultima_verificacion"]
         if tiempo_desde_ultima <= timedelta(minutes=_TOLERANCIA_INSPECTOR_MINUTOS):
             return ResultadoVerificacion(
                 patente=patente,
@@ -156,24 +120,17 @@ def verificar_estado_vehiculo(patente, usuario, subcuadra):
     # Sin este chequeo el inspector vería el botón INFRACCIONAR y recién
     # descubriría el duplicado al enviar el formulario (mala UX).
     # El plazo lo configura el superadmin en editar_municipio; fallback al default.
-    if municipio:
-        minutos = getattr(municipio, "minutos_entre_infracciones", MINUTOS_ENTRE_INFRACCIONES)
-        hace_n_min = timezone.now() - timedelta(minutes=minutos)
-        infraccion_reciente = (
-            Infraccion.objects
-            .filter(vehiculo=vehiculo, municipio=municipio, creado_en__gte=hace_n_min)
-            .order_by("-creado_en")
-            .first()
+    infraccion_en = ultima_infraccion(estado, municipio)
+    minutos = getattr(municipio, "minutos_entre_infracciones", MINUTOS_ENTRE_INFRACCIONES)
+    if infraccion_en and timezone.now() - infraccion_en <= timedelta(minutes=minutos):
+        segundos_transcurridos = (timezone.now() - infraccion_en).total_seconds()
+        minutos_hasta = max(1, int((minutos * 60 - segundos_transcurridos) / 60) + 1)
+        return ResultadoVerificacion(
+            patente=patente,
+            estado=EstadoVehiculo.INFRACCION_RECIENTE,
+            estacionamiento_activo=False,
+            minutos_hasta_siguiente=minutos_hasta,
         )
-        if infraccion_reciente:
-            segundos_transcurridos = (timezone.now() - infraccion_reciente.creado_en).total_seconds()
-            minutos_hasta = max(1, int((minutos * 60 - segundos_transcurridos) / 60) + 1)
-            return ResultadoVerificacion(
-                patente=patente,
-                estado=EstadoVehiculo.INFRACCION_RECIENTE,
-                estacionamiento_activo=False,
-                minutos_hasta_siguiente=minutos_hasta,
-            )
 
     # 7. IMPAGO
     return ResultadoVerificacion(
@@ -182,3 +139,74 @@ def verificar_estado_vehiculo(patente, usuario, subcuadra):
         estacionamiento_activo=False,
         registrar_infraccion_url=_url_infraccion(patente),
     )
+
+
+def verificar_estado_vehiculo(patente, usuario, subcuadra):
+    """
+    Verifica el estado de un vehículo para el inspector.
+
+    Orden de evaluación:
+    1. Vehículo no registrado       → NO_REGISTRADO
+    2. Exento total                 → EXENTO_TOTAL
+    3. Estacionamiento activo       → PAGADO
+    4. Abono mensual vigente        → ABONO_ACTIVO
+    5. Exento parcial en subcuadra  → EXENTO_PARCIAL
+    6. Dentro de tolerancia         → PENDIENTE_PAGO
+    7. Infracción reciente (<15min) → INFRACCION_RECIENTE
+    8. Sin pago                     → IMPAGO
+
+    Registra siempre la verificación para trazabilidad.
+
+    El estado sale de PatenteStatusIndex en un SELECT anotado; se suma el
+    INSERT de la verificación (diferido si el write-behind está activo).
+    La verificación anterior (para la tolerancia) se lee ANTES de registrar
+    la nueva.
+    """
+    municipio = getattr(usuario, "municipio", None)
+
+    estado = PatenteStatusIndex.obtener(patente, municipio)
+    resultado = _resolver_estado(patente, estado, subcuadra, municipio)
+
+    if estado is not None:
+        registrar_verificaciones([{
+            "vehiculo_id":  estado["id"],
+            "inspector_id": usuario.id,
+            "subcuadra_id": subcuadra.id if subcuadra else None,
+        }])
+
+    return resultado
+
+
+def verificar_estados_vehiculos(patentes, usuario, subcuadra):
+    """
+    Versión por lote de verificar_estado_vehiculo para varias patentes
+    leídas en la misma subcuadra.
+
+    Cantidad de queries constante, sin importar el tamaño del lote:
+    un SELECT anotado con patente__in y un solo bulk_create de VerificacionInspector
+    (diferido si el write-behind está activo).
+    Patentes repetidas se verifican una sola vez.
+
+    Retorna la lista de ResultadoVerificacion en el orden de entrada.
+    """
+    municipio = getattr(usuario, "municipio", None)
+    patentes  = list(dict.fromkeys(patentes))
+
+    estados = PatenteStatusIndex.obtener_varios(patentes, municipio)
+    resultados = [
+        _resolver_estado(patente, estados.get(patente), subcuadra, municipio)
+        for patente in patentes
+    ]
+
+    registradas = [p for p in patentes if p in estados]
+    if registradas:
+        registrar_verificaciones([
+            {
+                "vehiculo_id":  estados[patente]["id"],
+                "inspector_id": usuario.id,
+                "subcuadra_id": subcuadra.id,
+            }
+            for patente in registradas
+        ])
+
+    return resultados
@@ -1,5 +1,5 @@
 # app_estacionamiento/services_verificacion.py
 # SHIM de compatibilidad — la lógica vive en services/verificacion.py
 # Importar desde: from .services.verificacion import verificar_estado_vehiculo
-from .services.verificacion import verificar_estado_vehiculo  # noqa: F401
+from .services.verificacion import verificar_estado_vehiculo, verificar_estados_vehiculos  # noqa: F401
 # Estos imports son necesarios para mantener compatibilidad con el código existente que importa desde este módulo.
\ No newline at end of file
@@ -0,0 +1,50 @@
+# app_estacionamiento/signals.py
+"""
+Señales de modelos del dominio.
+
+Se importan desde AppEstacionamientoConfig.ready() para registrarse una sola vez.
+Mantienen al día los cachés derivados de la base:
+- CalendarioCobro: editar horarios o días especiales descarta el calendario
+  del municipio.
+- IndiceSubcuadras: crear, editar (coordenadas) o borrar una subcuadra
+  cambia la versión del índice espacial del municipio.
+- ConfigMunicipio: cambios en Municipio, Tarifa o ModuloMunicipio descartan
+  la configuración del municipio guardada en el proceso.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from app_estacionamiento.models import (
+    DiaEspecial,
+    HorarioEstacionamiento,
+    ModuloMunicipio,
+    Municipio,
+    Subcuadra,
+    Tarifa,
+)
+from app_estacionamiento.services.config_municipio import invalidar_config
+from app_estacionamiento.services.horarios import invalidar_calendario
+from app_estacionamiento.services.indice_subcuadras import invalidar_indice_subcuadras
+
+
+@receiver([post_save, post_delete], sender=HorarioEstacionamiento)
+@receiver([post_save, post_delete], sender=DiaEspecial)
+def invalidar_calendario_cobro(sender, instance, **kwargs):
+    invalidar_calendario(instance.municipio_id)
+
+
+@receiver([post_save, post_delete], sender=Subcuadra)
+def invalidar_indice_subcuadras_por_cambio(sender, instance, **kwargs):
+    invalidar_indice_subcuadras(instance.municipio_id)
+
+
+@receiver([post_save, post_delete], sender=Municipio)
+def invalidar_config_por_municipio(sender, instance, **kwargs):
+    invalidar_config(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Tarifa)
+@receiver([post_save, post_delete], sender=ModuloMunicipio)
+def invalidar_config_por_relacionado(sender, instance, **kwargs):
+    invalidar_config(instance.municipio_id)
@@ -15,6 +15,7 @@ from app_estacionamiento.models import (
 )
 from app_estacionamiento.services_caja import generar_cierre_caja
 from app_estacionamiento.services_infracciones import crear_infraccion, ErrorInfraccion
+from app_estacionamiento.services.saldo import saldo_actual
 
 
 # ─────────────────────────────────────────────
@@ -188,9 +189,8 @@ class TestRenovarEstacionamiento(TestCase):
 
     def test_renovar_descuenta_saldo(self):
         self.client.post(self.url, {"horas_extra": "1"})
-        self.conductor.refresh_from_db()
         # $100/h × 1h = $100 descontado de $500
-        self.assertEqual(self.conductor.saldo, Decimal("400"))
+        self.assertEqual(saldo_actual(self.conductor), Decimal("400"))
 
     def test_renovar_sin_saldo_no_modifica(self):
         """Con saldo insuficiente no cambia ni duración ni saldo."""
@@ -198,9 +198,8 @@ class TestRenovarEstacionamiento(TestCase):
         self.conductor.save()
         self.client.post(self.url, {"horas_extra": "2"})  # costaría $200
         self.est.refresh_from_db()
-        self.conductor.refresh_from_db()
         self.assertEqual(self.est.duracion_horas, 2)
-        self.assertEqual(self.conductor.saldo, Decimal("50"))
+        self.assertEqual(saldo_actual(self.conductor), Decimal("50"))
 
     def test_renovar_estacionamiento_ajeno_retorna_404(self):
         """No puede renovar un estacionamiento de otro conductor."""
@@ -8,6 +8,7 @@ from django.urls import reverse
 from app_estacionamiento.models import (
     Usuario, Municipio, Subcuadra, Estacionamiento, Tarifa
 )
+from app_estacionamiento.services.saldo import saldo_actual
 
 
 class BaseRolesTest(TestCase):
@@ -158,8 +159,7 @@ class FlujoConductorCompletoTest(BaseRolesTest):
             {"patente": "AAA999", "duracion": "2"}
         )
 
-        self.conductor.refresh_from_db()
-        self.assertLess(self.conductor.saldo, saldo_inicial)
+        self.assertLess(saldo_actual(self.conductor), saldo_inicial)
 
     def test_no_puede_tener_dos_estacionamientos_activos(self):
         self.client.force_login(self.conductor)
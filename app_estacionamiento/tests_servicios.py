@@ -10,14 +10,41 @@ Cubre:
 - Multi-municipio          :: aislamiento de datos entre municipios
 - Tesorero / vendedor      :: depositar_comision → certificar_comision
 - use_cases/acreditar_saldo_mp.py :: idempotencia por mp_payment_id
+- services/indice_patentes.py :: PatenteStatusIndex (estado siempre al día, una query)
+- services/registro_verificaciones.py :: buffer write-behind + recuperación de spool
+- services/horarios.py        :: CalendarioCobro (horario precompilado + invalidación)
+- services/barrido.py         :: barrer_estacionamientos (cierre por lotes de vencidos)
+- use_cases/finalizar_estacionamiento.py :: finalizar_lote (equivalencia con ejecutar)
+- services/saldo.py        :: libro de saldo (débito condicional, compactación)
+- services/indice_subcuadras.py :: grilla espacial para subcuadra_cercana (GPS)
+- services/fotos_infracciones.py :: marca de agua de fotos en segundo plano
+- services/caja_saldo.py      :: CajaSaldo (totales de caja incrementales + reconciliación)
+- services/paginacion.py      :: paginación por cursor + exportación CSV/XLSX en streaming
+- services/resumen_diario.py  :: ResumenDiario (construcción incremental + lectura combinada)
+- services/fechas.py          :: rangos de fechas locales sin __date + índices (EXPLAIN en PostgreSQL)
+- services/caja.py            :: generar_cierre_caja en una pasada (cierre + totales por medio)
+- services/cierres_programados.py :: cierres de caja automáticos (corte, trabajos, worker)
+- services/rendiciones.py      :: certificación masiva + rendición por grupo con liquidaciones
+- services/comisiones.py       :: libro de comisiones por vendedor y mes + reconciliación
+- services/cobros_lote.py      :: cobros por lote idempotentes (cola offline del vendedor)
+- services/config_municipio.py :: ConfigMunicipio en memoria del proceso (TTL corto + invalidación por señales)
+- services/reportes.py :: TrabajoReporte (huella, worker, purga) y vistas de estado/descarga
+- services/cache_documentos.py :: PDF de juzgado/rendición cacheados por huella (ETag/304)
+- services/exportaciones.py :: exportación de infracciones, estacionamientos e historial del vendedor con los filtros de la lista
+- services/importacion_estacionamientos.py :: importación del Excel del sistema anterior por lotes en segundo plano
+- services/importacion_exenciones.py :: vista previa de exenciones por columna (pandas) guardada en la base + confirmación por lote
 
 Correr con:
     python manage.py test app_estacionamiento.tests_servicios --verbosity=2
 """
-from datetime import date
+from datetime import date, timedelta
 from decimal import Decimal
 
-from django.test import TestCase, Client
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.utils import timezone
 
@@ -26,7 +53,7 @@ from app_estacionamiento.models import (
     Infraccion, MovimientoCaja, Tarifa, AbonoMensual, LiquidacionComision,
 )
 from app_estacionamiento.services.infracciones import cobrar_infraccion_efectivo
-from app_estacionamiento.services.saldo import cargar_saldo_conductor
+from app_estacionamiento.services.saldo import cargar_saldo_conductor, saldo_actual
 
 
 # ─────────────────────────────────────────────
@@ -193,8 +220,7 @@ class TestCargarSaldoConductor(TestCase):
     def test_saldo_se_acredita(self):
         """El saldo del conductor aumenta en el monto cargado."""
         cargar_saldo_conductor(admin=self.admin, conductor=self.conductor, monto=Decimal("500"))
-        self.conductor.refresh_from_db()
-        self.assertEqual(self.conductor.saldo, Decimal("600"))
+        self.assertEqual(saldo_actual(self.conductor), Decimal("600"))
 
     def test_crea_movimiento_en_caja(self):
         """Se genera un MovimientoCaja de tipo 'ingreso' a nombre del admin."""
@@ -214,11 +240,11 @@ class TestCargarSaldoConductor(TestCase):
             cargar_saldo_conductor(admin=self.admin, conductor=self.conductor, monto=Decimal("-50"))
 
     def test_retorna_conductor_actualizado(self):
-        """La función retorna el conductor con el saldo ya actualizado."""
+        """La función retorna el conductor, cuyo saldo real ya incluye la carga."""
         resultado = cargar_saldo_conductor(
             admin=self.admin, conductor=self.conductor, monto=Decimal("200")
         )
-        self.assertEqual(resultado.saldo, Decimal("300"))
+        self.assertEqual(saldo_actual(resultado), Decimal("300"))
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -320,8 +346,7 @@ class TestMultiMunicipio(TestCase):
         cargar_saldo_conductor(
             admin=self.admin_a, conductor=self.conductor_a, monto=Decimal("200")
         )
-        self.conductor_b.refresh_from_db()
-        self.assertEqual(self.conductor_b.saldo, saldo_b_antes)
+        self.assertEqual(saldo_actual(self.conductor_b), saldo_b_antes)
 
     def test_movimientos_caja_son_por_municipio(self):
         """Los movimientos de caja del admin A no aparecen en las consultas del admin B."""
@@ -499,8 +524,7 @@ class TestToleranciaMulta(TestCase):
         """Si se anula por gracia, el saldo del conductor no se toca."""
         saldo_antes = self.conductor.saldo
         self._pagar_con_tiempo(delta_minutos=2)
-        self.conductor.refresh_from_db()
-        self.assertEqual(self.conductor.saldo, saldo_antes)
+        self.assertEqual(saldo_actual(self.conductor), saldo_antes)
 
     def test_pago_exactamente_en_limite_anula(self):
         """Pagar exactamente a los 5 min todavía está dentro del plazo (<=)."""
@@ -513,8 +537,7 @@ class TestToleranciaMulta(TestCase):
         resultado = self._pagar_con_tiempo(delta_minutos=10)
         self.assertEqual(resultado.estado, "pagada")
         self.assertFalse(resultado.anulada_por_gracia)
-        self.conductor.refresh_from_db()
-        self.assertEqual(self.conductor.saldo, saldo_antes - Decimal("500"))
+        self.assertEqual(saldo_actual(self.conductor), saldo_antes - Decimal("500"))
 
     def test_tolerancia_cero_siempre_cobra(self):
         """Con tolerancia=0 no hay gracia: pagar al instante igual cobra."""
@@ -523,8 +546,7 @@ class TestToleranciaMulta(TestCase):
         saldo_antes = self.conductor.saldo
         resultado = self._pagar_con_tiempo(delta_minutos=0)
         self.assertEqual(resultado.estado, "pagada")
-        self.conductor.refresh_from_db()
-        self.assertLess(self.conductor.saldo, saldo_antes)
+        self.assertLess(saldo_actual(self.conductor), saldo_antes)
 
     def test_pago_doble_lanza_excepcion(self):
         """Intentar pagar una infracción ya pagada lanza Exception."""
@@ -1019,8 +1041,7 @@ class TestAcreditarSaldoMp(TestCase):
     def test_acredita_saldo_correctamente(self):
         """Primera llamada: acredita el monto al conductor."""
         self._ejecutar(monto=Decimal("500.00"))
-        self.conductor.refresh_from_db()
-        self.assertEqual(self.conductor.saldo, Decimal("500.00"))
+        self.assertEqual(saldo_actual(self.conductor), Decimal("500.00"))
 
     def test_crea_movimiento_con_mp_payment_id(self):
         """El MovimientoCaja creado guarda el payment_id en el campo dedicado."""
@@ -1035,8 +1056,7 @@ class TestAcreditarSaldoMp(TestCase):
         """El mismo payment_id no debe acreditarse dos veces (idempotencia)."""
         self._ejecutar(payment_id="PAY_DOBLE", monto=Decimal("300.00"))
         self._ejecutar(payment_id="PAY_DOBLE", monto=Decimal("300.00"))
-        self.conductor.refresh_from_db()
-        self.assertEqual(self.conductor.saldo, Decimal("300.00"))
+        self.assertEqual(saldo_actual(self.conductor), Decimal("300.00"))
 
     def test_segunda_llamada_no_crea_movimiento_duplicado(self):
         """Solo existe un MovimientoCaja por payment_id, aunque se llame dos veces."""
@@ -1050,11 +1070,2938 @@ class TestAcreditarSaldoMp(TestCase):
         """Dos pagos distintos se acreditan por separado sin interferencia."""
         self._ejecutar(payment_id="PAY_A", monto=Decimal("100.00"))
         self._ejecutar(payment_id="PAY_B", monto=Decimal("200.00"))
-        self.conductor.refresh_from_db()
-        self.assertEqual(self.conductor.saldo, Decimal("300.00"))
+        self.assertEqual(saldo_actual(self.conductor), Decimal("300.00"))
 
     def test_monto_invalido_lanza_error(self):
         """monto <= 0 debe lanzar ValueError antes de tocar la DB."""
         from app_estacionamiento.use_cases.acreditar_saldo_mp import ejecutar
         with self.assertRaises(ValueError):
             ejecutar(usuario=self.conductor, monto=Decimal("0"), payment_id="PAY_CERO")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 9. verificar_estado_vehiculo() — regresión de cantidad de queries
+# ─────────────────────────────────────────────────────────────────────────────
+
+class VehiculosPorEstadoMixin:
+    """Un vehículo por cada estado posible de la verificación, en la misma subcuadra."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from app_estacionamiento.models import Estacionamiento, VerificacionInspector
+        cache.clear()
+        self.municipio = crear_municipio()
+        self.inspector = crear_inspector(self.municipio)
+        self.subcuadra = crear_subcuadra(self.municipio)
+        self.subcuadra_exenta = Subcuadra.objects.create(
+            calle="Rivadavia", altura=200, municipio=self.municipio
+        )
+        # Precargar el municipio del inspector: el FK no cuenta como query del service
+        self.inspector.municipio
+
+        self.v_pagado = crear_vehiculo(self.municipio, patente="PAG001")
+        Estacionamiento.objects.create(
+            vehiculo=self.v_pagado, subcuadra=self.subcuadra, duracion_horas=1,
+        )
+        self.v_abono = crear_vehiculo(self.municipio, patente="ABO001")
+        AbonoMensual.objects.create(
+            vehiculo=self.v_abono, municipio=self.municipio,
+            mes=date.today().replace(day=1), monto=Decimal("500"),
+        )
+        self.v_parcial = crear_vehiculo(self.municipio, patente="PAR001")
+        self.v_parcial.subcuadras_exentas.add(self.subcuadra_exenta, self.subcuadra)
+        self.v_total = Vehiculo.objects.create(
+            patente="TOT001", municipio=self.municipio, exento_global=True,
+            tipo_exencion="discapacitado",
+        )
+        self.v_tolerancia = crear_vehiculo(self.municipio, patente="TOL001")
+        VerificacionInspector.objects.create(
+            vehiculo=self.v_tolerancia, inspector=self.inspector, subcuadra=self.subcuadra,
+        )
+        self.v_reciente = crear_vehiculo(self.municipio, patente="REC001")
+        crear_infraccion(self.municipio, self.inspector, self.v_reciente, self.subcuadra)
+        self.v_impago = crear_vehiculo(self.municipio, patente="IMP001")
+
+
+class TestVerificacionCantidadQueries(VehiculosPorEstadoMixin, TestCase):
+    """
+    verificar_estado_vehiculo es el camino más caliente del inspector.
+    Debe resolver cualquier estado con 2 queries: el SELECT anotado y el INSERT
+    de VerificacionInspector (1 sola si la patente no está registrada).
+    """
+
+    def _verificar(self, patente, queries=2):
+        from app_estacionamiento.services.verificacion import verificar_estado_vehiculo
+        with self.assertNumQueries(queries):
+            return verificar_estado_vehiculo(patente, self.inspector, self.subcuadra)
+
+    def test_cada_estado_se_resuelve_en_dos_queries(self):
+        from app_estacionamiento.domain.enums import EstadoVehiculo
+        esperados = {
+            "PAG001": EstadoVehiculo.PAGADO,
+            "ABO001": EstadoVehiculo.ABONO_ACTIVO,
+            "PAR001": EstadoVehiculo.EXENTO_PARCIAL,
+            "TOT001": EstadoVehiculo.EXENTO_TOTAL,
+            "TOL001": EstadoVehiculo.PENDIENTE_PAGO,
+            "REC001": EstadoVehiculo.INFRACCION_RECIENTE,
+            "IMP001": EstadoVehiculo.IMPAGO,
+        }
+        for patente, estado in esperados.items():
+            with self.subTest(patente=patente):
+                self.assertEqual(self._verificar(patente).estado, estado)
+
+    def test_no_registrado_una_sola_query(self):
+        from app_estacionamiento.domain.enums import EstadoVehiculo
+        resultado = self._verificar("NOEXISTE", queries=1)
+        self.assertEqual(resultado.estado, EstadoVehiculo.NO_REGISTRADO)
+
+    def test_exento_parcial_trae_todas_sus_subcuadras(self):
+        resultado = self._verificar("PAR001")
+        self.assertTrue(resultado.exento_en_subcuadra_actual)
+        self.assertCountEqual(
+            [s.id for s in resultado.subcuadras_exentas],
+            [self.subcuadra.id, self.subcuadra_exenta.id],
+        )
+
+    def test_exento_total_informa_tipo_exencion(self):
+        resultado = self._verificar("TOT001")
+        self.assertEqual(resultado.tipo_exencion, "discapacitado")
+
+    def test_infraccion_reciente_informa_minutos_restantes(self):
+        resultado = self._verificar("REC001")
+        self.assertGreaterEqual(resultado.minutos_hasta_siguiente, 1)
+
+    def test_registra_la_verificacion(self):
+        from app_estacionamiento.models import VerificacionInspector
+        self._verificar("IMP001")
+        self.assertTrue(
+            VerificacionInspector.objects.filter(vehiculo=self.v_impago).exists()
+        )
+
+    def test_segunda_verificacion_cae_en_tolerancia(self):
+        from app_estacionamiento.domain.enums import EstadoVehiculo
+        self.assertEqual(self._verificar("IMP001").estado, EstadoVehiculo.IMPAGO)
+        self.assertEqual(
+            self._verificar("IMP001").estado, EstadoVehiculo.PENDIENTE_PAGO
+        )
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 10. PatenteStatusIndex — el estado refleja siempre la base
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestPatenteStatusIndex(TestCase):
+    """
+    Cada lectura es una sola query y ve al instante cualquier cambio en
+    Estacionamiento, AbonoMensual, Infraccion o en las exenciones del Vehiculo.
+    """
+
+    def setUp(self):
+        self.municipio = crear_municipio()
+        self.inspector = crear_inspector(self.municipio)
+        self.subcuadra = crear_subcuadra(self.municipio)
+        self.inspector.municipio
+        self.vehiculo  = crear_vehiculo(self.municipio, patente="IDX001")
+
+    def _estado(self, queries=None):
+        from app_estacionamiento.services.indice_patentes import PatenteStatusIndex
+        from app_estacionamiento.services.verificacion import _resolver_estado
+        if queries is None:
+            registro = PatenteStatusIndex.obtener("IDX001", self.municipio)
+        else:
+            with self.assertNumQueries(queries):
+                registro = PatenteStatusIndex.obtener("IDX001", self.municipio)
+        return _resolver_estado("IDX001", registro, self.subcuadra, self.municipio).estado
+
+    def test_cada_lectura_es_una_sola_query(self):
+        from app_estacionamiento.domain.enums import EstadoVehiculo
+        self.assertEqual(self._estado(queries=1), EstadoVehiculo.IMPAGO)
+        self.assertEqual(self._estado(queries=1), EstadoVehiculo.IMPAGO)
+
+    def test_nuevo_estacionamiento_se_refleja(self):
+        from app_estacionamiento.domain.enums import EstadoVehiculo
+        from app_estacionamiento.models import Estacionamiento
+        self.assertEqual(self._estado(), EstadoVehiculo.IMPAGO)
+        est = Estacionamiento.objects.create(
+            vehiculo=self.vehiculo, subcuadra=self.subcuadra, duracion_horas=1,
+        )
+        self.assertEqual(self._estado(), EstadoVehiculo.PAGADO)
+        est.estado = "FINALIZADO"
+        est.save()
+        self.assertEqual(self._estado(), EstadoVehiculo.IMPAGO)
+
+    def test_nuevo_abono_se_refleja(self):
+        from app_estacionamiento.domain.enums import EstadoVehiculo
+        self.assertEqual(self._estado(), EstadoVehiculo.IMPAGO)
+        AbonoMensual.objects.create(
+            vehiculo=self.vehiculo, municipio=self.municipio,
+            mes=date.today().replace(day=1), monto=Decimal("500"),
+        )
+        self.assertEqual(self._estado(), EstadoVehiculo.ABONO_ACTIVO)
+
+    def test_nueva_infraccion_se_refleja(self):
+        from app_estacionamiento.domain.enums import EstadoVehiculo
+        self.assertEqual(self._estado(), EstadoVehiculo.IMPAGO)
+        crear_infraccion(self.municipio, self.inspector, self.vehiculo, self.subcuadra)
+        self.assertEqual(self._estado(), EstadoVehiculo.INFRACCION_RECIENTE)
+
+    def test_cambio_de_exenciones_se_refleja(self):
+        from app_estacionamiento.domain.enums import EstadoVehiculo
+        self.assertEqual(self._estado(), EstadoVehiculo.IMPAGO)
+        self.vehiculo.subcuadras_exentas.add(self.subcuadra)
+        self.assertEqual(self._estado(), EstadoVehiculo.EXENTO_PARCIAL)
+        self.vehiculo.subcuadras_exentas.clear()
+        self.vehiculo.exento_global = True
+        self.vehiculo.save()
+        self.assertEqual(self._estado(), EstadoVehiculo.EXENTO_TOTAL)
+
+    def test_detalle_patente_muestra_estacionamiento_activo(self):
+        from app_estacionamiento.models import Estacionamiento
+        Estacionamiento.objects.create(
+            vehiculo=self.vehiculo, subcuadra=self.subcuadra, duracion_horas=2,
+        )
+        resp = Client().get(reverse("pago_publico_detalle", args=["IDX001"]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertIsNotNone(resp.context["estacionamiento_activo"])
+        self.assertFalse(resp.context["abono_activo"])
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 11. Verificación por lote — verificar_estados_vehiculos() y endpoint JSON
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestVerificacionPorLote(VehiculosPorEstadoMixin, TestCase):
+    """
+    El lote debe dar los mismos estados que la verificación individual,
+    con una cantidad de queries que no depende de cuántas patentes trae.
+    """
+
+    PATENTES = ["PAG001", "ABO001", "PAR001", "TOT001", "TOL001", "REC001", "IMP001"]
+
+    def test_lote_resuelve_todo_en_dos_queries(self):
+        from app_estacionamiento.domain.enums import EstadoVehiculo
+        from app_estacionamiento.models import VerificacionInspector
+        from app_estacionamiento.services.verificacion import verificar_estados_vehiculos
+        with self.assertNumQueries(2):
+            resultados = verificar_estados_vehiculos(
+                self.PATENTES + ["NOEXISTE", "IMP001"], self.inspector, self.subcuadra,
+            )
+        self.assertEqual(
+            [r.estado for r in resultados],
+            [
+                EstadoVehiculo.PAGADO, EstadoVehiculo.ABONO_ACTIVO,
+                EstadoVehiculo.EXENTO_PARCIAL, EstadoVehiculo.EXENTO_TOTAL,
+                EstadoVehiculo.PENDIENTE_PAGO, EstadoVehiculo.INFRACCION_RECIENTE,
+                EstadoVehiculo.IMPAGO, EstadoVehiculo.NO_REGISTRADO,
+            ],
+        )
+        # Una verificación por patente registrada (la del setUp de TOL001 ya existía)
+        self.assertEqual(VerificacionInspector.objects.count(), len(self.PATENTES) + 1)
+
+    def test_segundo_lote_cae_en_tolerancia(self):
+        from app_estacionamiento.domain.enums import EstadoVehiculo
+        from app_estacionamiento.services.verificacion import verificar_estados_vehiculos
+        verificar_estados_vehiculos(self.PATENTES, self.inspector, self.subcuadra)
+        with self.assertNumQueries(2):
+            resultados = verificar_estados_vehiculos(
+                self.PATENTES, self.inspector, self.subcuadra,
+            )
+        self.assertEqual(resultados[-1].estado, EstadoVehiculo.PENDIENTE_PAGO)
+
+    def _post_lote(self, datos):
+        import json
+        client = Client()
+        client.force_login(self.inspector)
+        return client.post(
+            reverse("inspectores_verificar_lote"),
+            data=json.dumps(datos),
+            content_type="application/json",
+        )
+
+    def test_endpoint_devuelve_resultados_en_orden_y_da_de_alta_nuevas(self):
+        resp = self._post_lote({
+            "patentes": ["imp-001", "NUE001", "PAG001"],
+            "subcuadra_id": self.subcuadra.id,
+        })
+        self.assertEqual(resp.status_code, 200)
+        resultados = resp.json()["resultados"]
+        self.assertEqual([r["patente"] for r in resultados], ["IMP001", "NUE001", "PAG001"])
+        self.assertEqual([r["estado"] for r in resultados], ["impago", "impago", "pagado"])
+        self.assertTrue(resultados[0]["necesita_infraccion"])
+        self.assertTrue(Vehiculo.objects.filter(patente="NUE001").exists())
+
+    def test_endpoint_cierra_vencidos_con_queries_constantes(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from app_estacionamiento.models import Estacionamiento
+
+        def verificar_con_vencidos(patentes):
+            for patente in patentes:
+                Estacionamiento.objects.create(
+                    vehiculo=crear_vehiculo(self.municipio, patente=patente),
+                    subcuadra=self.subcuadra, duracion_horas=1,
+                )
+            Estacionamiento.objects.filter(vehiculo__patente__in=patentes).update(
+                hora_inicio=timezone.now() - timedelta(hours=2),
+            )
+            with CaptureQueriesContext(connection) as queries:
+                resp = self._post_lote({"patentes": patentes, "subcuadra_id": self.subcuadra.id})
+            self.assertEqual([r["estado"] for r in resp.json()["resultados"]], ["impago"] * len(patentes))
+            self.assertFalse(Estacionamiento.objects.filter(vehiculo__patente__in=patentes, estado="ACTIVO").exists())
+            return len(queries)
+
+        self.assertEqual(verificar_con_vencidos(["VEN001"]), verificar_con_vencidos(["VEN002", "VEN003", "VEN004"]))
+
+    def test_endpoint_rechaza_subcuadra_de_otro_municipio(self):
+        otro = crear_municipio(nombre="Otro")
+        ajena = Subcuadra.objects.create(calle="Mitre", altura=100, municipio=otro)
+        resp = self._post_lote({"patentes": ["IMP001"], "subcuadra_id": ajena.id})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_endpoint_rechaza_lote_sin_patentes(self):
+        resp = self._post_lote({"patentes": [], "subcuadra_id": self.subcuadra.id})
+        self.assertEqual(resp.status_code, 400)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 12. Registro write-behind de VerificacionInspector
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestRegistroVerificacionesWriteBehind(TestCase):
+    """
+    Con VERIFICACIONES_WRITE_BEHIND las verificaciones quedan en buffer + spool
+    y se insertan por lote; la tolerancia del inspector no cambia.
+    """
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from unittest.mock import patch
+        from django.core.cache import cache
+        from django.test import override_settings
+        from app_estacionamiento.services import registro_verificaciones
+
+        cache.clear()
+        self.spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spool_dir, ignore_errors=True)
+        ajustes = override_settings(
+            VERIFICACIONES_WRITE_BEHIND=True,
+            VERIFICACIONES_SPOOL_DIR=self.spool_dir,
+            VERIFICACIONES_FLUSH_CADA=3,
+            VERIFICACIONES_FLUSH_SEGUNDOS=0,   # sin hilo: se vuelca a mano
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        buffer_nuevo = patch.object(
+            registro_verificaciones, "_buffer", registro_verificaciones._BufferVerificaciones()
+        )
+        buffer_nuevo.start()
+        self.addCleanup(buffer_nuevo.stop)
+
+        self.municipio = crear_municipio()
+        self.inspector = crear_inspector(self.municipio)
+        self.subcuadra = crear_subcuadra(self.municipio)
+        self.inspector.municipio
+        for patente in ("WB0001", "WB0002", "WB0003"):
+            crear_vehiculo(self.municipio, patente=patente)
+
+    def _verificar(self, patente):
+        from app_estacionamiento.services.verificacion import verificar_estado_vehiculo
+        return verificar_estado_vehiculo(patente, self.inspector, self.subcuadra)
+
+    def _spools(self, patron="*.spool"):
+        from pathlib import Path
+        return list(Path(self.spool_dir).glob(patron))
+
+    def test_encola_sin_insertar_y_deja_spool(self):
+        from app_estacionamiento.models import VerificacionInspector
+        self._verificar("WB0001")
+        self.assertFalse(VerificacionInspector.objects.exists())
+        [spool] = self._spools()
+        self.assertEqual(len(spool.read_text().splitlines()), 1)
+
+    def test_verificacion_solo_consulta(self):
+        self._verificar("WB0001")
+        with self.assertNumQueries(1):
+            self._verificar("WB0001")
+
+    def test_tolerancia_lee_el_buffer(self):
+        from app_estacionamiento.domain.enums import EstadoVehiculo
+        self.assertEqual(self._verificar("WB0001").estado, EstadoVehiculo.IMPAGO)
+        # la verificación anterior sigue en el buffer, no en la base
+        self.assertEqual(self._verificar("WB0001").estado, EstadoVehiculo.PENDIENTE_PAGO)
+
+    def test_vuelca_al_llegar_al_tope_conservando_la_fecha(self):
+        from app_estacionamiento.models import VerificacionInspector
+        from app_estacionamiento.services.registro_verificaciones import registrar_verificaciones
+        from app_estacionamiento.services.verificacion import verificar_estados_vehiculos
+        verificar_estados_vehiculos(["WB0001", "WB0002"], self.inspector, self.subcuadra)
+        self.assertFalse(VerificacionInspector.objects.exists())
+        [fecha] = registrar_verificaciones([{
+            "vehiculo_id":  Vehiculo.objects.get(patente="WB0003").id,
+            "inspector_id": self.inspector.id,
+            "subcuadra_id": self.subcuadra.id,
+        }])
+        self.assertEqual(VerificacionInspector.objects.count(), 3)
+        self.assertEqual(
+            VerificacionInspector.objects.get(vehiculo__patente="WB0003").fecha, fecha
+        )
+        self.assertEqual(self._spools("*.spool") + self._spools("*.volcando"), [])
+
+    def test_crear_infraccion_vuelca_y_marca_la_verificacion(self):
+        from app_estacionamiento.models import VerificacionInspector
+        from app_estacionamiento.services.infracciones import crear_infraccion
+        self._verificar("WB0001")
+        crear_infraccion(
+            patente="WB0001", subcuadra_id=self.subcuadra.id, inspector=self.inspector,
+        )
+        self.assertTrue(
+            VerificacionInspector.objects.get(vehiculo__patente="WB0001").infraccion_generada
+        )
+
+    def test_comando_recupera_spool_de_proceso_caido(self):
+        import json
+        import os
+        from datetime import timedelta
+        from pathlib import Path
+        from django.core.management import call_command
+        from app_estacionamiento.models import VerificacionInspector
+
+        fecha = timezone.now() - timedelta(hours=2)
+        vehiculo = Vehiculo.objects.get(patente="WB0002")
+        # Nadie tiene tomado el flock de este .lock: es de un proceso que ya murió
+        Path(self.spool_dir, "999-caido.lock").touch()
+        Path(self.spool_dir, "999-caido.spool").write_text(json.dumps({
+            "vehiculo_id": vehiculo.id, "inspector_id": self.inspector.id,
+            "subcuadra_id": self.subcuadra.id, "resultado": "verificado",
+            "fecha": fecha.isoformat(),
+        }) + "\n" + '{"vehiculo_id": 1, "insp')   # última línea cortada por el crash
+
+        call_command("volcar_verificaciones", stdout=open(os.devnull, "w"))
+
+        self.assertEqual(VerificacionInspector.objects.get(vehiculo=vehiculo).fecha, fecha)
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    def test_comando_no_toca_el_spool_de_un_proceso_vivo(self):
+        import os
+        from django.core.management import call_command
+        from app_estacionamiento.models import VerificacionInspector
+        self._verificar("WB0001")
+        call_command("volcar_verificaciones", stdout=open(os.devnull, "w"))
+        self.assertFalse(VerificacionInspector.objects.exists())
+        self.assertEqual(len(self._spools()), 1)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 13. CalendarioCobro — horario precompilado por municipio
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestCalendarioCobro(TestCase):
+    """
+    El calendario resuelve "¿se cobra ahora?" y "minutos hasta el cierre"
+    sin queries, y se invalida al editar horarios o días especiales.
+    """
+
+    def setUp(self):
+        from datetime import time
+        from django.core.cache import cache
+        from app_estacionamiento.models import HorarioEstacionamiento
+        cache.clear()
+        self.municipio = crear_municipio()
+        # Lunes 08:00–13:00; el resto de la semana sin horario
+        self.horario = HorarioEstacionamiento.objects.create(
+            municipio=self.municipio, dia_semana=0,
+            hora_inicio=time(8, 0), hora_fin=time(13, 0),
+        )
+        self.lunes = date(2030, 1, 7)   # un lunes, dentro del rango precargado
+
+    def _momento(self, fecha, hora, minuto=0):
+        from datetime import datetime
+        return timezone.make_aware(datetime(fecha.year, fecha.month, fecha.day, hora, minuto))
+
+    def _calendario(self):
+        from app_estacionamiento.services.horarios import CalendarioCobro
+        return CalendarioCobro.construir(self.municipio, desde=self.lunes)
+
+    def test_dentro_y_fuera_del_horario(self):
+        calendario = self._calendario()
+        self.assertEqual(calendario.cobro_activo(self._momento(self.lunes, 10)), (True, None))
+        permitido, mensaje = calendario.cobro_activo(self._momento(self.lunes, 14))
+        self.assertFalse(permitido)
+        self.assertIn("08:00 a 13:00", mensaje)
+        # Martes sin horario configurado → libre todo el día
+        martes = self.lunes + timedelta(days=1)
+        self.assertEqual(calendario.cobro_activo(self._momento(martes, 23)), (True, None))
+
+    def test_dia_especial_sin_cobro_anula_el_horario(self):
+        from app_estacionamiento.models import DiaEspecial
+        DiaEspecial.objects.create(
+            municipio=self.municipio, fecha=self.lunes, descripcion="Feriado de prueba",
+        )
+        permitido, mensaje = self._calendario().cobro_activo(self._momento(self.lunes, 10))
+        self.assertFalse(permitido)
+        self.assertIn("Feriado de prueba", mensaje)
+
+    def test_minutos_hasta_cierre(self):
+        calendario = self._calendario()
+        self.assertEqual(calendario.minutos_hasta_cierre(self._momento(self.lunes, 11, 30)), 90)
+        self.assertIsNone(
+            calendario.minutos_hasta_cierre(self._momento(self.lunes + timedelta(days=1), 11))
+        )
+        self.assertTrue(calendario.paso_el_cierre(self._momento(self.lunes, 13, 1)))
+        self.assertFalse(calendario.paso_el_cierre(self._momento(self.lunes, 13, 0)))
+
+    def test_cacheado_no_consulta_la_base(self):
+        from app_estacionamiento.services.horarios import puede_estacionar_ahora
+        with self.assertNumQueries(2):
+            puede_estacionar_ahora(self.municipio)
+        with self.assertNumQueries(0):
+            puede_estacionar_ahora(self.municipio)
+
+    def test_editar_horario_invalida_el_calendario(self):
+        from datetime import time
+        from app_estacionamiento.services.horarios import obtener_calendario
+        self.assertEqual(obtener_calendario(self.municipio).ventanas[0][1], time(13, 0))
+        self.horario.hora_fin = time(20, 0)
+        self.horario.save()
+        self.assertEqual(obtener_calendario(self.municipio).ventanas[0][1], time(20, 0))
+
+    def test_agregar_dia_especial_invalida_el_calendario(self):
+        from app_estacionamiento.models import DiaEspecial
+        from app_estacionamiento.services.horarios import obtener_calendario
+        hoy = timezone.localdate()
+        self.assertNotIn(hoy, obtener_calendario(self.municipio).especiales)
+        dia = DiaEspecial.objects.create(municipio=self.municipio, fecha=hoy, descripcion="Duelo")
+        self.assertIn(hoy, obtener_calendario(self.municipio).especiales)
+        dia.delete()
+        self.assertNotIn(hoy, obtener_calendario(self.municipio).especiales)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 14. Barrido de estacionamientos vencidos
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestBarridoEstacionamientos(TestCase):
+    """
+    barrer_estacionamientos cierra por lotes los vencidos por tiempo y por
+    cierre de horario, con la misma contabilidad que el cierre individual.
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.municipio = crear_municipio()
+        self.subcuadra = crear_subcuadra(self.municipio)
+        self.conductor = crear_conductor(self.municipio)
+        self.ahora     = timezone.now()
+
+    def _estacionamiento(self, patente, minutos_atras, duracion=1, costo=Decimal("200")):
+        from app_estacionamiento.models import Estacionamiento
+        est = Estacionamiento.objects.create(
+            vehiculo=crear_vehiculo(self.municipio, patente=patente),
+            subcuadra=self.subcuadra, usuario=self.conductor,
+            duracion_horas=duracion, costo_base=costo,
+        )
+        Estacionamiento.objects.filter(pk=est.pk).update(
+            hora_inicio=self.ahora - timedelta(minutes=minutos_atras)
+        )
+        return est
+
+    def test_vencidos_por_tiempo_se_finalizan_en_lote(self):
+        from app_estacionamiento.services.barrido import barrer_vencidos_por_tiempo
+        vencidos = [self._estacionamiento(f"VEN00{i}", 61 + i) for i in range(5)]
+        gratis   = self._estacionamiento("VEN009", 200, duracion=2, costo=Decimal("0"))
+        vigente  = self._estacionamiento("VIG001", 30)
+
+        self.assertEqual(barrer_vencidos_por_tiempo(self.ahora, lote=2), 6)
+
+        for est in vencidos:
+            est.refresh_from_db()
+            self.assertEqual(est.estado, "FINALIZADO")
+            self.assertEqual(est.costo_final, Decimal("200"))
+            self.assertEqual(est.hora_fin, self.ahora)
+        gratis.refresh_from_db()
+        self.assertEqual(gratis.costo_final, Decimal("100"))   # TARIFA_MINIMA
+        vigente.refresh_from_db()
+        self.assertEqual(vigente.estado, "ACTIVO")
+
+    def test_barrido_se_refleja_en_el_estado_de_la_patente(self):
+        from app_estacionamiento.services.barrido import barrer_vencidos_por_tiempo
+        from app_estacionamiento.services.indice_patentes import PatenteStatusIndex
+        self._estacionamiento("IDX002", 90)
+        registro = PatenteStatusIndex.obtener("IDX002", self.municipio)
+        self.assertIsNotNone(registro["estacionamiento_inicio"])
+        barrer_vencidos_por_tiempo(self.ahora)
+        registro = PatenteStatusIndex.obtener("IDX002", self.municipio)
+        self.assertIsNone(registro["estacionamiento_inicio"])
+
+    def test_cierre_de_horario_respeta_el_reintegro(self):
+        from datetime import time
+        from app_estacionamiento.models import HorarioEstacionamiento, MovimientoCaja
+        from app_estacionamiento.services.barrido import barrer_estacionamientos
+        HorarioEstacionamiento.objects.create(
+            municipio=self.municipio, dia_semana=timezone.localtime(self.ahora).weekday(),
+            hora_inicio=time(0, 0), hora_fin=time(0, 0),   # ya cerró hoy
+        )
+        largo  = self._estacionamiento("HOR001", 45, duracion=3)
+        recien = self._estacionamiento("HOR002", 10, duracion=3)
+        saldo_antes = self.conductor.saldo
+
+        resultado = barrer_estacionamientos(self.ahora)
+
+        self.assertEqual(resultado, {"por_tiempo": 0, "por_horario": 2})
+        largo.refresh_from_db()
+        recien.refresh_from_db()
+        self.assertEqual(largo.costo_final, Decimal("200"))
+        self.assertEqual(recien.costo_final, Decimal("0"))
+        self.assertEqual(saldo_actual(self.conductor), saldo_antes + Decimal("200"))
+        self.assertEqual(
+            MovimientoCaja.objects.filter(usuario=self.conductor, tipo="ingreso").count(), 1
+        )
+
+    def test_comando_barrer_estacionamientos(self):
+        import io
+        from django.core.management import call_command
+        est = self._estacionamiento("CMD001", 120)
+        salida = io.StringIO()
+        call_command("barrer_estacionamientos", stdout=salida)
+        est.refresh_from_db()
+        self.assertEqual(est.estado, "FINALIZADO")
+        self.assertIn("por tiempo: 1", salida.getvalue())
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 15. finalizar_lote() — misma contabilidad que ejecutar() fila por fila
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestFinalizarLote(TestCase):
+    """
+    Test de propiedad: para escenarios generados al azar (semilla fija),
+    finalizar_lote sobre un conjunto da exactamente los mismos costos,
+    saldos y movimientos que llamar a ejecutar() sobre un conjunto gemelo.
+    """
+
+    CONDUCTORES = 3
+
+    def setUp(self):
+        self.municipio = crear_municipio()
+        self.subcuadra = crear_subcuadra(self.municipio)
+        self.ahora     = timezone.now()
+
+    def _escenario(self, rng, prefijo):
+        """Crea conductores y estacionamientos ACTIVO según la secuencia de rng."""
+        from app_estacionamiento.models import Estacionamiento
+        conductores = [
+            crear_conductor(self.municipio, correo=f"{prefijo}{i}@test.com", saldo=1000)
+            for i in range(self.CONDUCTORES)
+        ]
+        estacionamientos = []
+        for i in range(rng.randint(5, 25)):
+            conductor = rng.choice(conductores + [None])
+            est = Estacionamiento.objects.create(
+                vehiculo=crear_vehiculo(self.municipio, patente=f"{prefijo}{i:03d}"),
+                subcuadra=self.subcuadra,
+                usuario=conductor,
+                duracion_horas=Decimal(rng.choice(["1", "1.5", "2", "4"])),
+                costo_base=Decimal(rng.choice(["0", "150", "237.50", "400"])),
+            )
+            Estacionamiento.objects.filter(pk=est.pk).update(
+                hora_inicio=self.ahora - timedelta(minutes=rng.randint(0, 300), seconds=rng.randint(0, 59))
+            )
+            estacionamientos.append(est)
+        return conductores, estacionamientos
+
+    def _foto(self, conductores, estacionamientos):
+        """Estado contable comparable entre los dos conjuntos gemelos."""
+        from app_estacionamiento.models import Estacionamiento
+        for c in conductores:
+            c.refresh_from_db()
+        costos = [
+            (e.estado, e.costo_final, e.hora_fin)
+            for e in Estacionamiento.objects.filter(
+                pk__in=[e.pk for e in estacionamientos]
+            ).order_by("pk")
+        ]
+        movimientos = [
+            sorted(
+                MovimientoCaja.objects.filter(usuario=c)
+                .values_list("monto", "tipo", "descripcion")
+            )
+            for c in conductores
+        ]
+        return costos, [saldo_actual(c) for c in conductores], movimientos
+
+    def test_lote_equivale_a_fila_por_fila(self):
+        import random
+        from unittest.mock import patch
+        from app_estacionamiento.use_cases.finalizar_estacionamiento import (
+            ejecutar, finalizar_lote,
+        )
+        from app_estacionamiento.models import Estacionamiento
+
+        for semilla in range(8):
+            with self.subTest(semilla=semilla):
+                cond_a, ests_a = self._escenario(random.Random(semilla), f"a{semilla}x")
+                cond_b, ests_b = self._escenario(random.Random(semilla), f"b{semilla}x")
+
+                with patch("app_estacionamiento.use_cases.finalizar_estacionamiento.timezone") as tz:
+                    tz.now.return_value = self.ahora
+                    for est in ests_a:
+                        ejecutar(est)
+
+                resultado = finalizar_lote(
+                    Estacionamiento.objects.filter(pk__in=[e.pk for e in ests_b]), self.ahora,
+                )
+
+                self.assertEqual(self._foto(cond_a, ests_a), self._foto(cond_b, ests_b))
+                self.assertEqual(resultado["finalizados"], len(ests_b))
+
+    def test_lote_usa_queries_constantes(self):
+        import random
+        from app_estacionamiento.use_cases.finalizar_estacionamiento import finalizar_lote
+        from app_estacionamiento.models import Estacionamiento
+        _, ests = self._escenario(random.Random(1), "q")
+        # SELECT FOR UPDATE + UPDATE estacionamientos + bulk_create libro + bulk_create caja
+        # + alta y UPDATE de CajaSaldo (+ SAVEPOINT/RELEASE del atomic dentro del TestCase)
+        with self.assertNumQueries(8):
+            finalizar_lote(Estacionamiento.objects.filter(pk__in=[e.pk for e in ests]), self.ahora)
+
+    def test_lote_ignora_los_ya_finalizados(self):
+        import random
+        from app_estacionamiento.use_cases.finalizar_estacionamiento import finalizar_lote
+        from app_estacionamiento.models import Estacionamiento
+        _, ests = self._escenario(random.Random(2), "f")
+        qs = Estacionamiento.objects.filter(pk__in=[e.pk for e in ests])
+        finalizar_lote(qs, self.ahora)
+        self.assertEqual(finalizar_lote(qs, self.ahora)["finalizados"], 0)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 16. Libro de saldo — SaldoMovimiento, débito condicional y compactación
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestLibroSaldo(TestCase):
+    """saldo_actual = snapshot + pendientes; los débitos no dejan saldo negativo."""
+
+    def setUp(self):
+        self.municipio = crear_municipio()
+        self.conductor = crear_conductor(self.municipio, saldo=500)
+
+    def _pendientes(self):
+        from app_estacionamiento.models import SaldoMovimiento
+        return SaldoMovimiento.objects.filter(usuario=self.conductor, compactado=False)
+
+    def test_acreditar_no_toca_el_snapshot(self):
+        from app_estacionamiento.services.saldo import acreditar_saldo
+        acreditar_saldo(self.conductor.pk, Decimal("250"), "Carga")
+        self.conductor.refresh_from_db()
+        self.assertEqual(self.conductor.saldo, Decimal("500"))
+        self.assertEqual(saldo_actual(self.conductor), Decimal("750"))
+
+    def test_debito_usa_creditos_pendientes(self):
+        """Un débito puede gastar una carga que todavía no se compactó."""
+        from app_estacionamiento.services.saldo import acreditar_saldo, debitar_saldo_conductor
+        acreditar_saldo(self.conductor.pk, Decimal("100"), "Carga")
+        debitar_saldo_conductor(self.conductor, Decimal("600"), "Estacionamiento")
+        self.assertEqual(saldo_actual(self.conductor), Decimal("0"))
+        self.assertTrue(MovimientoCaja.objects.filter(
+            usuario=self.conductor, tipo="egreso", monto=Decimal("600"),
+        ).exists())
+
+    def test_debito_insuficiente_no_inserta_nada(self):
+        from app_estacionamiento.services.saldo import SaldoInsuficiente, debitar_saldo_conductor
+        with self.assertRaises(SaldoInsuficiente):
+            debitar_saldo_conductor(self.conductor, Decimal("500.01"), "Estacionamiento")
+        self.assertFalse(self._pendientes().exists())
+        self.assertFalse(MovimientoCaja.objects.filter(usuario=self.conductor).exists())
+        self.assertEqual(saldo_actual(self.conductor), Decimal("500"))
+
+    def test_debitos_sucesivos_frenan_en_cero(self):
+        """Con céntimos: la suma no se pasa por redondeo y el último débito se rechaza."""
+        from app_estacionamiento.services.saldo import SaldoInsuficiente, debitar_saldo_conductor
+        for _ in range(3):
+            debitar_saldo_conductor(self.conductor, Decimal("166.66"), "Estacionamiento")
+        debitar_saldo_conductor(self.conductor, Decimal("0.02"), "Estacionamiento")
+        with self.assertRaises(SaldoInsuficiente):
+            debitar_saldo_conductor(self.conductor, Decimal("0.01"), "Estacionamiento")
+        self.assertEqual(saldo_actual(self.conductor), Decimal("0"))
+
+    def test_compactar_conserva_el_saldo(self):
+        from app_estacionamiento.services.saldo import (
+            acreditar_saldo, compactar_saldos, debitar_saldo_conductor,
+        )
+        otro = crear_conductor(self.municipio, correo="otro@test.com", saldo=0)
+        acreditar_saldo(self.conductor.pk, Decimal("70.10"), "Carga")
+        debitar_saldo_conductor(self.conductor, Decimal("20.05"), "Estacionamiento")
+        acreditar_saldo(otro.pk, Decimal("30"), "Carga")
+
+        self.assertEqual(compactar_saldos(), 3)
+
+        self.assertFalse(self._pendientes().exists())
+        self.conductor.refresh_from_db()
+        otro.refresh_from_db()
+        self.assertEqual(self.conductor.saldo, Decimal("550.05"))
+        self.assertEqual(otro.saldo, Decimal("30"))
+        self.assertEqual(saldo_actual(self.conductor), Decimal("550.05"))
+        self.assertEqual(compactar_saldos(), 0)
+
+    def test_compacta_al_confirmar_solo_si_acumula(self):
+        """Una operación no reescribe el Usuario hasta que hay COMPACTAR_DESDE pendientes."""
+        from unittest.mock import patch
+        from app_estacionamiento.services.saldo import acreditar_saldo
+        with patch("app_estacionamiento.services.saldo.COMPACTAR_DESDE", 3):
+            for _ in range(2):
+                with self.captureOnCommitCallbacks(execute=True):
+                    acreditar_saldo(self.conductor.pk, Decimal("40"), "Carga")
+            self.conductor.refresh_from_db()
+            self.assertEqual(self.conductor.saldo, Decimal("500"))
+            self.assertEqual(self.conductor.saldo_al_dia, Decimal("580"))
+            self.assertEqual(self._pendientes().count(), 2)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                acreditar_saldo(self.conductor.pk, Decimal("40"), "Carga")
+        self.conductor.refresh_from_db()
+        self.assertEqual(self.conductor.saldo, Decimal("620"))
+        self.assertFalse(self._pendientes().exists())
+
+    def test_listado_anota_saldo_al_dia(self):
+        from app_estacionamiento.services.saldo import acreditar_saldo, con_saldo_al_dia
+        acreditar_saldo(self.conductor.pk, Decimal("25"), "Carga")
+        with self.assertNumQueries(1):
+            saldos = {u.pk: u.saldo_al_dia for u in con_saldo_al_dia(Usuario.objects.all())}
+        self.assertEqual(saldos[self.conductor.pk], Decimal("525"))
+
+    def test_cobro_efectivo_va_al_saldo_operativo(self):
+        from app_estacionamiento.services.caja import registrar_cobro_efectivo
+        from app_estacionamiento.services.saldo import compactar_saldos
+        from app_estacionamiento.models import SaldoMovimiento
+        vendedor = crear_vendedor(self.municipio)
+        registrar_cobro_efectivo(vendedor, Decimal("300"), "Cobro")
+        self.assertEqual(
+            saldo_actual(vendedor, SaldoMovimiento.CUENTA_OPERATIVO), Decimal("300"),
+        )
+        compactar_saldos()
+        vendedor.refresh_from_db()
+        self.assertEqual(vendedor.saldo_operativo, Decimal("300"))
+        self.assertEqual(vendedor.saldo, Decimal("0"))
+
+    def test_estacionar_sin_saldo_al_insertar_no_crea_nada(self):
+        """Si otro débito se llevó el saldo después del chequeo optimista, no se estaciona."""
+        from unittest.mock import patch
+        from app_estacionamiento.models import Estacionamiento
+        from app_estacionamiento.use_cases.estacionar_vehiculo import (
+            REDIRECT_SIN_SALDO, ejecutar_estacionamiento,
+        )
+        crear_tarifa(self.municipio, precio_hora=300)
+        vehiculo  = crear_vehiculo(self.municipio)
+        subcuadra = crear_subcuadra(self.municipio)
+
+        with patch(
+            "app_estacionamiento.use_cases.estacionar_vehiculo.saldo_actual",
+            return_value=Decimal("100000"),
+        ):
+            resultado = ejecutar_estacionamiento(self.conductor, vehiculo, subcuadra, "2")
+
+        self.assertFalse(resultado["ok"])
+        self.assertEqual(resultado["redirect"], REDIRECT_SIN_SALDO)
+        self.assertFalse(Estacionamiento.objects.filter(vehiculo=vehiculo).exists())
+        self.assertFalse(self._pendientes().exists())
+
+    def test_estacionar_otro_error_no_se_informa_como_sin_saldo(self):
+        """Solo SaldoInsuficiente lleva a cargar saldo; otro ValueError se propaga sin debitar."""
+        from unittest.mock import patch
+        from app_estacionamiento.use_cases.estacionar_vehiculo import ejecutar_estacionamiento
+        crear_tarifa(self.municipio, precio_hora=100)
+        vehiculo  = crear_vehiculo(self.municipio)
+        subcuadra = crear_subcuadra(self.municipio)
+
+        with patch(
+            "app_estacionamiento.use_cases.estacionar_vehiculo.EstacionamientoFactory.crear",
+            side_effect=ValueError("dato inválido"),
+        ), self.assertRaisesMessage(ValueError, "dato inválido"):
+            ejecutar_estacionamiento(self.conductor, vehiculo, subcuadra, "1")
+        self.assertFalse(self._pendientes().exists())
+        self.assertEqual(saldo_actual(self.conductor), Decimal("500"))
+
+    def test_comando_compactar_saldos(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from app_estacionamiento.services.saldo import acreditar_saldo
+        acreditar_saldo(self.conductor.pk, Decimal("10"), "Carga")
+        salida = StringIO()
+        call_command("compactar_saldos", stdout=salida)
+        self.assertIn("compactados: 1", salida.getvalue())
+        self.conductor.refresh_from_db()
+        self.assertEqual(self.conductor.saldo, Decimal("510"))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 17. Índice espacial de subcuadras — GPS del inspector y del pago público
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestIndiceSubcuadras(TestCase):
+    """La grilla da el mismo resultado que recorrer todas las cuadras con haversine."""
+
+    # Centro aproximado de una ciudad bonaerense
+    LAT, LON = -34.6037, -58.3816
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.municipio = crear_municipio()
+
+    def _puntos(self, rng, cantidad, radio=0.03):
+        from app_estacionamiento.services.indice_subcuadras import SubcuadraGPS
+        return [
+            SubcuadraGPS(
+                i, f"Calle {i}", i,
+                self.LAT + rng.uniform(-radio, radio),
+                self.LON + rng.uniform(-radio, radio),
+            )
+            for i in range(cantidad)
+        ]
+
+    def test_coincide_con_fuerza_bruta(self):
+        import random
+        from app_estacionamiento.services.indice_subcuadras import IndiceSubcuadras, haversine_m
+        for semilla in range(5):
+            rng     = random.Random(semilla)
+            puntos  = self._puntos(rng, rng.randint(1, 400))
+            indice  = IndiceSubcuadras(puntos)
+            for _ in range(40):
+                # Algunas consultas caen lejos de la zona cargada
+                lat = self.LAT + rng.uniform(-0.2, 0.2)
+                lon = self.LON + rng.uniform(-0.2, 0.2)
+                k   = rng.choice([1, 3, 10])
+                esperado = sorted(
+                    (haversine_m(lat, lon, p.lat, p.lon), p.id) for p in puntos
+                )[:k]
+                obtenido = [(d, p.id) for d, p in indice.cercanas(lat, lon, k)]
+                with self.subTest(semilla=semilla, lat=lat, lon=lon, k=k):
+                    self.assertEqual([i for _, i in obtenido], [i for _, i in esperado])
+                    for (d1, _), (d2, _) in zip(obtenido, esperado):
+                        self.assertAlmostEqual(d1, d2, places=6)
+
+    def test_haversine_un_grado_de_latitud(self):
+        from app_estacionamiento.services.indice_subcuadras import haversine_m
+        self.assertAlmostEqual(haversine_m(0, 0, 1, 0), 111_195, delta=1)
+
+    def test_sin_coordenadas_no_hay_cercana(self):
+        from app_estacionamiento.services.indice_subcuadras import obtener_indice_subcuadras
+        crear_subcuadra(self.municipio)   # sin lat/lon
+        self.assertIsNone(obtener_indice_subcuadras(self.municipio.id).mas_cercana(self.LAT, self.LON))
+
+    def test_indice_se_reutiliza_y_se_rearma_al_editar(self):
+        from app_estacionamiento.services.indice_subcuadras import obtener_indice_subcuadras
+        cerca = Subcuadra.objects.create(
+            municipio=self.municipio, calle="Mitre", altura=100, lat=self.LAT, lon=self.LON,
+        )
+        lejos = Subcuadra.objects.create(
+            municipio=self.municipio, calle="Belgrano", altura=0, lat=self.LAT + 0.01, lon=self.LON,
+        )
+        self.assertEqual(obtener_indice_subcuadras(self.municipio.id).mas_cercana(self.LAT, self.LON).id, cerca.id)
+        with self.assertNumQueries(0):
+            obtener_indice_subcuadras(self.municipio.id)
+
+        # Como guardar_coordenadas de gestionar_subcuadras
+        lejos.lat, lejos.lon = self.LAT + 0.00001, self.LON
+        lejos.save(update_fields=["lat", "lon"])
+        cerca.lat = cerca.lon = None
+        cerca.save(update_fields=["lat", "lon"])
+
+        mas_cercana = obtener_indice_subcuadras(self.municipio.id).mas_cercana(self.LAT, self.LON)
+        self.assertEqual(mas_cercana.id, lejos.id)
+        self.assertEqual(mas_cercana.nombre, "Belgrano")
+
+    def test_endpoints_gps(self):
+        Subcuadra.objects.create(
+            municipio=self.municipio, calle="Mitre", altura=200, lat=self.LAT, lon=self.LON,
+        )
+        Subcuadra.objects.create(
+            municipio=self.municipio, calle="Mitre", altura=300, lat=self.LAT + 0.002, lon=self.LON,
+        )
+        consulta = {"lat": self.LAT + 0.0015, "lon": self.LON}
+
+        inspector = crear_inspector(self.municipio)
+        client = Client()
+        client.force_login(inspector)
+        respuesta = client.get(reverse("inspectores_subcuadra_cercana"), consulta).json()
+        self.assertEqual(respuesta["nombre"], "Mitre 300")
+
+        publica = Client().get(reverse("pago_publico_subcuadra_cercana"), consulta).json()
+        self.assertEqual((publica["calle"], publica["altura"]), ("Mitre", 300))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 18. Fotos de infracciones — marca de agua en segundo plano
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestFotosInfraccionesAsincronas(TestCase):
+    """
+    Con INFRACCIONES_FOTO_ASINCRONA el acta se guarda con la foto cruda y
+    services/fotos_infracciones.py la marca, le quita el EXIF y la reemplaza.
+    """
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(INFRACCIONES_FOTO_ASINCRONA=True, MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.municipio = crear_municipio()
+        crear_tarifa(self.municipio)
+        self.inspector = crear_inspector(self.municipio)
+        self.subcuadra = crear_subcuadra(self.municipio)
+        crear_vehiculo(self.municipio, patente="FOT001")
+
+    def _foto(self, contenido=None, exif=None):
+        """JPEG blanco 800×600 (o bytes arbitrarios) como upload."""
+        import io
+        from PIL import Image
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        if contenido is None:
+            buf = io.BytesIO()
+            Image.new("RGB", (800, 600), (255, 255, 255)).save(
+                buf, format="JPEG", quality=95, exif=exif or b"",
+            )
+            contenido = buf.getvalue()
+        return SimpleUploadedFile("acta.jpg", contenido, content_type="image/jpeg")
+
+    def _crear(self, foto):
+        from app_estacionamiento.services.infracciones import crear_infraccion
+        return crear_infraccion(
+            patente="FOT001", subcuadra_id=self.subcuadra.id, inspector=self.inspector,
+            foto=foto, gps_lat="-34.65061", gps_lon="-59.43203", gps_acc="12",
+        )
+
+    def _franja_oscura(self, infraccion):
+        from PIL import Image
+        with infraccion.foto.storage.open(infraccion.foto.name, "rb") as f:
+            img = Image.open(f)
+            img.load()
+        alto = img.height
+        return sum(
+            1 for x in range(0, img.width, 20)
+            if all(c < 200 for c in img.getpixel((x, int(alto * 0.90) + 5)))
+        ), img
+
+    def test_acta_se_guarda_cruda_y_el_worker_la_marca(self):
+        from app_estacionamiento.services.fotos_infracciones import procesar_fotos_pendientes
+
+        infraccion = self._crear(self._foto())
+        self.assertEqual(infraccion.foto_estado, Infraccion.FOTO_PENDIENTE)
+        self.assertEqual((infraccion.gps_lat, infraccion.gps_lon, infraccion.gps_acc),
+                         ("-34.65061", "-59.43203", "12"))
+        self.assertTrue(infraccion.foto_en_proceso)
+        self.assertFalse(infraccion.foto_lista)
+        oscuros, _ = self._franja_oscura(infraccion)
+        self.assertEqual(oscuros, 0, "La foto cruda todavía no tiene marca de agua")
+        cruda = infraccion.foto.name
+
+        self.assertEqual(procesar_fotos_pendientes(), {"listas": 1, "errores": 0})
+
+        infraccion.refresh_from_db()
+        self.assertEqual(infraccion.foto_estado, Infraccion.FOTO_LISTA)
+        self.assertTrue(infraccion.foto_lista)
+        self.assertNotEqual(infraccion.foto.name, cruda)
+        self.assertFalse(infraccion.foto.storage.exists(cruda), "La foto cruda se borra")
+        oscuros, _ = self._franja_oscura(infraccion)
+        self.assertGreater(oscuros, 5)
+
+        # Nada más en la cola
+        self.assertEqual(procesar_fotos_pendientes(), {"listas": 0, "errores": 0})
+
+    def test_quita_exif_y_respeta_la_orientacion(self):
+        from PIL import Image
+        from app_estacionamiento.services.fotos_infracciones import procesar_foto
+
+        exif = Image.Exif()
+        exif[0x0112] = 6            # Orientation: rotar 90°
+        exif[0x010F] = "Celular"    # Make
+        infraccion = self._crear(self._foto(exif=exif.tobytes()))
+
+        self.assertTrue(procesar_foto(infraccion.id))
+        infraccion.refresh_from_db()
+        _, img = self._franja_oscura(infraccion)
+        self.assertEqual(dict(img.getexif()), {})
+        self.assertEqual(img.size, (600, 800))
+
+    def test_no_retoma_una_foto_en_proceso_salvo_que_este_vencida(self):
+        from app_estacionamiento.services.fotos_infracciones import (
+            PROCESANDO_VENCE_MINUTOS, procesar_foto,
+        )
+
+        infraccion = self._crear(self._foto())
+        Infraccion.objects.filter(id=infraccion.id).update(
+            foto_estado=Infraccion.FOTO_PROCESANDO, foto_estado_desde=timezone.now(),
+        )
+        self.assertFalse(procesar_foto(infraccion.id))
+
+        # Worker caído hace rato: otro la retoma
+        Infraccion.objects.filter(id=infraccion.id).update(
+            foto_estado_desde=timezone.now() - timedelta(minutes=PROCESANDO_VENCE_MINUTOS + 1),
+        )
+        self.assertTrue(procesar_foto(infraccion.id))
+        self.assertFalse(procesar_foto(infraccion.id))
+
+    def test_foto_ilegible_queda_en_error_con_la_original(self):
+        from app_estacionamiento.services.fotos_infracciones import procesar_fotos_pendientes
+
+        infraccion = self._crear(self._foto(contenido=b"esto no es un jpeg"))
+        cruda = infraccion.foto.name
+
+        self.assertEqual(procesar_fotos_pendientes(), {"listas": 0, "errores": 1})
+        infraccion.refresh_from_db()
+        self.assertEqual(infraccion.foto_estado, Infraccion.FOTO_ERROR)
+        self.assertEqual(infraccion.foto.name, cruda)
+        self.assertTrue(infraccion.foto.storage.exists(cruda))
+        # Un error no vuelve a la cola
+        self.assertEqual(procesar_fotos_pendientes(), {"listas": 0, "errores": 0})
+
+    def test_sin_modo_asincrono_la_foto_sale_marcada(self):
+        from django.test import override_settings
+
+        with override_settings(INFRACCIONES_FOTO_ASINCRONA=False):
+            infraccion = self._crear(self._foto())
+        self.assertEqual(infraccion.foto_estado, Infraccion.FOTO_LISTA)
+        oscuros, _ = self._franja_oscura(infraccion)
+        self.assertGreater(oscuros, 5)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 19. CajaSaldo — totales de caja incrementales y reconciliación
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestCajaSaldo(TestCase):
+    """
+    CajaSaldo se mantiene en cada MovimientoCaja / cierre y siempre coincide
+    con lo que da sumar el historial (services/caja_saldo.py).
+    """
+
+    def setUp(self):
+        self.municipio = crear_municipio()
+        crear_tarifa(self.municipio)
+        self.vendedor  = crear_vendedor(self.municipio)
+        self.conductor = crear_conductor(self.municipio)
+
+    def _esperado(self, usuario):
+        from app_estacionamiento.services.caja_saldo import totales_desde_historial
+        return totales_desde_historial([usuario.pk])[usuario.pk]
+
+    def _caja(self, usuario):
+        from app_estacionamiento.services.caja_saldo import obtener_caja_saldo
+        return obtener_caja_saldo(usuario)
+
+    def _assert_coincide(self, usuario):
+        caja, esperado = self._caja(usuario), self._esperado(usuario)
+        for campo in ("total_ingresos", "total_egresos", "total_comisiones",
+                      "abierto_monto", "abierto_cantidad"):
+            self.assertEqual(getattr(caja, campo), esperado[campo], campo)
+        self.assertEqual(
+            caja.ingresos_del_dia(esperado["dia"]),
+            (esperado["dia_ingresos"], esperado["dia_cantidad"]),
+        )
+
+    def test_movimientos_y_cierre_mantienen_los_totales(self):
+        from app_estacionamiento.services.caja import generar_cierre_caja, registrar_cobro_efectivo
+        from app_estacionamiento.services.saldo import debitar_saldo_conductor
+
+        self.assertEqual(self._caja(self.vendedor).abierto_monto, 0)
+        registrar_cobro_efectivo(self.vendedor, Decimal("300"), "cobro 1", Decimal("30"))
+        registrar_cobro_efectivo(self.vendedor, Decimal("200"), "cobro 2", Decimal("20"))
+        MovimientoCaja.objects.create(
+            usuario=self.vendedor, monto=Decimal("50"), tipo="egreso", descripcion="vuelto",
+        )
+        self._assert_coincide(self.vendedor)
+        caja = self._caja(self.vendedor)
+        self.assertEqual((caja.abierto_monto, caja.abierto_cantidad), (Decimal("500"), 2))
+        self.assertEqual(caja.saldo, Decimal("450"))
+        self.assertEqual(caja.total_comisiones, Decimal("50"))
+
+        cierre = generar_cierre_caja(self.vendedor)
+        self.assertEqual(cierre.total_cobrado, Decimal("500"))
+        caja = self._caja(self.vendedor)
+        self.assertEqual((caja.abierto_monto, caja.abierto_cantidad), (Decimal("0"), 0))
+        self.assertEqual(caja.total_ingresos, Decimal("500"))
+        self._assert_coincide(self.vendedor)
+
+        debitar_saldo_conductor(self.conductor, Decimal("100"), "estacionamiento")
+        self._assert_coincide(self.conductor)
+
+    def test_finalizar_lote_actualiza_las_cajas(self):
+        from app_estacionamiento.models import Estacionamiento
+        from app_estacionamiento.use_cases.finalizar_estacionamiento import finalizar_lote
+
+        vehiculo = crear_vehiculo(self.municipio, patente="CAJ001")
+        subcuadra = crear_subcuadra(self.municipio)
+        est = Estacionamiento.objects.create(
+            usuario=self.conductor, vehiculo=vehiculo, subcuadra=subcuadra,
+            duracion_horas=1, costo_base=Decimal("150"),
+        )
+        finalizar_lote(Estacionamiento.objects.filter(pk=est.pk))
+        self.assertEqual(self._caja(self.conductor).total_ingresos, Decimal("150"))
+        self._assert_coincide(self.conductor)
+
+    def test_el_dia_arranca_de_cero(self):
+        registrar = MovimientoCaja.objects.create
+        mov = registrar(usuario=self.vendedor, monto=Decimal("80"), tipo="ingreso")
+        ayer = timezone.localdate() - timedelta(days=1)
+        from app_estacionamiento.models import CajaSaldo
+        CajaSaldo.objects.filter(pk=self.vendedor.pk).update(dia=ayer)
+        self.assertEqual(self._caja(self.vendedor).ingresos_del_dia(timezone.localdate()),
+                         (Decimal("0"), 0))
+
+        registrar(usuario=self.vendedor, monto=Decimal("20"), tipo="ingreso")
+        caja = self._caja(self.vendedor)
+        self.assertEqual(caja.dia, timezone.localdate())
+        self.assertEqual(caja.ingresos_del_dia(caja.dia), (Decimal("20"), 1))
+        self.assertEqual(caja.total_ingresos, mov.monto + Decimal("20"))
+
+    def test_reconciliar_corrige_diferencias(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from app_estacionamiento.models import CajaSaldo
+
+        for monto in ("100", "250"):
+            MovimientoCaja.objects.create(usuario=self.vendedor, monto=Decimal(monto), tipo="ingreso")
+        # Alta por fuera de save(): la caja queda desfasada
+        MovimientoCaja.objects.bulk_create([
+            MovimientoCaja(usuario=self.vendedor, monto=Decimal("40"), tipo="egreso"),
+        ])
+        CajaSaldo.objects.filter(pk=self.conductor.pk).delete()
+
+        salida = StringIO()
+        call_command("reconciliar_cajas", "--solo-verificar", stdout=salida)
+        self.assertIn(f"usuario {self.vendedor.pk}", salida.getvalue())
+        self.assertEqual(self._caja(self.vendedor).total_egresos, 0)
+
+        call_command("reconciliar_cajas", stdout=StringIO())
+        self._assert_coincide(self.vendedor)
+        self.assertEqual(self._caja(self.vendedor).saldo, Decimal("310"))
+
+        salida = StringIO()
+        call_command("reconciliar_cajas", stdout=salida)
+        self.assertIn("corregidas: 0", salida.getvalue())
+
+    def test_panel_y_caja_leen_caja_saldo(self):
+        from app_estacionamiento.services.caja import registrar_cobro_efectivo
+
+        registrar_cobro_efectivo(self.vendedor, Decimal("120"), "cobro", Decimal("12"))
+        client = Client()
+        client.force_login(self.vendedor)
+
+        panel = client.get(reverse("panel_vendedor"))
+        self.assertEqual(panel.context["total_hoy"], Decimal("120"))
+        self.assertEqual(panel.context["cantidad_operaciones"], 1)
+        self.assertEqual(panel.context["a_rendir"], Decimal("120"))
+        self.assertEqual(panel.context["comisiones_pendientes"], Decimal("12"))
+
+        caja = client.get(reverse("vendedores_cerrar_caja"))
+        self.assertEqual(caja.context["total_a_cerrar"], Decimal("120"))
+        self.assertEqual(caja.context["movimientos_abiertos"], 1)
+        self.assertEqual(caja.context["saldo"], Decimal("120"))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 20. Historial de caja — paginación por cursor y exportación en streaming
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestHistorialCajaPaginado(TestCase):
+    """paginar_keyset recorre todo sin repetir ni saltear; la exportación va en streaming."""
+
+    def setUp(self):
+        self.municipio = crear_municipio()
+        self.vendedor  = crear_vendedor(self.municipio)
+        ahora = timezone.now()
+        MovimientoCaja.objects.bulk_create([
+            MovimientoCaja(usuario=self.vendedor, monto=Decimal(i + 1), tipo="ingreso",
+                           descripcion=f"cobro {i}")
+            for i in range(23)
+        ])
+        # Varios con el mismo creado_en: el desempate por id no tiene que perder filas
+        ids = list(MovimientoCaja.objects.order_by("id").values_list("id", flat=True))
+        for n, id_ in enumerate(ids):
+            MovimientoCaja.objects.filter(id=id_).update(
+                creado_en=ahora - timedelta(minutes=n // 4),
+            )
+
+    def test_recorre_todas_las_filas_en_orden(self):
+        from app_estacionamiento.services.paginacion import paginar_keyset
+
+        vistos, cursor, paginas = [], None, 0
+        while True:
+            pagina = paginar_keyset(MovimientoCaja.objects.all(), cursor, tamanio=5)
+            self.assertEqual(pagina.es_primera, cursor is None)
+            vistos += [(m.creado_en, m.id) for m in pagina]
+            paginas += 1
+            cursor = pagina.siguiente
+            if cursor is None:
+                break
+        self.assertEqual(paginas, 5)
+        esperado = list(
+            MovimientoCaja.objects.order_by("-creado_en", "-id").values_list("creado_en", "id")
+        )
+        self.assertEqual(vistos, esperado)
+
+    def test_cursor_invalido_es_la_primera_pagina(self):
+        from app_estacionamiento.services.paginacion import paginar_keyset
+
+        primera = paginar_keyset(MovimientoCaja.objects.all(), None, tamanio=5)
+        for basura in ("xx", "bm8tZmVjaGF8MQ", "!!!"):
+            pagina = paginar_keyset(MovimientoCaja.objects.all(), basura, tamanio=5)
+            self.assertTrue(pagina.es_primera)
+            self.assertEqual([m.id for m in pagina], [m.id for m in primera])
+
+    def test_vistas_paginan(self):
+        client = Client()
+        client.force_login(self.vendedor)
+        respuesta = client.get(reverse("vendedores_caja"))
+        movimientos = respuesta.context["movimientos"]
+        self.assertEqual(len(movimientos), 23)
+        self.assertIsNone(movimientos.siguiente)
+
+        admin = crear_admin(self.municipio)
+        client.force_login(admin)
+        from app_estacionamiento.services import paginacion
+        from unittest.mock import patch
+        with patch.object(paginacion, "TAMANIO_PAGINA", 10):
+            primera = client.get(reverse("inspectores_resumen_cobros")).context["cobros"]
+            self.assertEqual(len(primera), 10)
+            segunda = client.get(
+                reverse("inspectores_resumen_cobros"), {"desde": primera.siguiente},
+            ).context["cobros"]
+        self.assertFalse(segunda.es_primera)
+        self.assertEqual(len(segunda), 10)
+        self.assertFalse({m.id for m in primera} & {m.id for m in segunda})
+
+    def test_exportar_csv_en_streaming(self):
+        import csv
+        import io
+        client = Client()
+        client.force_login(self.vendedor)
+        respuesta = client.get(reverse("exportar_movimientos_caja"), {"formato": "csv"})
+        self.assertTrue(respuesta.streaming)
+        self.assertIn("attachment", respuesta["Content-Disposition"])
+        contenido = b"".join(respuesta.streaming_content).decode("utf-8-sig")
+        filas = list(csv.reader(io.StringIO(contenido)))
+        self.assertEqual(filas[0][0], "Fecha")
+        self.assertEqual(len(filas), 24)
+        # De la más vieja a la más nueva (20, 21 y 22 comparten creado_en: por id)
+        self.assertEqual([f[4] for f in filas[1:4]], ["cobro 20", "cobro 21", "cobro 22"])
+
+    def test_exportar_xlsx(self):
+        import io
+        import openpyxl
+        client = Client()
+        client.force_login(self.vendedor)
+        respuesta = client.get(reverse("exportar_movimientos_caja"), {"formato": "xlsx"})
+        self.assertTrue(respuesta.streaming)
+        wb = openpyxl.load_workbook(io.BytesIO(b"".join(respuesta.streaming_content)))
+        ws = wb.active
+        self.assertEqual(ws.max_row, 24)
+        self.assertEqual(ws.cell(row=1, column=6).value, "Monto")
+        self.assertEqual(sum(ws.cell(row=r, column=6).value for r in range(2, 25)), 276)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 21. ResumenDiario — recaudación diaria pre-sumada
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestResumenDiario(TestCase):
+    """
+    ResumenDiario suma lo mismo que MovimientoCaja, se construye de forma
+    incremental y recaudacion_por_usuario combina resumen + movimientos en vivo.
+    """
+
+    def setUp(self):
+        self.municipio = crear_municipio()
+        self.vendedor  = crear_vendedor(self.municipio)
+        self.admin     = crear_admin(self.municipio)
+        otro = crear_municipio(nombre="Otro")
+        self.ajeno = crear_vendedor(otro, correo="ajeno@test.com")
+        self.hoy = timezone.localdate()
+        for dias_atras in (5, 3, 1):
+            self._mov(self.vendedor, 100, dias_atras, medio_pago="efectivo", comision=10)
+            self._mov(self.vendedor, 50, dias_atras, medio_pago="qr", comision=5)
+            self._mov(self.admin, 30, dias_atras)
+            self._mov(self.ajeno, 999, dias_atras)
+        self._mov(self.vendedor, 20, 3, tipo="egreso")
+        self._mov(self.vendedor, 7, 0)
+
+    def _mov(self, usuario, monto, dias_atras, tipo="ingreso", medio_pago="efectivo", comision=0):
+        from app_estacionamiento.services.fechas import inicio_dia
+        mov = MovimientoCaja.objects.create(
+            usuario=usuario, monto=Decimal(monto), tipo=tipo, medio_pago=medio_pago,
+            comision_monto=Decimal(comision),
+        )
+        dia = self.hoy - timedelta(days=dias_atras)
+        MovimientoCaja.objects.filter(pk=mov.pk).update(creado_en=inicio_dia(dia) + timedelta(hours=12))
+        return mov
+
+    def _directo(self, usuario, desde, hasta, tipo="ingreso"):
+        qs = MovimientoCaja.objects.filter(
+            usuario=usuario, creado_en__date__gte=desde, creado_en__date__lte=hasta,
+        )
+        if tipo:
+            qs = qs.filter(tipo=tipo)
+        return qs.aggregate(t=Sum("monto"))["t"] or 0
+
+    def test_construye_solo_dias_cerrados_y_suma_igual(self):
+        from app_estacionamiento.models import ResumenDiario
+        from app_estacionamiento.services.resumen_diario import construir_resumen_diario
+
+        resultado = construir_resumen_diario()
+        self.assertEqual(resultado["dias"], 5)   # de hace 5 días hasta ayer
+        self.assertFalse(ResumenDiario.objects.filter(fecha=self.hoy).exists())
+        fila = ResumenDiario.objects.get(
+            usuario=self.vendedor, fecha=self.hoy - timedelta(days=3),
+            medio_pago="efectivo", tipo="ingreso",
+        )
+        self.assertEqual((fila.total, fila.cantidad, fila.comisiones), (Decimal("100"), 1, Decimal("10")))
+        self.assertEqual(fila.municipio, self.municipio)
+        total = ResumenDiario.objects.filter(usuario=self.vendedor).aggregate(t=Sum("total"))["t"]
+        self.assertEqual(total, self._directo(self.vendedor, self.hoy - timedelta(days=5),
+                                              self.hoy - timedelta(days=1), tipo=None))
+
+    def test_incremental_recoge_filas_tardias(self):
+        from app_estacionamiento.models import ResumenDiario
+        from app_estacionamiento.services.resumen_diario import construir_resumen_diario
+
+        construir_resumen_diario()
+        # Segunda pasada: solo vuelve a armar el último día construido
+        self.assertEqual(construir_resumen_diario()["dias"], 1)
+
+        # Un cobro de hace 5 días que llega tarde (p. ej. sincronización offline)
+        self._mov(self.vendedor, 40, 5, medio_pago="qr")
+        self.assertEqual(construir_resumen_diario()["dias"], 2)
+        fila = ResumenDiario.objects.get(
+            usuario=self.vendedor, fecha=self.hoy - timedelta(days=5),
+            medio_pago="qr", tipo="ingreso",
+        )
+        self.assertEqual((fila.total, fila.cantidad), (Decimal("90"), 2))
+        # Sin duplicados tras varias pasadas
+        self.assertEqual(
+            ResumenDiario.objects.filter(usuario=self.vendedor).aggregate(t=Sum("total"))["t"],
+            self._directo(self.vendedor, self.hoy - timedelta(days=5),
+                          self.hoy - timedelta(days=1), tipo=None),
+        )
+
+    def test_recaudacion_combina_resumen_y_vivo(self):
+        from app_estacionamiento.services.resumen_diario import (
+            construir_resumen_diario, recaudacion_por_usuario,
+        )
+
+        construir_resumen_diario(hasta=self.hoy - timedelta(days=3))
+        for desde, hasta in (
+            (None, None),
+            (self.hoy - timedelta(days=4), self.hoy),
+            (self.hoy - timedelta(days=1), self.hoy - timedelta(days=1)),
+            (self.hoy - timedelta(days=5), self.hoy - timedelta(days=3)),
+        ):
+            filas = {r["usuario"]: r for r in recaudacion_por_usuario(self.municipio, desde, hasta)}
+            self.assertNotIn(self.ajeno, filas)
+            d = desde or date(2000, 1, 1)
+            h = hasta or self.hoy
+            self.assertEqual(filas[self.vendedor]["total"], self._directo(self.vendedor, d, h))
+            self.assertEqual(filas[self.admin]["total"], self._directo(self.admin, d, h))
+
+        todo = recaudacion_por_usuario(self.municipio, tipo=None)
+        self.assertEqual(todo[0]["usuario"], self.vendedor)
+        self.assertEqual(todo[0]["total"], Decimal("457") + Decimal("20"))
+        self.assertEqual(todo[0]["comisiones"], Decimal("45"))
+
+    def test_comando_reconstruye_rango(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from app_estacionamiento.models import ResumenDiario
+
+        salida = StringIO()
+        dia = (self.hoy - timedelta(days=3)).isoformat()
+        call_command("construir_resumen_diario", desde=dia, hasta=dia, stdout=salida)
+        self.assertIn("1 días reconstruidos", salida.getvalue())
+        self.assertEqual(
+            set(ResumenDiario.objects.values_list("fecha", flat=True)),
+            {self.hoy - timedelta(days=3)},
+        )
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 22. Rangos de fechas — filtro_fechas en vez de __date, índices compuestos
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestFiltroFechas(TestCase):
+    """filtro_fechas devuelve las mismas filas que __date__gte/__date__lte."""
+
+    def setUp(self):
+        from app_estacionamiento.services.fechas import inicio_dia
+        self.municipio = crear_municipio()
+        self.vendedor  = crear_vendedor(self.municipio)
+        self.dia = timezone.localdate() - timedelta(days=2)
+        inicio = inicio_dia(self.dia)
+        # Justo en los bordes del día, y un día antes/después
+        for momento in (
+            inicio - timedelta(microseconds=1),
+            inicio,
+            inicio + timedelta(hours=12),
+            inicio + timedelta(days=1) - timedelta(microseconds=1),
+            inicio + timedelta(days=1),
+        ):
+            mov = MovimientoCaja.objects.create(
+                usuario=self.vendedor, monto=Decimal("10"), tipo="ingreso",
+            )
+            MovimientoCaja.objects.filter(pk=mov.pk).update(creado_en=momento)
+
+    def _ids(self, **filtro):
+        return set(MovimientoCaja.objects.filter(**filtro).values_list("id", flat=True))
+
+    def test_equivale_a_date(self):
+        from app_estacionamiento.services.fechas import filtro_fechas
+
+        ayer = self.dia + timedelta(days=1)
+        casos = [
+            (self.dia, self.dia, dict(creado_en__date=self.dia)),
+            (self.dia, None, dict(creado_en__date__gte=self.dia)),
+            (None, self.dia, dict(creado_en__date__lte=self.dia)),
+            (self.dia, ayer, dict(creado_en__date__gte=self.dia, creado_en__date__lte=ayer)),
+        ]
+        for desde, hasta, con_date in casos:
+            filtro = filtro_fechas("creado_en", desde, hasta)
+            self.assertEqual(self._ids(**filtro), self._ids(**con_date), (desde, hasta))
+        self.assertEqual(len(self._ids(**filtro_fechas("creado_en", self.dia, self.dia))), 3)
+
+    def test_acepta_strings_e_ignora_invalidos(self):
+        from app_estacionamiento.services.fechas import filtro_fechas
+
+        dia = self.dia.isoformat()
+        self.assertEqual(
+            filtro_fechas("creado_en", dia, dia), filtro_fechas("creado_en", self.dia, self.dia),
+        )
+        self.assertEqual(filtro_fechas("creado_en", "", "31/12/2025"), {})
+        self.assertEqual(filtro_fechas("creado_en"), {})
+
+    def test_vista_con_fecha_invalida_no_falla(self):
+        admin = crear_admin(self.municipio)
+        client = Client()
+        client.force_login(admin)
+        respuesta = client.get(
+            reverse("admin_infracciones"), {"fecha_desde": "no-es-fecha", "fecha_hasta": "2025-13-45"},
+        )
+        self.assertEqual(respuesta.status_code, 200)
+
+
+@skipUnless(connection.vendor == "postgresql", "EXPLAIN de índices: solo PostgreSQL")
+class TestIndicesRangosFecha(TestCase):
+    """
+    Los filtros por rango de fecha de los listados usan los índices
+    compuestos. enable_seqscan=off para que el planner no prefiera el
+    recorrido secuencial por tener pocas filas.
+    """
+
+    def setUp(self):
+        self.municipio = crear_municipio()
+        self.vendedor  = crear_vendedor(self.municipio)
+        self.hoy = timezone.localdate()
+
+    def _plan(self, queryset):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+    def test_infracciones_del_municipio(self):
+        from app_estacionamiento.services.fechas import filtro_fechas
+        qs = Infraccion.objects.filter(
+            municipio=self.municipio, **filtro_fechas("creado_en", self.hoy, self.hoy),
+        )
+        self.assertIn("idx_infraccion_mun_fecha", self._plan(qs))
+
+    def test_cobros_del_dia(self):
+        from app_estacionamiento.services.fechas import filtro_fechas
+        qs = MovimientoCaja.objects.filter(
+            usuario=self.vendedor, tipo="ingreso", cerrado=False,
+            **filtro_fechas("creado_en", self.hoy, self.hoy),
+        )
+        self.assertIn("idx_movcaja_usr_tipo_fecha", self._plan(qs))
+
+    def test_estacionamientos_por_subcuadra(self):
+        from app_estacionamiento.models import Estacionamiento
+        from app_estacionamiento.services.fechas import filtro_fechas
+        subcuadra = crear_subcuadra(self.municipio)
+        qs = Estacionamiento.objects.filter(
+            subcuadra=subcuadra, estado="FINALIZADO",
+            **filtro_fechas("hora_inicio", self.hoy, self.hoy),
+        )
+        self.assertIn("idx_estac_sub_estado_inicio", self._plan(qs))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 23. Cierre de caja en una pasada
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestCierreCajaUnaPasada(TestCase):
+    """
+    generar_cierre_caja cierra y suma en una pasada: pocas queries sin
+    importar la cantidad de movimientos, y respeta el rango de fechas.
+    """
+
+    def setUp(self):
+        self.municipio = crear_municipio()
+        self.vendedor  = crear_vendedor(self.municipio)
+        self.vendedor.porcentaje_ganancia = Decimal("10")
+        self.vendedor.save()
+        medios = [m for m, _ in MovimientoCaja.MEDIOS_PAGO]
+        MovimientoCaja.objects.bulk_create([
+            MovimientoCaja(usuario=self.vendedor, monto=Decimal("10"), tipo="ingreso",
+                           medio_pago=medios[i % len(medios)])
+            for i in range(60)
+        ])
+
+    def test_queries_constantes(self):
+        from app_estacionamiento.services.caja import generar_cierre_caja
+        from app_estacionamiento.models import CierreCaja
+
+        # savepoint + agregación + UPDATE + INSERT del cierre + CajaSaldo + release
+        with self.assertNumQueries(6):
+            cierre = generar_cierre_caja(self.vendedor)
+        self.assertEqual(cierre.total_cobrado, Decimal("600"))
+        self.assertEqual(cierre.cantidad_movimientos, 60)
+        self.assertEqual(cierre.total_efectivo, Decimal("100"))
+        self.assertEqual(cierre.total_transferencia, Decimal("100"))
+        self.assertEqual(cierre.total_digital, Decimal("400"))
+        self.assertEqual(cierre.ganancia_usuario, Decimal("60.00"))
+        self.assertEqual(
+            cierre.fecha_apertura,
+            MovimientoCaja.objects.order_by("creado_en").first().creado_en,
+        )
+        self.assertFalse(MovimientoCaja.objects.filter(cerrado=False).exists())
+        self.assertEqual(CierreCaja.objects.count(), 1)
+
+    def test_rango_de_fechas_deja_el_resto_abierto(self):
+        from app_estacionamiento.services.caja import generar_cierre_caja
+
+        ahora = timezone.now()
+        viejos = list(MovimientoCaja.objects.order_by("id").values_list("id", flat=True)[:20])
+        MovimientoCaja.objects.filter(id__in=viejos).update(creado_en=ahora - timedelta(days=3))
+
+        cierre = generar_cierre_caja(self.vendedor, fecha_hasta=ahora - timedelta(days=1))
+        self.assertEqual(cierre.cantidad_movimientos, 20)
+        self.assertEqual(
+            set(MovimientoCaja.objects.filter(cerrado=True).values_list("id", flat=True)), set(viejos),
+        )
+        self.assertEqual(generar_cierre_caja(self.vendedor).cantidad_movimientos, 40)
+        self.assertIsNone(generar_cierre_caja(self.vendedor))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 24. Cierres de caja programados
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestCierresProgramados(TestCase):
+    """
+    programar_cierres crea un trabajo por cobrador y corte; el worker genera
+    el cierre hasta el corte y le manda el resumen al cobrador.
+    """
+
+    def setUp(self):
+        from datetime import datetime, time
+        self.municipio = crear_municipio()
+        self.municipio.cierre_automatico = "diario"
+        self.municipio.cierre_hora = time(20, 0)
+        self.municipio.save()
+        self.vendedor = crear_vendedor(self.municipio)
+        self.vendedor.porcentaje_ganancia = Decimal("10")
+        self.vendedor.save()
+        self.admin = crear_admin(self.municipio)
+        self.corte = timezone.make_aware(
+            datetime.combine(timezone.localdate() - timedelta(days=1), time(20, 0))
+        )
+        self.ahora = self.corte + timedelta(hours=2)
+        self._mov(self.vendedor, 100, self.corte - timedelta(hours=3))
+        self._mov(self.vendedor, 50, self.corte - timedelta(minutes=1), medio_pago="qr")
+        self._mov(self.vendedor, 30, self.corte + timedelta(minutes=30))   # después del corte
+        self._mov(self.admin, 70, self.corte - timedelta(hours=1))
+
+    def _mov(self, usuario, monto, creado_en, medio_pago="efectivo"):
+        mov = MovimientoCaja.objects.create(
+            usuario=usuario, monto=Decimal(monto), tipo="ingreso", medio_pago=medio_pago,
+        )
+        MovimientoCaja.objects.filter(pk=mov.pk).update(creado_en=creado_en)
+
+    def test_corte_vigente(self):
+        from app_estacionamiento.services.cierres_programados import corte_vigente
+
+        self.assertEqual(corte_vigente(self.municipio, self.ahora), self.corte)
+        self.assertEqual(
+            corte_vigente(self.municipio, self.corte - timedelta(minutes=1)),
+            self.corte - timedelta(days=1),
+        )
+        self.municipio.cierre_automatico = "semanal"
+        self.municipio.cierre_dia_semana = self.corte.weekday()
+        self.assertEqual(corte_vigente(self.municipio, self.ahora), self.corte)
+        self.assertEqual(
+            corte_vigente(self.municipio, self.corte - timedelta(seconds=1)),
+            self.corte - timedelta(days=7),
+        )
+        self.municipio.cierre_automatico = ""
+        self.assertIsNone(corte_vigente(self.municipio, self.ahora))
+
+    def test_programar_es_idempotente(self):
+        from app_estacionamiento.models import TrabajoCierreCaja
+        from app_estacionamiento.services.cierres_programados import programar_cierres
+
+        self.assertEqual(programar_cierres(self.ahora), 2)
+        self.assertEqual(programar_cierres(self.ahora), 0)
+        self.assertEqual(
+            set(TrabajoCierreCaja.objects.values_list("usuario_id", "corte", "periodo")),
+            {(self.vendedor.id, self.corte, "diario"), (self.admin.id, self.corte, "diario")},
+        )
+        # Municipio con cierre manual: nada
+        TrabajoCierreCaja.objects.all().delete()
+        self.municipio.cierre_automatico = ""
+        self.municipio.save()
+        self.assertEqual(programar_cierres(self.ahora), 0)
+
+    def test_programa_propio_del_cobrador(self):
+        from datetime import time
+        from app_estacionamiento.models import TrabajoCierreCaja
+        from app_estacionamiento.services.cierres_programados import programar_cierres
+
+        # Vendedor con turno propio: corta a las 18, sigue diario (día vacío = el del municipio)
+        self.vendedor.cierre_automatico = "diario"
+        self.vendedor.cierre_hora = time(18, 0)
+        self.vendedor.save()
+        corte_vendedor = self.corte - timedelta(hours=2)
+        self.assertEqual(programar_cierres(self.ahora), 2)
+        self.assertEqual(
+            set(TrabajoCierreCaja.objects.values_list("usuario_id", "corte")),
+            {(self.vendedor.id, corte_vendedor), (self.admin.id, self.corte)},
+        )
+
+        # "manual" lo saca del cierre del municipio; otro cobrador con
+        # programa propio se cierra aunque el municipio sea manual
+        TrabajoCierreCaja.objects.all().delete()
+        self.vendedor.cierre_automatico = "manual"
+        self.vendedor.save()
+        self.municipio.cierre_automatico = ""
+        self.municipio.save()
+        self.admin.cierre_automatico = "semanal"
+        self.admin.cierre_dia_semana = self.corte.weekday()
+        self.admin.save()
+        self.assertEqual(programar_cierres(self.ahora), 1)
+        self.assertEqual(
+            list(TrabajoCierreCaja.objects.values_list("usuario_id", "corte", "periodo")),
+            [(self.admin.id, self.corte, "semanal")],
+        )
+
+    def test_admin_configura_el_cierre_del_vendedor(self):
+        client = Client()
+        client.force_login(self.admin)
+        self.assertContains(
+            client.get(reverse("admin_editar_vendedor", args=[self.vendedor.id])), "Como el municipio",
+        )
+        datos = {
+            "nombre": "Kiosco", "activo": "on", "periodicidad_rendicion": "semanal",
+            "cierre_automatico": "semanal", "cierre_hora": "07:15", "cierre_dia_semana": "2",
+        }
+        client.post(reverse("admin_editar_vendedor", args=[self.vendedor.id]), datos)
+        self.vendedor.refresh_from_db()
+        self.assertEqual(self.vendedor.cierre_automatico, "semanal")
+        self.assertEqual(self.vendedor.cierre_hora.strftime("%H:%M"), "07:15")
+        self.assertEqual(self.vendedor.cierre_dia_semana, 2)
+
+        client.post(reverse("admin_editar_vendedor", args=[self.vendedor.id]), {
+            **datos, "cierre_automatico": "", "cierre_hora": "", "cierre_dia_semana": "",
+        })
+        self.vendedor.refresh_from_db()
+        self.assertEqual(
+            (self.vendedor.cierre_automatico, self.vendedor.cierre_hora, self.vendedor.cierre_dia_semana),
+            ("", None, None),
+        )
+
+    def test_worker_cierra_hasta_el_corte_y_notifica(self):
+        from app_estacionamiento.models import Notificacion, TrabajoCierreCaja
+        from app_estacionamiento.services.cierres_programados import (
+            procesar_trabajos_pendientes, programar_cierres,
+        )
+
+        programar_cierres(self.ahora)
+        resultado = procesar_trabajos_pendientes()
+        self.assertEqual(resultado, {"listos": 2, "sin_movimientos": 0, "errores": 0})
+
+        trabajo = TrabajoCierreCaja.objects.get(usuario=self.vendedor)
+        self.assertEqual(trabajo.estado, TrabajoCierreCaja.LISTO)
+        cierre = trabajo.cierre
+        self.assertEqual(cierre.total_cobrado, Decimal("150"))
+        self.assertEqual(cierre.total_digital, Decimal("50"))
+        self.assertEqual(cierre.periodo, "diario")
+        # El cobro posterior al corte sigue abierto
+        self.assertEqual(
+            list(MovimientoCaja.objects.filter(usuario=self.vendedor, cerrado=False).values_list("monto", flat=True)),
+            [Decimal("30")],
+        )
+        notificacion = Notificacion.objects.get(destinatario=self.vendedor)
+        self.assertEqual(notificacion.mensaje, trabajo.resumen)
+        self.assertIn("$150", trabajo.resumen)
+        self.assertIn("Tu comisión: $15,00", trabajo.resumen)
+        # Nada más para procesar
+        self.assertEqual(procesar_trabajos_pendientes(), {"listos": 0, "sin_movimientos": 0, "errores": 0})
+
+    def test_error_se_reintenta_hasta_el_maximo(self):
+        from unittest.mock import patch
+        from app_estacionamiento.models import CierreCaja, Notificacion, TrabajoCierreCaja
+        from app_estacionamiento.services import cierres_programados
+
+        cierres_programados.programar_cierres(self.ahora)
+        with patch.object(cierres_programados, "resumen_cierre", side_effect=RuntimeError("plantilla")):
+            for _ in range(cierres_programados.MAX_INTENTOS + 1):
+                cierres_programados.procesar_trabajos_pendientes()
+
+        trabajo = TrabajoCierreCaja.objects.get(usuario=self.vendedor)
+        self.assertEqual(trabajo.estado, TrabajoCierreCaja.ERROR)
+        self.assertEqual(trabajo.intentos, cierres_programados.MAX_INTENTOS)
+        self.assertIn("plantilla", trabajo.error)
+        # El fallo deshizo el cierre entero: nada cerrado, nada notificado
+        self.assertFalse(CierreCaja.objects.exists())
+        self.assertFalse(Notificacion.objects.exists())
+        self.assertFalse(MovimientoCaja.objects.filter(cerrado=True).exists())
+
+    def test_comando(self):
+        from io import StringIO
+        from unittest.mock import patch
+        from django.core.management import call_command
+
+        salida = StringIO()
+        with patch.object(timezone, "now", return_value=self.ahora):
+            call_command("cerrar_cajas_programadas", stdout=salida)
+        self.assertIn("2 nuevos", salida.getvalue())
+        self.assertIn("generados: 2", salida.getvalue())
+
+    def test_superadmin_configura_el_cierre(self):
+        superadmin = Usuario.objects.create_user(
+            correo="super@test.com", password="pass1234", es_superadmin=True,
+        )
+        client = Client()
+        client.force_login(superadmin)
+        client.post(reverse("editar_municipio", args=[self.municipio.id]), {
+            "nombre": self.municipio.nombre, "activo": "on",
+            "cierre_automatico": "semanal", "cierre_hora": "06:30", "cierre_dia_semana": "0",
+        })
+        self.municipio.refresh_from_db()
+        self.assertEqual(self.municipio.cierre_automatico, "semanal")
+        self.assertEqual(self.municipio.cierre_hora.strftime("%H:%M"), "06:30")
+        self.assertEqual(self.municipio.cierre_dia_semana, 0)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 25. Certificación y rendición por lote
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestRendicionesPorLote(TestCase):
+    """
+    La certificación masiva es un UPDATE más sus filas de auditoría; la
+    rendición se arma por grupo de cierres y genera las liquidaciones de
+    comisión de los vendedores en la misma transacción.
+    """
+
+    def setUp(self):
+        from datetime import datetime, time
+        from app_estacionamiento.services.caja import generar_cierre_caja
+
+        self.municipio = crear_municipio()
+        self.admin     = crear_admin(self.municipio)
+        self.v1 = crear_vendedor(self.municipio, "v1@test.com")
+        self.v2 = crear_vendedor(self.municipio, "v2@test.com")
+        otro = Municipio.objects.create(nombre="Otro", activo=True)
+        self.ajeno = crear_vendedor(otro, "ajeno@test.com")
+
+        hoy = timezone.localdate()
+        self.dia1 = hoy - timedelta(days=3)
+        self.dia2 = hoy - timedelta(days=2)
+        self.cierres = []
+        for usuario, dia, monto, comision in (
+            (self.v1, self.dia1, 100, 10), (self.v2, self.dia1, 200, 20),
+            (self.v1, self.dia2, 300, 30), (self.admin, self.dia2, 50, 0),
+            (self.ajeno, self.dia2, 999, 99),
+        ):
+            MovimientoCaja.objects.create(
+                usuario=usuario, monto=Decimal(monto), tipo="ingreso",
+                comision_monto=Decimal(comision),
+            )
+            cierre = generar_cierre_caja(usuario)
+            cierre.__class__.objects.filter(pk=cierre.pk).update(
+                fecha_cierre=timezone.make_aware(datetime.combine(dia, time(12, 0))),
+            )
+            self.cierres.append(cierre)
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_cierre_guarda_total_comisiones(self):
+        self.assertEqual(
+            [c.total_comisiones for c in self.cierres],
+            [Decimal("10"), Decimal("20"), Decimal("30"), Decimal("0"), Decimal("99")],
+        )
+
+    def test_certificacion_masiva_un_update_y_auditoria(self):
+        from app_estacionamiento.models import CertificacionCierre, CierreCaja
+        from app_estacionamiento.services.rendiciones import certificar_cierres
+
+        response = self.client.post(reverse("certificar_cierre", args=[self.cierres[0].id]))
+        self.assertEqual(response.status_code, 302)
+        individual = CertificacionCierre.objects.get()
+        self.assertFalse(individual.en_lote)
+
+        pendientes = CierreCaja.objects.filter(usuario__municipio=self.municipio)
+        # savepoint + ids + UPDATE + INSERT de auditoría + release
+        with self.assertNumQueries(5):
+            self.assertEqual(certificar_cierres(self.admin, pendientes), 3)
+        self.assertEqual(certificar_cierres(self.admin, pendientes), 0)
+
+        self.assertEqual(pendientes.filter(certificado=True, certificado_por=self.admin).count(), 4)
+        self.assertFalse(CierreCaja.objects.get(pk=self.cierres[4].pk).certificado)
+        self.assertEqual(CertificacionCierre.objects.filter(en_lote=True).count(), 3)
+        # El ya certificado conserva su única fila de auditoría
+        self.assertEqual(self.cierres[0].certificaciones.count(), 1)
+
+    def test_vista_lote_respeta_filtros(self):
+        from app_estacionamiento.models import CierreCaja
+
+        response = self.client.post(reverse("certificar_cierres_lote"), {
+            "todos": "1", "usuario_id": str(self.v1.id),
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            set(CierreCaja.objects.filter(certificado=True).values_list("id", flat=True)),
+            {self.cierres[0].id, self.cierres[2].id},
+        )
+        self.client.post(reverse("certificar_cierres_lote"), {
+            "cierre_ids": [str(self.cierres[1].id), str(self.cierres[4].id)],
+        })
+        self.assertTrue(CierreCaja.objects.get(pk=self.cierres[1].pk).certificado)
+        # El cierre de otro municipio no se toca
+        self.assertFalse(CierreCaja.objects.get(pk=self.cierres[4].pk).certificado)
+
+    def test_cierres_por_periodo(self):
+        from app_estacionamiento.models import CierreCaja
+        from app_estacionamiento.services.rendiciones import cierres_por_periodo
+
+        CierreCaja.objects.update(certificado=True)
+        diarios = list(cierres_por_periodo(self.municipio, "diario"))
+        self.assertEqual([g["grupo"] for g in diarios], [self.dia1, self.dia2])
+        self.assertEqual([g["cantidad"] for g in diarios], [2, 2])
+        self.assertEqual(diarios[0]["cobrado"], Decimal("300"))
+        self.assertEqual(diarios[1]["comisiones"], Decimal("30"))
+        mensual = list(cierres_por_periodo(self.municipio, "mensual"))
+        self.assertEqual(sum(g["cantidad"] for g in mensual), 4)
+        self.assertEqual(mensual[0]["grupo"].day, 1)
+
+    def test_rendicion_por_grupo_con_liquidaciones(self):
+        from app_estacionamiento.models import CierreCaja, Rendicion
+
+        CierreCaja.objects.update(certificado=True)
+        response = self.client.get(reverse("crear_rendicion"))
+        self.assertEqual(len(list(response.context["grupos"])), 2)
+
+        response = self.client.post(reverse("crear_rendicion"), {
+            "periodo": "diario", "agrupacion": "diario", "grupos": [self.dia2.isoformat()],
+        })
+        self.assertRedirects(response, reverse("admin_rendiciones"))
+        rendicion = Rendicion.objects.get()
+        self.assertEqual(rendicion.total_neto, Decimal("350"))
+        self.assertEqual((rendicion.fecha_desde, rendicion.fecha_hasta), (self.dia2, self.dia2))
+        self.assertEqual(
+            set(rendicion.cierres.values_list("id", flat=True)),
+            {self.cierres[2].id, self.cierres[3].id},
+        )
+        # Solo el vendedor con comisión en los cierres rendidos
+        liquidacion = LiquidacionComision.objects.get()
+        self.assertEqual(liquidacion.vendedor, self.v1)
+        self.assertEqual(liquidacion.monto_total, Decimal("30"))
+        self.assertEqual(liquidacion.rendicion, rendicion)
+        self.assertEqual(liquidacion.estado, "pendiente")
+
+        # El resto, con una rendición mensual: una liquidación por vendedor
+        self.client.post(reverse("crear_rendicion"), {
+            "periodo": "mensual", "agrupacion": "mensual",
+            "grupos": [self.dia1.replace(day=1).isoformat(), self.dia2.replace(day=1).isoformat()],
+        })
+        self.assertEqual(Rendicion.objects.count(), 2)
+        self.assertFalse(CierreCaja.objects.filter(usuario__municipio=self.municipio, rendicion__isnull=True).exists())
+        self.assertEqual(
+            dict(LiquidacionComision.objects.exclude(rendicion=rendicion).values_list("vendedor_id", "monto_total")),
+            {self.v1.id: Decimal("10"), self.v2.id: Decimal("20")},
+        )
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 26. Libro de comisiones
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestLibroComisiones(TestCase):
+    """
+    Cada cobro con comisión suma al ComisionPeriodo del mes; las pantallas
+    leen el libro y reconciliar_comisiones lo compara con MovimientoCaja.
+    """
+
+    def setUp(self):
+        self.municipio = crear_municipio()
+        self.vendedor  = crear_vendedor(self.municipio)
+        self.tesorero  = crear_tesorero(self.municipio)
+
+    def _libro(self):
+        from app_estacionamiento.models import ComisionPeriodo
+        return {
+            (c.periodo, c.monto, c.cantidad)
+            for c in ComisionPeriodo.objects.filter(vendedor=self.vendedor)
+        }
+
+    def test_cobro_con_comision_suma_al_periodo(self):
+        from app_estacionamiento.services.caja import registrar_cobro_efectivo
+
+        registrar_cobro_efectivo(self.vendedor, Decimal("100"), "cobro", Decimal("10"))
+        registrar_cobro_efectivo(self.vendedor, Decimal("50"), "cobro", Decimal("5"))
+        registrar_cobro_efectivo(self.vendedor, Decimal("80"), "sin comisión")
+        MovimientoCaja.objects.create(usuario=self.vendedor, monto=Decimal("30"), tipo="egreso")
+
+        mes = timezone.localdate().replace(day=1)
+        self.assertEqual(self._libro(), {(mes, Decimal("15"), 2)})
+
+    def test_pantallas_leen_el_libro(self):
+        from app_estacionamiento.services.caja import registrar_cobro_efectivo
+
+        registrar_cobro_efectivo(self.vendedor, Decimal("200"), "cobro", Decimal("20"))
+        hoy = timezone.localdate()
+        LiquidacionComision.objects.create(
+            vendedor=self.vendedor, municipio=self.municipio,
+            fecha_desde=hoy, fecha_hasta=hoy, monto_total=Decimal("8"),
+        )
+        client = Client()
+        client.force_login(self.vendedor)
+        response = client.get(reverse("mis_comisiones"))
+        self.assertEqual(response.context["total_acumulado"], Decimal("20"))
+        self.assertEqual(response.context["pendiente"], Decimal("12"))
+        self.assertEqual(len(response.context["periodos"]), 1)
+        self.assertEqual(client.get(reverse("panel_vendedor")).context["comisiones_pendientes"], Decimal("12"))
+
+        client.force_login(self.tesorero)
+        saldos = client.get(reverse("panel_tesorero")).context["saldos_comisiones"]
+        self.assertEqual(
+            [(s["vendedor"], s["devengado"], s["liquidado"], s["pendiente"]) for s in saldos],
+            [(self.vendedor, Decimal("20"), Decimal("8"), Decimal("12"))],
+        )
+
+    def test_reconciliar_detecta_y_corrige(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from app_estacionamiento.models import ComisionPeriodo
+        from app_estacionamiento.services.caja import registrar_cobro_efectivo
+        from app_estacionamiento.services.comisiones import reconciliar_comisiones
+
+        registrar_cobro_efectivo(self.vendedor, Decimal("100"), "cobro", Decimal("10"))
+        # Cargados por fuera de save(): el libro no se entera
+        hace_dos_meses = timezone.now() - timedelta(days=62)
+        viejos = MovimientoCaja.objects.bulk_create([
+            MovimientoCaja(usuario=self.vendedor, monto=Decimal("40"), tipo="ingreso",
+                           comision_monto=Decimal("4"))
+            for _ in range(3)
+        ])
+        MovimientoCaja.objects.filter(pk__in=[m.pk for m in viejos]).update(creado_en=hace_dos_meses)
+        ComisionPeriodo.objects.filter(vendedor=self.vendedor).update(monto=Decimal("99"))
+
+        salida = StringIO()
+        call_command("reconciliar_comisiones", "--solo-verificar", stdout=salida)
+        self.assertIn("diferencias sin corregir: 2", salida.getvalue())
+        self.assertEqual(ComisionPeriodo.objects.get(vendedor=self.vendedor).monto, Decimal("99"))
+
+        call_command("reconciliar_comisiones", stdout=StringIO())
+        mes = timezone.localdate().replace(day=1)
+        self.assertEqual(self._libro(), {
+            (mes, Decimal("10"), 1),
+            (timezone.localdate(hace_dos_meses).replace(day=1), Decimal("12"), 3),
+        })
+        self.assertEqual(reconciliar_comisiones()["diferencias"], [])
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 27. Cobros por lote (cola offline del vendedor)
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestCobrosPorLote(TestCase):
+    """
+    cobrar_lote registra las ventas encoladas por la terminal: cada una con
+    su clave (un reenvío no cobra dos veces), en su savepoint (un rechazo
+    no afecta al resto) y con la hora de la venta, no la de sincronización.
+    """
+
+    def setUp(self):
+        self.municipio = crear_municipio()
+        self.vendedor  = crear_vendedor(self.municipio)
+        self.inspector = crear_inspector(self.municipio)
+        self.subcuadra = crear_subcuadra(self.municipio)
+        crear_tarifa(self.municipio, precio_hora=100, precio_abono_auto=500)
+        self.client = Client()
+        self.client.force_login(self.vendedor)
+
+    def _enviar(self, cobros):
+        import json
+        response = self.client.post(
+            reverse("vendedores_cobrar_lote"), json.dumps({"cobros": cobros}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()["resultados"]
+
+    def test_lote_registra_y_reenvio_no_duplica(self):
+        from app_estacionamiento.models import Estacionamiento
+        vehiculo   = crear_vehiculo(self.municipio, "INF001")
+        infraccion = crear_infraccion(self.municipio, self.inspector, vehiculo, self.subcuadra, monto=1000)
+        Infraccion.objects.filter(pk=infraccion.pk).update(creado_en=timezone.now() - timedelta(hours=1))
+        mes = timezone.localdate().replace(day=1).isoformat()
+        cobros = [
+            {"clave": "a1", "tipo": "estacionamiento", "patente": "nue001", "duracion": "1.5"},
+            {"clave": "a2", "tipo": "infraccion", "infraccion_id": infraccion.id, "medio_pago": "qr"},
+            {"clave": "a3", "tipo": "abono", "patente": "NUE002", "mes": mes},
+        ]
+
+        resultados = self._enviar(cobros)
+        self.assertEqual([r["estado"] for r in resultados], ["ok", "ok", "ok"])
+        self.assertFalse(any(r["duplicado"] for r in resultados))
+        self.assertEqual(resultados[0]["monto"], "150.00")
+        self.assertTrue(Vehiculo.objects.filter(patente="NUE001", municipio=self.municipio).exists())
+        self.assertTrue(Estacionamiento.objects.filter(vehiculo__patente="NUE001", estado="ACTIVO").exists())
+        infraccion.refresh_from_db()
+        self.assertEqual(infraccion.estado, "pagada")
+        self.assertTrue(AbonoMensual.objects.filter(vehiculo__patente="NUE002").exists())
+        movimientos = MovimientoCaja.objects.filter(usuario=self.vendedor)
+        self.assertEqual(movimientos.count(), 3)
+        self.assertEqual(movimientos.aggregate(t=Sum("comision_monto"))["t"], Decimal("165"))
+
+        # La respuesta se perdió y la terminal reenvía el lote
+        reenvio = self._enviar(cobros)
+        self.assertEqual([r["estado"] for r in reenvio], ["ok", "ok", "ok"])
+        self.assertTrue(all(r["duplicado"] for r in reenvio))
+        self.assertEqual(reenvio[0]["estacionamiento_id"], resultados[0]["estacionamiento_id"])
+        self.assertEqual(movimientos.count(), 3)
+
+    def test_rechazo_no_afecta_al_resto(self):
+        mes = timezone.localdate().replace(day=1).isoformat()
+        cobros = [
+            {"clave": "b1", "tipo": "abono", "patente": "ABO001", "mes": mes},
+            {"clave": "b2", "tipo": "abono", "patente": "ABO001", "mes": mes},
+            {"clave": "b3", "tipo": "estacionamiento", "patente": "EST001", "duracion": "0.7"},
+            {"clave": "b4", "tipo": "otro"},
+            {"clave": "b5", "tipo": "estacionamiento", "patente": "EST001", "duracion": "1"},
+        ]
+        resultados = self._enviar(cobros)
+        self.assertEqual(
+            [r["estado"] for r in resultados], ["ok", "rechazado", "rechazado", "rechazado", "ok"],
+        )
+        self.assertIn("ya tiene abono", resultados[1]["error"])
+        self.assertEqual(resultados[2]["error"], "Duración inválida.")
+        self.assertEqual(MovimientoCaja.objects.filter(usuario=self.vendedor).count(), 2)
+
+        # El rechazo también queda guardado: reenviarlo no lo reintenta
+        self.assertEqual(self._enviar([cobros[1]])[0]["estado"], "rechazado")
+
+    def test_patente_demasiado_larga_se_rechaza_sin_frenar_el_lote(self):
+        cobros = [
+            {"clave": "l1", "tipo": "estacionamiento", "patente": "LARGA1234567", "duracion": "1"},
+            {"clave": "l2", "tipo": "estacionamiento", "patente": "EST002", "duracion": "1"},
+        ]
+        resultados = self._enviar(cobros)
+        self.assertEqual([r["estado"] for r in resultados], ["rechazado", "ok"])
+        self.assertEqual(resultados[0]["error"], "Patente de más de 10 caracteres")
+        self.assertFalse(Vehiculo.objects.filter(patente__startswith="LARGA").exists())
+
+    def test_sin_subcuadra_rechaza_el_estacionamiento(self):
+        from unittest.mock import patch
+        from app_estacionamiento.models import Estacionamiento
+        with patch("app_estacionamiento.services.cobros_lote.get_subcuadra_default", return_value=None):
+            resultados = self._enviar([
+                {"clave": "s1", "tipo": "estacionamiento", "patente": "SUB001", "duracion": "1"},
+            ])
+        self.assertEqual(resultados[0]["estado"], "rechazado")
+        self.assertEqual(resultados[0]["error"], "No hay subcuadra configurada para este municipio.")
+        self.assertFalse(Estacionamiento.objects.filter(vehiculo__patente="SUB001").exists())
+        self.assertFalse(MovimientoCaja.objects.filter(usuario=self.vendedor).exists())
+
+    def test_usa_la_hora_de_la_venta(self):
+        from app_estacionamiento.models import Estacionamiento
+        ahora = timezone.now()
+        vehiculo   = crear_vehiculo(self.municipio, "OFF001")
+        infraccion = crear_infraccion(self.municipio, self.inspector, vehiculo, self.subcuadra)
+        Infraccion.objects.filter(pk=infraccion.pk).update(creado_en=ahora - timedelta(hours=3))
+
+        resultados = self._enviar([
+            # Vendido dentro de la tolerancia de la infracción, sincronizado horas después
+            {"clave": "c1", "tipo": "estacionamiento", "patente": "OFF001", "duracion": "1",
+             "vendido_en": (ahora - timedelta(hours=3) + timedelta(minutes=2)).isoformat()},
+            # El anterior ya había vencido a la hora de esta venta
+            {"clave": "c2", "tipo": "estacionamiento", "patente": "OFF001", "duracion": "1",
+             "vendido_en": (ahora - timedelta(minutes=30)).isoformat()},
+            {"clave": "c3", "tipo": "estacionamiento", "patente": "OFF001", "duracion": "1",
+             "vendido_en": (ahora - timedelta(hours=30)).isoformat()},
+        ])
+        self.assertEqual([r["estado"] for r in resultados], ["ok", "ok", "rechazado"])
+        self.assertEqual(resultados[0]["infraccion_anulada"], infraccion.id)
+        infraccion.refresh_from_db()
+        self.assertEqual(infraccion.estado, "anulada")
+        inicios = list(
+            Estacionamiento.objects.filter(vehiculo=vehiculo).order_by("id").values_list("hora_inicio", flat=True)
+        )
+        self.assertEqual(inicios[0], ahora - timedelta(hours=3) + timedelta(minutes=2))
+        self.assertEqual(inicios[1], ahora - timedelta(minutes=30))
+
+    def test_validacion_del_pedido(self):
+        from app_estacionamiento.services.cobros_lote import MAX_COBROS_POR_LOTE
+        url = reverse("vendedores_cobrar_lote")
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertEqual(self.client.post(url, "{", content_type="application/json").status_code, 400)
+        demasiados = [{"clave": str(i), "tipo": "abono"} for i in range(MAX_COBROS_POR_LOTE + 1)]
+        import json
+        self.assertEqual(
+            self.client.post(url, json.dumps({"cobros": demasiados}), content_type="application/json").status_code,
+            400,
+        )
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 28. Configuración del municipio en caché
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestConfigMunicipio(TestCase):
+    """
+    obtener_config arma la tarifa, los módulos y los datos del municipio una
+    vez; las señales de Municipio, Tarifa y ModuloMunicipio descartan la copia
+    del proceso y la próxima lectura ve los datos nuevos.
+    """
+
+    def setUp(self):
+        self.municipio = crear_municipio(comision_pct=10)
+        self.tarifa    = crear_tarifa(self.municipio, precio_hora=100)
+
+    def test_segunda_lectura_no_consulta_la_base(self):
+        from app_estacionamiento.services.config_municipio import obtener_config, tarifa_vigente
+
+        config = obtener_config(self.municipio.id)
+        self.assertEqual(config.tarifa.pk, self.tarifa.pk)
+        self.assertEqual(config.comision_vendedor, Decimal("10"))
+        with self.assertNumQueries(0):
+            self.assertEqual(tarifa_vigente(self.municipio).precio_por_hora, Decimal("100"))
+            self.assertFalse(obtener_config(self.municipio).tiene_modulo("balance_por_dominio"))
+        self.assertIsNone(obtener_config(None))
+
+    def test_senales_invalidan(self):
+        from app_estacionamiento.models import ModuloMunicipio
+        from app_estacionamiento.services.config_municipio import obtener_config, tarifa_vigente
+
+        obtener_config(self.municipio.id)
+        self.tarifa.precio_por_hora = Decimal("150")
+        self.tarifa.save()
+        self.assertEqual(tarifa_vigente(self.municipio.id).precio_por_hora, Decimal("150"))
+
+        self.municipio.tolerancia_multa_minutos = 12
+        self.municipio.save(update_fields=["tolerancia_multa_minutos"])
+        self.assertEqual(obtener_config(self.municipio.id).tolerancia_multa_minutos, 12)
+
+        ModuloMunicipio.objects.create(municipio=self.municipio, modulo="balance_por_dominio")
+        self.assertTrue(obtener_config(self.municipio.id).tiene_modulo("balance_por_dominio"))
+
+        self.tarifa.delete()
+        self.assertIsNone(tarifa_vigente(self.municipio.id))
+
+    def test_vistas_que_usan_update_invalidan(self):
+        from app_estacionamiento.models import ModuloMunicipio
+        from app_estacionamiento.services.config_municipio import obtener_config, tarifa_vigente
+
+        admin = crear_admin(self.municipio)
+        superadmin = Usuario.objects.create_user(
+            correo="super@test.com", password="pass1234", es_superadmin=True, es_conductor=False,
+        )
+        ModuloMunicipio.objects.create(municipio=self.municipio, modulo="balance_por_dominio")
+        self.assertTrue(obtener_config(self.municipio.id).tiene_modulo("balance_por_dominio"))
+
+        client = Client()
+        client.force_login(admin)
+        client.post(reverse("gestionar_tarifas"), {
+            "precio_por_hora": "200", "monto_infraccion": "1000", "precio_abono_auto": "0",
+            "precio_abono_moto": "0", "comision_vendedor": "10", "tolerancia_multa_minutos": "5",
+        })
+        self.assertEqual(tarifa_vigente(self.municipio.id).precio_por_hora, Decimal("200"))
+
+        client.force_login(superadmin)
+        client.post(reverse("gestionar_modulo", args=[self.municipio.id]), {
+            "accion": "desactivar", "modulo": "balance_por_dominio",
+        })
+        self.assertFalse(obtener_config(self.municipio.id).tiene_modulo("balance_por_dominio"))
+
+    def test_lectura_no_consulta_el_cache_de_django(self):
+        """Con DatabaseCache (producción) una lectura sigue sin tocar la base."""
+        from django.test import override_settings
+        from app_estacionamiento.services.config_municipio import obtener_config
+
+        obtener_config(self.municipio.id)
+        compartido = {"default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "cache_test",
+        }}
+        with override_settings(CACHES=compartido), self.assertNumQueries(0):
+            self.assertEqual(obtener_config(self.municipio.id).tarifa.pk, self.tarifa.pk)
+
+    def test_cambio_de_otro_proceso_llega_al_vencer_el_ttl(self):
+        """Un update() no dispara señales, como un cambio hecho en otro worker."""
+        import time
+        from unittest.mock import patch
+        from app_estacionamiento.services.config_municipio import CONFIG_TTL, tarifa_vigente
+
+        tarifa_vigente(self.municipio.id)
+        Tarifa.objects.filter(pk=self.tarifa.pk).update(precio_por_hora=Decimal("300"))
+        self.assertEqual(tarifa_vigente(self.municipio.id).precio_por_hora, Decimal("100"))
+        despues = time.monotonic() + CONFIG_TTL + 1
+        with patch("time.monotonic", return_value=despues):
+            self.assertEqual(tarifa_vigente(self.municipio.id).precio_por_hora, Decimal("300"))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 29. Reportes en segundo plano
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestReportesEnSegundoPlano(TestCase):
+    """
+    solicitar_reporte crea un TrabajoReporte (o reutiliza uno igual por la
+    huella), el worker genera el archivo en el storage y las vistas de
+    estado y descarga solo lo muestran a quien corresponde.
+    """
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.municipio = crear_municipio()
+        self.admin     = crear_admin(self.municipio)
+        self.inspector = crear_inspector(self.municipio)
+        crear_infraccion(
+            self.municipio, self.inspector, crear_vehiculo(self.municipio), crear_subcuadra(self.municipio),
+        )
+
+    def test_misma_huella_reutiliza_el_trabajo(self):
+        from app_estacionamiento.services.reportes import solicitar_reporte
+
+        hoy = timezone.localdate()
+        trabajo, nuevo = solicitar_reporte(self.admin, "juzgado", {"frecuencia": "mensual"})
+        self.assertTrue(nuevo)
+        self.assertEqual(trabajo.parametros, {
+            "desde": hoy.replace(day=1).isoformat(), "hasta": hoy.isoformat(),
+        })
+        # El mismo rango pedido con fechas explícitas da la misma huella
+        otro, nuevo = solicitar_reporte(self.admin, "juzgado", {
+            "desde": hoy.replace(day=1).isoformat(), "hasta": hoy.isoformat(),
+        })
+        self.assertFalse(nuevo)
+        self.assertEqual(otro.pk, trabajo.pk)
+
+        distinto, nuevo = solicitar_reporte(self.admin, "juzgado", {"frecuencia": "diario"})
+        self.assertTrue(nuevo or hoy.day == 1)
+        if hoy.day != 1:
+            self.assertNotEqual(distinto.huella, trabajo.huella)
+
+    def test_worker_genera_y_purga(self):
+        from app_estacionamiento.models import TrabajoReporte
+        from app_estacionamiento.services.reportes import (
+            RETENCION_HORAS, procesar_reportes_pendientes, purgar_reportes, solicitar_reporte,
+        )
+
+        trabajo, _ = solicitar_reporte(self.admin, "juzgado", {})
+        xlsx, _    = solicitar_reporte(self.admin, "estadisticas_inspectores", {"inspector_id": self.inspector.id})
+        self.assertEqual(procesar_reportes_pendientes(), {"listos": 2, "errores": 0})
+
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.progreso, trabajo.intentos), ("listo", 100, 1))
+        self.assertTrue(trabajo.nombre_archivo.startswith("infracciones_impagas_"))
+        with trabajo.archivo.open("rb") as f:
+            self.assertEqual(f.read(4), b"%PDF")
+        xlsx.refresh_from_db()
+        self.assertEqual(xlsx.parametros["inspector_id"], self.inspector.id)
+        self.assertTrue(xlsx.nombre_archivo.endswith(".xlsx"))
+
+        # Listo y reciente: se reutiliza en vez de generar otro
+        self.assertEqual(solicitar_reporte(self.admin, "juzgado", {})[0].pk, trabajo.pk)
+
+        ruta = trabajo.archivo.path
+        self.assertEqual(purgar_reportes(), 0)
+        self.assertEqual(purgar_reportes(timezone.now() + timedelta(hours=RETENCION_HORAS + 1)), 2)
+        self.assertFalse(TrabajoReporte.objects.exists())
+        import os
+        self.assertFalse(os.path.exists(ruta))
+
+    def test_error_se_registra_y_se_reintenta(self):
+        from app_estacionamiento.models import Rendicion, TrabajoReporte
+        from app_estacionamiento.services.reportes import (
+            MAX_INTENTOS, ReporteInvalido, procesar_reportes_pendientes, solicitar_reporte,
+        )
+
+        hoy = timezone.localdate()
+        rendicion = Rendicion.objects.create(
+            municipio=self.municipio, admin=self.admin, periodo="mensual", fecha_desde=hoy, fecha_hasta=hoy,
+        )
+        trabajo, _ = solicitar_reporte(self.admin, "rendicion", {"rendicion_id": rendicion.id})
+        rendicion.delete()
+        self.assertEqual(procesar_reportes_pendientes(), {"listos": 0, "errores": 1})
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.intentos), ("error", 1))
+        self.assertIn("does not exist", trabajo.error)
+
+        TrabajoReporte.objects.filter(pk=trabajo.pk).update(intentos=MAX_INTENTOS)
+        self.assertEqual(procesar_reportes_pendientes(), {"listos": 0, "errores": 0})
+
+        with self.assertRaises(ReporteInvalido):
+            solicitar_reporte(self.admin, "rendicion", {"rendicion_id": rendicion.id})
+        with self.assertRaises(ReporteInvalido):
+            solicitar_reporte(self.inspector, "juzgado", {})
+
+    @override_settings(REPORTES_EN_SEGUNDO_PLANO=True)
+    def test_vistas_solicitar_estado_y_descargar(self):
+        from app_estacionamiento.services.reportes import procesar_reportes_pendientes
+
+        client = Client()
+        client.force_login(self.inspector)
+        resp = client.post(reverse("reporte_solicitar"), {"tipo": "infracciones_dia"})
+        self.assertEqual(resp.status_code, 202)
+        datos = resp.json()
+        self.assertEqual((datos["estado"], datos["progreso"]), ("pendiente", 0))
+        self.assertNotIn("url_descarga", datos)
+        self.assertEqual(client.post(reverse("reporte_solicitar"), {"tipo": "juzgado"}).status_code, 400)
+
+        procesar_reportes_pendientes()
+        datos = client.get(datos["url_estado"]).json()
+        self.assertEqual(datos["estado"], "listo")
+        resp = client.get(datos["url_descarga"])
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "application/pdf")
+        self.assertEqual(b"".join(resp.streaming_content)[:4], b"%PDF")
+
+        # Otro inspector del mismo municipio y un admin de otro municipio no lo ven
+        otro = crear_inspector(self.municipio, correo="otro@test.com")
+        client.force_login(otro)
+        self.assertEqual(client.get(datos["url_estado"]).status_code, 404)
+        ajeno = crear_admin(crear_municipio(nombre="Otro"), correo="ajeno@test.com")
+        client.force_login(ajeno)
+        self.assertEqual(client.get(datos["url_descarga"]).status_code, 404)
+        client.force_login(crear_vendedor(self.municipio))
+        self.assertEqual(client.get(datos["url_estado"]).status_code, 403)
+
+    @override_settings(REPORTES_EN_SEGUNDO_PLANO=False)
+    def test_sin_worker_se_genera_en_el_request(self):
+        """Sin worker la descarga es directa y el endpoint devuelve el reporte listo."""
+        from django.core.files.storage import storages
+        from app_estacionamiento.models import TrabajoReporte
+
+        client = Client()
+        client.force_login(self.admin)
+        self.assertNotContains(client.get(reverse("admin_infracciones")), "reportes.js")
+
+        resp = client.post(reverse("reporte_solicitar"), {
+            "tipo": "estadisticas_inspectores", "inspector_id": self.inspector.id,
+        })
+        self.assertEqual(resp.status_code, 202)
+        datos = resp.json()
+        self.assertEqual((datos["estado"], datos["progreso"]), ("listo", 100))
+        trabajo = TrabajoReporte.objects.get(pk=datos["id"])
+        self.assertIs(trabajo.archivo.storage, storages["archivos"])
+        self.assertEqual(client.get(datos["url_descarga"]).status_code, 200)
+
+        with override_settings(REPORTES_EN_SEGUNDO_PLANO=True):
+            self.assertContains(client.get(reverse("admin_infracciones")), "reportes.js")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 30. Caché por contenido de los PDF
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestCacheDocumentos(TestCase):
+    """
+    El PDF de juzgado y el de rendición se guardan bajo la huella de su
+    contenido: una descarga repetida no lo vuelve a generar y con
+    If-None-Match recibe 304; un cambio en los datos cambia la huella.
+    """
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.municipio = crear_municipio()
+        self.admin     = crear_admin(self.municipio)
+        self.infraccion = crear_infraccion(
+            self.municipio, crear_inspector(self.municipio), crear_vehiculo(self.municipio),
+            crear_subcuadra(self.municipio),
+        )
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_juzgado_304_y_cambio_de_estado(self):
+        from unittest.mock import patch
+        from app_estacionamiento.models import DocumentoCacheado
+        from app_estacionamiento.services import cache_documentos
+
+        url = reverse("pdf_infracciones_juzgado")
+        with patch.object(
+            cache_documentos, "generar_pdf_juzgado", wraps=cache_documentos.generar_pdf_juzgado,
+        ) as generar:
+            primera = self.client.get(url)
+            self.assertEqual(primera.status_code, 200)
+            self.assertEqual(primera.content[:4], b"%PDF")
+            etag = primera["ETag"]
+
+            segunda = self.client.get(url)
+            self.assertEqual((segunda["ETag"], segunda.content), (etag, primera.content))
+            self.assertEqual(generar.call_count, 1)
+
+            no_modificado = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(no_modificado.status_code, 304)
+            self.assertEqual(no_modificado["ETag"], etag)
+
+            # La infracción se paga: la huella cambia y el PDF se regenera
+            Infraccion.objects.filter(pk=self.infraccion.pk).update(estado="pagada")
+            tercera = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(tercera.status_code, 200)
+            self.assertNotEqual(tercera["ETag"], etag)
+            self.assertEqual(generar.call_count, 2)
+        self.assertEqual(DocumentoCacheado.objects.count(), 2)
+
+    def test_rendicion_validada_cambia_huella_y_purga(self):
+        from app_estacionamiento.models import DocumentoCacheado, Rendicion
+        from app_estacionamiento.services.cache_documentos import (
+            CACHE_DIAS, huella_rendicion, pdf_rendicion_cacheado, purgar_documentos,
+        )
+
+        hoy = timezone.localdate()
+        rendicion = Rendicion.objects.create(
+            municipio=self.municipio, admin=self.admin, periodo="mensual",
+            fecha_desde=hoy, fecha_hasta=hoy, total_efectivo=Decimal("100"), total_neto=Decimal("100"),
+        )
+        antes = huella_rendicion(rendicion)
+        self.assertEqual(huella_rendicion(rendicion), antes)
+        self.assertEqual(pdf_rendicion_cacheado(rendicion)[:4], b"%PDF")
+
+        rendicion.estado = "validada"
+        rendicion.tesorero = crear_tesorero(self.municipio)
+        rendicion.validado_en = timezone.now()
+        rendicion.save()
+        self.assertNotEqual(huella_rendicion(rendicion), antes)
+
+        documento = DocumentoCacheado.objects.get(huella=antes)
+        ruta = documento.archivo.path
+        self.assertEqual(purgar_documentos(), 0)
+        self.assertEqual(purgar_documentos(timezone.now() + timedelta(days=CACHE_DIAS + 1)), 1)
+        import os
+        self.assertFalse(os.path.exists(ruta))
+
+    def test_pdf_ilegible_borra_el_archivo_y_se_regenera(self):
+        import os
+        from unittest.mock import patch
+        from django.core.files.storage import storages
+        from app_estacionamiento.models import DocumentoCacheado
+        from app_estacionamiento.services import cache_documentos
+
+        huella = "a" * 64
+        cache_documentos.obtener_pdf(DocumentoCacheado.JUZGADO, huella, lambda: b"%PDF-1")
+        documento = DocumentoCacheado.objects.get()
+        self.assertIs(documento.archivo.storage, storages["archivos"])
+        ruta = documento.archivo.path
+
+        with patch.object(cache_documentos, "_leer", side_effect=OSError("roto")):
+            contenido = cache_documentos.obtener_pdf(DocumentoCacheado.JUZGADO, huella, lambda: b"%PDF-2")
+        self.assertEqual(contenido, b"%PDF-2")
+        # El archivo viejo se borró antes que la fila: no queda huérfano
+        nuevo = DocumentoCacheado.objects.get()
+        self.assertEqual(os.listdir(os.path.dirname(ruta)), [os.path.basename(nuevo.archivo.path)])
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 31. Exportaciones de las listas del admin
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestExportacionesAdmin(TestCase):
+    """
+    Infracciones, estacionamientos e historial del vendedor se exportan en
+    streaming (CSV o XLSX write_only) con los mismos filtros GET que la lista.
+    """
+
+    def setUp(self):
+        from app_estacionamiento.models import Estacionamiento
+
+        self.municipio = crear_municipio()
+        self.admin     = crear_admin(self.municipio)
+        inspector = crear_inspector(self.municipio)
+        subcuadra = crear_subcuadra(self.municipio)
+        self.vehiculos = [crear_vehiculo(self.municipio, patente=f"EXP{i:03d}") for i in range(3)]
+        for i, vehiculo in enumerate(self.vehiculos):
+            crear_infraccion(self.municipio, inspector, vehiculo, subcuadra, monto=100 * (i + 1))
+            Estacionamiento.objects.create(
+                vehiculo=vehiculo, subcuadra=subcuadra, usuario=self.admin,
+                estado="FINALIZADO", duracion_horas=Decimal("1.5"), costo_base=Decimal("15"),
+            )
+        Infraccion.objects.filter(vehiculo=self.vehiculos[0]).update(estado="pagada")
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def _csv(self, respuesta):
+        import csv
+        import io
+        self.assertTrue(respuesta.streaming)
+        return list(csv.reader(io.StringIO(b"".join(respuesta.streaming_content).decode("utf-8-sig"))))
+
+    def test_infracciones_con_los_filtros_de_la_lista(self):
+        import io
+        import openpyxl
+
+        filas = self._csv(self.client.get(reverse("exportar_infracciones"), {"estado": "pendiente"}))
+        self.assertEqual(filas[0][:3], ["N° acta", "Fecha", "Patente"])
+        self.assertEqual([f[2] for f in filas[1:]], ["EXP001", "EXP002"])
+        self.assertEqual({f[7] for f in filas[1:]}, {"Pendiente"})
+
+        # Mismo filtro que la lista: la lista y la exportación cuentan lo mismo
+        lista = self.client.get(reverse("admin_infracciones"), {"patente": "exp002"})
+        self.assertEqual(lista.context["paginator"].count, 1)
+        respuesta = self.client.get(reverse("exportar_infracciones"), {"patente": "exp002", "formato": "xlsx"})
+        self.assertTrue(respuesta.streaming)
+        ws = openpyxl.load_workbook(io.BytesIO(b"".join(respuesta.streaming_content))).active
+        self.assertEqual(ws.max_row, 2)
+        self.assertEqual((ws.cell(row=2, column=3).value, ws.cell(row=2, column=7).value), ("EXP002", 300))
+
+    def test_estacionamientos_e_historial_vendedor(self):
+        filas = self._csv(self.client.get(reverse("exportar_estacionamientos"), {"patente": "EXP00"}))
+        self.assertEqual(len(filas), 4)
+        self.assertEqual((filas[1][5], filas[1][6], filas[1][8]), ("1.5", "15.00", "Finalizado"))
+        self.assertEqual(len(self._csv(self.client.get(reverse("exportar_estacionamientos"), {"patente": "ZZZ"}))), 1)
+
+        vendedor = crear_vendedor(self.municipio)
+        MovimientoCaja.objects.create(usuario=vendedor, tipo="ingreso", monto=Decimal("50"), descripcion="cobro")
+        url = reverse("exportar_historial_vendedor", args=[vendedor.id])
+        filas = self._csv(self.client.get(url, {"desde": timezone.localdate().isoformat()}))
+        self.assertEqual([f[4] for f in filas[1:]], ["cobro"])
+        self.assertEqual(len(self._csv(self.client.get(url, {"hasta": "2000-01-01"}))), 1)
+
+        ajeno = crear_vendedor(crear_municipio(nombre="Otro"), correo="ajeno@test.com")
+        self.assertEqual(
+            self.client.get(reverse("exportar_historial_vendedor", args=[ajeno.id])).status_code, 404,
+        )
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 32. Importación de estacionamientos en segundo plano
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestImportacionEstacionamientos(TestCase):
+    """
+    El Excel del sistema anterior se guarda como TrabajoImportacion y el
+    worker lo importa por lotes (read_only, bulk_create), con las mismas
+    reglas por fila que la importación dentro del request. Sin worker la
+    página de avance importa un tramo por request.
+    """
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media, IMPORTACION_EN_SEGUNDO_PLANO=True)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.municipio  = crear_municipio()
+        self.superadmin = Usuario.objects.create_user(
+            correo="superadmin@test.com", password="pass1234", es_superadmin=True,
+        )
+        self.client = Client()
+        self.client.force_login(self.superadmin)
+
+    def _excel(self, filas):
+        import io
+        import openpyxl
+        from datetime import datetime
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.append(["TransactionInfo"])
+        ws.append(["Domino", "Hora", "Desde", "Desde Ingresado", "Hasta", "Cuadra", "Zona",
+                   "Interfaz", "Inspector", "Teléfono", "Monto", "Tarjeta", "-", "Local"])
+        for patente, horas, cuadra, telefono, monto in filas:
+            desde = datetime(2026, 3, 2, 10, 0)
+            hasta = desde + timedelta(hours=horas) if horas is not None else None
+            ws.append([patente, desde, desde, desde, hasta, cuadra, "Z1",
+                       "App", "", telefono, monto, "", "", "Local"])
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        return SimpleUploadedFile("TransactionInfo.xlsx", buffer.getvalue())
+
+    def _subir(self, filas):
+        from app_estacionamiento.models import TrabajoImportacion
+
+        resp = self.client.post(
+            reverse("importar_estacionamientos", args=[self.municipio.id]),
+            {"archivo": self._excel(filas)},
+        )
+        trabajo = TrabajoImportacion.objects.latest("id")
+        self.assertRedirects(resp, reverse("estado_importacion", args=[trabajo.id]))
+        return trabajo
+
+    def test_importa_por_lotes_con_errores_por_fila(self):
+        from unittest import mock
+        from app_estacionamiento.models import Estacionamiento, TrabajoImportacion
+        from app_estacionamiento.services import importacion_estacionamientos as imp
+
+        conductor = crear_conductor(self.municipio)
+        conductor.telefono = "2494123456"
+        conductor.save(update_fields=["telefono"])
+        ocupado = crear_vehiculo(self.municipio, "OCU123")
+        Estacionamiento.objects.create(
+            vehiculo=ocupado, subcuadra=crear_subcuadra(self.municipio), estado="ACTIVO",
+        )
+        trabajo = self._subir([
+            ("ab 123 cd", 1.5, "San Martín 100", 2494123456.0, 150),  # subcuadra existente
+            ("NUE001", 2, "Av Rivadavia 350", None, 200),
+            ("AB123CD", 1, "San Martín 100", None, 100),               # repetida en el archivo
+            ("OCU123", 1, "San Martín 100", None, 100),                # ya activa en el sistema
+            ("", 1, "San Martín 100", None, 100),
+            ("MAL001", 1, "SinAltura", None, 100),
+            ("MAL002", None, "San Martín 100", None, 100),
+            ("NUE002", 0.5, "Av Rivadavia 350", None, "x"),
+        ])
+        self.assertEqual(trabajo.estado, TrabajoImportacion.PENDIENTE)
+        self.assertEqual(Estacionamiento.objects.count(), 1)
+
+        with mock.patch.object(imp, "LOTE_FILAS", 3):
+            self.assertEqual(imp.procesar_importaciones_pendientes(), {"listos": 1, "errores": 0})
+
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, TrabajoImportacion.LISTO)
+        self.assertEqual((trabajo.importados, trabajo.omitidos, trabajo.filas_procesadas), (3, 5, 10))
+        self.assertFalse(trabajo.archivo)
+        self.assertEqual([e["fila"] for e in trabajo.errores], [5, 6, 7, 8, 9])
+        self.assertIn("ya tiene un estacionamiento ACTIVO", trabajo.errores[0]["error"])
+
+        est = Estacionamiento.objects.get(vehiculo__patente="AB123CD")
+        self.assertEqual((est.duracion_horas, est.costo_final, est.usuario_id), (Decimal("1.5"), Decimal("150"), conductor.id))
+        self.assertEqual(est.subcuadra.calle, "San Martín")
+        self.assertEqual(
+            Subcuadra.objects.filter(municipio=self.municipio, calle="Av Rivadavia", altura=350).count(), 1,
+        )
+        self.assertEqual(Estacionamiento.objects.get(vehiculo__patente="NUE002").costo_base, Decimal("0"))
+        self.assertTrue(Vehiculo.objects.filter(patente="NUE001", municipio=self.municipio).exists())
+
+        resp = self.client.get(reverse("estado_importacion", args=[trabajo.id]))
+        self.assertContains(resp, "MAL001")
+        self.assertFalse(resp.context["en_curso"])
+
+    def test_retoma_desde_la_ultima_fila_confirmada(self):
+        from app_estacionamiento.models import Estacionamiento, TrabajoImportacion
+        from app_estacionamiento.services.importacion_estacionamientos import (
+            leer_fila,
+            procesar_importaciones_pendientes,
+        )
+
+        trabajo = self._subir([
+            ("RET001", 1, "Mitre 200", None, 10),
+            ("RET002", 1, "Mitre 200", None, 10),
+            ("RET003", 1, "Mitre 200", None, 10),
+        ])
+        # Un worker anterior confirmó las filas 3 y 4 y se cortó
+        TrabajoImportacion.objects.filter(id=trabajo.id).update(
+            estado=TrabajoImportacion.PROCESANDO, filas_procesadas=4, importados=2,
+            latido_en=timezone.now() - timedelta(hours=1),
+        )
+        procesar_importaciones_pendientes()
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.importados, trabajo.intentos), (TrabajoImportacion.LISTO, 3, 1))
+        self.assertEqual(list(Estacionamiento.objects.values_list("vehiculo__patente", flat=True)), ["RET003"])
+
+        # read_only corta las celdas vacías del final: la fila se completa
+        fila = leer_fila(3, ("ab1", None, timezone.now() - timedelta(hours=2), None, timezone.now(), "Mitre 200"))
+        self.assertEqual((fila.patente, fila.duracion_horas, fila.costo), ("AB1", Decimal("2.0"), Decimal("0")))
+
+    def test_valores_que_no_entran_en_la_columna_se_rechazan_por_fila(self):
+        from app_estacionamiento.models import Estacionamiento, TrabajoImportacion
+        from app_estacionamiento.services.importacion_estacionamientos import procesar_importaciones_pendientes
+
+        trabajo = self._subir([
+            ("LARGA12345678", 1, "Mitre 200", None, 10),
+            ("CAL001", 1, "X" * 101 + " 200", None, 10),
+            ("MON001", 1, "Mitre 200", None, 10 ** 9),
+            ("BIE001", 1, "Mitre 200", None, 10),
+        ])
+        procesar_importaciones_pendientes()
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.importados, trabajo.omitidos), (TrabajoImportacion.LISTO, 1, 3))
+        self.assertEqual([e["fila"] for e in trabajo.errores], [3, 4, 5])
+        self.assertIn("Patente de más de 10", trabajo.errores[0]["error"])
+        self.assertEqual(list(Estacionamiento.objects.values_list("vehiculo__patente", flat=True)), ["BIE001"])
+
+    def test_archivo_invalido_no_crea_trabajo(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from app_estacionamiento.models import TrabajoImportacion
+
+        resp = self.client.post(
+            reverse("importar_estacionamientos", args=[self.municipio.id]),
+            {"archivo": SimpleUploadedFile("roto.xlsx", b"no es un excel")},
+        )
+        self.assertRedirects(resp, reverse("importar_estacionamientos", args=[self.municipio.id]))
+        self.assertFalse(TrabajoImportacion.objects.exists())
+
+    @override_settings(IMPORTACION_EN_SEGUNDO_PLANO=False)
+    def test_sin_worker_avanza_un_tramo_por_request(self):
+        from unittest import mock
+        from django.core.files.storage import storages
+        from app_estacionamiento.models import Estacionamiento, TrabajoImportacion
+        from app_estacionamiento.services import importacion_estacionamientos as imp
+
+        url_estado = None
+        with mock.patch.object(imp, "LOTE_FILAS", 2), mock.patch.object(imp, "SEGUNDOS_POR_REQUEST", 0):
+            # Cada request (la subida y la página a la que redirige) confirma
+            # un lote y devuelve el trabajo a la cola
+            trabajo = self._subir([(f"TRA00{i}", 1, "Mitre 200", None, 10) for i in range(7)])
+            self.assertIs(trabajo.archivo.storage, storages["archivos"])
+            trabajo.refresh_from_db()
+            self.assertEqual((trabajo.estado, trabajo.filas_procesadas, trabajo.intentos), ("pendiente", 6, 0))
+            url_estado = reverse("estado_importacion", args=[trabajo.id])
+
+            resp = self.client.get(url_estado)
+            self.assertTrue(resp.context["en_curso"])
+            self.assertContains(resp, "no cierres la página")
+            resp = self.client.get(url_estado)
+
+        self.assertFalse(resp.context["en_curso"])
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.importados, trabajo.intentos), ("listo", 7, 1))
+        self.assertEqual(Estacionamiento.objects.filter(estado="ACTIVO").count(), 7)
+        # Terminado: volver a la página no importa nada
+        self.client.get(url_estado)
+        self.assertEqual(TrabajoImportacion.objects.get(pk=trabajo.pk).intentos, 1)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 33. Importación de exenciones (vista previa en la base + upsert)
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestImportacionExenciones(TestCase):
+    """
+    La vista previa se analiza por columna (pandas) con una consulta de
+    subcuadras y una de vehículos, queda en FilaImportacionExencion y la
+    confirmación la aplica por lote con las reglas de siempre.
+    """
+
+    def setUp(self):
+        self.municipio = crear_municipio()
+        self.admin     = crear_admin(self.municipio)
+        self.sm600  = Subcuadra.objects.create(municipio=self.municipio, calle="San Martín", altura=600)
+        self.sm700  = Subcuadra.objects.create(municipio=self.municipio, calle="San Martín", altura=700)
+        self.mitre  = Subcuadra.objects.create(municipio=self.municipio, calle="Mitre", altura=100)
+        self.existente = Vehiculo.objects.create(patente="EXI111", notas_exencion="previa")
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def _excel(self, filas):
+        import io
+        import openpyxl
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.append(["Patente", "Nombre y Apellido", "Direccion", "Telefono", "Fecha", "Condicion", "Vencimiento"])
+        for fila in filas:
+            ws.append(list(fila))
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        return SimpleUploadedFile("exenciones.xlsx", buffer.getvalue())
+
+    def test_vista_previa_y_confirmacion(self):
+        from datetime import datetime
+        from app_estacionamiento.models import FilaImportacionExencion, ImportacionExencion
+
+        archivo = self._excel([
+            ("ab-123cd", "Juan", "san martín 685", 2994123456, datetime(2025, 1, 2), "Propietario", None),
+            ("EXI111", "Ana", "Mitre 120", None, None, "Global", None),
+            (None, None, None, None, None, None, None),
+            (None, "Sin patente", "Mitre 100", None, None, None, None),
+            ("AB123CD", None, "Inexistente 10", None, None, None, None),
+            ("ABCDEFGHIJK1", None, None, None, None, None, None),
+        ])
+        resp = self.client.post(reverse("importar_exenciones"), {"accion": "preview", "archivo": archivo})
+        self.assertNotIn("importar_exenciones_datos", self.client.session)
+        filas = {f.num: f for f in resp.context["resultados"]}
+        self.assertEqual(sorted(filas), [2, 3, 5, 6, 7])
+        self.assertEqual(
+            [filas[n].estado for n in sorted(filas)], ["nuevo", "actualizar", "error", "nuevo", "error"],
+        )
+        # Bloque 650 no existe: la más cercana (empate → la primera)
+        self.assertEqual(filas[2].subcuadra, self.sm600)
+        self.assertIn("bloque 650 no existe", filas[2].mensaje)
+        self.assertEqual(filas[3].subcuadra, self.mitre)
+        self.assertIn("sin subcuadra para 'Inexistente 10'", filas[6].mensaje)
+        self.assertEqual(
+            filas[2].notas,
+            "Nombre: Juan | Tel: 2994123456 | Fecha: 02/01/2025 | Dirección: san martín 685 | Condición: Propietario",
+        )
+        importacion = resp.context["importacion"]
+        self.assertEqual(FilaImportacionExencion.objects.filter(importacion=importacion).count(), 5)
+
+        resp = self.client.post(reverse("importar_exenciones"), {
+            "accion": "confirmar", "importacion_id": importacion.id,
+        })
+        self.assertRedirects(resp, reverse("exenciones"), fetch_redirect_response=False)
+        self.assertTrue(any("1 vehículos nuevos, 2 actualizados" in str(m) for m in resp.wsgi_request._messages))
+        self.assertFalse(ImportacionExencion.objects.exists())
+
+        nuevo = Vehiculo.objects.get(patente="AB123CD")
+        self.assertTrue(nuevo.exento_parcial)
+        self.assertFalse(nuevo.exento_global or nuevo.exencion_verificada)
+        self.assertEqual(list(nuevo.subcuadras_exentas.all()), [self.sm600])
+        self.assertTrue(nuevo.notas_exencion.endswith(" | Dirección: Inexistente 10"))
+        self.existente.refresh_from_db()
+        self.assertTrue(self.existente.exento_global)
+        self.assertEqual(self.existente.tipo_exencion, "vecino_frentista")
+        self.assertEqual(self.existente.notas_exencion, "previa | Nombre: Ana | Dirección: Mitre 120 | Condición: Global")
+        self.assertEqual(list(self.existente.subcuadras_exentas.all()), [self.mitre])
+
+        # Confirmar otra vez no vuelve a aplicar nada
+        self.client.post(reverse("importar_exenciones"), {"accion": "confirmar", "importacion_id": importacion.id})
+        self.existente.refresh_from_db()
+        self.assertEqual(self.existente.notas_exencion.count("Nombre: Ana"), 1)
+
+    def test_consultas_no_dependen_de_las_filas(self):
+        from django.test.utils import CaptureQueriesContext
+        from app_estacionamiento.services.importacion_exenciones import (
+            analizar_exenciones,
+            confirmar_importacion,
+        )
+
+        def consultas(n):
+            filas = [(f"P{n}X{i:03d}", "Nombre", f"San Martín {600 + i}", "", "", "", "") for i in range(n)]
+            with CaptureQueriesContext(connection) as analisis:
+                importacion, _ = analizar_exenciones(self._excel(filas), self.municipio, self.admin)
+            with CaptureQueriesContext(connection) as confirmacion:
+                self.assertEqual(confirmar_importacion(importacion.id, self.municipio, self.admin), (n, 0))
+            return len(analisis), len(confirmacion)
+
+        self.assertEqual(consultas(3), consultas(40))
+        self.assertIsNone(confirmar_importacion(0, self.municipio, self.admin))
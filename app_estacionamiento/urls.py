@@ -69,6 +69,7 @@ urlpatterns = [
     # =========================
     path("inspectores/", views.panel_inspectores, name="panel_inspectores"),
     path("inspectores/verificar/", views.verificar_vehiculo, name="inspectores_verificar_vehiculo"),
+    path("inspectores/verificar-lote/", views.verificar_lote, name="inspectores_verificar_lote"),
     path("inspectores/infraccion/", views.registrar_infraccion, name="inspectores_registrar_infraccion"),
     path("inspectores/manual/", views.registrar_estacionamiento_manual, name="inspectores_registrar_estacionamiento_manual"),
     path("inspectores/cobros/", views.resumen_cobros, name="inspectores_resumen_cobros"),
@@ -90,6 +91,7 @@ urlpatterns = [
     path("vendedores/resumen/", views.resumen_caja, name="vendedores_resumen_caja"),
     path("vendedores/caja/", views.caja_inspector, name="vendedores_caja"),
     path("vendedores/cerrar-caja/", views.cerrar_caja, name="vendedores_cerrar_caja"),
+    path("vendedores/caja/exportar/", views.exportar_movimientos_caja, name="exportar_movimientos_caja"),
     path("vendedores/cobrar-infraccion/", views.cobrar_infraccion_vendedor, name="vendedores_cobrar_infraccion"),
 
     # =========================
@@ -121,6 +123,7 @@ urlpatterns = [
     path("admin-vendedores/", views.gestionar_vendedores, name="gestionar_vendedores"),
     path("admin-vendedores/<int:vendedor_id>/editar/", views.editar_vendedor, name="admin_editar_vendedor"),
     path("admin-vendedores/<int:vendedor_id>/historial/", views.historial_vendedor, name="admin_historial_vendedor"),
+    path("admin-vendedores/<int:vendedor_id>/historial/exportar/", views.exportar_historial_vendedor, name="exportar_historial_vendedor"),
     path("admin-vendedores/crear/", views.gestionar_vendedores, name="admin_crear_vendedor"),
     path("admin-exenciones/", views.panel_exenciones, name="exenciones"),
     path("admin-subcuadras/", views.gestionar_subcuadras, name="gestionar_subcuadras"),
@@ -129,6 +132,7 @@ urlpatterns = [
     path("admin-crear-conductor/", views.crear_conductor, name="crear_conductor"),
     path("admin-usuarios/<int:usuario_id>/", views.detalle_usuario_admin, name="detalle_usuario_admin"),
     path("admin-infracciones/", views.admin_infracciones, name="admin_infracciones"),
+    path("admin-infracciones/exportar/", views.exportar_infracciones, name="exportar_infracciones"),
     path("admin-infracciones/<int:infraccion_id>/comprobante/", views.comprobante_infraccion, name="comprobante_infraccion"),
     path("admin-tarifas/", views.gestionar_tarifas, name="gestionar_tarifas"),
     path("admin-horarios/", views.gestionar_horarios, name="gestionar_horarios"),
@@ -141,6 +145,7 @@ urlpatterns = [
     path("admin-rendiciones/", views.admin_rendiciones, name="admin_rendiciones"),
     path("admin-rendiciones/crear/", views.crear_rendicion, name="crear_rendicion"),
     path("admin-rendiciones/<int:cierre_id>/certificar/", views.certificar_cierre, name="certificar_cierre"),
+    path("admin-rendiciones/certificar-lote/", views.certificar_cierres_lote, name="certificar_cierres_lote"),
     path("admin-rendiciones/<int:rendicion_id>/pdf/", views.pdf_rendicion, name="pdf_rendicion"),
 
     # =========================
@@ -150,14 +155,23 @@ urlpatterns = [
     path("admin-verificaciones/<int:solicitud_id>/resolver/", views.resolver_verificacion, name="resolver_verificacion"),
     path("admin-vehiculos/", views.admin_vehiculos, name="admin_vehiculos"),
     path("admin-estacionamientos/", views.admin_estacionamientos, name="admin_estacionamientos"),
+    path("admin-estacionamientos/exportar/", views.exportar_estacionamientos, name="exportar_estacionamientos"),
     path("admin-inspectores/estadisticas/", views.estadisticas_inspectores, name="estadisticas_inspectores"),
     path("admin-inspectores/estadisticas/excel/", views.estadisticas_inspectores_excel, name="estadisticas_inspectores_excel"),
     path("admin-infracciones/pdf-juzgado/", views.pdf_infracciones_juzgado, name="pdf_infracciones_juzgado"),
 
+    # =========================
+    # 📄 REPORTES EN SEGUNDO PLANO
+    # =========================
+    path("reportes/solicitar/", views.solicitar_reporte_view, name="reporte_solicitar"),
+    path("reportes/<int:trabajo_id>/estado/", views.estado_reporte, name="reporte_estado"),
+    path("reportes/<int:trabajo_id>/descargar/", views.descargar_reporte, name="reporte_descargar"),
+
     # =========================
     # 📅 ABONO MENSUAL
     # =========================
     path("vendedores/abono/", views.cobrar_abono, name="cobrar_abono"),
+    path("vendedores/cobros/lote/", views.cobrar_lote, name="vendedores_cobrar_lote"),
 
     # =========================
     # 💵 COMISIONES VENDEDORES
@@ -183,6 +197,7 @@ urlpatterns = [
     path("superadmin/admin/<int:admin_id>/toggle/",             views_superadmin.toggle_admin,      name="toggle_admin"),
     path("superadmin/municipio/<int:municipio_id>/modulo/",     views_superadmin.gestionar_modulo,      name="gestionar_modulo"),
     path("superadmin/municipio/<int:municipio_id>/importar/",   views_superadmin.importar_estacionamientos, name="importar_estacionamientos"),
+    path("superadmin/importacion/<int:trabajo_id>/",            views_superadmin.estado_importacion,        name="estado_importacion"),
     path("superadmin/municipio/<int:municipio_id>/plantillas/", views_superadmin.gestionar_plantillas,      name="gestionar_plantillas"),
 
 ]
@@ -11,6 +11,7 @@ de retorno exitoso (mp_exitoso) como fallback.
 from decimal import Decimal
 from django.db import transaction
 from app_estacionamiento.models import Usuario, MovimientoCaja
+from app_estacionamiento.services.saldo import acreditar_saldo
 
 
 def ejecutar(usuario: Usuario, monto: Decimal, payment_id: str) -> None:
@@ -37,16 +38,16 @@ def ejecutar(usuario: Usuario, monto: Decimal, payment_id: str) -> None:
     if ya_acreditado:
         return
 
+    # Sin select_for_update sobre el usuario: la acreditación es un INSERT en
+    # el libro de saldo. Si dos webhooks llegan juntos, el unique de
+    # mp_payment_id hace fallar al segundo y su transacción se deshace entera.
     with transaction.atomic():
-        usuario_locked = Usuario.objects.select_for_update().get(pk=usuario.pk)
-        usuario_locked.saldo += monto
-        usuario_locked.save()
-
         MovimientoCaja.objects.create(
-            usuario=usuario_locked,
+            usuario=usuario,
             monto=monto,
             tipo="ingreso",
             medio_pago="mercadopago",
             mp_payment_id=payment_id,
             descripcion=f"Carga de saldo via MercadoPago",
         )
+        acreditar_saldo(usuario.pk, monto, f"MercadoPago {payment_id}")
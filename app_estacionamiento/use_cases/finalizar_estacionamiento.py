@@ -1,16 +1,19 @@
 # app_estacionamiento/use_cases/finalizar_estacionamiento.py
 
+from collections import defaultdict
 from decimal import Decimal
 
 from django.db import transaction
+from django.db.models import Case, F, Value, When
 from django.utils import timezone
 
 from app_estacionamiento.models import (
     Estacionamiento,
     MovimientoCaja,
-    Usuario,
     Estado,
 )
+from app_estacionamiento.services.caja_saldo import registrar_movimientos
+from app_estacionamiento.services.saldo import acreditar_saldo, acreditar_saldos
 
 TARIFA_MINIMA = Decimal("100")
 
@@ -57,27 +60,23 @@ def ejecutar(estacionamiento):
         costo = estacionamiento.costo_base or TARIFA_MINIMA
 
         # Chequeo de reintegro: si finalizo antes del umbral, devolver saldo completo.
-        # Lock sobre el conductor para evitar race conditions con otros debitos simultaneos.
+        # El reintegro es una fila más en el libro de saldo: no bloquea al conductor.
         minutos_transcurridos = int((ahora - estacionamiento.hora_inicio).total_seconds() / 60)
-        reintegro = minutos_transcurridos < UMBRAL_REINTEGRO_MINUTOS
+        # Sin usuario (pago público anónimo) no hay a quién reintegrarle.
+        reintegro = (
+            estacionamiento.usuario_id is not None
+            and minutos_transcurridos < UMBRAL_REINTEGRO_MINUTOS
+        )
 
         if reintegro:
-            conductor = (
-                Usuario.objects
-                .select_for_update()
-                .get(id=estacionamiento.usuario_id)
-            )
-            conductor.saldo += costo
-            conductor.save(update_fields=["saldo"])
+            descripcion = _descripcion_reintegro(minutos_transcurridos)
+            acreditar_saldo(estacionamiento.usuario_id, costo, descripcion)
 
             MovimientoCaja.objects.create(
-                usuario=conductor,
+                usuario_id=estacionamiento.usuario_id,
                 monto=costo,
                 tipo="ingreso",
-                descripcion=(
-                    f"Reintegro: estacionamiento finalizado a los "
-                    f"{minutos_transcurridos} min (< {UMBRAL_REINTEGRO_MINUTOS} min)"
-                ),
+                descripcion=descripcion,
             )
             costo_final = Decimal("0")
         else:
@@ -92,3 +91,79 @@ def ejecutar(estacionamiento):
             "reintegro":             reintegro,
             "minutos_transcurridos": minutos_transcurridos,
         }
+
+
+def _descripcion_reintegro(minutos_transcurridos):
+    return (
+        f"Reintegro: estacionamiento finalizado a los "
+        f"{minutos_transcurridos} min (< {UMBRAL_REINTEGRO_MINUTOS} min)"
+    )
+
+
+def finalizar_lote(queryset, ahora=None):
+    """
+    Finaliza de una vez todos los estacionamientos ACTIVO del queryset.
+
+    Misma regla que ejecutar() fila por fila, pero por conjunto:
+      - un SELECT ... FOR UPDATE de los ACTIVO (solo las columnas necesarias)
+      - un UPDATE de estado / hora_fin / costo_final para todo el lote
+      - un bulk_create en el libro de saldo y otro de MovimientoCaja, con un
+        reintegro por estacionamiento (más el UPDATE de CajaSaldo)
+
+    Un estacionamiento sin usuario no tiene a quién reintegrarle: se cobra
+    completo aunque haya terminado antes del umbral (igual que en ejecutar()).
+
+    Retorna dict con:
+      finalizados       (int)      estacionamientos cerrados
+      reintegros        (int)      cuántos tuvieron devolución
+      monto_reintegrado (Decimal)  total devuelto a los conductores
+    """
+    ahora = ahora or timezone.now()
+
+    with transaction.atomic():
+        filas = list(
+            queryset.filter(estado=Estado.ACTIVO)
+            .select_for_update(of=("self",))
+            .values_list("id", "usuario_id", "hora_inicio", "costo_base")
+        )
+        if not filas:
+            return {"finalizados": 0, "reintegros": 0, "monto_reintegrado": Decimal("0")}
+
+        ids_reintegro = []
+        reintegro_por_conductor = defaultdict(Decimal)
+        movimientos = []
+        for id_, usuario_id, hora_inicio, costo_base in filas:
+            minutos_transcurridos = int((ahora - hora_inicio).total_seconds() / 60)
+            if usuario_id is None or minutos_transcurridos >= UMBRAL_REINTEGRO_MINUTOS:
+                continue
+            costo = costo_base or TARIFA_MINIMA
+            ids_reintegro.append(id_)
+            reintegro_por_conductor[usuario_id] += costo
+            movimientos.append(MovimientoCaja(
+                usuario_id=usuario_id,
+                monto=costo,
+                tipo="ingreso",
+                descripcion=_descripcion_reintegro(minutos_transcurridos),
+            ))
+
+        Estacionamiento.objects.filter(id__in=[f[0] for f in filas]).update(
+            estado=Estado.FINALIZADO,
+            hora_fin=ahora,
+            costo_final=Case(
+                When(id__in=ids_reintegro, then=Value(Decimal("0"))),
+                When(costo_base=0, then=Value(TARIFA_MINIMA)),
+                default=F("costo_base"),
+            ),
+        )
+
+        if movimientos:
+            acreditar_saldos([(m.usuario_id, m.monto, m.descripcion) for m in movimientos])
+            MovimientoCaja.objects.bulk_create(movimientos)
+            # bulk_create no pasa por MovimientoCaja.save()
+            registrar_movimientos(movimientos)
+
+    return {
+        "finalizados":       len(filas),
+        "reintegros":        len(movimientos),
+        "monto_reintegrado": sum(reintegro_por_conductor.values(), Decimal("0")),
+    }
@@ -2,7 +2,7 @@
 from django.db import transaction
 from django.utils import timezone
 
-from app_estacionamiento.models import Infraccion, Usuario
+from app_estacionamiento.models import Infraccion
 from app_estacionamiento.services.saldo import debitar_saldo_conductor
 from app_estacionamiento.services.infracciones import calcular_estado_tolerancia
 
@@ -20,12 +20,12 @@ def ejecutar(usuario, infraccion):
     Retorna la infraccion actualizada con atributo extra:
       - infraccion.anulada_por_gracia (True si se anulo, False si se cobro)
 
-    Usa select_for_update() para evitar race conditions de doble pago.
+    Usa select_for_update() sobre la infraccion para evitar doble pago
+    concurrente; el saldo se debita con el INSERT condicional del libro.
     """
     with transaction.atomic():
-        # Bloquear filas para prevenir doble pago concurrente
+        # Bloquear la infraccion para prevenir doble pago concurrente
         infraccion_locked = Infraccion.objects.select_for_update().get(pk=infraccion.pk)
-        usuario_locked    = Usuario.objects.select_for_update().get(pk=usuario.pk)
 
         if infraccion_locked.estado != "pendiente":
             raise Exception("La infraccion ya fue procesada")
@@ -50,9 +50,8 @@ def ejecutar(usuario, infraccion):
 
         # ── Cobro normal ─────────────────────────────────────────────────────
         # debitar_saldo_conductor valida saldo, descuenta y registra el egreso.
-        # usuario_locked ya esta bloqueado con select_for_update().
         debitar_saldo_conductor(
-            conductor=usuario_locked,
+            conductor=usuario,
             monto=infraccion_locked.monto,
             descripcion=f"Pago infraccion #{infraccion_locked.id} — {infraccion_locked.vehiculo.patente}",
         )
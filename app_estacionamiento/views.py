@@ -11,6 +11,7 @@
 #   views_conductor.py  → estacionar, historial, infracciones propias, vehículos
 #   views_admin.py      → panel admin, inspectores, vendedores, tarifas, exenciones, etc.
 #   views_mp.py         → integración MercadoPago (carga de saldo)
+#   views_reportes.py   → reportes en segundo plano (pedir, estado, descarga)
 
 # ─── Re-exportaciones por módulo ─────────────────────────────────────────────
 from .views_auth import (
@@ -25,6 +26,7 @@ from .views_auth import (
 from .views_inspector import (
     panel_inspectores,
     verificar_vehiculo,
+    verificar_lote,
     registrar_infraccion,
     ticket_infraccion,
     gestion_infracciones,
@@ -46,8 +48,10 @@ from .views_vendedor import (
     registrar_estacionamiento_manual,
     registrar_estacionamiento_vendedor,
     resumen_cobros,
+    exportar_movimientos_caja,
     ticket_cobro,
     cobrar_abono,
+    cobrar_lote,
     resumen_caja,
     cobrar_infraccion_vendedor,
     cerrar_caja,
@@ -89,10 +93,14 @@ from .views_admin import (
     admin_rendiciones,
     crear_rendicion,
     certificar_cierre,
+    certificar_cierres_lote,
     gestionar_verificaciones,
     resolver_verificacion,
     admin_vehiculos,
     admin_estacionamientos,
+    exportar_estacionamientos,
+    exportar_infracciones,
+    exportar_historial_vendedor,
     historial_vendedor,
     crear_conductor,
     estadisticas_inspectores,
@@ -102,6 +110,11 @@ from .views_admin import (
     gestionar_subcuadras,
     importar_exenciones,
 )
+from .views_reportes import (
+    solicitar_reporte_view,
+    estado_reporte,
+    descargar_reporte,
+)
 from .views_mp import (
     mp_iniciar_carga,
     mp_exitoso,
@@ -16,12 +16,13 @@ No incluye cobros de MercadoPago (eso es views_mp.py).
 """
 
 from datetime import date
+from datetime import time as time_type
 from decimal import Decimal
 
 from django.contrib import messages
 from django.core.mail import send_mail
 from django.core.paginator import Paginator
-from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models import Count, F, Q, Sum
 from django.db.models.functions import TruncDate
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
@@ -32,10 +33,43 @@ from django.core.exceptions import ValidationError as DjangoValidationError
 
 from .decorators import require_role
 from .services.infracciones import cobrar_infraccion_efectivo, MEDIOS_VALIDOS_COBRO
-from .services.saldo import cargar_saldo_conductor
+from .services.caja import ENCABEZADOS_MOVIMIENTOS, filas_movimientos_caja
+from .services.cache_documentos import (
+    huella_juzgado,
+    huella_rendicion,
+    pdf_juzgado_cacheado,
+    pdf_rendicion_cacheado,
+    respuesta_pdf,
+)
+from .services.config_municipio import invalidar_config
+from .services.documentos import (
+    generar_pdf_juzgado,
+    generar_xlsx_estadisticas_inspectores,
+    rango_juzgado,
+)
+from .services.exportaciones import (
+    ENCABEZADOS_ESTACIONAMIENTOS,
+    ENCABEZADOS_INFRACCIONES,
+    filas_estacionamientos,
+    filas_infracciones,
+    respuesta_exportacion,
+)
+from .services.fechas import a_fecha, filtro_fechas
+from .services.importacion_exenciones import (
+    analizar_exenciones,
+    confirmar_importacion,
+    purgar_vistas_previas,
+)
+from .services.rendiciones import (
+    AGRUPACIONES, RendicionInvalida, armar_rendicion, certificar_cierres, cierres_a_rendir,
+    cierres_por_periodo,
+)
+from .services.resumen_diario import recaudacion_por_usuario
+from .services.saldo import cargar_saldo_conductor, con_saldo_al_dia, saldo_actual
 from .utils import sanitizar_patente
 from .models import (
     CierreCaja,
+    DIAS_SEMANA,
     DiaEspecial,
     Estacionamiento,
     HorarioEstacionamiento,
@@ -176,9 +210,8 @@ def dashboard_admin(request):
         municipio=municipio
     ).annotate(fecha=TruncDate("fecha_creacion")).values("fecha").annotate(total=Count("id"))
 
-    cobros = MovimientoCaja.objects.filter(
-        usuario__municipio=municipio
-    ).values("usuario__correo").annotate(total=Sum("monto")).order_by("-total")
+    # Desde ResumenDiario (+ lo de hoy en vivo), no sumando todo MovimientoCaja
+    cobros = recaudacion_por_usuario(municipio, tipo=None)
 
     return render(request, "admin/panel_admin.html", {
         "infracciones_por_inspector": infracciones_por_inspector,
@@ -310,11 +343,9 @@ def cargar_saldo(request, usuario_id):
         try:
             monto = Decimal(monto_str)
             cargar_saldo_conductor(admin=admin, conductor=usuario, monto=monto)
-            # Refresca el usuario para obtener el saldo actualizado
-            usuario.refresh_from_db()
             comprobante = {
                 "monto":      monto,
-                "saldo_nuevo": usuario.saldo,
+                "saldo_nuevo": saldo_actual(usuario),
                 "fecha":      timezone.localtime(),
                 "admin":      admin,
             }
@@ -379,10 +410,9 @@ def gestionar_inspectores(request):
     ).annotate(
         total_infracciones=Count("infraccion", distinct=True),
         total_verificaciones=Count("verificacioninspector", distinct=True),
-        total_cobrado_sum=Sum(
-            "movimientocaja__monto",
-            filter=Q(movimientocaja__tipo="ingreso"),
-        ),
+        # Total acumulado de CajaSaldo: sumar movimientocaja en este mismo
+        # annotate multiplicaba los montos por las filas de los otros JOIN.
+        total_cobrado_sum=F("caja_saldo__total_ingresos"),
     )
 
     return render(request, "admin/gestionar_inspectores.html", {
@@ -436,40 +466,37 @@ def editar_inspector(request, inspector_id):
 
 
 
-@require_role("admin")
-def historial_vendedor(request, vendedor_id):
-    """Historial de movimientos de caja de un vendedor/kiosco.
-
-    Muestra todos los MovimientoCaja del vendedor con filtros opcionales
-    por fecha. Incluye totales del período filtrado.
+def _movimientos_vendedor(request, vendedor_id):
+    """
+    (vendedor, movimientos, desde, hasta) con los filtros opcionales por
+    fecha (?desde / ?hasta; una fecha inválida se ignora). La usan el
+    historial y su exportación.
     """
     vendedor  = get_object_or_404(
         Usuario, id=vendedor_id, es_vendedor=True, municipio=request.user.municipio
     )
-    movimientos = MovimientoCaja.objects.filter(
-        usuario=vendedor
-    ).order_by("-creado_en")
-
-    # Filtros opcionales por fecha
     desde = request.GET.get("desde", "").strip()
     hasta = request.GET.get("hasta", "").strip()
 
-    if desde:
-        try:
-            from datetime import datetime
-            movimientos = movimientos.filter(
-                creado_en__date__gte=datetime.strptime(desde, "%Y-%m-%d").date()
-            )
-        except ValueError:
-            desde = ""
-    if hasta:
-        try:
-            from datetime import datetime
-            movimientos = movimientos.filter(
-                creado_en__date__lte=datetime.strptime(hasta, "%Y-%m-%d").date()
-            )
-        except ValueError:
-            hasta = ""
+    if desde and not a_fecha(desde):
+        desde = ""
+    if hasta and not a_fecha(hasta):
+        hasta = ""
+    movimientos = MovimientoCaja.objects.filter(
+        usuario=vendedor, **filtro_fechas("creado_en", desde, hasta),
+    )
+    return vendedor, movimientos, desde, hasta
+
+
+@require_role("admin")
+def historial_vendedor(request, vendedor_id):
+    """Historial de movimientos de caja de un vendedor/kiosco.
+
+    Muestra todos los MovimientoCaja del vendedor con filtros opcionales
+    por fecha. Incluye totales del período filtrado.
+    """
+    vendedor, movimientos, desde, hasta = _movimientos_vendedor(request, vendedor_id)
+    movimientos = movimientos.order_by("-creado_en")
 
     # Totales del período filtrado
     from django.db.models import Sum
@@ -494,6 +521,22 @@ def historial_vendedor(request, vendedor_id):
         "neto_municipio":  neto_municipio,
     })
 
+
+@require_role("admin")
+def exportar_historial_vendedor(request, vendedor_id):
+    """
+    Descarga los movimientos de caja del vendedor (mismo filtro de fechas
+    que el historial), en streaming. ?formato=csv (default) | xlsx
+    """
+    vendedor, movimientos, _, _ = _movimientos_vendedor(request, vendedor_id)
+    return respuesta_exportacion(
+        request.GET.get("formato"),
+        f"movimientos_caja_{vendedor.pk}_{timezone.localdate():%Y%m%d}",
+        ENCABEZADOS_MOVIMIENTOS,
+        filas_movimientos_caja(movimientos),
+        "Movimientos",
+    )
+
 @require_role("admin")
 def gestionar_vendedores(request):
     """Lista, crea y configura vendedores (kioscos) del municipio."""
@@ -535,7 +578,7 @@ def gestionar_vendedores(request):
             vendedor.save()
             return redirect("gestionar_vendedores")
 
-    vendedores = Usuario.objects.filter(es_vendedor=True, municipio=municipio)
+    vendedores = con_saldo_al_dia(Usuario.objects.filter(es_vendedor=True, municipio=municipio))
     return render(request, "admin/gestionar_vendedores.html", {
         "vendedores": vendedores,
         "error":      error,
@@ -567,10 +610,25 @@ def editar_vendedor(request, vendedor_id):
         except Exception:
             vendedor.porcentaje_ganancia = 0
         vendedor.periodicidad_rendicion = request.POST.get("periodicidad_rendicion", "semanal")
+
+        # ── Cierre de caja programado propio (vacío = el del municipio) ────
+        cierre_automatico = request.POST.get("cierre_automatico", vendedor.cierre_automatico)
+        if cierre_automatico in dict(Usuario.CIERRES_COBRADOR):
+            vendedor.cierre_automatico = cierre_automatico
+        try:
+            vendedor.cierre_hora = time_type.fromisoformat(request.POST.get("cierre_hora", "").strip())
+        except ValueError:
+            vendedor.cierre_hora = None
+        dia_semana = request.POST.get("cierre_dia_semana", "").strip()
+        vendedor.cierre_dia_semana = int(dia_semana) if dia_semana in {str(d) for d, _ in DIAS_SEMANA} else None
         vendedor.save()
         return redirect("gestionar_vendedores")
 
-    return render(request, "admin/editar_vendedor.html", {"vendedor": vendedor})
+    return render(request, "admin/editar_vendedor.html", {
+        "vendedor":          vendedor,
+        "cierres_cobrador":  Usuario.CIERRES_COBRADOR,
+        "dias_semana":       DIAS_SEMANA,
+    })
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -636,9 +694,9 @@ def gestionar_usuarios(request):
     municipio = usuario.municipio
 
     q = request.GET.get("q", "").strip()
-    qs = Usuario.objects.filter(
+    qs = con_saldo_al_dia(Usuario.objects.filter(
         es_conductor=True, municipio=municipio
-    ).prefetch_related("vehiculos").order_by("first_name", "last_name")
+    )).prefetch_related("vehiculos").order_by("first_name", "last_name")
 
     if q:
         qs = qs.filter(
@@ -742,6 +800,32 @@ def detalle_usuario_admin(request, usuario_id):
 # Infracciones (vista admin)
 # ─────────────────────────────────────────────────────────────────────────────
 
+def _filtrar_infracciones(request, municipio):
+    """
+    Infracciones del municipio con los filtros GET de la lista (patente,
+    inspector, estado, fecha_desde, fecha_hasta). Retorna (queryset, filtros).
+    La usan la lista y su exportación.
+    """
+    filtros = {
+        "patente":     sanitizar_patente(request.GET.get("patente", "")),
+        "inspector":   request.GET.get("inspector", "").strip(),
+        "estado":      request.GET.get("estado", "").strip(),
+        "fecha_desde": request.GET.get("fecha_desde", "").strip(),
+        "fecha_hasta": request.GET.get("fecha_hasta", "").strip(),
+    }
+    infracciones = Infraccion.objects.filter(municipio=municipio)
+    if filtros["patente"]:
+        infracciones = infracciones.filter(vehiculo__patente__icontains=filtros["patente"])
+    if filtros["inspector"].isdigit():
+        infracciones = infracciones.filter(inspector_id=filtros["inspector"])
+    if filtros["estado"]:
+        infracciones = infracciones.filter(estado=filtros["estado"])
+    infracciones = infracciones.filter(
+        **filtro_fechas("creado_en", filtros["fecha_desde"], filtros["fecha_hasta"])
+    )
+    return infracciones, filtros
+
+
 @require_role("admin")
 def admin_infracciones(request):
     """
@@ -751,26 +835,12 @@ def admin_infracciones(request):
     usuario   = request.user
     municipio = usuario.municipio
 
-    infracciones = Infraccion.objects.filter(municipio=municipio).select_related(
+    infracciones, filtros = _filtrar_infracciones(request, municipio)
+    infracciones = infracciones.select_related(
         "vehiculo", "inspector", "subcuadra"
     ).order_by("-creado_en")
-
-    patente      = sanitizar_patente(request.GET.get("patente", ""))
-    inspector_id = request.GET.get("inspector", "").strip()
-    estado       = request.GET.get("estado", "").strip()
-    fecha_desde  = request.GET.get("fecha_desde", "").strip()
-    fecha_hasta  = request.GET.get("fecha_hasta", "").strip()
-
-    if patente:
-        infracciones = infracciones.filter(vehiculo__patente__icontains=patente)
-    if inspector_id:
-        infracciones = infracciones.filter(inspector_id=inspector_id)
-    if estado:
-        infracciones = infracciones.filter(estado=estado)
-    if fecha_desde:
-        infracciones = infracciones.filter(creado_en__date__gte=fecha_desde)
-    if fecha_hasta:
-        infracciones = infracciones.filter(creado_en__date__lte=fecha_hasta)
+    fecha_desde = filtros["fecha_desde"]
+    fecha_hasta = filtros["fecha_hasta"]
 
     if request.method == "POST":
         accion        = request.POST.get("accion")
@@ -838,16 +908,27 @@ def admin_infracciones(request):
         "detalle_id":    detalle_id,
         "total_impagas": total_impagas,
         "export_pdf_url": export_pdf_url,
-        "filtros": {
-            "patente":     patente,
-            "inspector":   inspector_id,
-            "estado":      estado,
-            "fecha_desde": fecha_desde,
-            "fecha_hasta": fecha_hasta,
-        },
+        "filtros":       filtros,
     })
 
 
+@require_role("admin")
+def exportar_infracciones(request):
+    """
+    Descarga las infracciones de la lista (mismos filtros GET), en streaming.
+
+    ?formato=csv (default) | xlsx
+    """
+    infracciones, _ = _filtrar_infracciones(request, request.user.municipio)
+    return respuesta_exportacion(
+        request.GET.get("formato"),
+        f"infracciones_{timezone.localdate():%Y%m%d}",
+        ENCABEZADOS_INFRACCIONES,
+        filas_infracciones(infracciones),
+        "Infracciones",
+    )
+
+
 @require_role("admin")
 def comprobante_infraccion(request, infraccion_id):
     """Vista de impresión para comprobante de pago de infracción."""
@@ -911,6 +992,7 @@ def gestionar_tarifas(request):
                     precio_abono_auto=abono_auto,
                     precio_abono_moto=abono_moto,
                 )
+                invalidar_config(municipio.id)  # update() no dispara señales
             else:
                 Tarifa.objects.create(
                     municipio=municipio,
@@ -1056,10 +1138,7 @@ def admin_rendiciones(request):
 
     if usuario_id:
         cierres = cierres.filter(usuario_id=usuario_id)
-    if fecha_desde:
-        cierres = cierres.filter(fecha_cierre__date__gte=fecha_desde)
-    if fecha_hasta:
-        cierres = cierres.filter(fecha_cierre__date__lte=fecha_hasta)
+    cierres = cierres.filter(**filtro_fechas("fecha_cierre", fecha_desde, fecha_hasta))
 
     conteo_pendientes = CierreCaja.objects.filter(
         usuario__municipio=municipio, certificado=False,
@@ -1163,13 +1242,12 @@ def admin_rendiciones(request):
                 if "rendiciones" in secciones:
                     total_rendido = Rendicion.objects.filter(
                         admin__municipio=municipio,
-                        fecha_desde__date__gte=inf_desde,
-                        fecha_hasta__date__lte=inf_hasta,
+                        **filtro_fechas("fecha_desde", desde=inf_desde),
+                        **filtro_fechas("fecha_hasta", hasta=inf_hasta),
                     ).aggregate(t=Sum("monto_total"))["t"] or 0
                     cierres_cert = CierreCaja.objects.filter(
                         usuario__municipio=municipio,
-                        fecha_cierre__date__gte=inf_desde,
-                        fecha_cierre__date__lte=inf_hasta,
+                        **filtro_fechas("fecha_cierre", inf_desde, inf_hasta),
                         certificado=True,
                     ).aggregate(t=Sum("monto_municipio"))["t"] or 0
                     cuerpo_lineas += [
@@ -1180,29 +1258,22 @@ def admin_rendiciones(request):
                     ]
 
                 if "vendedores" in secciones:
-                    from django.db.models import Sum as DjSum
-                    vendedores_recap = (
-                        MovimientoCaja.objects
-                        .filter(usuario__municipio=municipio, tipo="ingreso",
-                                creado_en__date__gte=inf_desde, creado_en__date__lte=inf_hasta)
-                        .values("usuario__first_name", "usuario__last_name", "usuario__correo")
-                        .annotate(total=Sum("monto"))
-                        .order_by("-total")
-                    )
+                    vendedores_recap = recaudacion_por_usuario(municipio, inf_desde, inf_hasta)
                     cuerpo_lineas.append("=== RECAUDACIÓN POR VENDEDOR ===")
                     for v in vendedores_recap:
-                        nombre_v = f"{v['usuario__first_name']} {v['usuario__last_name']}".strip() or v["usuario__correo"]
+                        u = v["usuario"]
+                        nombre_v = f"{u.first_name} {u.last_name}".strip() or u.correo
                         cuerpo_lineas.append(f"  {nombre_v}: ${v['total']:,.0f}")
                     cuerpo_lineas.append("")
 
                 if "infracciones" in secciones:
                     cant_imp = Infraccion.objects.filter(
                         municipio=municipio, estado="pendiente",
-                        creado_en__date__gte=inf_desde, creado_en__date__lte=inf_hasta,
+                        **filtro_fechas("creado_en", inf_desde, inf_hasta),
                     ).count()
                     cant_pag = Infraccion.objects.filter(
                         municipio=municipio, estado="pagada",
-                        creado_en__date__gte=inf_desde, creado_en__date__lte=inf_hasta,
+                        **filtro_fechas("creado_en", inf_desde, inf_hasta),
                     ).count()
                     cuerpo_lineas += [
                         "=== INFRACCIONES ===",
@@ -1212,7 +1283,7 @@ def admin_rendiciones(request):
                     ]
                     # Adjuntar PDF del juzgado
                     try:
-                        pdf_bytes = _generar_pdf_infracciones_juzgado(municipio, inf_desde, inf_hasta)
+                        pdf_bytes = generar_pdf_juzgado(municipio, inf_desde, inf_hasta)
                         adjuntos.append((
                             f"infracciones_impagas_{inf_desde.strftime('%Y%m%d')}.pdf",
                             pdf_bytes,
@@ -1264,108 +1335,65 @@ def admin_rendiciones(request):
 @require_role("admin")
 def crear_rendicion(request):
     """
-    El admin genera una rendición a tesorería seleccionando cierres de caja certificados.
+    El admin genera una rendición a tesorería con cierres de caja certificados.
 
-    Los totales se calculan automáticamente desde los CierreCaja seleccionados:
+    Los cierres se eligen por grupo (día/semana/mes, ver services/rendiciones)
+    o por id. Los totales se calculan automáticamente desde los CierreCaja:
     - total_efectivo    = suma de cierre.total_efectivo
     - total_digital     = suma de cierre.total_transferencia + cierre.total_digital
                           (desde la perspectiva de tesorería, transferencia y digital/card
                            son lo mismo: no es efectivo que el admin manipula físicamente)
     - total_neto        = total_efectivo + total_digital
     - El admin NO puede escribir los montos — solo certifica lo que el sistema calculó.
+    En la misma transacción se generan las LiquidacionComision de los vendedores.
     """
-    from django.db import transaction as db_transaction
-
-    municipio = request.user.municipio
+    municipio  = request.user.municipio
+    agrupacion = request.POST.get("agrupacion") or request.GET.get("agrupacion") or "diario"
+    if agrupacion not in AGRUPACIONES:
+        agrupacion = "diario"
 
     if request.method == "POST":
         periodo      = request.POST.get("periodo", "").strip()
         notas        = request.POST.get("notas", "").strip()
         cierre_ids   = request.POST.getlist("cierre_ids")
+        grupos       = [a_fecha(g) for g in request.POST.getlist("grupos")]
         comprobante  = request.FILES.get("comprobante_archivo")
 
         if not periodo:
             messages.error(request, "Indicá el período.")
             return redirect("crear_rendicion")
 
-        if not cierre_ids:
+        if not cierre_ids and not grupos:
             messages.error(request, "Seleccioná al menos un cierre de caja.")
             return redirect("crear_rendicion")
 
         try:
-            cierre_ids_int = [int(pk) for pk in cierre_ids]
+            cierre_ids_int = [int(pk) for pk in cierre_ids] if cierre_ids else None
         except ValueError:
             messages.error(request, "IDs de cierres inválidos.")
             return redirect("crear_rendicion")
+        if None in grupos:
+            messages.error(request, "Grupos de cierres inválidos.")
+            return redirect("crear_rendicion")
 
-        with db_transaction.atomic():
-            # Traer solo cierres del municipio, certificados y aún sin rendir.
-            # select_for_update evita race conditions si dos admins operan simultáneamente.
-            cierres = CierreCaja.objects.select_for_update().filter(
-                id__in=cierre_ids_int,
-                usuario__municipio=municipio,
-                certificado=True,
-                rendicion__isnull=True,
-            )
-
-            if cierres.count() != len(cierre_ids_int):
-                messages.error(
-                    request,
-                    "Algunos cierres seleccionados no son válidos (ya rendidos, no certificados o de otro municipio)."
-                )
-                return redirect("crear_rendicion")
-
-            # Calcular totales desde el desglose de cada cierre
-            totales = cierres.aggregate(
-                tefectivo     = Sum("total_efectivo"),
-                ttransferencia = Sum("total_transferencia"),
-                tdigital      = Sum("total_digital"),
-            )
-            suma_efectivo      = totales["tefectivo"]      or Decimal("0")
-            suma_transferencia = totales["ttransferencia"] or Decimal("0")
-            suma_digital       = totales["tdigital"]       or Decimal("0")
-
-            # Para tesorería, transferencia + digital (débito/crédito/QR) se agrupan como "digital"
-            total_efectivo = suma_efectivo
-            total_digital  = suma_transferencia + suma_digital
-            total_neto     = total_efectivo + total_digital
-
-            # Fechas del período: min(fecha_cierre) / max(fecha_cierre) de los cierres elegidos
-            fechas = cierres.aggregate(
-                desde=Min("fecha_cierre"),
-                hasta=Max("fecha_cierre"),
-            )
-
-            cantidad_cierres = cierres.count()
-
-            rendicion = Rendicion.objects.create(
-                municipio           = municipio,
-                admin               = request.user,
-                periodo             = periodo,
-                fecha_desde         = fechas["desde"].date() if fechas["desde"] else date.today(),
-                fecha_hasta         = fechas["hasta"].date() if fechas["hasta"] else date.today(),
-                total_efectivo      = total_efectivo,
-                total_digital       = total_digital,
-                total_neto          = total_neto,
-                notas_tesorero      = notas,
-                comprobante_archivo = comprobante,
+        try:
+            rendicion, cantidad_cierres, liquidaciones = armar_rendicion(
+                request.user, periodo,
+                cierre_ids=cierre_ids_int, grupos=grupos, agrupacion=agrupacion,
+                notas=notas, comprobante=comprobante,
             )
+        except RendicionInvalida as e:
+            messages.error(request, str(e))
+            return redirect("crear_rendicion")
 
-            # Vincular cada cierre a esta rendición (auditoría)
-            cierres.update(rendicion=rendicion)
-
-        messages.success(
-            request,
-            f"Rendición creada con {cantidad_cierres} cierre(s). Total neto: ${total_neto:,.2f}"
-        )
+        mensaje = f"Rendición creada con {cantidad_cierres} cierre(s). Total neto: ${rendicion.total_neto:,.2f}"
+        if liquidaciones:
+            mensaje += f" · {len(liquidaciones)} liquidación(es) de comisión generada(s)."
+        messages.success(request, mensaje)
         return redirect("admin_rendiciones")
 
-    # GET: mostrar cierres disponibles (certificados y sin rendir)
-    cierres_pendientes = CierreCaja.objects.filter(
-        usuario__municipio=municipio,
-        certificado=True,
-        rendicion__isnull=True,
-    ).select_related("usuario").order_by("fecha_cierre")
+    # GET: cierres disponibles (certificados y sin rendir), sumados por grupo en la base
+    cierres_pendientes = cierres_a_rendir(municipio).select_related("usuario").order_by("fecha_cierre")
 
     # Pre-calcular totales de todos los cierres disponibles para mostrar en el resumen
     totales_disponibles = cierres_pendientes.aggregate(
@@ -1374,10 +1402,13 @@ def crear_rendicion(request):
         suma_transferencia = Sum("total_transferencia"),
         suma_digital      = Sum("total_digital"),
         suma_cobrado      = Sum("total_cobrado"),
+        suma_comisiones   = Sum("total_comisiones"),
     )
 
     return render(request, "admin/crear_rendicion.html", {
         "periodos":            Rendicion.PERIODOS,
+        "agrupacion":          agrupacion,
+        "grupos":              cierres_por_periodo(municipio, agrupacion),
         "cierres_pendientes":  cierres_pendientes,
         "totales_disponibles": totales_disponibles,
         "hoy":                 date.today(),
@@ -1396,15 +1427,10 @@ def certificar_cierre(request, cierre_id):
     if request.method != "POST":
         return redirect("admin_rendiciones")
 
-    if cierre.certificado:
+    if not certificar_cierres(request.user, CierreCaja.objects.filter(id=cierre.id), en_lote=False):
         messages.warning(request, "Este cierre ya estaba certificado.")
         return redirect("admin_rendiciones")
 
-    cierre.certificado    = True
-    cierre.certificado_en  = timezone.now()
-    cierre.certificado_por = request.user
-    cierre.save(update_fields=["certificado", "certificado_en", "certificado_por"])
-
     messages.success(
         request,
         f"✅ Cierre de {cierre.usuario.correo} del {cierre.fecha_cierre:%d/%m/%Y} certificado."
@@ -1412,6 +1438,39 @@ def certificar_cierre(request, cierre_id):
     return redirect("admin_rendiciones")
 
 
+@require_role("admin")
+def certificar_cierres_lote(request):
+    """
+    Certificación masiva. Solo acepta POST: los `cierre_ids` marcados, o con
+    `todos` todos los pendientes que coinciden con los filtros de la lista
+    (usuario_id, fecha_desde, fecha_hasta).
+    """
+    if request.method != "POST":
+        return redirect("admin_rendiciones")
+
+    cierres = CierreCaja.objects.filter(usuario__municipio=request.user.municipio, certificado=False)
+    if request.POST.get("todos"):
+        usuario_id = request.POST.get("usuario_id", "").strip()
+        if usuario_id.isdigit():
+            cierres = cierres.filter(usuario_id=usuario_id)
+        cierres = cierres.filter(**filtro_fechas(
+            "fecha_cierre", request.POST.get("fecha_desde"), request.POST.get("fecha_hasta"),
+        ))
+    else:
+        ids = [pk for pk in request.POST.getlist("cierre_ids") if pk.isdigit()]
+        if not ids:
+            messages.error(request, "Seleccioná al menos un cierre de caja.")
+            return redirect(reverse("admin_rendiciones") + "?filtro=pendientes")
+        cierres = cierres.filter(id__in=ids)
+
+    cantidad = certificar_cierres(request.user, cierres)
+    if cantidad:
+        messages.success(request, f"✅ {cantidad} cierre(s) certificado(s).")
+    else:
+        messages.warning(request, "No había cierres pendientes de certificación en la selección.")
+    return redirect(reverse("admin_rendiciones") + "?filtro=pendientes")
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Verificaciones de identidad y exenciones
 # ─────────────────────────────────────────────────────────────────────────────
@@ -1649,33 +1708,38 @@ def admin_vehiculos(request):
 # Historial de estacionamientos del municipio
 # ─────────────────────────────────────────────────────────────────────────────
 
+def _filtrar_estacionamientos(request, municipio):
+    """
+    Estacionamientos del municipio con los filtros GET del historial
+    (patente, estado, fecha_desde, fecha_hasta). Retorna (queryset, filtros).
+    """
+    filtros = {
+        "patente":     sanitizar_patente(request.GET.get("patente", "")),
+        "estado":      request.GET.get("estado", "").strip(),
+        "fecha_desde": request.GET.get("fecha_desde", "").strip(),
+        "fecha_hasta": request.GET.get("fecha_hasta", "").strip(),
+    }
+    estacionamientos = Estacionamiento.objects.filter(subcuadra__municipio=municipio)
+    if filtros["patente"]:
+        estacionamientos = estacionamientos.filter(vehiculo__patente__icontains=filtros["patente"])
+    if filtros["estado"]:
+        estacionamientos = estacionamientos.filter(estado=filtros["estado"])
+    estacionamientos = estacionamientos.filter(
+        **filtro_fechas("hora_inicio", filtros["fecha_desde"], filtros["fecha_hasta"])
+    )
+    return estacionamientos, filtros
+
+
 @require_role("admin")
 def admin_estacionamientos(request):
     """
     Historial de estacionamientos del municipio con filtros básicos.
     Útil para auditoría y para verificar el funcionamiento del sistema.
     """
-    municipio   = request.user.municipio
-    patente     = sanitizar_patente(request.GET.get("patente", ""))
-    estado      = request.GET.get("estado", "").strip()
-    fecha_desde = request.GET.get("fecha_desde", "").strip()
-    fecha_hasta = request.GET.get("fecha_hasta", "").strip()
-
-    estacionamientos = (
-        Estacionamiento.objects
-        .filter(subcuadra__municipio=municipio)
-        .select_related("vehiculo", "usuario", "subcuadra")
-        .order_by("-hora_inicio")
-    )
-
-    if patente:
-        estacionamientos = estacionamientos.filter(vehiculo__patente__icontains=patente)
-    if estado:
-        estacionamientos = estacionamientos.filter(estado=estado)
-    if fecha_desde:
-        estacionamientos = estacionamientos.filter(hora_inicio__date__gte=fecha_desde)
-    if fecha_hasta:
-        estacionamientos = estacionamientos.filter(hora_inicio__date__lte=fecha_hasta)
+    estacionamientos, filtros = _filtrar_estacionamientos(request, request.user.municipio)
+    estacionamientos = estacionamientos.select_related(
+        "vehiculo", "usuario", "subcuadra"
+    ).order_by("-hora_inicio")
 
     paginator = Paginator(estacionamientos, 50)
     page      = request.GET.get("page", 1)
@@ -1683,127 +1747,29 @@ def admin_estacionamientos(request):
 
     return render(request, "admin/estacionamientos.html", {
         "estacionamientos": estacionamientos_pag,
-        "filtros": {
-            "patente":     patente,
-            "estado":      estado,
-            "fecha_desde": fecha_desde,
-            "fecha_hasta": fecha_hasta,
-        },
+        "filtros":          filtros,
     })
 
-# ─────────────────────────────────────────────────────────────────────────────
-# PDF infracciones impagas — para presentar en juzgado de faltas
-# ─────────────────────────────────────────────────────────────────────────────
 
-def _generar_pdf_infracciones_juzgado(municipio, desde, hasta, infracciones_qs=None):
+@require_role("admin")
+def exportar_estacionamientos(request):
     """
-    Genera un PDF con las infracciones impagas del municipio en el rango de fechas.
-    Retorna bytes del PDF listo para HttpResponse o adjunto de email.
+    Descarga el historial de estacionamientos (mismos filtros GET), en streaming.
 
-    Args:
-        municipio: objeto Municipio
-        desde / hasta: date objects
-        infracciones_qs: queryset ya filtrado (opcional). Si None, filtra impagas del rango.
+    ?formato=csv (default) | xlsx
     """
-    import io
-    from reportlab.lib import colors
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import cm
-    from reportlab.platypus import SimpleDocTemplate, Spacer, Table, TableStyle, Paragraph
-
-    if infracciones_qs is None:
-        infracciones_qs = (
-            Infraccion.objects
-            .filter(municipio=municipio, estado="pendiente",
-                    creado_en__date__gte=desde, creado_en__date__lte=hasta)
-            .select_related("vehiculo", "inspector", "subcuadra")
-            .order_by("creado_en")
-        )
-
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(
-        buffer, pagesize=A4,
-        rightMargin=2*cm, leftMargin=2*cm,
-        topMargin=2*cm, bottomMargin=2*cm,
+    estacionamientos, _ = _filtrar_estacionamientos(request, request.user.municipio)
+    return respuesta_exportacion(
+        request.GET.get("formato"),
+        f"estacionamientos_{timezone.localdate():%Y%m%d}",
+        ENCABEZADOS_ESTACIONAMIENTOS,
+        filas_estacionamientos(estacionamientos),
+        "Estacionamientos",
     )
-    estilos = getSampleStyleSheet()
-    estilo_titulo = ParagraphStyle("titulo", parent=estilos["Title"], fontSize=14, alignment=TA_CENTER)
-    estilo_sub    = ParagraphStyle("sub",    parent=estilos["Normal"], fontSize=9,
-                                   textColor=colors.HexColor("#555555"), alignment=TA_CENTER)
-    estilo_pie    = ParagraphStyle("pie",    parent=estilos["Normal"], fontSize=8,
-                                   textColor=colors.HexColor("#888888"))
-
-    partes = []
-
-    municipio_nombre = municipio.nombre if municipio else "Municipio"
-    generado_en = timezone.localtime().strftime("%d/%m/%Y %H:%M")
-
-    partes.append(Paragraph(f"Infracciones impagas — {municipio_nombre}", estilo_titulo))
-    partes.append(Paragraph(
-        f"Período: {desde.strftime('%d/%m/%Y')} al {hasta.strftime('%d/%m/%Y')} "
-        f"&nbsp;|&nbsp; Generado: {generado_en}",
-        estilo_sub,
-    ))
-    partes.append(Spacer(1, 0.6*cm))
-
-    encabezado = ["#Acta", "Fecha", "Patente", "Inspector", "Subcuadra", "Monto", "Días"]
-    filas = [encabezado]
-
-    hoy = timezone.localtime().date()
-    monto_total = 0
-    for inf in infracciones_qs:
-        dias = (hoy - timezone.localtime(inf.creado_en).date()).days
-        filas.append([
-            str(inf.id),
-            timezone.localtime(inf.creado_en).strftime("%d/%m/%Y"),
-            inf.vehiculo.patente if inf.vehiculo else "—",
-            inf.inspector.nombre_completo() if inf.inspector else "—",
-            str(inf.subcuadra) if inf.subcuadra else "—",
-            f"${inf.monto:,.0f}",
-            str(dias),
-        ])
-        monto_total += inf.monto
-
-    if len(filas) == 1:
-        partes.append(Paragraph("Sin infracciones impagas en el período.", estilos["Normal"]))
-    else:
-        anchos = [1.4*cm, 2.2*cm, 2.2*cm, 4.0*cm, 3.5*cm, 2.0*cm, 1.4*cm]
-        tabla = Table(filas, colWidths=anchos, repeatRows=1)
-        tabla.setStyle(TableStyle([
-            ("BACKGROUND",    (0, 0), (-1, 0), colors.HexColor("#2c3e50")),
-            ("TEXTCOLOR",     (0, 0), (-1, 0), colors.white),
-            ("FONTNAME",      (0, 0), (-1, 0), "Helvetica-Bold"),
-            ("FONTSIZE",      (0, 0), (-1, 0), 8),
-            ("FONTSIZE",      (0, 1), (-1, -1), 7.5),
-            ("ROWBACKGROUNDS",(0, 1), (-1, -1), [colors.white, colors.HexColor("#f5f5f5")]),
-            ("GRID",          (0, 0), (-1, -1), 0.4, colors.HexColor("#cccccc")),
-            ("ALIGN",         (5, 0), (6, -1), "RIGHT"),
-            ("ALIGN",         (0, 0), (0, -1), "RIGHT"),
-            ("VALIGN",        (0, 0), (-1, -1), "MIDDLE"),
-            ("TOPPADDING",    (0, 0), (-1, -1), 3),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 3),
-        ]))
-        partes.append(tabla)
-        partes.append(Spacer(1, 0.5*cm))
-        total_actas = len(filas) - 1
-        partes.append(Paragraph(
-            f"Total: <b>{total_actas}</b> acta{'s' if total_actas != 1 else ''} "
-            f"&nbsp;|&nbsp; Monto total adeudado: <b>${monto_total:,.0f}</b>",
-            estilos["Normal"],
-        ))
-
-    partes.append(Spacer(1, 1.5*cm))
-    partes.append(Paragraph(
-        "Documento generado automáticamente por el Sistema de Estacionamiento Medido Municipal.",
-        estilo_pie,
-    ))
-
-    doc.build(partes)
-    buffer.seek(0)
-    return buffer.read()
 
+# ─────────────────────────────────────────────────────────────────────────────
+# PDF infracciones impagas — para presentar en juzgado de faltas
+# ─────────────────────────────────────────────────────────────────────────────
 
 @require_role("admin")
 def pdf_infracciones_juzgado(request):
@@ -1814,36 +1780,17 @@ def pdf_infracciones_juzgado(request):
         frecuencia: "diario" | "semanal" | "mensual" (pre-selecciona rango)
         desde / hasta: YYYY-MM-DD (override manual)
     """
-    from datetime import date as date_type, timedelta
-    from django.http import HttpResponse
-
     municipio = request.user.municipio
-    hoy = timezone.localtime().date()
-
-    frecuencia = request.GET.get("frecuencia", "mensual")
-    desde_str  = request.GET.get("desde", "")
-    hasta_str  = request.GET.get("hasta", "")
-
-    try:
-        desde = date_type.fromisoformat(desde_str)
-    except ValueError:
-        if frecuencia == "diario":
-            desde = hoy
-        elif frecuencia == "semanal":
-            desde = hoy - timedelta(days=hoy.weekday())
-        else:  # mensual
-            desde = hoy.replace(day=1)
-
-    try:
-        hasta = date_type.fromisoformat(hasta_str)
-    except ValueError:
-        hasta = hoy
+    desde, hasta = rango_juzgado(
+        request.GET.get("frecuencia", "mensual"),
+        request.GET.get("desde", ""),
+        request.GET.get("hasta", ""),
+    )
 
-    pdf_bytes = _generar_pdf_infracciones_juzgado(municipio, desde, hasta)
+    # El PDF sale de la caché por contenido; una descarga repetida recibe 304
+    huella = huella_juzgado(municipio, desde, hasta)
     nombre = f"infracciones_impagas_{desde.strftime('%Y%m%d')}_{hasta.strftime('%Y%m%d')}.pdf"
-    response = HttpResponse(pdf_bytes, content_type="application/pdf")
-    response["Content-Disposition"] = f'attachment; filename="{nombre}"'
-    return response
+    return respuesta_pdf(request, huella, lambda: pdf_juzgado_cacheado(municipio, desde, hasta, huella), nombre)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -1903,13 +1850,11 @@ def estadisticas_inspectores(request):
     # ── Queryset base ─────────────────────────────────────────────────────────
     verif_qs = VerificacionInspector.objects.filter(
         inspector__municipio=municipio,
-        fecha__date__gte=desde,
-        fecha__date__lte=hasta,
+        **filtro_fechas("fecha", desde, hasta),
     )
     inf_qs = Infraccion.objects.filter(
         municipio=municipio,
-        creado_en__date__gte=desde,
-        creado_en__date__lte=hasta,
+        **filtro_fechas("creado_en", desde, hasta),
     )
 
     if inspector_sel:
@@ -1917,13 +1862,9 @@ def estadisticas_inspectores(request):
         inf_qs = inf_qs.filter(inspector=inspector_sel)
 
     # ── Comparativa por inspector ─────────────────────────────────────────────
-    rango_q = Q(
-        verificacioninspector__fecha__date__gte=desde,
-        verificacioninspector__fecha__date__lte=hasta,
-    )
+    rango_q = Q(**filtro_fechas("verificacioninspector__fecha", desde, hasta))
     rango_inf_q = Q(
-        infraccion__creado_en__date__gte=desde,
-        infraccion__creado_en__date__lte=hasta,
+        **filtro_fechas("infraccion__creado_en", desde, hasta),
         infraccion__municipio=municipio,
     )
     comparativa = inspectores.annotate(
@@ -2006,14 +1947,8 @@ def estadisticas_inspectores_excel(request):
     Acepta los mismos parámetros GET que estadisticas_inspectores:
     ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD&inspector_id=X
     """
-    import io
     from datetime import date as date_type
-    from django.db.models import Count, Q
     from django.http import HttpResponse
-    from .models import VerificacionInspector
-    import openpyxl
-    from openpyxl.styles import Font, PatternFill, Alignment
-    from openpyxl.utils import get_column_letter
 
     municipio = request.user.municipio
     hoy = timezone.localtime().date()
@@ -2042,117 +1977,14 @@ def estadisticas_inspectores_excel(request):
         except (Usuario.DoesNotExist, ValueError):
             pass
 
-    # ── Datos de comparativa ──────────────────────────────────────────────────
-    rango_q = Q(
-        verificacioninspector__fecha__date__gte=desde,
-        verificacioninspector__fecha__date__lte=hasta,
-    )
-    rango_inf_q = Q(
-        infraccion__creado_en__date__gte=desde,
-        infraccion__creado_en__date__lte=hasta,
-        infraccion__municipio=municipio,
-    )
-    qs_inspectores = Usuario.objects.filter(
-        municipio=municipio, es_inspector=True
-    )
-    if inspector_sel:
-        qs_inspectores = qs_inspectores.filter(pk=inspector_sel.pk)
-
-    comparativa = qs_inspectores.order_by("first_name", "last_name").annotate(
-        total_verificaciones=Count("verificacioninspector", filter=rango_q),
-        total_infracciones=Count(
-            "infraccion",
-            filter=rango_inf_q & ~Q(infraccion__estado="anulada"),
-        ),
-        infracciones_anuladas=Count(
-            "infraccion",
-            filter=rango_inf_q & Q(infraccion__estado="anulada"),
-        ),
-    )
-
-    # ── Armar el Excel ────────────────────────────────────────────────────────
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Estadísticas inspectores"
-
-    # Estilo de encabezado
-    COLOR_HEADER = "1a4d6e"  # azul oscuro
-    estilo_header = Font(bold=True, color="FFFFFF")
-    relleno_header = PatternFill("solid", fgColor=COLOR_HEADER)
-    centrado = Alignment(horizontal="center")
-
-    # ── Título del reporte ────────────────────────────────────────────────────
-    ws.merge_cells("A1:F1")
-    celda_titulo = ws["A1"]
-    celda_titulo.value = f"Estadísticas de inspectores — {municipio.nombre}"
-    celda_titulo.font = Font(bold=True, size=13)
-    celda_titulo.alignment = centrado
-
-    ws.merge_cells("A2:F2")
-    celda_periodo = ws["A2"]
-    celda_periodo.value = f"Período: {desde.strftime('%d/%m/%Y')} al {hasta.strftime('%d/%m/%Y')}"
-    celda_periodo.alignment = centrado
-
-    ws.append([])  # fila vacía
-
-    # ── Encabezados de la tabla ───────────────────────────────────────────────
-    encabezados = [
-        "Inspector",
-        "Verificaciones",
-        "Infracciones",
-        "Anuladas",
-        "Tasa infracción (%)",
-        "Efectividad (%)",
-    ]
-    ws.append(encabezados)
-    fila_header = ws.max_row
-    for col_idx, _ in enumerate(encabezados, start=1):
-        celda = ws.cell(row=fila_header, column=col_idx)
-        celda.font = estilo_header
-        celda.fill = relleno_header
-        celda.alignment = centrado
-
-    # ── Filas de datos ────────────────────────────────────────────────────────
-    for insp in comparativa:
-        nombre_completo = f"{insp.first_name} {insp.last_name}".strip() or insp.correo
-        verif = insp.total_verificaciones
-        inf   = insp.total_infracciones
-        anul  = insp.infracciones_anuladas
-        # tasa = infracciones / verificaciones (cuántas verificaciones terminaron en infracción)
-        tasa = round(inf / verif * 100, 1) if verif else 0
-        # efectividad = (inf - anuladas) / inf (de las que labró, cuántas sobrevivieron)
-        efectividad = round((inf - anul) / inf * 100, 1) if inf else 0
-        ws.append([nombre_completo, verif, inf, anul, tasa, efectividad])
-
-    # ── Fila de totales ───────────────────────────────────────────────────────
-    total_verif = sum(i.total_verificaciones for i in comparativa)
-    total_inf   = sum(i.total_infracciones   for i in comparativa)
-    total_anul  = sum(i.infracciones_anuladas for i in comparativa)
-    tasa_total  = round(total_inf / total_verif * 100, 1) if total_verif else 0
-
-    ws.append([])  # separador
-    fila_totales = ["TOTAL", total_verif, total_inf, total_anul, tasa_total, ""]
-    ws.append(fila_totales)
-    fila_tot_idx = ws.max_row
-    for col_idx in range(1, 7):
-        celda = ws.cell(row=fila_tot_idx, column=col_idx)
-        celda.font = Font(bold=True)
-
-    # ── Ancho de columnas ─────────────────────────────────────────────────────
-    anchos = [30, 16, 14, 12, 20, 18]
-    for i, ancho in enumerate(anchos, start=1):
-        ws.column_dimensions[get_column_letter(i)].width = ancho
+    contenido = generar_xlsx_estadisticas_inspectores(municipio, desde, hasta, inspector_sel)
 
     # ── Respuesta HTTP como descarga ──────────────────────────────────────────
     nombre_archivo = (
         f"inspectores_{desde.strftime('%Y%m%d')}_{hasta.strftime('%Y%m%d')}.xlsx"
     )
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-
     response = HttpResponse(
-        buffer.getvalue(),
+        contenido,
         content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
     )
     response["Content-Disposition"] = f'attachment; filename="{nombre_archivo}"'
@@ -2161,179 +1993,6 @@ def estadisticas_inspectores_excel(request):
 
 # ─── PDF de rendición ────────────────────────────────────────────────────────
 
-def _generar_pdf_rendicion(rendicion):
-    """
-    Genera el PDF de una rendición para tesorería.
-
-    Incluye:
-    - Encabezado: municipio, período, admin, estado
-    - Resumen: efectivo / digital / neto
-    - Tabla de detalle: un fila por CierreCaja incluido en la rendición
-    - Pie: fecha de generación + notas del tesorero si las hay
-
-    Retorna bytes del PDF listos para HttpResponse.
-    """
-    import io
-    from reportlab.lib import colors
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import cm
-    from reportlab.platypus import SimpleDocTemplate, Spacer, Table, TableStyle, Paragraph, HRFlowable
-
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(
-        buffer, pagesize=A4,
-        rightMargin=2*cm, leftMargin=2*cm,
-        topMargin=2*cm, bottomMargin=2*cm,
-    )
-
-    estilos = getSampleStyleSheet()
-    estilo_titulo = ParagraphStyle(
-        "titulo", parent=estilos["Title"], fontSize=14, alignment=TA_CENTER, spaceAfter=4,
-    )
-    estilo_sub = ParagraphStyle(
-        "sub", parent=estilos["Normal"], fontSize=9,
-        textColor=colors.HexColor("#555555"), alignment=TA_CENTER, spaceAfter=2,
-    )
-    estilo_seccion = ParagraphStyle(
-        "seccion", parent=estilos["Normal"], fontSize=10,
-        textColor=colors.HexColor("#2c3e50"), fontName="Helvetica-Bold", spaceBefore=10, spaceAfter=4,
-    )
-    estilo_pie = ParagraphStyle(
-        "pie", parent=estilos["Normal"], fontSize=8,
-        textColor=colors.HexColor("#888888"), alignment=TA_CENTER,
-    )
-    estilo_notas = ParagraphStyle(
-        "notas", parent=estilos["Normal"], fontSize=9,
-        textColor=colors.HexColor("#664d03"),
-        backColor=colors.HexColor("#fff3cd"),
-        borderPadding=(4, 8, 4, 8),
-    )
-
-    municipio_nombre = rendicion.municipio.nombre if rendicion.municipio else "Municipio"
-    admin_nombre = rendicion.admin.nombre_completo() if rendicion.admin else "—"
-    generado_en = timezone.localtime().strftime("%d/%m/%Y %H:%M")
-
-    # Estado con color de texto (no hay color en PDF inline, usamos texto)
-    estado_texto = {
-        "pendiente": "Pendiente de validación",
-        "validada":  "Validada por tesorería",
-        "observada": "Con observaciones",
-    }.get(rendicion.estado, rendicion.estado)
-
-    partes = []
-
-    # ── Encabezado ──────────────────────────────────────────────────────────
-    partes.append(Paragraph(f"Rendición — {municipio_nombre}", estilo_titulo))
-    partes.append(Paragraph(
-        f"Período: {rendicion.fecha_desde.strftime('%d/%m/%Y')} al {rendicion.fecha_hasta.strftime('%d/%m/%Y')}"
-        f"&nbsp;|&nbsp; Admin: {admin_nombre}"
-        f"&nbsp;|&nbsp; Estado: {estado_texto}",
-        estilo_sub,
-    ))
-    partes.append(Paragraph(f"Generado: {generado_en}", estilo_sub))
-    partes.append(Spacer(1, 0.4*cm))
-    partes.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor("#2c3e50")))
-    partes.append(Spacer(1, 0.4*cm))
-
-    # ── Resumen de totales ───────────────────────────────────────────────────
-    partes.append(Paragraph("Resumen de totales", estilo_seccion))
-    resumen_data = [
-        ["Concepto", "Monto"],
-        ["Efectivo", f"${rendicion.total_efectivo:,.2f}"],
-        ["Digital (transferencia + débito/crédito/QR)", f"${rendicion.total_digital:,.2f}"],
-        ["Total neto a rendir", f"${rendicion.total_neto:,.2f}"],
-    ]
-    tabla_resumen = Table(resumen_data, colWidths=[12*cm, 4*cm])
-    tabla_resumen.setStyle(TableStyle([
-        ("BACKGROUND",    (0, 0), (-1, 0), colors.HexColor("#2c3e50")),
-        ("TEXTCOLOR",     (0, 0), (-1, 0), colors.white),
-        ("FONTNAME",      (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("FONTSIZE",      (0, 0), (-1, -1), 9),
-        ("ROWBACKGROUNDS",(0, 1), (-1, -2), [colors.white, colors.HexColor("#f5f5f5")]),
-        # Fila de total neto en negrita con fondo destacado
-        ("BACKGROUND",    (0, 3), (-1, 3), colors.HexColor("#e8f5e9")),
-        ("FONTNAME",      (0, 3), (-1, 3), "Helvetica-Bold"),
-        ("GRID",          (0, 0), (-1, -1), 0.4, colors.HexColor("#cccccc")),
-        ("ALIGN",         (1, 0), (1, -1), "RIGHT"),
-        ("TOPPADDING",    (0, 0), (-1, -1), 4),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
-        ("LEFTPADDING",   (0, 0), (-1, -1), 8),
-    ]))
-    partes.append(tabla_resumen)
-    partes.append(Spacer(1, 0.5*cm))
-
-    # ── Detalle de cierres incluidos ─────────────────────────────────────────
-    cierres = list(
-        rendicion.cierres.select_related("usuario", "certificado_por").order_by("fecha_cierre")
-    )
-
-    if cierres:
-        partes.append(Paragraph(f"Cierres de caja incluidos ({len(cierres)})", estilo_seccion))
-
-        encabezado = ["Usuario", "Fecha cierre", "Período", "Efectivo", "Transferencia", "Digital", "Total"]
-        filas = [encabezado]
-
-        for cierre in cierres:
-            filas.append([
-                cierre.usuario.nombre_completo() if cierre.usuario else "—",
-                timezone.localtime(cierre.fecha_cierre).strftime("%d/%m/%Y"),
-                cierre.get_periodo_display() if cierre.periodo else "—",
-                f"${cierre.total_efectivo:,.0f}",
-                f"${cierre.total_transferencia:,.0f}",
-                f"${cierre.total_digital:,.0f}",
-                f"${cierre.total_cobrado:,.0f}",
-            ])
-
-        anchos = [4.2*cm, 2.2*cm, 1.8*cm, 2.0*cm, 2.5*cm, 1.8*cm, 2.0*cm]
-        tabla_cierres = Table(filas, colWidths=anchos, repeatRows=1)
-        tabla_cierres.setStyle(TableStyle([
-            ("BACKGROUND",    (0, 0), (-1, 0), colors.HexColor("#2c3e50")),
-            ("TEXTCOLOR",     (0, 0), (-1, 0), colors.white),
-            ("FONTNAME",      (0, 0), (-1, 0), "Helvetica-Bold"),
-            ("FONTSIZE",      (0, 0), (-1, 0), 8),
-            ("FONTSIZE",      (0, 1), (-1, -1), 7.5),
-            ("ROWBACKGROUNDS",(0, 1), (-1, -1), [colors.white, colors.HexColor("#f5f5f5")]),
-            ("GRID",          (0, 0), (-1, -1), 0.4, colors.HexColor("#cccccc")),
-            ("ALIGN",         (3, 0), (-1, -1), "RIGHT"),
-            ("VALIGN",        (0, 0), (-1, -1), "MIDDLE"),
-            ("TOPPADDING",    (0, 0), (-1, -1), 3),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 3),
-            ("LEFTPADDING",   (0, 0), (-1, -1), 5),
-        ]))
-        partes.append(tabla_cierres)
-    else:
-        partes.append(Paragraph("Sin cierres de caja vinculados.", estilos["Normal"]))
-
-    # ── Validación de tesorería ──────────────────────────────────────────────
-    if rendicion.tesorero and rendicion.validado_en:
-        partes.append(Spacer(1, 0.5*cm))
-        partes.append(Paragraph("Validación de tesorería", estilo_seccion))
-        validado_en = timezone.localtime(rendicion.validado_en).strftime("%d/%m/%Y %H:%M")
-        partes.append(Paragraph(
-            f"Validada por: <b>{rendicion.tesorero.nombre_completo()}</b> el {validado_en}",
-            estilos["Normal"],
-        ))
-
-    if rendicion.notas_tesorero:
-        partes.append(Spacer(1, 0.3*cm))
-        partes.append(Paragraph(f"Observaciones: {rendicion.notas_tesorero}", estilo_notas))
-
-    # ── Pie ──────────────────────────────────────────────────────────────────
-    partes.append(Spacer(1, 1*cm))
-    partes.append(HRFlowable(width="100%", thickness=0.5, color=colors.HexColor("#cccccc")))
-    partes.append(Spacer(1, 0.2*cm))
-    partes.append(Paragraph(
-        "Documento generado automáticamente por el Sistema de Estacionamiento Medido Municipal.",
-        estilo_pie,
-    ))
-
-    doc.build(partes)
-    buffer.seek(0)
-    return buffer.read()
-
-
 @require_role("admin", "tesorero")
 def pdf_rendicion(request, rendicion_id):
     """
@@ -2346,15 +2005,12 @@ def pdf_rendicion(request, rendicion_id):
     # El tesorero también está restringido por municipio.
     rendicion = get_object_or_404(Rendicion, id=rendicion_id, municipio=municipio)
 
-    pdf_bytes = _generar_pdf_rendicion(rendicion)
-
+    huella = huella_rendicion(rendicion)
     nombre_archivo = (
         f"rendicion_{rendicion.fecha_desde.strftime('%Y%m%d')}"
         f"_{rendicion.fecha_hasta.strftime('%Y%m%d')}.pdf"
     )
-    response = HttpResponse(pdf_bytes, content_type="application/pdf")
-    response["Content-Disposition"] = f'attachment; filename="{nombre_archivo}"'
-    return response
+    return respuesta_pdf(request, huella, lambda: pdf_rendicion_cacheado(rendicion, huella), nombre_archivo)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -2466,197 +2122,6 @@ def gestionar_subcuadras(request):
 # Importación de exenciones desde Excel
 # ─────────────────────────────────────────────────────────────────────────────
 
-def _procesar_fila_exencion(fila_num, fila_vals, municipio):
-    """
-    Procesa una fila del Excel y devuelve un dict con el resultado del análisis.
-
-    Devuelve:
-        {
-            "num":       int,          # número de fila (para mostrar al usuario)
-            "patente":   str,
-            "nombre":    str,
-            "telefono":  str,
-            "direccion": str,          # texto original de la columna Direccion
-            "subcuadra": Subcuadra | None,
-            "notas":     str,          # texto a guardar en notas_exencion
-            "estado":    "nuevo" | "actualizar" | "error",
-            "mensaje":   str,
-        }
-    """
-    import re
-
-    # ── Leer celdas ───────────────────────────────────────────────────────────
-    def celda(idx):
-        """Devuelve el valor de la celda como string limpio (o vacío)."""
-        val = fila_vals[idx] if idx < len(fila_vals) else None
-        if val is None:
-            return ""
-        return str(val).strip()
-
-    patente   = re.sub(r"[^A-Z0-9]", "", celda(0).upper())
-    nombre    = celda(1)
-    direccion = celda(2)
-    telefono  = celda(3)
-    # columnas Fecha(4), Condicion(5), Vencimiento(6) — las guardamos en notas
-    fecha      = celda(4)
-    condicion  = celda(5)
-    vencimiento = celda(6)
-
-    # ── Validación básica ─────────────────────────────────────────────────────
-    if not patente:
-        return {
-            "num": fila_num, "patente": "", "nombre": nombre,
-            "telefono": telefono, "direccion": direccion,
-            "subcuadra": None, "notas": "",
-            "estado": "error", "mensaje": "Patente vacía — fila ignorada.",
-        }
-
-    # ── Detectar tipo de exención ─────────────────────────────────────────────
-    # Si Condicion contiene "global" → exento_global (cubre cualquier subcuadra).
-    # Cualquier otro valor (vacío, "Propietario", etc.) → exento_parcial.
-    es_global = "global" in condicion.lower()
-
-    # ── Buscar subcuadra a partir de la dirección ────────────────────────────
-    # La dirección viene como "CALLE NUMERO" (ej: "29 685", "San Martín 430").
-    # Las subcuadras se organizan en bloques de 50 numerales:
-    #   altura_real = 685 → bloque = (685 // 50) * 50 = 650
-    # Estrategia:
-    #   1. Separar el último token como número (altura real del domicilio).
-    #   2. Calcular el bloque de 50 más cercano hacia abajo.
-    #   3. Buscar subcuadra por calle (icontains) + altura exacta del bloque.
-    #   4. Si no existe ese bloque, tomar la subcuadra de la misma calle con
-    #      altura más cercana (menor distancia absoluta).
-    subcuadra = None
-    aviso_subcuadra = ""
-    if direccion:
-        # Separar calle y número desde la derecha
-        tokens = direccion.strip().rsplit(None, 1)
-        calle_texto  = None
-        altura_bloque = None
-
-        if len(tokens) == 2:
-            try:
-                altura_real   = int(tokens[1])
-                calle_texto   = tokens[0].strip()
-                altura_bloque = (altura_real // 50) * 50
-            except ValueError:
-                calle_texto = direccion
-        else:
-            calle_texto = direccion
-
-        # Intento 1: calle + bloque exacto
-        if calle_texto and altura_bloque is not None:
-            exactas = Subcuadra.objects.filter(
-                municipio=municipio,
-                calle__icontains=calle_texto,
-                altura=altura_bloque,
-            )
-            if exactas.exists():
-                subcuadra = exactas.first()
-
-        # Intento 2: misma calle, subcuadra con altura más cercana al bloque
-        if subcuadra is None and calle_texto:
-            por_calle = list(Subcuadra.objects.filter(
-                municipio=municipio,
-                calle__icontains=calle_texto,
-            ))
-            if por_calle:
-                if altura_bloque is not None:
-                    subcuadra = min(por_calle, key=lambda s: abs(s.altura - altura_bloque))
-                    aviso_subcuadra = (
-                        f" (bloque {altura_bloque} no existe, subcuadra más cercana: {subcuadra})"
-                    )
-                else:
-                    subcuadra = por_calle[0]
-            else:
-                aviso_subcuadra = f" (sin subcuadra para '{direccion}')"
-
-    # ── Construir notas_exencion ──────────────────────────────────────────────
-    partes = []
-    if nombre:
-        partes.append(f"Nombre: {nombre}")
-    if telefono:
-        partes.append(f"Tel: {telefono}")
-    if fecha:
-        partes.append(f"Fecha: {fecha}")
-    if direccion:
-        partes.append(f"Dirección: {direccion}")
-    if condicion:
-        partes.append(f"Condición: {condicion}")
-    if vencimiento:
-        partes.append(f"Vencimiento: {vencimiento}")
-    notas = " | ".join(partes)
-
-    # ── Determinar si el vehículo ya existe ───────────────────────────────────
-    vehiculo_existente = Vehiculo.objects.filter(patente=patente).first()
-    estado  = "actualizar" if vehiculo_existente else "nuevo"
-    tipo_label = "🌐 Global" if es_global else "📍 Parcial"
-    mensaje = (
-        f"{'Actualiza' if vehiculo_existente else 'Crea'} vehículo. "
-        f"{tipo_label}.{aviso_subcuadra}"
-    )
-
-    return {
-        "num":       fila_num,
-        "patente":   patente,
-        "nombre":    nombre,
-        "telefono":  telefono,
-        "direccion": direccion,
-        "subcuadra": subcuadra,
-        "es_global": es_global,
-        "notas":     notas,
-        "estado":    estado,
-        "mensaje":   mensaje,
-    }
-
-
-def _guardar_fila_exencion(datos_fila, municipio):
-    """
-    Aplica los datos procesados de una fila al modelo Vehiculo.
-    Se llama solo tras la confirmación del admin.
-
-    Reglas:
-    - get_or_create por patente.
-    - es_global=True  → exento_global=True  (vale en cualquier subcuadra).
-    - es_global=False → exento_parcial=True (solo en subcuadras_exentas).
-    - exencion_verificada = False (pendiente de contacto con el titular).
-    - tipo_exencion = "vecino_frentista".
-    - Si hay subcuadra → agregarla a subcuadras_exentas con .add() (no borra
-      las existentes, por eso es seguro para vehículos ya registrados).
-    - notas_exencion: se concatena con " | " para no pisar datos anteriores.
-    """
-    patente   = datos_fila["patente"]
-    subcuadra = datos_fila["subcuadra"]
-    notas     = datos_fila["notas"]
-    es_global = datos_fila.get("es_global", False)
-
-    vehiculo, _ = Vehiculo.objects.get_or_create(
-        patente=patente,
-        defaults={"tipo": "auto", "municipio": municipio},
-    )
-
-    if es_global:
-        vehiculo.exento_global  = True
-        # No tocamos exento_parcial ni subcuadras_exentas si ya tenía parcial
-    else:
-        vehiculo.exento_parcial = True
-
-    vehiculo.exencion_verificada = False
-    vehiculo.tipo_exencion       = "vecino_frentista"
-
-    # Concatenar notas sin pisar lo que el admin haya escrito antes
-    if notas:
-        if vehiculo.notas_exencion:
-            vehiculo.notas_exencion = vehiculo.notas_exencion + " | " + notas
-        else:
-            vehiculo.notas_exencion = notas
-
-    vehiculo.save()
-
-    if subcuadra:
-        vehiculo.subcuadras_exentas.add(subcuadra)
-
-
 @require_role("admin")
 def importar_exenciones(request):
     """
@@ -2665,18 +2130,19 @@ def importar_exenciones(request):
 
     Flujo:
     1. GET             → muestra el formulario de carga.
-    2. POST preview    → lee el Excel, muestra tabla fila x fila sin guardar.
-    3. POST confirmar  → guarda todos los registros en la DB.
+    2. POST preview    → analiza el Excel y guarda la vista previa en la base
+                         (ImportacionExencion); muestra tabla fila x fila.
+    3. POST confirmar  → aplica la vista previa (importacion_id) en la DB.
 
+    El análisis y la confirmación están en services/importacion_exenciones.py.
     Todos los vehículos importados quedan con exencion_verificada=False
     para que el admin los contacte individualmente y complete los datos faltantes.
     """
-    import io
-    import json as _json
     try:
-        import openpyxl
+        import openpyxl  # noqa: F401 — motor de pandas.read_excel
+        import pandas  # noqa: F401
     except ImportError:
-        messages.error(request, "Falta instalar openpyxl: pip install openpyxl")
+        messages.error(request, "Falta instalar pandas y openpyxl: pip install pandas openpyxl")
         return redirect("exenciones")
 
     usuario   = request.user
@@ -2684,8 +2150,7 @@ def importar_exenciones(request):
     if not municipio:
         return redirect("login")
 
-    accion     = request.POST.get("accion", "")
-    resultados = None  # lista de dicts para mostrar en el template
+    accion = request.POST.get("accion", "")
 
     if request.method == "POST" and accion == "preview":
         archivo = request.FILES.get("archivo")
@@ -2693,78 +2158,30 @@ def importar_exenciones(request):
             messages.error(request, "Seleccioná un archivo Excel.")
             return render(request, "admin/importar_exenciones.html", {})
 
+        purgar_vistas_previas()
         try:
-            wb  = openpyxl.load_workbook(io.BytesIO(archivo.read()), data_only=True)
-            ws  = wb.active
-            filas = list(ws.iter_rows(min_row=2, values_only=True))  # omite encabezado
+            importacion, resultados = analizar_exenciones(archivo, municipio, usuario)
         except Exception as exc:
             messages.error(request, f"No se pudo leer el Excel: {exc}")
             return render(request, "admin/importar_exenciones.html", {})
 
-        resultados = []
-        for idx, fila in enumerate(filas, start=2):
-            # Ignorar filas completamente vacías
-            if all(v is None or str(v).strip() == "" for v in fila):
-                continue
-            datos = _procesar_fila_exencion(idx, fila, municipio)
-            resultados.append(datos)
-
-        # Serializar para el formulario de confirmación:
-        # no podemos reenviar el archivo, así que guardamos los datos en sesión.
-        # Excluimos el objeto Subcuadra (no serializable) y guardamos solo el id.
-        datos_sesion = []
-        for d in resultados:
-            if d["estado"] == "error":
-                continue
-            datos_sesion.append({
-                "patente":      d["patente"],
-                "subcuadra_id": d["subcuadra"].id if d["subcuadra"] else None,
-                "notas":        d["notas"],
-                "es_global":    d.get("es_global", False),
-            })
-        request.session["importar_exenciones_datos"] = datos_sesion
-
         return render(request, "admin/importar_exenciones.html", {
-            "resultados": resultados,
+            "resultados":  resultados,
+            "importacion": importacion,
             "modo": "preview",
         })
 
     elif request.method == "POST" and accion == "confirmar":
-        datos_sesion = request.session.pop("importar_exenciones_datos", None)
-        if not datos_sesion:
-            messages.error(request, "Sesión expirada. Volvé a cargar el archivo.")
+        try:
+            importacion_id = int(request.POST.get("importacion_id", ""))
+        except ValueError:
+            importacion_id = None
+        resultado = importacion_id and confirmar_importacion(importacion_id, municipio, usuario)
+        if not resultado:
+            messages.error(request, "La vista previa venció o ya se confirmó. Volvé a cargar el archivo.")
             return render(request, "admin/importar_exenciones.html", {})
 
-        creados    = 0
-        actualizados = 0
-
-        for item in datos_sesion:
-            patente     = item["patente"]
-            subcuadra_id = item.get("subcuadra_id")
-            notas        = item.get("notas", "")
-
-            subcuadra = None
-            if subcuadra_id:
-                try:
-                    subcuadra = Subcuadra.objects.get(id=subcuadra_id)
-                except Subcuadra.DoesNotExist:
-                    pass
-
-            existia = Vehiculo.objects.filter(patente=patente).exists()
-            _guardar_fila_exencion(
-                {
-                    "patente":   patente,
-                    "subcuadra": subcuadra,
-                    "notas":     notas,
-                    "es_global": item.get("es_global", False),
-                },
-                municipio,
-            )
-            if existia:
-                actualizados += 1
-            else:
-                creados += 1
-
+        creados, actualizados = resultado
         messages.success(
             request,
             f"✅ Importación completada: {creados} vehículos nuevos, "
@@ -33,11 +33,8 @@ from .models import (
     Estacionamiento,
     Estado,
     Infraccion,
-    MovimientoCaja,
     Notificacion,
     SolicitudVerificacion,
-    Tarifa,
-    Usuario,
     VerificacionInspector,
     Vehiculo,
     VehiculoUsuario,
@@ -45,11 +42,13 @@ from .models import (
 from .use_cases.estacionar_vehiculo import ejecutar_estacionamiento
 from .use_cases.finalizar_estacionamiento import ejecutar as finalizar_estacionamiento_uc
 from .use_cases.pagar_infraccion import ejecutar as pagar_infraccion_uc
+from .services.config_municipio import tarifa_vigente
 from .services.horarios import (
     calcular_opciones_duracion,
     cerrar_estacionamientos_vencidos_por_horario,
     puede_estacionar_ahora,
 )
+from .services.saldo import SaldoInsuficiente, debitar_saldo_conductor, saldo_actual
 from .utils import get_subcuadra_default, sanitizar_patente
 from .views_auth import redirect_por_rol
 
@@ -360,7 +359,7 @@ def mis_infracciones(request):
 
     return render(request, "usuarios/historial_infracciones.html", {
         "infracciones":         infracciones,
-        "saldo_usuario":        usuario.saldo,
+        "saldo_usuario":        saldo_actual(usuario),
         "tiene_pendientes":     infracciones.filter(estado="pendiente").exists(),
         "tolerancia_min":       tolerancia_min,
         "ids_dentro_tolerancia": ids_dentro_tolerancia,
@@ -462,8 +461,6 @@ def estacionar_vehiculo(request):
     Flujo GET:
     - Muestra dropdown de vehículos del conductor y opciones de duración según tarifa
     """
-    from .models import Tarifa
-
     usuario  = request.user
     warning  = None
     vehiculos = Vehiculo.objects.filter(
@@ -578,7 +575,7 @@ def estacionar_vehiculo(request):
         return redirect(reverse(result["redirect"]))
 
     # ── GET ──────────────────────────────────────────────────────────────────
-    tarifa_obj       = Tarifa.objects.filter(municipio=usuario.municipio).first()
+    tarifa_obj       = tarifa_vigente(usuario.municipio)
     tarifa_hora_auto = tarifa_obj.precio_por_hora if tarifa_obj else 100
     tarifa_hora_moto = (
         tarifa_obj.precio_por_hora_moto
@@ -640,7 +637,7 @@ def renovar_estacionamiento(request, est_id):
         estado="ACTIVO",
     )
 
-    tarifa_obj  = Tarifa.objects.filter(municipio=usuario.municipio).first()
+    tarifa_obj  = tarifa_vigente(usuario.municipio)
     tarifa_hora = tarifa_obj.precio_por_hora if tarifa_obj else Decimal("100")
     error       = None
 
@@ -653,35 +650,31 @@ def renovar_estacionamiento(request, est_id):
             error = "Ingresá una cantidad de horas válida."
         else:
             costo_extra = horas_extra * tarifa_hora
+            saldo       = saldo_actual(usuario)
 
-            if usuario.saldo < costo_extra:
-                error = f"Saldo insuficiente. Necesitás ${costo_extra:.2f} y tenés ${usuario.saldo:.2f}."
+            if saldo < costo_extra:
+                error = f"Saldo insuficiente. Necesitás ${costo_extra:.2f} y tenés ${saldo:.2f}."
             else:
-                with transaction.atomic():
-                    usuario_db = Usuario.objects.select_for_update().get(id=usuario.id)
-                    if usuario_db.saldo < costo_extra:
-                        error = "Saldo insuficiente."
-                    else:
-                        # horas_extra ya es Decimal — sin int() para no perder medias horas
-                        estacionamiento.duracion_horas = estacionamiento.duracion_horas + horas_extra
-                        estacionamiento.save(update_fields=["duracion_horas"])
-
-                        usuario_db.saldo -= costo_extra
-                        usuario_db.save(update_fields=["saldo"])
-
-                        MovimientoCaja.objects.create(
-                            usuario=usuario_db,
+                try:
+                    with transaction.atomic():
+                        # Débito condicional en el libro de saldo (sin lock sobre el usuario)
+                        debitar_saldo_conductor(
+                            conductor=usuario,
                             monto=costo_extra,
-                            tipo="egreso",
                             descripcion=f"Renovación {float(horas_extra):g}h — {estacionamiento.vehiculo.patente}",
                         )
-
-                        messages.success(
-                            request,
-                            f"✅ Estacionamiento extendido {float(horas_extra):g}h más. "
-                            f"Se descontaron ${costo_extra:.2f} de tu saldo."
-                        )
-                        return redirect("inicio_usuarios")
+                        # horas_extra ya es Decimal — sin int() para no perder medias horas
+                        estacionamiento.duracion_horas = estacionamiento.duracion_horas + horas_extra
+                        estacionamiento.save(update_fields=["duracion_horas"])
+                except SaldoInsuficiente:
+                    error = "Saldo insuficiente."
+                else:
+                    messages.success(
+                        request,
+                        f"✅ Estacionamiento extendido {float(horas_extra):g}h más. "
+                        f"Se descontaron ${costo_extra:.2f} de tu saldo."
+                    )
+                    return redirect("inicio_usuarios")
 
     opciones_duracion = calcular_opciones_duracion(
         municipio=usuario.municipio,
@@ -693,7 +686,7 @@ def renovar_estacionamiento(request, est_id):
     return render(request, "usuarios/renovar_estacionamiento.html", {
         "estacionamiento":  estacionamiento,
         "tarifa_hora":      tarifa_hora,
-        "saldo":            usuario.saldo,
+        "saldo":            saldo_actual(usuario),
         "error":            error,
         "opciones_duracion": opciones_duracion,
     })
@@ -760,8 +753,7 @@ def pagar_abono_conductor(request):
     - POST accion=cobrar: debita saldo y crea AbonoMensual
     """
     from datetime import date
-    from app_estacionamiento.models import AbonoMensual, Tarifa, Vehiculo
-    from app_estacionamiento.services.saldo import debitar_saldo_conductor
+    from app_estacionamiento.models import AbonoMensual, Vehiculo
 
     MESES_ES = [
         "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
@@ -776,7 +768,7 @@ def pagar_abono_conductor(request):
 
     usuario   = request.user
     municipio = usuario.municipio
-    tarifa_obj = Tarifa.objects.filter(municipio=municipio).first()
+    tarifa_obj = tarifa_vigente(municipio)
 
     hoy      = date.today()
     mes_base = hoy.replace(day=1)
@@ -839,16 +831,14 @@ def pagar_abono_conductor(request):
                     elif accion == "confirmar":
                         confirmar = True
                     elif accion == "cobrar":
-                        if usuario.saldo < precio:
-                            error = f"Saldo insuficiente. Disponible: ${usuario.saldo}, requerido: ${precio}."
+                        saldo = saldo_actual(usuario)
+                        if saldo < precio:
+                            error = f"Saldo insuficiente. Disponible: ${saldo}, requerido: ${precio}."
                         else:
-                            with transaction.atomic():
-                                conductor_locked = Usuario.objects.select_for_update().get(id=usuario.id)
-                                if conductor_locked.saldo < precio:
-                                    error = "Saldo insuficiente."
-                                else:
+                            try:
+                                with transaction.atomic():
                                     debitar_saldo_conductor(
-                                        conductor=conductor_locked,
+                                        conductor=usuario,
                                         monto=precio,
                                         descripcion=f"Abono mensual {mes_seleccionado.strftime('%m/%Y')} - {vehiculo.patente}",
                                     )
@@ -860,6 +850,8 @@ def pagar_abono_conductor(request):
                                         monto=precio,
                                         medio_pago="saldo",
                                     )
+                            except SaldoInsuficiente:
+                                error = "Saldo insuficiente."
                             if not error:
                                 messages.success(
                                     request,
@@ -876,5 +868,5 @@ def pagar_abono_conductor(request):
         "precio":           precio,
         "confirmar":        confirmar,
         "error":            error,
-        "saldo_usuario":    usuario.saldo,
+        "saldo_usuario":    saldo_actual(usuario),
     })
@@ -13,7 +13,6 @@ No incluye cobros ni liquidaciones (eso es responsabilidad del vendedor).
 
 from datetime import date, timedelta
 
-import math
 
 from django.contrib import messages
 from django.http import JsonResponse
@@ -28,10 +27,13 @@ from .models import (
     Subcuadra,
     Vehiculo,
 )
+from .services.documentos import generar_pdf_infracciones_dia
+from .services.fechas import filtro_fechas
 from .services.horarios import puede_estacionar_ahora
+from .services.indice_subcuadras import obtener_indice_subcuadras
 from .services_infracciones import ErrorInfraccion, crear_infraccion
-from .services_verificacion import verificar_estado_vehiculo
-from .use_cases.finalizar_estacionamiento import ejecutar as finalizar_estacionamiento_uc
+from .services_verificacion import verificar_estado_vehiculo, verificar_estados_vehiculos
+from .use_cases.finalizar_estacionamiento import ejecutar as finalizar_estacionamiento_uc, finalizar_lote
 from .utils import get_subcuadra_default, obtener_plantilla, sanitizar_patente
 
 
@@ -52,7 +54,7 @@ def panel_inspectores(request):
     infracciones_hoy = Infraccion.objects.filter(
         municipio=inspector.municipio,
         inspector=inspector,
-        creado_en__date=hoy,
+        **filtro_fechas("creado_en", hoy, hoy),
     ).count()
 
     # Cierres de caja que el admin todavía no certificó — igual al panel de vendedor
@@ -165,6 +167,104 @@ def verificar_vehiculo(request):
     })
 
 
+# Tope de patentes por lote: una cuadra entera entra holgada y evita que
+# un request arme un patente__in gigante.
+MAX_PATENTES_POR_LOTE = 50
+
+
+def _resultado_a_json(resultado):
+    """ResultadoVerificacion → dict serializable para la respuesta del lote."""
+    return {
+        "patente":                    resultado.patente,
+        "estado":                     resultado.estado.value,
+        "estado_label":               resultado.estado_label(),
+        "css_class":                  resultado.css_class(),
+        "estacionamiento_activo":     resultado.estacionamiento_activo,
+        "necesita_infraccion":        resultado.necesita_infraccion(),
+        "registrar_infraccion_url":   resultado.registrar_infraccion_url,
+        "exento_en_subcuadra_actual": resultado.exento_en_subcuadra_actual,
+        "tipo_exencion":              resultado.tipo_exencion,
+        "minutos_hasta_siguiente":    resultado.minutos_hasta_siguiente,
+        "subcuadras_exentas":         [str(s) for s in resultado.subcuadras_exentas or []],
+    }
+
+
+@require_role("inspector")
+def verificar_lote(request):
+    """
+    Endpoint AJAX para verificar varias patentes de una misma subcuadra.
+
+    Recibe: POST JSON { patentes: [..], subcuadra_id }
+    Devuelve: JSON { subcuadra_id, resultados: [..] } en el orden recibido.
+
+    Hace lo mismo que verificar_vehiculo para cada patente (alta de las no
+    registradas, auto-cierre de estacionamientos vencidos, registro de la
+    verificación) pero con una cantidad constante de queries por lote: en 3G
+    un solo POST reemplaza 10–20 recargas de página.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Método no permitido"}, status=405)
+
+    import json
+
+    try:
+        body = json.loads(request.body)
+    except (json.JSONDecodeError, ValueError):
+        return JsonResponse({"error": "JSON inválido"}, status=400)
+
+    patentes = body.get("patentes") if isinstance(body, dict) else None
+    if not isinstance(patentes, list):
+        return JsonResponse({"error": "Lista de patentes requerida"}, status=400)
+    patentes = list(dict.fromkeys(
+        p for p in (sanitizar_patente(str(p or "")) for p in patentes) if p
+    ))
+    if not patentes:
+        return JsonResponse({"error": "Lista de patentes requerida"}, status=400)
+    if len(patentes) > MAX_PATENTES_POR_LOTE:
+        return JsonResponse(
+            {"error": f"Máximo {MAX_PATENTES_POR_LOTE} patentes por lote"}, status=400
+        )
+
+    municipio    = request.user.municipio
+    subcuadra_id = str(body.get("subcuadra_id") or "")
+    subcuadra    = None
+    if subcuadra_id.isdigit():
+        subcuadra = Subcuadra.objects.filter(id=subcuadra_id, municipio=municipio).first()
+    if subcuadra is None:
+        return JsonResponse({"error": "Subcuadra inválida"}, status=400)
+
+    # Vehículos no registrados: se crean todos juntos (mismo criterio que
+    # verificar_vehiculo, que los da de alta antes de verificar).
+    existentes = set(
+        Vehiculo.objects.filter(patente__in=patentes).values_list("patente", flat=True)
+    )
+    nuevas = [p for p in patentes if p not in existentes]
+    if nuevas:
+        Vehiculo.objects.bulk_create(
+            [Vehiculo(patente=p, municipio=municipio) for p in nuevas],
+            ignore_conflicts=True,
+        )
+
+    # Auto-cierre de estacionamientos vencidos ANTES de verificar, todos
+    # juntos con finalizar_lote (el vencimiento se calcula en Python: sumar
+    # horas a una fecha en SQL es distinto en SQLite y PostgreSQL)
+    ahora   = timezone.now()
+    activos = Estacionamiento.objects.filter(vehiculo__patente__in=patentes, estado="ACTIVO")
+    vencidos = [
+        id_ for id_, hora_inicio, duracion in activos.values_list("id", "hora_inicio", "duracion_horas")
+        if ahora >= hora_inicio + timedelta(hours=float(duracion))
+    ]
+    if vencidos:
+        finalizar_lote(activos.filter(id__in=vencidos), ahora)
+
+    resultados = verificar_estados_vehiculos(patentes, request.user, subcuadra)
+
+    return JsonResponse({
+        "subcuadra_id": subcuadra.id,
+        "resultados":   [_resultado_a_json(r) for r in resultados],
+    })
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Infracciones
 # ─────────────────────────────────────────────────────────────────────────────
@@ -338,16 +438,9 @@ def pdf_infracciones_hoy(request):
     Devuelve:
         PDF adjunto con columnas: N° acta, Hora, Patente, Subcuadra, Motivo, Monto, Estado.
     """
-    import io
     from datetime import date as date_type
 
     from django.http import HttpResponse
-    from reportlab.lib import colors
-    from reportlab.lib.enums import TA_CENTER
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import cm
-    from reportlab.platypus import SimpleDocTemplate, Spacer, Table, TableStyle, Paragraph
 
     inspector = request.user
 
@@ -357,91 +450,10 @@ def pdf_infracciones_hoy(request):
     except ValueError:
         fecha = timezone.localtime().date()
 
-    infracciones = (
-        Infraccion.objects
-        .filter(inspector=inspector, municipio=inspector.municipio, creado_en__date=fecha)
-        .select_related("vehiculo", "subcuadra")
-        .order_by("id")
-    )
-
-    # ── Armar PDF en memoria ────────────────────────────────────────────
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(
-        buffer, pagesize=A4,
-        rightMargin=2*cm, leftMargin=2*cm,
-        topMargin=2*cm, bottomMargin=2*cm,
-    )
-
-    estilos = getSampleStyleSheet()
-    estilo_titulo = ParagraphStyle(
-        "titulo", parent=estilos["Title"], fontSize=14, alignment=TA_CENTER
-    )
-    estilo_sub = ParagraphStyle(
-        "sub", parent=estilos["Normal"], fontSize=9, textColor=colors.HexColor("#555555")
-    )
-
-    partes = []
-
-    municipio_nombre = inspector.municipio.nombre if inspector.municipio else ""
-    partes.append(Paragraph(
-        f"Infracciones del día — {fecha.strftime('%d/%m/%Y')}",
-        estilo_titulo,
-    ))
-    partes.append(Spacer(1, 0.3*cm))
-    partes.append(Paragraph(
-        f"Inspector: {inspector.nombre_completo()} &nbsp;|&nbsp; Municipio: {municipio_nombre}",
-        estilo_sub,
-    ))
-    partes.append(Spacer(1, 0.6*cm))
-
-    ESTADOS = {"pendiente": "Pendiente", "pagada": "Pagada", "anulada": "Anulada"}
-    encabezado = ["Acta", "Hora", "Patente", "Subcuadra", "Motivo", "Monto", "Estado"]
-    filas = [encabezado]
-
-    for inf in infracciones:
-        hora_local = timezone.localtime(inf.creado_en).strftime("%H:%M")
-        filas.append([
-            str(inf.id),
-            hora_local,
-            inf.vehiculo.patente,
-            str(inf.subcuadra.calle) if inf.subcuadra else "—",
-            inf.motivo or "—",
-            f"${inf.monto}",
-            ESTADOS.get(inf.estado, inf.estado.capitalize()),
-        ])
-
-    if len(filas) == 1:
-        partes.append(Paragraph("Sin infracciones registradas para esta fecha.", estilos["Normal"]))
-    else:
-        anchos = [1.5*cm, 1.5*cm, 2.2*cm, 3.5*cm, 4.5*cm, 1.8*cm, 2.2*cm]
-        tabla = Table(filas, colWidths=anchos, repeatRows=1)
-        tabla.setStyle(TableStyle([
-            ("BACKGROUND",    (0, 0), (-1, 0), colors.HexColor("#2c3e50")),
-            ("TEXTCOLOR",     (0, 0), (-1, 0), colors.white),
-            ("FONTNAME",      (0, 0), (-1, 0), "Helvetica-Bold"),
-            ("FONTSIZE",      (0, 0), (-1, 0), 9),
-            ("FONTSIZE",      (0, 1), (-1, -1), 8),
-            ("ROWBACKGROUNDS",(0, 1), (-1, -1), [colors.white, colors.HexColor("#f5f5f5")]),
-            ("GRID",          (0, 0), (-1, -1), 0.4, colors.HexColor("#cccccc")),
-            ("ALIGN",         (5, 0), (5, -1), "RIGHT"),
-            ("VALIGN",        (0, 0), (-1, -1), "MIDDLE"),
-            ("TOPPADDING",    (0, 0), (-1, -1), 3),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 3),
-        ]))
-        partes.append(tabla)
-
-    total = len(filas) - 1
-    partes.append(Spacer(1, 0.5*cm))
-    partes.append(Paragraph(
-        f"Total: <b>{total}</b> infracción{'es' if total != 1 else ''}",
-        estilos["Normal"],
-    ))
-
-    doc.build(partes)
-    buffer.seek(0)
+    pdf_bytes = generar_pdf_infracciones_dia(inspector, fecha)
 
     nombre_archivo = f"infracciones_{fecha.strftime('%Y%m%d')}_{inspector.id}.pdf"
-    response = HttpResponse(buffer, content_type="application/pdf")
+    response = HttpResponse(pdf_bytes, content_type="application/pdf")
     response["Content-Disposition"] = f'attachment; filename="{nombre_archivo}"'
     return response
 
@@ -459,8 +471,8 @@ def subcuadra_cercana(request):
     Devuelve: {"id": <int>, "nombre": "<str>"} con la subcuadra más cercana,
               o {} si el municipio no tiene subcuadras con coordenadas cargadas.
 
-    La distancia se calcula como distancia euclidiana sobre lat/lon —
-    suficiente para zonas urbanas densas sin necesidad de proyecciones geográficas.
+    La búsqueda va contra el índice espacial del municipio
+    (services/indice_subcuadras.py), con distancia haversine en metros.
     El inspector puede corregir manualmente si el GPS es impreciso.
     """
     try:
@@ -473,29 +485,15 @@ def subcuadra_cercana(request):
     if not municipio:
         return JsonResponse({})
 
-    # Solo subcuadras con coordenadas cargadas (no todas las tienen)
-    subcuadras = Subcuadra.objects.filter(
-        municipio=municipio,
-        lat__isnull=False,
-        lon__isnull=False,
-    )
-
-    if not subcuadras.exists():
+    # Solo entran al índice las subcuadras con coordenadas cargadas (no todas las tienen)
+    mas_cercana = obtener_indice_subcuadras(municipio.id).mas_cercana(lat_inspector, lon_inspector)
+    if mas_cercana is None:
         # Municipio sin coordenadas — el inspector selecciona manualmente
         return JsonResponse({})
 
-    # Distancia euclidiana al centroide de cada subcuadra.
-    # Para zonas urbanas de pocos km², la distorsión de no usar proyección es mínima.
-    def distancia(s):
-        dlat = float(s.lat) - lat_inspector
-        dlon = float(s.lon) - lon_inspector
-        return math.sqrt(dlat ** 2 + dlon ** 2)
-
-    mas_cercana = min(subcuadras, key=distancia)
-
     return JsonResponse({
         "id":     mas_cercana.id,
-        "nombre": str(mas_cercana),
+        "nombre": mas_cercana.nombre,
     })
 
 
@@ -33,6 +33,7 @@ from django.views.decorators.csrf import csrf_exempt
 
 from .decorators import require_login
 from .models import Usuario
+from .services.saldo import saldo_actual
 
 logger = logging.getLogger(__name__)
 
@@ -220,10 +221,9 @@ def mp_exitoso(request):
     except Exception:
         pass  # Si ya fue acreditado por el webhook, está bien
 
-    request.user.refresh_from_db()
     messages.success(
         request,
-        f"✅ Se acreditaron ${monto} a tu saldo. Nuevo saldo: ${request.user.saldo}",
+        f"✅ Se acreditaron ${monto} a tu saldo. Nuevo saldo: ${saldo_actual(request.user)}",
     )
     return redirect("inicio_usuarios")
 
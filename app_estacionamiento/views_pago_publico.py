@@ -37,10 +37,15 @@ from django.urls import reverse
 from django.utils import timezone
 
 from .models import (
-    Infraccion, Municipio, PagoPublico, Subcuadra, Tarifa, Vehiculo,
+    Infraccion, Municipio, PagoPublico, Subcuadra, Vehiculo,
     AbonoMensual, Estacionamiento,
 )
+from .services.config_municipio import tarifa_vigente
 from .services.horarios import obtener_tarifa_hora
+from .services.indice_patentes import (
+    PatenteStatusIndex, abono_vigente, estacionamiento_vence,
+)
+from .services.indice_subcuadras import obtener_indice_subcuadras
 from .use_cases.procesar_pago_publico import ejecutar as procesar_pago_publico
 from .utils import sanitizar_patente
 
@@ -173,20 +178,22 @@ def detalle_patente(request, patente):
         estado="pendiente",
     ).order_by("-creado_en")
 
+    # Estacionamiento y abono activos salen del registro por patente (una query)
+    registro = PatenteStatusIndex.obtener(patente, municipio)
+
     # Estacionamiento activo (para mostrar advertencia)
-    estacionamiento_activo = Estacionamiento.objects.filter(
-        vehiculo__patente=patente,
-        estado="activo",
-    ).first()
+    estacionamiento_activo = None
+    hora_vencimiento = estacionamiento_vence(registro)
+    if hora_vencimiento:
+        estacionamiento_activo = {
+            "hora_vencimiento": hora_vencimiento,
+            "duracion_horas":   registro["estacionamiento_duracion"],
+        }
 
     # Abono activo en el mes actual
     hoy        = timezone.localdate()
     mes_actual = date(hoy.year, hoy.month, 1)
-    abono_activo = AbonoMensual.objects.filter(
-        vehiculo__patente=patente,
-        municipio=municipio,
-        mes=mes_actual,
-    ).first()
+    abono_activo = abono_vigente(registro, municipio)
 
     # Mes siguiente para ofrecer abono
     if hoy.month == 12:
@@ -198,7 +205,7 @@ def detalle_patente(request, patente):
     subcuadras = Subcuadra.objects.filter(municipio=municipio).order_by("calle", "altura")
 
     # Tarifa vigente para calcular costos en el frontend
-    tarifa = Tarifa.objects.filter(municipio=municipio).first()
+    tarifa = tarifa_vigente(municipio)
 
     return render(request, "pago_publico/detalle_patente.html", {
         "patente":                 patente,
@@ -311,7 +318,7 @@ def iniciar_pago_estacionamiento(request):
 
     # Calcular costo según tarifa
     tipo_vehiculo = request.POST.get("tipo_vehiculo", "auto")
-    tarifa = Tarifa.objects.filter(municipio=municipio).first()
+    tarifa = tarifa_vigente(municipio)
     vehiculo_mock = type("V", (), {"tipo": tipo_vehiculo})()  # objeto duck-typing para obtener_tarifa_hora
     tarifa_hora   = obtener_tarifa_hora(tarifa, vehiculo_mock) if tarifa else Decimal("0")
     monto         = duracion * tarifa_hora
@@ -388,7 +395,7 @@ def iniciar_pago_abono(request):
 
     # Precio según tipo de vehículo
     tipo_vehiculo = request.POST.get("tipo_vehiculo", "auto")
-    tarifa = Tarifa.objects.filter(municipio=municipio).first()
+    tarifa = tarifa_vigente(municipio)
     if not tarifa:
         return render(request, "pago_publico/error.html", {
             "mensaje": "No hay tarifa configurada para este municipio."
@@ -455,19 +462,13 @@ def subcuadra_cercana_publica(request):
     if not municipio:
         return JsonResponse({})
 
-    subcuadras = Subcuadra.objects.filter(
-        municipio=municipio,
-        lat__isnull=False,
-        lon__isnull=False,
-    )
-
-    if not subcuadras.exists():
+    mas_cercana = obtener_indice_subcuadras(municipio.id).mas_cercana(lat, lon)
+    if mas_cercana is None:
         return JsonResponse({})
 
-    mas_cercana = min(subcuadras, key=lambda s: (s.lat - lat) ** 2 + (s.lon - lon) ** 2)
     return JsonResponse({
         "id":     mas_cercana.id,
-        "nombre": str(mas_cercana),
+        "nombre": mas_cercana.nombre,
         "calle":  mas_cercana.calle,
         "altura": mas_cercana.altura,
     })
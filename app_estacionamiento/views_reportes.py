@@ -0,0 +1,100 @@
+# app_estacionamiento/views_reportes.py
+"""
+Vistas de los reportes en segundo plano (TrabajoReporte).
+
+Responsabilidades:
+- Pedir un reporte (lo genera el worker `generar_reportes`, o esta misma
+  vista si REPORTES_EN_SEGUNDO_PLANO está apagado)
+- Consultar su estado y progreso (el navegador lo consulta cada pocos segundos)
+- Descargar el archivo generado
+
+Los permisos por tipo son los de las descargas directas (ver
+services/reportes.py). Las descargas directas siguen disponibles.
+"""
+
+from django.conf import settings
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+
+from .decorators import require_role
+from .models import TrabajoReporte
+from .services.reportes import (
+    ReporteInvalido,
+    ejecutar_trabajo,
+    puede_ver_reporte,
+    purgar_reportes,
+    solicitar_reporte,
+)
+
+
+def _estado_json(trabajo):
+    datos = {
+        "id":       trabajo.id,
+        "tipo":     trabajo.tipo,
+        "estado":   trabajo.estado,
+        "progreso": trabajo.progreso,
+        "url_estado": reverse("reporte_estado", args=[trabajo.id]),
+    }
+    if trabajo.estado == TrabajoReporte.LISTO:
+        datos["url_descarga"] = reverse("reporte_descargar", args=[trabajo.id])
+        datos["nombre"] = trabajo.nombre_archivo
+    if trabajo.estado == TrabajoReporte.ERROR:
+        datos["error"] = "No se pudo generar el reporte. Se reintenta automáticamente."
+    return datos
+
+
+def _trabajo_visible(request, trabajo_id):
+    trabajo = get_object_or_404(TrabajoReporte, id=trabajo_id, municipio_id=request.user.municipio_id)
+    if not puede_ver_reporte(request.user, trabajo):
+        raise Http404
+    return trabajo
+
+
+@require_role("admin", "inspector", "tesorero")
+def solicitar_reporte_view(request):
+    """
+    Endpoint AJAX: pide un reporte.
+
+    Recibe: POST tipo=<juzgado|rendicion|infracciones_dia|estadisticas_inspectores>
+            más los parámetros de la descarga directa (desde, hasta,
+            frecuencia, fecha, inspector_id, rendicion_id).
+    Devuelve: JSON con el estado del trabajo (202 si es nuevo, 200 si se
+              reutilizó uno en curso o recién generado).
+
+    Sin worker (REPORTES_EN_SEGUNDO_PLANO=False) el reporte se genera acá
+    mismo y la respuesta ya viene "listo" (o "error"); los archivos viejos
+    se purgan al crear uno nuevo, que es lo que haría el worker.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Método no permitido"}, status=405)
+    try:
+        trabajo, nuevo = solicitar_reporte(request.user, request.POST.get("tipo", ""), request.POST)
+    except ReporteInvalido as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    if not settings.REPORTES_EN_SEGUNDO_PLANO and trabajo.estado != TrabajoReporte.LISTO:
+        if nuevo:
+            purgar_reportes()
+        ejecutar_trabajo(trabajo.id)
+        trabajo.refresh_from_db()
+    return JsonResponse(_estado_json(trabajo), status=202 if nuevo else 200)
+
+
+@require_role("admin", "inspector", "tesorero")
+def estado_reporte(request, trabajo_id):
+    """Endpoint AJAX: estado y progreso del reporte."""
+    return JsonResponse(_estado_json(_trabajo_visible(request, trabajo_id)))
+
+
+@require_role("admin", "inspector", "tesorero")
+def descargar_reporte(request, trabajo_id):
+    """Descarga el archivo de un reporte listo."""
+    trabajo = _trabajo_visible(request, trabajo_id)
+    if trabajo.estado != TrabajoReporte.LISTO or not trabajo.archivo:
+        raise Http404
+    return FileResponse(
+        trabajo.archivo.open("rb"),
+        as_attachment=True,
+        filename=trabajo.nombre_archivo,
+        content_type=trabajo.content_type,
+    )
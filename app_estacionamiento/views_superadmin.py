@@ -13,8 +13,10 @@ Responsabilidades:
 - Importar estacionamientos activos desde Excel del sistema anterior
 """
 
+from datetime import time as time_type
 from decimal import Decimal, InvalidOperation
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.password_validation import validate_password
@@ -22,12 +24,17 @@ from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import transaction
 from django.db.models import Count, Q
 from django.shortcuts import get_object_or_404, redirect, render
-from django.utils import timezone
 
 from .decorators import require_role
 from .views_admin import _error_password
-from .models import Estacionamiento, ModuloMunicipio, Municipio, PlantillaDocumento, Subcuadra, Usuario, Vehiculo
-from .utils import sanitizar_patente
+from .models import ModuloMunicipio, Municipio, PlantillaDocumento, TrabajoImportacion, Usuario
+from .services.config_municipio import invalidar_config
+from .services.importacion_estacionamientos import (
+    MAX_INTENTOS,
+    PRIMERA_FILA,
+    importar_en_el_request,
+    solicitar_importacion,
+)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -135,6 +142,18 @@ def editar_municipio(request, municipio_id):
         municipio.monto_maximo_carga        = _entero("monto_maximo_carga",        municipio.monto_maximo_carga)
         municipio.minutos_entre_infracciones = _entero("minutos_entre_infracciones", municipio.minutos_entre_infracciones)
         municipio.activo             = request.POST.get("activo") == "on"
+
+        # ── Cierre de caja automático ──────────────────────────────────────
+        cierre_automatico = request.POST.get("cierre_automatico", municipio.cierre_automatico)
+        if cierre_automatico in dict(Municipio.CIERRES_AUTOMATICOS):
+            municipio.cierre_automatico = cierre_automatico
+        try:
+            municipio.cierre_hora = time_type.fromisoformat(request.POST.get("cierre_hora", "").strip())
+        except ValueError:
+            pass
+        dia_semana = _entero("cierre_dia_semana", municipio.cierre_dia_semana)
+        if 0 <= dia_semana <= 6:
+            municipio.cierre_dia_semana = dia_semana
         municipio.leyenda_horarios   = request.POST.get("leyenda_horarios", "").strip()
         municipio.texto_ordenanza    = request.POST.get("texto_ordenanza", "").strip()
 
@@ -201,6 +220,8 @@ def editar_municipio(request, municipio_id):
         "modulos":              modulos,
         "modulos_disponibles":  modulos_disponibles,
         "descripciones_modulos": descripciones_modulos,
+        "cierres_automaticos":  Municipio.CIERRES_AUTOMATICOS,
+        "dias_semana":          Municipio.DIAS_SEMANA,
     })
 
 
@@ -322,6 +343,7 @@ def gestionar_modulo(request, municipio_id):
 
     elif accion == "desactivar":
         ModuloMunicipio.objects.filter(municipio=municipio, modulo=modulo).update(activo=False)
+        invalidar_config(municipio.id)  # update() no dispara señales
         nombre = dict(ModuloMunicipio.MODULOS).get(modulo, modulo)
         messages.success(request, f"Módulo '{nombre}' desactivado.")
 
@@ -332,27 +354,6 @@ def gestionar_modulo(request, municipio_id):
 # Importación de estacionamientos desde Excel (sistema anterior)
 # ─────────────────────────────────────────────────────────────────────────────
 
-def _parsear_cuadra(texto_cuadra):
-    """
-    Convierte el formato del Excel "16 750" en (calle, altura).
-
-    El Excel usa "CALLE ALTURA" donde CALLE puede tener espacios
-    (ej: "Av San Martín 350"). Tomamos todo excepto el último token
-    como calle, y el último token como altura entera.
-
-    Devuelve (calle: str, altura: int) o lanza ValueError si no se puede parsear.
-    """
-    partes = str(texto_cuadra).strip().split()
-    if len(partes) < 2:
-        raise ValueError(f"Formato de cuadra inválido: '{texto_cuadra}'")
-    try:
-        altura = int(partes[-1])
-    except ValueError:
-        raise ValueError(f"Altura no es un número en cuadra: '{texto_cuadra}'")
-    calle = " ".join(partes[:-1])
-    return calle, altura
-
-
 @require_role("superadmin")
 def importar_estacionamientos(request, municipio_id):
     """
@@ -365,13 +366,10 @@ def importar_estacionamientos(request, municipio_id):
         Domino, Hora de Transacción, Desde, Desde Ingresado, Hasta,
         Cuadra, Zona, Interfaz, Inspector, Teléfono, Monto, Tarjeta, -, Local
 
-    Lógica de importación:
-    - hora_inicio = now() (el estacionamiento arranca desde este momento)
-    - duracion_horas = Hasta - Desde del Excel (se preserva la duración original)
-    - usuario = null si no hay teléfono (no se toca saldo)
-    - subcuadra: se crea si no existe en el municipio
-    - vehículo: se crea si no existe
-    - filas con error: se saltean y se incluyen en el reporte
+    La vista solo valida y guarda el archivo: la importación la hace el
+    worker `importar_estacionamientos` por lotes (ver
+    services/importacion_estacionamientos.py, donde están las reglas por
+    fila) y el avance se ve en estado_importacion.
     """
     import openpyxl
 
@@ -380,6 +378,7 @@ def importar_estacionamientos(request, municipio_id):
     if request.method != "POST":
         return render(request, "superadmin/importar_excel.html", {
             "municipio": municipio,
+            "importaciones": TrabajoImportacion.objects.filter(municipio=municipio).order_by("-id")[:5],
         })
 
     archivo = request.FILES.get("archivo")
@@ -400,128 +399,50 @@ def importar_estacionamientos(request, municipio_id):
         messages.error(request, f"El archivo no puede superar {LIMITE_MB} MB.")
         return redirect("importar_estacionamientos", municipio_id=municipio_id)
 
+    # En read_only solo se lee el índice del libro: detecta un archivo que
+    # no es Excel sin recorrer las filas.
     try:
-        wb = openpyxl.load_workbook(archivo, data_only=True)
-        ws = wb.active
+        openpyxl.load_workbook(archivo, read_only=True, data_only=True).close()
+        archivo.seek(0)
     except Exception as e:
         messages.error(request, f"No se pudo abrir el archivo: {e}")
         return redirect("importar_estacionamientos", municipio_id=municipio_id)
 
-    errores      = []
-    importados   = 0
-    omitidos     = 0
-    hora_inicio  = timezone.now()  # todos arrancan desde el mismo momento
+    trabajo = solicitar_importacion(municipio, request.user, archivo)
+    if not settings.IMPORTACION_EN_SEGUNDO_PLANO:
+        importar_en_el_request(trabajo.id)
+    return redirect("estado_importacion", trabajo_id=trabajo.id)
 
-    for num_fila, fila in enumerate(ws.iter_rows(min_row=3, values_only=True), start=3):
-
-        # Fila completamente vacía → saltar
-        if not any(fila):
-            continue
-
-        # Desempaquetar columnas (14 columnas en el formato del sistema anterior)
-        try:
-            (domino, hora_tx, desde, desde_ing, hasta,
-             cuadra, zona, interfaz, inspector, telefono,
-             monto, tarjeta, _col13, local) = fila
-        except ValueError:
-            errores.append({
-                "fila": num_fila,
-                "patente": "—",
-                "error": f"Fila con {len(fila)} columnas (se esperan 14) — verificar formato",
-            })
-            omitidos += 1
-            continue
-
-        # Cada fila en su propia transacción para que un error no cancele todo
-        try:
-            with transaction.atomic():
-
-                # ── 1. Patente ───────────────────────────────────────────────
-                patente = sanitizar_patente(str(domino or ""))
-                if not patente:
-                    raise ValueError("Patente vacía o inválida")
-
-                # ── 2. Duración ──────────────────────────────────────────────
-                if not desde or not hasta:
-                    raise ValueError("Faltan columnas Desde o Hasta")
-                if not hasattr(desde, "hour") or not hasattr(hasta, "hour"):
-                    raise ValueError("Desde/Hasta no son fechas válidas")
-
-                duracion_segundos = (hasta - desde).total_seconds()
-                if duracion_segundos <= 0:
-                    raise ValueError(
-                        f"Duración inválida: Desde={desde} Hasta={hasta}"
-                    )
-                # Redondear a 1 decimal (ej: 3600s → 1.0h, 5400s → 1.5h)
-                duracion_horas = Decimal(str(round(duracion_segundos / 3600, 1)))
-
-                # ── 3. Vehículo ──────────────────────────────────────────────
-                vehiculo, _ = Vehiculo.objects.get_or_create(
-                    patente=patente,
-                    defaults={"municipio": municipio},
-                )
-
-                # ── 4. Conductor (opcional) ──────────────────────────────────
-                # No tocamos saldo — solo vinculamos si existe en el sistema.
-                usuario = None
-                if telefono:
-                    tel_str = str(int(telefono)) if isinstance(telefono, float) else str(telefono).strip()
-                    usuario = Usuario.objects.filter(telefono=tel_str).first()
-
-                # ── 5. Subcuadra ─────────────────────────────────────────────
-                # Creamos si no existe; el admin puede renombrarlas después.
-                nombre_cuadra = str(cuadra).strip() if cuadra else ""
-                if not nombre_cuadra or nombre_cuadra == " ":
-                    raise ValueError("Cuadra vacía")
-
-                calle_str, altura_int = _parsear_cuadra(nombre_cuadra)
-                subcuadra, _ = Subcuadra.objects.get_or_create(
-                    municipio=municipio,
-                    calle=calle_str,
-                    altura=altura_int,
-                )
-
-                # ── 6. Verificar no duplicar estacionamiento activo ──────────
-                if Estacionamiento.objects.filter(
-                    vehiculo=vehiculo, estado="ACTIVO"
-                ).exists():
-                    raise ValueError(
-                        f"Patente {patente} ya tiene un estacionamiento ACTIVO en el sistema"
-                    )
-
-                # ── 7. Monto ─────────────────────────────────────────────────
-                try:
-                    costo = Decimal(str(monto or 0))
-                except InvalidOperation:
-                    costo = Decimal("0")
-
-                # ── 8. Crear estacionamiento ─────────────────────────────────
-                Estacionamiento.objects.create(
-                    vehiculo=vehiculo,
-                    subcuadra=subcuadra,
-                    usuario=usuario,
-                    estado="ACTIVO",
-                    hora_inicio=hora_inicio,
-                    duracion_horas=duracion_horas,
-                    costo_base=costo,
-                    costo_final=costo,
-                )
-                importados += 1
-
-        except Exception as e:
-            errores.append({
-                "fila":    num_fila,
-                "patente": str(domino or "—"),
-                "error":   str(e),
-            })
-            omitidos += 1
 
+@require_role("superadmin")
+def estado_importacion(request, trabajo_id):
+    """
+    Avance y resultado de una importación. Mientras está en curso la página
+    se recarga sola; sin worker, cada carga importa un tramo más (y reintenta
+    un error con intentos disponibles).
+    """
+    trabajo = get_object_or_404(
+        TrabajoImportacion.objects.select_related("municipio"), id=trabajo_id,
+    )
+    if not settings.IMPORTACION_EN_SEGUNDO_PLANO and trabajo.estado != TrabajoImportacion.LISTO:
+        if importar_en_el_request(trabajo.id) is not None:
+            trabajo.refresh_from_db()
+    en_curso = trabajo.estado in (TrabajoImportacion.PENDIENTE, TrabajoImportacion.PROCESANDO)
+    progreso = 0
+    if trabajo.filas_total:
+        leidas = max(trabajo.filas_procesadas - PRIMERA_FILA + 1, 0)
+        progreso = min(100, leidas * 100 // trabajo.filas_total)
     return render(request, "superadmin/resultado_importacion.html", {
-        "municipio":  municipio,
-        "importados": importados,
-        "omitidos":   omitidos,
-        "errores":    errores,
-        "total":      importados + omitidos,
+        "municipio":  trabajo.municipio,
+        "trabajo":    trabajo,
+        "en_curso":   en_curso,
+        "progreso":   progreso,
+        "reintenta":  trabajo.estado == TrabajoImportacion.ERROR and trabajo.intentos < MAX_INTENTOS,
+        "en_segundo_plano": settings.IMPORTACION_EN_SEGUNDO_PLANO,
+        "importados": trabajo.importados,
+        "omitidos":   trabajo.omitidos,
+        "errores":    trabajo.errores,
+        "total":      trabajo.importados + trabajo.omitidos,
     })
 
 
@@ -16,6 +16,7 @@ from django.utils import timezone
 
 from .decorators import require_role
 from .models import LiquidacionComision, Rendicion
+from .services.comisiones import saldos_por_vendedor
 
 
 @require_role("tesorero")
@@ -44,6 +45,9 @@ def panel_tesorero(request):
 
     liquidaciones = qs_liquidaciones.order_by("-creado_en")[:50]
 
+    # Comisiones devengadas vs. liquidadas por vendedor (libro ComisionPeriodo, ya sumado)
+    saldos_comisiones = saldos_por_vendedor(municipio)
+
     return render(request, "tesorero/panel_tesorero.html", {
         "rendiciones_pendientes":  rendiciones_pendientes,
         "rendiciones_historial":   rendiciones_historial,
@@ -51,6 +55,7 @@ def panel_tesorero(request):
         "liquidaciones":           liquidaciones,
         "pendientes_rendicion":    pendientes_rendicion,
         "pendientes_liquidacion":  pendientes_liquidacion,
+        "saldos_comisiones":       saldos_comisiones,
     })
 
 
@@ -6,6 +6,7 @@ Responsabilidades:
 - Cobrar estacionamiento en efectivo
 - Cobrar infracciones por patente
 - Cobrar abono mensual
+- Recibir las ventas hechas sin conexión (cobrar_lote)
 - Ver y cerrar su propia caja
 - Ver y certificar sus comisiones
 
@@ -19,7 +20,8 @@ from decimal import Decimal
 
 from django.contrib import messages
 from django.db import transaction
-from django.db.models import Q, Sum
+from django.db.models import Q
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils import timezone
@@ -29,14 +31,22 @@ from .factories import EstacionamientoFactory
 from .models import (
     AbonoMensual,
     CierreCaja,
+    ComisionPeriodo,
     Estacionamiento,
     Infraccion,
     LiquidacionComision,
     MovimientoCaja,
-    Tarifa,
     Vehiculo,
 )
 from .services_caja import generar_cierre_caja
+from .services.caja import ENCABEZADOS_MOVIMIENTOS, filas_movimientos_caja
+from .services.caja_saldo import obtener_caja_saldo
+from .services.cobros_lote import MAX_COBROS_POR_LOTE, procesar_lote
+from .services.comisiones import saldo_comisiones
+from .services.config_municipio import tarifa_vigente
+from .services.exportaciones import respuesta_exportacion
+from .services.fechas import filtro_fechas
+from .services.paginacion import paginar_keyset
 from .use_cases.cobrar_estacionamiento import ejecutar as cobrar_estacionamiento
 from .services.horarios import calcular_opciones_duracion, puede_estacionar_ahora
 from .services.infracciones import calcular_estado_tolerancia, MEDIOS_VALIDOS_COBRO
@@ -56,19 +66,12 @@ def panel_vendedor(request):
     user = request.user
     hoy  = timezone.localdate()
 
-    movimientos_hoy = MovimientoCaja.objects.filter(
-        usuario=user, tipo="ingreso", creado_en__date=hoy,
-    )
-    total_hoy            = movimientos_hoy.aggregate(total=Sum("monto"))["total"] or 0
-    cantidad_operaciones = movimientos_hoy.count()
-
-    a_rendir = MovimientoCaja.objects.filter(
-        usuario=user, tipo="ingreso", cerrado=False
-    ).aggregate(total=Sum("monto"))["total"] or 0
-
-    comisiones_pendientes = MovimientoCaja.objects.filter(
-        usuario=user, tipo="ingreso", comision_monto__gt=0,
-    ).aggregate(total=Sum("comision_monto"))["total"] or 0
+    # Totales acumulados (CajaSaldo): una query por pk en vez de sumar el historial
+    caja = obtener_caja_saldo(user)
+    total_hoy, cantidad_operaciones = caja.ingresos_del_dia(hoy)
+    a_rendir              = caja.abierto_monto
+    # Libro de comisiones: devengado − liquidado, ya sumado por período
+    comisiones_pendientes = saldo_comisiones(user)["pendiente"]
 
     # Cierres de caja que el admin todavía no certificó
     cierres_sin_certificar = CierreCaja.objects.filter(
@@ -95,7 +98,7 @@ def registrar_estacionamiento_manual(request):
     Valida horario del municipio y que el vehículo no esté ya activo.
     """
     vendedor   = request.user
-    tarifa_obj = Tarifa.objects.filter(municipio=vendedor.municipio).first()
+    tarifa_obj = tarifa_vigente(vendedor.municipio)
     tarifa_hora = tarifa_obj.precio_por_hora if tarifa_obj else Decimal("100")
     opciones_duracion = calcular_opciones_duracion(vendedor.municipio, tarifa_hora)
 
@@ -174,7 +177,7 @@ def registrar_estacionamiento_vendedor(request):
     Respeta el horario del municipio y diferencia tarifa auto/moto.
     """
     vendedor   = request.user
-    tarifa_obj = Tarifa.objects.filter(municipio=vendedor.municipio).first()
+    tarifa_obj = tarifa_vigente(vendedor.municipio)
 
     tarifa_hora_auto = tarifa_obj.precio_por_hora if tarifa_obj else Decimal("100")
     tarifa_hora_moto = (
@@ -446,7 +449,7 @@ def cobrar_abono(request):
 
     vendedor   = request.user
     municipio  = vendedor.municipio
-    tarifa_obj = Tarifa.objects.filter(municipio=municipio).first()
+    tarifa_obj = tarifa_vigente(municipio)
 
     error     = None
     vehiculo  = None
@@ -570,6 +573,40 @@ def cobrar_abono(request):
     })
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# Cobros por lote (cola offline de la terminal)
+# ─────────────────────────────────────────────────────────────────────────────
+
+@require_role("vendedor", "admin")
+def cobrar_lote(request):
+    """
+    Endpoint AJAX que recibe las ventas encoladas por la terminal.
+
+    Recibe: POST JSON { cobros: [{clave, tipo, vendido_en, ...}, ..] }
+    Devuelve: JSON { resultados: [..] } en el orden recibido.
+
+    Cada venta trae su clave (la genera la terminal): reenviar el mismo lote
+    no cobra dos veces. Ver services/cobros_lote.py.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Método no permitido"}, status=405)
+
+    import json
+
+    try:
+        body = json.loads(request.body)
+    except (json.JSONDecodeError, ValueError):
+        return JsonResponse({"error": "JSON inválido"}, status=400)
+
+    cobros = body.get("cobros") if isinstance(body, dict) else None
+    if not isinstance(cobros, list) or not cobros:
+        return JsonResponse({"error": "Lista de cobros requerida"}, status=400)
+    if len(cobros) > MAX_COBROS_POR_LOTE:
+        return JsonResponse({"error": f"Máximo {MAX_COBROS_POR_LOTE} cobros por lote"}, status=400)
+
+    return JsonResponse({"resultados": procesar_lote(request.user, cobros)})
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Consultar deuda (compartida con admin)
 # ─────────────────────────────────────────────────────────────────────────────
@@ -725,12 +762,11 @@ def caja_inspector(request):
     if not municipio:
         return redirect("login")
 
-    movimientos = MovimientoCaja.objects.filter(usuario=usuario).order_by("-creado_en")
-
-    total_ingresos     = movimientos.filter(tipo="ingreso").aggregate(total=Sum("monto"))["total"] or 0
-    total_egresos      = movimientos.filter(tipo="egreso").aggregate(total=Sum("monto"))["total"] or 0
-    movimientos_pendientes = movimientos.filter(tipo="ingreso", cerrado=False)
-    total_a_cerrar     = movimientos_pendientes.aggregate(total=Sum("monto"))["total"] or 0
+    # Solo los abiertos (lo que muestra la pantalla), por páginas con cursor
+    movimientos = paginar_keyset(
+        MovimientoCaja.objects.filter(usuario=usuario, cerrado=False), request.GET.get("desde"),
+    )
+    caja = obtener_caja_saldo(usuario)
 
     historial_cierres = CierreCaja.objects.filter(
         usuario=usuario
@@ -738,26 +774,54 @@ def caja_inspector(request):
 
     return render(request, "inspectores/caja.html", {
         "movimientos":       movimientos,
-        "ingresos":          total_ingresos,
-        "egresos":           total_egresos,
-        "saldo":             total_ingresos - total_egresos,
-        "movimientos_abiertos": movimientos_pendientes.count(),
-        "total_a_cerrar":    total_a_cerrar,
+        "ingresos":          caja.total_ingresos,
+        "egresos":           caja.total_egresos,
+        "saldo":             caja.saldo,
+        "movimientos_abiertos": caja.abierto_cantidad,
+        "total_a_cerrar":    caja.abierto_monto,
         "historial_cierres": historial_cierres,
     })
 
 
 @require_role("vendedor", "admin")
 def resumen_cobros(request):
-    """Lista de todos los movimientos de caja del municipio."""
+    """Lista de los movimientos de caja del municipio, por páginas con cursor."""
     usuario = request.user
-    cobros  = MovimientoCaja.objects.filter(
-        usuario__municipio=usuario.municipio
-    ).select_related("usuario").order_by("-creado_en")
+    cobros  = paginar_keyset(
+        MovimientoCaja.objects.filter(
+            usuario__municipio=usuario.municipio
+        ).select_related("usuario"),
+        request.GET.get("desde"),
+    )
 
     return render(request, "inspectores/resumen_cobros.html", {"cobros": cobros})
 
 
+@require_role("vendedor", "admin")
+def exportar_movimientos_caja(request):
+    """
+    Descarga el historial completo de movimientos de caja, en streaming.
+
+    ?formato=csv (default) | xlsx
+    ?alcance=propios (default, los del usuario) | municipio (como resumen_cobros)
+    """
+    usuario = request.user
+    if request.GET.get("alcance") == "municipio":
+        movimientos = MovimientoCaja.objects.filter(usuario__municipio=usuario.municipio)
+        sufijo = "municipio"
+    else:
+        movimientos = MovimientoCaja.objects.filter(usuario=usuario)
+        sufijo = "propios"
+
+    return respuesta_exportacion(
+        request.GET.get("formato"),
+        f"movimientos_caja_{sufijo}_{timezone.localdate():%Y%m%d}",
+        ENCABEZADOS_MOVIMIENTOS,
+        filas_movimientos_caja(movimientos),
+        "Movimientos",
+    )
+
+
 @require_role("vendedor", "admin")
 def ticket_cobro(request, est_id):
     """
@@ -801,15 +865,16 @@ def resumen_caja(request):
     hoy     = timezone.localdate()
 
     cobros_hoy = MovimientoCaja.objects.filter(
-        usuario=usuario, tipo="ingreso", creado_en__date=hoy,
+        usuario=usuario, tipo="ingreso", **filtro_fechas("creado_en", hoy, hoy),
     ).order_by("-creado_en")
 
     cobros_abiertos = MovimientoCaja.objects.filter(
         usuario=usuario, tipo="ingreso", cerrado=False,
     ).order_by("-creado_en")
 
-    total_hoy     = cobros_hoy.aggregate(total=Sum("monto"))["total"] or 0
-    total_abierto = cobros_abiertos.aggregate(total=Sum("monto"))["total"] or 0
+    caja          = obtener_caja_saldo(usuario)
+    total_hoy     = caja.ingresos_del_dia(hoy)[0]
+    total_abierto = caja.abierto_monto
 
     return render(request, "vendedores/resumen_caja.html", {
         "cobros_hoy":     cobros_hoy,
@@ -829,23 +894,19 @@ def cerrar_caja(request):
     usuario = request.user
 
     if request.method != "POST":
-        movimientos_abiertos = MovimientoCaja.objects.filter(
-            usuario=usuario, tipo="ingreso", cerrado=False
-        ).order_by("creado_en")
-        total_a_cerrar   = movimientos_abiertos.aggregate(total=Sum("monto"))["total"] or 0
+        caja = obtener_caja_saldo(usuario)
         historial_cierres = CierreCaja.objects.filter(usuario=usuario).order_by("-fecha_cierre")[:10]
 
         return render(request, "inspectores/caja.html", {
-            "movimientos":        MovimientoCaja.objects.filter(usuario=usuario).order_by("-creado_en"),
-            "movimientos_abiertos": movimientos_abiertos.count(),
-            "total_a_cerrar":     total_a_cerrar,
-            "historial_cierres":  historial_cierres,
-            "ingresos":           MovimientoCaja.objects.filter(usuario=usuario, tipo="ingreso").aggregate(total=Sum("monto"))["total"] or 0,
-            "egresos":            MovimientoCaja.objects.filter(usuario=usuario, tipo="egreso").aggregate(total=Sum("monto"))["total"] or 0,
-            "saldo":              (
-                (MovimientoCaja.objects.filter(usuario=usuario, tipo="ingreso").aggregate(total=Sum("monto"))["total"] or 0)
-                - (MovimientoCaja.objects.filter(usuario=usuario, tipo="egreso").aggregate(total=Sum("monto"))["total"] or 0)
+            "movimientos":        paginar_keyset(
+                MovimientoCaja.objects.filter(usuario=usuario, cerrado=False), request.GET.get("desde"),
             ),
+            "movimientos_abiertos": caja.abierto_cantidad,
+            "total_a_cerrar":     caja.abierto_monto,
+            "historial_cierres":  historial_cierres,
+            "ingresos":           caja.total_ingresos,
+            "egresos":            caja.total_egresos,
+            "saldo":              caja.saldo,
             "periodos": CierreCaja.PERIODOS,
         })
 
@@ -880,16 +941,19 @@ def mis_comisiones(request):
     vendedor  = request.user
     municipio = vendedor.municipio
 
-    total_acumulado = MovimientoCaja.objects.filter(
-        usuario=vendedor, tipo="ingreso", comision_monto__gt=0,
-    ).aggregate(total=Sum("comision_monto"))["total"] or 0
+    # Devengado por mes desde el libro de comisiones (filas ya sumadas)
+    saldo    = saldo_comisiones(vendedor)
+    periodos = ComisionPeriodo.objects.filter(vendedor=vendedor).order_by("-periodo")[:12]
 
     liquidaciones = LiquidacionComision.objects.filter(
         vendedor=vendedor, municipio=municipio,
     ).order_by("-creado_en")
 
     return render(request, "vendedores/mis_comisiones.html", {
-        "total_acumulado": total_acumulado,
+        "total_acumulado": saldo["devengado"],
+        "total_liquidado": saldo["liquidado"],
+        "pendiente":       saldo["pendiente"],
+        "periodos":        periodos,
         "liquidaciones":   liquidaciones,
     })
 
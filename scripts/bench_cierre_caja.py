@@ -0,0 +1,109 @@
+"""
+Benchmark del cierre de caja con muchos movimientos abiertos.
+
+Compara el cierre "por pasos" anterior (select_for_update + exists +
+aggregate + first + count + update) con generar_cierre_caja() actual,
+midiendo cuánto dura la transacción del cierre: es el tiempo que los
+movimientos del cobrador quedan bloqueados.
+
+Todo corre dentro de una transacción que se revierte al final: no deja
+datos en la base. Uso:
+    python scripts/bench_cierre_caja.py [--movimientos 10000] [--repeticiones 3]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "sitio.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+from django.db.models import Case, DecimalField, Sum, Value, When  # noqa: E402
+
+from app_estacionamiento.models import MovimientoCaja, Usuario  # noqa: E402
+from app_estacionamiento.services.caja import MEDIOS_DIGITALES, generar_cierre_caja  # noqa: E402
+
+MEDIOS = [m for m, _ in MovimientoCaja.MEDIOS_PAGO]
+
+
+class _Revertir(Exception):
+    pass
+
+
+def _cierre_por_pasos(usuario):
+    """El cierre anterior, solo la parte que recorre los movimientos bloqueados."""
+    with transaction.atomic():
+        movimientos = MovimientoCaja.objects.select_for_update().filter(
+            usuario=usuario, tipo="ingreso", cerrado=False,
+        ).order_by("creado_en")
+        if not movimientos.exists():
+            return
+        decimal = DecimalField(max_digits=12, decimal_places=2)
+        movimientos.aggregate(
+            total=Sum("monto"),
+            efectivo=Sum(Case(When(medio_pago="efectivo", then="monto"), default=Value(0), output_field=decimal)),
+            transferencia=Sum(Case(When(medio_pago="transferencia", then="monto"), default=Value(0), output_field=decimal)),
+            digital=Sum(Case(When(medio_pago__in=MEDIOS_DIGITALES, then="monto"), default=Value(0), output_field=decimal)),
+        )
+        movimientos.first()
+        movimientos.count()
+        movimientos.update(cerrado=True)
+
+
+def _medir(funcion, usuario, cantidad):
+    """Carga `cantidad` movimientos abiertos, mide la transacción del cierre y revierte."""
+    try:
+        with transaction.atomic():
+            MovimientoCaja.objects.bulk_create(
+                [
+                    MovimientoCaja(
+                        usuario=usuario, monto=Decimal("100"), tipo="ingreso",
+                        medio_pago=MEDIOS[i % len(MEDIOS)], descripcion=f"bench {i}",
+                    )
+                    for i in range(cantidad)
+                ],
+                batch_size=2000,
+            )
+            inicio = time.perf_counter()
+            funcion(usuario)
+            duracion = time.perf_counter() - inicio
+            raise _Revertir
+    except _Revertir:
+        pass
+    return duracion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--movimientos", type=int, default=10000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        with transaction.atomic():
+            usuario = Usuario.objects.create_user(
+                correo="bench-cierre@invalid", password=None, es_vendedor=True,
+                porcentaje_ganancia=Decimal("10"),
+            )
+            print(f"Base: {connection.vendor} — {args.movimientos} movimientos abiertos")
+            for nombre, funcion in (("por pasos (anterior)", _cierre_por_pasos),
+                                    ("generar_cierre_caja", generar_cierre_caja)):
+                tiempos = [_medir(funcion, usuario, args.movimientos) for _ in range(args.repeticiones)]
+                print(f"  {nombre:<22} mediana {statistics.median(tiempos) * 1000:8.1f} ms "
+                      f"(mín {min(tiempos) * 1000:.1f} ms)")
+            raise _Revertir
+    except _Revertir:
+        pass
+
+
+if __name__ == "__main__":
+    main()
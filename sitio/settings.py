@@ -122,6 +122,26 @@ else:
         }
     }
 
+# ─── Caché ────────────────────────────────────────────────────────────────────
+# El calendario de cobro y el sello del índice de subcuadras se invalidan
+# desde señales: el caché tiene que ser compartido para que la invalidación
+# hecha en un proceso (otro worker de gunicorn, barrer_estacionamientos o
+# un shell) llegue a los demás. En producción: tabla en la base
+# (`python manage.py createcachetable`, corre en el preDeploy).
+# En desarrollo y tests: memoria del proceso.
+if DEBUG:
+    CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND":  "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "cache_compartido",
+            "OPTIONS":  {"MAX_ENTRIES": 50000},
+        },
+    }
+
 # ─── Autenticación ────────────────────────────────────────────────────────────
 AUTH_USER_MODEL = "app_estacionamiento.Usuario"
 
@@ -222,6 +242,12 @@ STORAGES = {
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedStaticFilesStorage",
     },
+    # "archivos": lo que no es imagen (reportes PDF/Excel generados, Excel a
+    # importar). Con Cloudinary se sube como recurso "raw": el storage de
+    # media solo acepta imágenes y rechaza un .xlsx.
+    "archivos": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
 }
 
 # ─── Archivos de media (fotos infracciones, logos) ───────────────────────────
@@ -240,6 +266,9 @@ if _cloudinary_cloud:
     STORAGES["default"] = {
         "BACKEND": "cloudinary_storage.storage.MediaCloudinaryStorage",
     }
+    STORAGES["archivos"] = {
+        "BACKEND": "cloudinary_storage.storage.RawMediaCloudinaryStorage",
+    }
     # MEDIA_URL vacío: django-cloudinary-storage construye la URL completa de Cloudinary
     # internamente. Si se setea a la URL base de Cloudinary, la URL se duplica.
     MEDIA_URL = ""
@@ -333,6 +362,42 @@ MP_CLIENT_SECRET  = os.getenv("MP_CLIENT_SECRET", "")
 # Sin esta variable, la verificación se omite (modo permisivo para entornos de prueba).
 MP_WEBHOOK_SECRET = os.getenv("MP_WEBHOOK_SECRET", "")
 
+# ─── Verificaciones del inspector (write-behind) ─────────────────────────────
+# Las VerificacionInspector se encolan en memoria + archivo spool y se insertan
+# con bulk_create cada N registros o T segundos (services/registro_verificaciones.py).
+# Los spools de procesos caídos los recupera: python manage.py volcar_verificaciones
+# En False (o sin fcntl, ej. Windows) se insertan en el momento, como antes.
+# Desactivado por defecto: activarlo solo con VERIFICACIONES_SPOOL_DIR en un
+# volumen persistente (el filesystem de Railway se borra en cada deploy) y con
+# `volcar_verificaciones --continuo` corriendo como servicio aparte. Mientras
+# tanto, la tolerancia de infracciones solo ve el buffer del propio proceso.
+VERIFICACIONES_WRITE_BEHIND   = os.getenv("VERIFICACIONES_WRITE_BEHIND", "False") == "True"
+VERIFICACIONES_SPOOL_DIR      = os.getenv("VERIFICACIONES_SPOOL_DIR", str(BASE_DIR / "spool"))
+VERIFICACIONES_FLUSH_CADA     = int(os.getenv("VERIFICACIONES_FLUSH_CADA", "50"))
+VERIFICACIONES_FLUSH_SEGUNDOS = float(os.getenv("VERIFICACIONES_FLUSH_SEGUNDOS", "5"))
+
+# ─── Fotos de infracciones (marca de agua en segundo plano) ──────────────────
+# En True el acta se guarda con la foto cruda (foto_estado="pendiente") y la
+# marca de agua + limpieza de EXIF la hace: python manage.py procesar_fotos_infracciones
+# En False se procesa en el request, como antes.
+# Desactivado por defecto: activarlo solo con
+# `procesar_fotos_infracciones --continuo` corriendo como servicio aparte;
+# sin worker las actas quedan con la foto cruda y "en proceso" para siempre.
+INFRACCIONES_FOTO_ASINCRONA = os.getenv("INFRACCIONES_FOTO_ASINCRONA", "False") == "True"
+
+# ─── Reportes pesados (PDF juzgado/rendición, Excel de estadísticas) ─────────
+# En True los links de descarga piden el reporte y lo genera el worker:
+# python manage.py generar_reportes --continuo
+# En False (por defecto, sin worker desplegado) la descarga es directa y el
+# endpoint de reportes lo genera en el mismo request.
+REPORTES_EN_SEGUNDO_PLANO = os.getenv("REPORTES_EN_SEGUNDO_PLANO", "False") == "True"
+
+# ─── Importación de estacionamientos del sistema anterior ────────────────────
+# En True la importa el worker: python manage.py importar_estacionamientos --continuo
+# En False (por defecto, sin worker desplegado) avanza por tramos de unos
+# segundos en cada request de la página de avance, que se recarga sola.
+IMPORTACION_EN_SEGUNDO_PLANO = os.getenv("IMPORTACION_EN_SEGUNDO_PLANO", "False") == "True"
+
 # ─── Misc ─────────────────────────────────────────────────────────────────────
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -0,0 +1,168 @@
+/**
+ * cola_cobros.js
+ *
+ * Cola de cobros sin conexión para la terminal del vendedor.
+ *
+ * Los formularios de cobro marcados con data-cola-cobro="<tipo>"
+ * (estacionamiento, infraccion, abono) se envían normalmente con conexión.
+ * Sin conexión la venta se guarda en localStorage con una clave propia y la
+ * hora de la venta, y se manda al endpoint de lote (data-url del <script>)
+ * cuando vuelve la señal, al cargar cualquier página y cada 60 s.
+ *
+ * El servidor identifica cada venta por su clave: reenviar un lote cuya
+ * respuesta se perdió no cobra dos veces. Las ventas con estado "ok" o
+ * "rechazado" salen de la cola; las "error" (o sin respuesta) se reintentan.
+ * Los rechazos quedan en una lista aparte para que el vendedor los vea.
+ */
+
+'use strict';
+
+(function () {
+  var _COLA_KEY      = 'colaCobros';
+  var _RECHAZOS_KEY  = 'colaCobrosRechazados';
+  var MAX_POR_LOTE   = 50;
+  var INTERVALO_MS   = 60000;
+
+  var script = document.currentScript;
+  var URL_LOTE = script && script.dataset.url;
+  var enviando = false;
+
+  // ── Persistencia ──────────────────────────────────────────────────────────
+
+  function leer(key) {
+    try { return JSON.parse(localStorage.getItem(key) || '[]'); } catch (_) { return []; }
+  }
+
+  function guardar(key, lista) {
+    localStorage.setItem(key, JSON.stringify(lista));
+  }
+
+  function nuevaClave() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2, 12);
+  }
+
+  function csrfToken() {
+    var m = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    if (m) return decodeURIComponent(m[1]);
+    var input = document.querySelector('input[name=csrfmiddlewaretoken]');
+    return input ? input.value : '';
+  }
+
+  // ── Indicador ─────────────────────────────────────────────────────────────
+
+  function actualizarIndicador() {
+    var pendientes = leer(_COLA_KEY).length;
+    var rechazos   = leer(_RECHAZOS_KEY);
+    var div = document.getElementById('cola-cobros-estado');
+    if (!pendientes && !rechazos.length) {
+      if (div) div.remove();
+      return;
+    }
+    if (!div) {
+      div = document.createElement('div');
+      div.id = 'cola-cobros-estado';
+      div.className = 'alert';
+      div.style.cssText = 'position:fixed; bottom:1rem; left:1rem; right:1rem; z-index:1000;' +
+        'background:#fff3cd; color:#856404; border:1px solid #ffc107; border-radius:8px;' +
+        'padding:0.75rem 1rem; font-size:0.95rem;';
+      document.body.appendChild(div);
+    }
+    var texto = '';
+    if (pendientes) {
+      texto += '📶 ' + pendientes + (pendientes === 1 ? ' cobro sin enviar' : ' cobros sin enviar') +
+        ' — se envían al volver la conexión.';
+    }
+    rechazos.forEach(function (r) {
+      texto += (texto ? '\n' : '') + '⚠️ ' + (r.patente || r.tipo) + ': ' + r.error;
+    });
+    div.textContent = texto;
+    div.style.whiteSpace = 'pre-line';
+    if (rechazos.length && !div.querySelector('button')) {
+      var btn = document.createElement('button');
+      btn.type = 'button';
+      btn.className = 'btn btn-outline';
+      btn.textContent = 'Entendido';
+      btn.style.marginTop = '0.5rem';
+      btn.addEventListener('click', function () {
+        guardar(_RECHAZOS_KEY, []);
+        actualizarIndicador();
+      });
+      div.appendChild(document.createElement('br'));
+      div.appendChild(btn);
+    }
+  }
+
+  // ── Encolar ───────────────────────────────────────────────────────────────
+
+  function encolar(form) {
+    var datos = new FormData(form);
+    var venta = {
+      clave:      nuevaClave(),
+      tipo:       form.dataset.colaCobro,
+      vendido_en: new Date().toISOString(),
+    };
+    ['patente', 'duracion', 'infraccion_id', 'mes', 'medio_pago'].forEach(function (campo) {
+      if (datos.has(campo)) venta[campo] = datos.get(campo);
+    });
+    var cola = leer(_COLA_KEY);
+    cola.push(venta);
+    guardar(_COLA_KEY, cola);
+    actualizarIndicador();
+    alert('Sin conexión: el cobro quedó guardado y se registra al volver la señal.');
+    form.reset();
+  }
+
+  document.addEventListener('submit', function (e) {
+    var form = e.target;
+    if (!form.dataset || !form.dataset.colaCobro || navigator.onLine) return;
+    // Botones que no cobran (p. ej. "Cancelar" en el abono) siguen su curso
+    if (e.submitter && e.submitter.name === 'accion' && e.submitter.value !== 'cobrar') return;
+    e.preventDefault();
+    encolar(form);
+  });
+
+  // ── Enviar ────────────────────────────────────────────────────────────────
+
+  function enviar() {
+    var cola = leer(_COLA_KEY);
+    if (enviando || !URL_LOTE || !cola.length || !navigator.onLine) return;
+    enviando = true;
+    var lote = cola.slice(0, MAX_POR_LOTE);
+
+    fetch(URL_LOTE, {
+      method: 'POST',
+      credentials: 'same-origin',
+      headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrfToken() },
+      body: JSON.stringify({ cobros: lote }),
+    })
+      .then(function (r) { return r.ok ? r.json() : Promise.reject(r.status); })
+      .then(function (data) {
+        var terminadas = {};
+        var rechazos = leer(_RECHAZOS_KEY);
+        (data.resultados || []).forEach(function (res, i) {
+          if (res.estado === 'error') return;
+          terminadas[lote[i].clave] = true;
+          if (res.estado === 'rechazado') {
+            rechazos.push({ tipo: lote[i].tipo, patente: lote[i].patente, error: res.error });
+          }
+        });
+        guardar(_RECHAZOS_KEY, rechazos);
+        // Releer: pudo encolarse otra venta mientras tanto
+        guardar(_COLA_KEY, leer(_COLA_KEY).filter(function (v) { return !terminadas[v.clave]; }));
+        var quedan = Object.keys(terminadas).length === lote.length && leer(_COLA_KEY).length;
+        enviando = false;
+        actualizarIndicador();
+        if (quedan) enviar();
+      })
+      .catch(function () {
+        enviando = false;
+        actualizarIndicador();
+      });
+  }
+
+  window.addEventListener('online', enviar);
+  setInterval(enviar, INTERVALO_MS);
+  actualizarIndicador();
+  enviar();
+}());
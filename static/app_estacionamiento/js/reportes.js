@@ -0,0 +1,86 @@
+/**
+ * reportes.js
+ *
+ * Descarga de reportes pesados generados en segundo plano.
+ *
+ * Los links marcados con data-reporte="<tipo>" (juzgado, rendicion,
+ * estadisticas_inspectores, infracciones_dia) en vez de descargar en el
+ * request piden el reporte al endpoint (data-url del <script>) con los
+ * mismos parámetros del link (query string y data-rendicion-id), muestran
+ * el progreso en el propio link y descargan el archivo cuando está listo.
+ *
+ * Si el pedido falla, o el trabajo sigue sin empezar pasados
+ * ESPERA_WORKER_MS (worker apagado), se sigue el link: la descarga directa
+ * sigue funcionando.
+ */
+
+'use strict';
+
+(function () {
+  var INTERVALO_MS     = 2000;
+  var ESPERA_WORKER_MS = 60000;
+
+  var script = document.currentScript;
+  var URL_SOLICITAR = script && script.dataset.url;
+
+  function csrfToken() {
+    var m = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    if (m) return decodeURIComponent(m[1]);
+    var input = document.querySelector('input[name=csrfmiddlewaretoken]');
+    return input ? input.value : '';
+  }
+
+  function terminar(link, texto) {
+    link.innerHTML = link.dataset.textoOriginal;
+    delete link.dataset.generando;
+    if (texto) alert(texto);
+  }
+
+  function descargaDirecta(link) {
+    terminar(link);
+    window.location.href = link.href;
+  }
+
+  function seguir(link, datos, desde) {
+    if (datos.estado === 'listo') {
+      terminar(link);
+      window.location.href = datos.url_descarga;
+      return;
+    }
+    if (datos.estado === 'pendiente' && Date.now() - desde > ESPERA_WORKER_MS) {
+      descargaDirecta(link);
+      return;
+    }
+    link.textContent = '⏳ Generando… ' + (datos.progreso || 0) + '%';
+    setTimeout(function () {
+      fetch(datos.url_estado, { credentials: 'same-origin' })
+        .then(function (r) { return r.ok ? r.json() : Promise.reject(r.status); })
+        .then(function (nuevo) { seguir(link, nuevo, desde); })
+        .catch(function () { terminar(link, 'No se pudo consultar el estado del reporte.'); });
+    }, INTERVALO_MS);
+  }
+
+  document.addEventListener('click', function (e) {
+    var link = e.target.closest && e.target.closest('a[data-reporte]');
+    if (!link || !URL_SOLICITAR) return;
+    e.preventDefault();
+    if (link.dataset.generando) return;
+    link.dataset.generando = '1';
+    link.dataset.textoOriginal = link.innerHTML;
+    link.textContent = '⏳ Pidiendo…';
+
+    var datos = new URLSearchParams(new URL(link.href, window.location.href).search);
+    datos.set('tipo', link.dataset.reporte);
+    if (link.dataset.rendicionId) datos.set('rendicion_id', link.dataset.rendicionId);
+
+    fetch(URL_SOLICITAR, {
+      method: 'POST',
+      credentials: 'same-origin',
+      headers: { 'X-CSRFToken': csrfToken() },
+      body: datos,
+    })
+      .then(function (r) { return r.ok ? r.json() : Promise.reject(r.status); })
+      .then(function (trabajo) { seguir(link, trabajo, Date.now()); })
+      .catch(function () { descargaDirecta(link); });
+  });
+}());